@@ -9,7 +9,6 @@ import json
 import importlib.util
 from pathlib import Path
 from datetime import datetime, timedelta
-import requests
 from typing import Dict, Any
 
 
@@ -63,8 +62,10 @@ def check_dependencies() -> bool:
 def check_target_website() -> bool:
     """Check if the target website is accessible."""
     try:
-        response = requests.get("https://books.toscrape.com/", timeout=10)
-        return response.status_code == 200
+        from utils.http_client import PooledFetcher
+
+        response = PooledFetcher.get("https://books.toscrape.com/", timeout=10)
+        return response.status == 200
     except Exception:
         return False
 
@@ -1,19 +1,119 @@
-from scrapling.fetchers import Fetcher
 from scrapling.parser import Adaptors, Adaptor
+from utils.http_client import (
+    PooledAsyncFetcher as AsyncFetcher,
+    PooledFetcher as Fetcher,
+    RawPage,
+    connection_stats,
+)
+from utils.backpressure import (
+    DEFAULT_OUTPUT_HIGH_WATER,
+    backpressure,
+    configure_backpressure,
+    default_detail_high_water,
+)
+from utils.checkpoint import CheckpointJournal
+from utils.concurrency import AdaptiveLimiter
+from utils.conditional import (
+    NOT_MODIFIED,
+    conditional_requests,
+    configure_conditional_requests,
+)
+from utils.archive import RECORDED_LATENCY, configure_archive, crawl_archive
+from utils.enrichment import (
+    DETAIL_MODES,
+    configure_details,
+    detail_policy,
+    has_details,
+)
+from utils.frontier import canonicalize_url, configure_frontier, frontier
+from utils.hedging import Hedger
+from utils.images import DEFAULT_IMAGE_CONCURRENCY, ImageDownloader, ImageStore
 from utils.logger import logger
+from utils.parse_pool import ParsePool
+from utils.rate_limiter import configure_rate_limit, rate_limiter
+from utils.response_cache import (
+    DEFAULT_CACHE_MAX_BYTES,
+    DEFAULT_CACHE_TTL,
+    configure_response_cache,
+    response_cache,
+)
+from utils.retry import configure_retries, retry_engine
+from utils.work_queue import Task, WorkQueue
 from utils.signal_handler import (
     setup_graceful_shutdown,
     is_shutdown_requested,
     add_cleanup_callback,
+    remove_cleanup_callback,
+    deferred_exit,
 )
+from utils.sink import JsonArraySink, PageOrder
+from utils.worker_pool import CrawlPool
 from tqdm import tqdm
+import asyncio
+import collections
 import concurrent.futures
+import contextlib
+import glob
+import heapq
+import json
 import re
+import socket
 import sys
 import os
-from typing import Dict, List, Any
+import time
+import uuid
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Generator,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
 from urllib.parse import urljoin
 
+T = TypeVar("T")
+
+# How often distributed workers and the coordinator poll the work queue
+QUEUE_POLL_INTERVAL = 1.0
+
+BASE_URL = "https://books.toscrape.com/"
+
+
+class FetchError(Exception):
+    """Raised when the crawl can't start because the first page failed."""
+
+
+def get_output_path(filename: str) -> str:
+    """Return where an output file should be written.
+
+    Args:
+        filename (str): The name of the output file.
+
+    Returns:
+        str: The path inside $OUTPUT_DIR if set, /app/output in Docker,
+        otherwise the file name relative to the current directory.
+    """
+    output_dir = os.environ.get("OUTPUT_DIR")
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        return os.path.join(output_dir, filename)
+
+    # Use /app/output if it exists (Docker environment), otherwise use current directory
+    if os.path.exists("/app") and os.access("/app", os.W_OK):
+        output_dir = "/app/output"
+        os.makedirs(output_dir, exist_ok=True)
+        return os.path.join(output_dir, filename)
+
+    # For local development and CI environments, use current directory
+    return filename
+
 
 def save_to_json(data: List[Dict[str, Any]], filename: str = "books.json") -> None:
     """Save the extracted data to a JSON file.
@@ -23,16 +123,8 @@ def save_to_json(data: List[Dict[str, Any]], filename: str = "books.json") -> No
         filename (str, optional): The name of the output file. Defaults to "books.json".
     """
     import json
-    import os
 
-    # Use /app/output if it exists (Docker environment), otherwise use current directory
-    if os.path.exists("/app") and os.access("/app", os.W_OK):
-        output_dir = "/app/output"
-        os.makedirs(output_dir, exist_ok=True)
-        output_path = os.path.join(output_dir, filename)
-    else:
-        # For local development and CI environments, use current directory
-        output_path = filename
+    output_path = get_output_path(filename)
 
     with open(output_path, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=4, ensure_ascii=False)
@@ -81,7 +173,8 @@ def process_book_listing(book: Adaptor, base_url: str) -> Dict[str, Any]:
         return {}
 
     relative_url = book_url_element.attrib.get("href", "")
-    if "catalogue" not in str(relative_url):
+    # Category pages link to books relative to themselves ("../../../")
+    if "catalogue" not in str(relative_url) and not str(relative_url).startswith("../"):
         relative_url = f"catalogue/{relative_url}"
     book_url = urljoin(base_url, relative_url)
 
@@ -117,11 +210,341 @@ def process_book_listing(book: Adaptor, base_url: str) -> Dict[str, Any]:
     }
 
 
-def process_book_details(book_data: Dict[str, Any]) -> Dict[str, Any]:
+def extract_book_details(detail_page: Adaptor) -> Dict[str, Any]:
+    """Extract the product information from a book detail page.
+
+    Args:
+        detail_page (Adaptor): The parsed detail page.
+
+    Returns:
+        Dict[str, Any]: The detail fields to merge into the book data.
+    """
+    # Extract product information table
+    product_info = {}
+    table_rows = detail_page.find_all("table.table-striped tr")
+
+    for row in table_rows:
+        header_elements = row.css("th::text")
+        value_elements = row.css("td::text")
+        header = "".join(str(elem) for elem in header_elements).strip()
+        value = "".join(str(elem) for elem in value_elements).strip()
+        product_info[header] = value
+
+    # Extract description
+    description_elem = detail_page.find("div#product_description + p")
+    description = description_elem.text.strip() if description_elem else ""
+
+    # Extract category
+    breadcrumb = detail_page.find("ul.breadcrumb")
+    if breadcrumb:
+        breadcrumb_items = breadcrumb.find_all("li")
+        if len(breadcrumb_items) > 2:
+            category_elements = breadcrumb_items[2].css("a::text")
+            category = "".join(str(elem) for elem in category_elements).strip()
+        else:
+            category = ""
+    else:
+        category = ""
+
+    return {
+        "upc": product_info.get("UPC", ""),
+        "product_type": product_info.get("Product Type", ""),
+        "price_excl_tax": product_info.get("Price (excl. tax)", ""),
+        "price_incl_tax": product_info.get("Price (incl. tax)", ""),
+        "tax": product_info.get("Tax", ""),
+        "availability": product_info.get("Availability", ""),
+        "number_of_reviews": product_info.get("Number of reviews", ""),
+        "description": description,
+        "category": category,
+    }
+
+
+def merge_detail_page(
+    book_data: Dict[str, Any], detail_page: Adaptor
+) -> Dict[str, Any]:
+    """Merge a fetched detail page into the book data.
+
+    A page answered 304 Not Modified gets the details stored by the run that
+    last fetched it.
+
+    Args:
+        book_data (Dict[str, Any]): The basic book data from the listing.
+        detail_page (Adaptor): The fetched detail page.
+
+    Returns:
+        Dict[str, Any]: The book data, enhanced when the page was fetched successfully.
+    """
+    if detail_page.status == NOT_MODIFIED:
+        details = conditional_requests.reuse(str(detail_page.url))
+        if details is None:
+            logger.warning(
+                f"No stored details for unchanged page of {book_data.get('title')}"
+            )
+            return book_data
+        book_data.update(details)
+        return book_data
+
+    if detail_page.status != 200:
+        logger.warning(
+            f"Failed to fetch detail page for {book_data.get('title')}. Status: {detail_page.status}"
+        )
+        return book_data
+
+    # Update book data with details
+    details = extract_book_details(detail_page)
+    if conditional_requests.enabled:
+        conditional_requests.remember(
+            str(detail_page.url), detail_page.headers, details
+        )
+    book_data.update(details)
+    return book_data
+
+
+def send_with_policies(
+    get: Callable[[], T],
+    stage: str,
+    limiter: Optional[AdaptiveLimiter] = None,
+    hedger: Optional[Hedger] = None,
+) -> T:
+    """Send a request through the hedger, the adaptive limit and the retry engine.
+
+    Args:
+        get (Callable[[], T]): Sends one request and returns the response.
+        stage (str): Pipeline stage of the request ("listing" or "detail").
+        limiter (AdaptiveLimiter, optional): Adaptive concurrency limit each
+            attempt waits for and reports its status to. Defaults to None.
+        hedger (Hedger, optional): Sends a backup request when an attempt is
+            slower than the hedging percentile. Defaults to None.
+
+    Returns:
+        T: The last response; retries are exhausted if it isn't a 200.
+    """
+
+    def send() -> T:
+        if hedger is None:
+            return get()
+        return hedger.call(get)
+
+    def attempt() -> T:
+        if limiter is None:
+            return send()
+        with limiter.slot() as slot:
+            page = send()
+            slot.status = page.status
+        return page
+
+    return retry_engine.call(stage, attempt)
+
+
+def conditional_kwargs(url: str, revalidate: bool = True) -> Dict[str, Any]:
+    """Return the extra fetch arguments of a conditional GET, if one applies.
+
+    Args:
+        url (str): The URL to fetch.
+        revalidate (bool, optional): Whether a 304 Not Modified is acceptable
+            for this request. Defaults to True.
+
+    Returns:
+        Dict[str, Any]: ``headers`` with the stored validators, or nothing.
+    """
+    headers = conditional_requests.request_headers(url) if revalidate else {}
+    return {"headers": headers} if headers else {}
+
+
+def fetch_page(
+    url: str,
+    stage: str,
+    limiter: Optional[AdaptiveLimiter] = None,
+    hedger: Optional[Hedger] = None,
+    revalidate: bool = True,
+) -> Adaptor:
+    """Fetch and parse a page through the retry engine.
+
+    Args:
+        url (str): The URL to fetch.
+        stage (str): Pipeline stage of the request ("listing" or "detail").
+        limiter (AdaptiveLimiter, optional): Adaptive concurrency limit each
+            attempt waits for and reports its status to. Defaults to None.
+        hedger (Hedger, optional): Sends a backup request when an attempt is
+            slower than the hedging percentile. Defaults to None.
+        revalidate (bool, optional): Send the stored validators, so an
+            unchanged page may be answered 304 Not Modified. Defaults to True.
+
+    Returns:
+        Adaptor: The last response; retries are exhausted if it isn't a 200
+        (or a 304).
+    """
+    kwargs = conditional_kwargs(url, revalidate)
+    return send_with_policies(
+        lambda: Fetcher.get(url, stealthy_headers=True, **kwargs),
+        stage,
+        limiter,
+        hedger,
+    )
+
+
+def fetch_raw_page(
+    url: str,
+    stage: str,
+    limiter: Optional[AdaptiveLimiter] = None,
+    hedger: Optional[Hedger] = None,
+) -> RawPage:
+    """Fetch a page through the retry engine without parsing it.
+
+    Args:
+        url (str): The URL to fetch.
+        stage (str): Pipeline stage of the request ("listing" or "detail").
+        limiter (AdaptiveLimiter, optional): Adaptive concurrency limit each
+            attempt waits for and reports its status to. Defaults to None.
+        hedger (Hedger, optional): Sends a backup request when an attempt is
+            slower than the hedging percentile. Defaults to None.
+
+    Returns:
+        RawPage: The last response; retries are exhausted if it isn't a 200.
+    """
+    return send_with_policies(
+        lambda: Fetcher.get_raw(url, stealthy_headers=True), stage, limiter, hedger
+    )
+
+
+def fetch_image(url: str) -> Optional[bytes]:
+    """Download a cover image through the shared client and the retry engine.
+
+    Args:
+        url (str): The image URL.
+
+    Returns:
+        Optional[bytes]: The image content, or None if it couldn't be fetched.
+    """
+    page = send_with_policies(
+        lambda: Fetcher.get_raw(url, stealthy_headers=True), "image"
+    )
+    if page.status != 200:
+        logger.warning(f"Failed to download image {url}. Status: {page.status}")
+        return None
+    return page.body
+
+
+async def async_send_with_policies(
+    get: Callable[[], Awaitable[T]],
+    stage: str,
+    semaphore: asyncio.Semaphore,
+    limiter: Optional[AdaptiveLimiter] = None,
+    hedger: Optional[Hedger] = None,
+) -> T:
+    """Send an async request through the hedger, the limits and the retry engine.
+
+    Backoff sleeps happen outside the semaphore so waiting retries don't
+    block other requests.
+
+    Args:
+        get (Callable[[], Awaitable[T]]): Sends one request and returns the response.
+        stage (str): Pipeline stage of the request ("listing" or "detail").
+        semaphore (asyncio.Semaphore): Limits the number of concurrent requests.
+        limiter (AdaptiveLimiter, optional): Adaptive concurrency limit each
+            attempt waits for and reports its status to. Defaults to None.
+        hedger (Hedger, optional): Sends a backup request when an attempt is
+            slower than the hedging percentile; the slower one is cancelled.
+            Defaults to None.
+
+    Returns:
+        T: The last response; retries are exhausted if it isn't a 200.
+    """
+
+    async def send() -> T:
+        if hedger is None:
+            return await get()
+        return await hedger.call_async(get)
+
+    async def attempt() -> T:
+        if limiter is None:
+            async with semaphore:
+                return await send()
+        # Wait for the adaptive limit first so queued details don't hold
+        # semaphore permits the listing pages need
+        async with limiter.async_slot() as slot, semaphore:
+            page = await send()
+            slot.status = page.status
+        return page
+
+    return await retry_engine.call_async(stage, attempt)
+
+
+async def async_fetch_page(
+    url: str,
+    stage: str,
+    semaphore: asyncio.Semaphore,
+    limiter: Optional[AdaptiveLimiter] = None,
+    hedger: Optional[Hedger] = None,
+) -> Adaptor:
+    """Asynchronously fetch and parse a page through the retry engine.
+
+    Args:
+        url (str): The URL to fetch.
+        stage (str): Pipeline stage of the request ("listing" or "detail").
+        semaphore (asyncio.Semaphore): Limits the number of concurrent requests.
+        limiter (AdaptiveLimiter, optional): Adaptive concurrency limit each
+            attempt waits for and reports its status to. Defaults to None.
+        hedger (Hedger, optional): Hedges the request if it becomes a
+            straggler. Defaults to None.
+
+    Returns:
+        Adaptor: The last response; retries are exhausted if it isn't a 200
+        (or a 304).
+    """
+    kwargs = conditional_kwargs(url)
+    return await async_send_with_policies(
+        lambda: AsyncFetcher.get(url, stealthy_headers=True, **kwargs),
+        stage,
+        semaphore,
+        limiter,
+        hedger,
+    )
+
+
+async def async_fetch_raw_page(
+    url: str,
+    stage: str,
+    semaphore: asyncio.Semaphore,
+    limiter: Optional[AdaptiveLimiter] = None,
+    hedger: Optional[Hedger] = None,
+) -> RawPage:
+    """Asynchronously fetch a page through the retry engine without parsing it.
+
+    Args:
+        url (str): The URL to fetch.
+        stage (str): Pipeline stage of the request ("listing" or "detail").
+        semaphore (asyncio.Semaphore): Limits the number of concurrent requests.
+        limiter (AdaptiveLimiter, optional): Adaptive concurrency limit each
+            attempt waits for and reports its status to. Defaults to None.
+        hedger (Hedger, optional): Hedges the request if it becomes a
+            straggler. Defaults to None.
+
+    Returns:
+        RawPage: The last response; retries are exhausted if it isn't a 200.
+    """
+    return await async_send_with_policies(
+        lambda: AsyncFetcher.get_raw(url, stealthy_headers=True),
+        stage,
+        semaphore,
+        limiter,
+        hedger,
+    )
+
+
+def process_book_details(
+    book_data: Dict[str, Any],
+    limiter: Optional[AdaptiveLimiter] = None,
+    hedger: Optional[Hedger] = None,
+) -> Dict[str, Any]:
     """Fetch and process the book detail page to extract additional information.
 
     Args:
         book_data (Dict[str, Any]): The basic book data from the listing.
+        limiter (AdaptiveLimiter, optional): Adaptive concurrency limit the
+            request waits for and reports its status to. Defaults to None.
+        hedger (Hedger, optional): Hedges the request if it becomes a
+            straggler. Defaults to None.
 
     Returns:
         Dict[str, Any]: The enhanced book data with details.
@@ -134,58 +557,47 @@ def process_book_details(book_data: Dict[str, Any]) -> Dict[str, Any]:
     try:
         # Fetch the detail page
         logger.debug(f"Fetching details for: {book_data.get('title')}")
-        detail_page = Fetcher.get(detail_url, stealthy_headers=True)
+        detail_page = fetch_page(detail_url, "detail", limiter, hedger)
+        return merge_detail_page(book_data, detail_page)
 
-        if detail_page.status != 200:
-            logger.warning(
-                f"Failed to fetch detail page for {book_data.get('title')}. Status: {detail_page.status}"
-            )
-            return book_data
+    except Exception as e:
+        logger.error(
+            f"Error processing detail page for {book_data.get('title')}: {str(e)}"
+        )
+        return book_data
 
-        # Extract product information table
-        product_info = {}
-        table_rows = detail_page.find_all("table.table-striped tr")
-
-        for row in table_rows:
-            header_elements = row.css("th::text")
-            value_elements = row.css("td::text")
-            header = "".join(str(elem) for elem in header_elements).strip()
-            value = "".join(str(elem) for elem in value_elements).strip()
-            product_info[header] = value
-
-        # Extract description
-        description_elem = detail_page.find("div#product_description + p")
-        description = description_elem.text.strip() if description_elem else ""
-
-        # Extract category
-        breadcrumb = detail_page.find("ul.breadcrumb")
-        if breadcrumb:
-            breadcrumb_items = breadcrumb.find_all("li")
-            if len(breadcrumb_items) > 2:
-                category_elements = breadcrumb_items[2].css("a::text")
-                category = "".join(str(elem) for elem in category_elements).strip()
-            else:
-                category = ""
-        else:
-            category = ""
 
-        # Update book data with details
-        book_data.update(
-            {
-                "upc": product_info.get("UPC", ""),
-                "product_type": product_info.get("Product Type", ""),
-                "price_excl_tax": product_info.get("Price (excl. tax)", ""),
-                "price_incl_tax": product_info.get("Price (incl. tax)", ""),
-                "tax": product_info.get("Tax", ""),
-                "availability": product_info.get("Availability", ""),
-                "number_of_reviews": product_info.get("Number of reviews", ""),
-                "description": description,
-                "category": category,
-            }
-        )
+async def async_process_book_details(
+    book_data: Dict[str, Any],
+    semaphore: asyncio.Semaphore,
+    limiter: Optional[AdaptiveLimiter] = None,
+    hedger: Optional[Hedger] = None,
+) -> Dict[str, Any]:
+    """Asynchronously fetch and process the book detail page.
+
+    Args:
+        book_data (Dict[str, Any]): The basic book data from the listing.
+        semaphore (asyncio.Semaphore): Limits the number of concurrent requests.
+        limiter (AdaptiveLimiter, optional): Adaptive concurrency limit the
+            request waits for and reports its status to. Defaults to None.
+        hedger (Hedger, optional): Hedges the request if it becomes a
+            straggler. Defaults to None.
 
+    Returns:
+        Dict[str, Any]: The enhanced book data with details.
+    """
+    detail_url = book_data.get("detail_url")
+    if not detail_url:
+        logger.warning(f"No detail URL for book: {book_data.get('title')}")
         return book_data
 
+    try:
+        logger.debug(f"Fetching details for: {book_data.get('title')}")
+        detail_page = await async_fetch_page(
+            detail_url, "detail", semaphore, limiter, hedger
+        )
+        return merge_detail_page(book_data, detail_page)
+
     except Exception as e:
         logger.error(
             f"Error processing detail page for {book_data.get('title')}: {str(e)}"
@@ -193,6 +605,127 @@ def process_book_details(book_data: Dict[str, Any]) -> Dict[str, Any]:
         return book_data
 
 
+def fetch_book_details_raw(
+    book_data: Dict[str, Any],
+    limiter: Optional[AdaptiveLimiter] = None,
+    hedger: Optional[Hedger] = None,
+) -> Tuple[Dict[str, Any], Optional[RawPage]]:
+    """Download a book's detail page for the parse pool, without parsing it.
+
+    Args:
+        book_data (Dict[str, Any]): The basic book data from the listing.
+        limiter (AdaptiveLimiter, optional): Adaptive concurrency limit the
+            request waits for and reports its status to. Defaults to None.
+        hedger (Hedger, optional): Hedges the request if it becomes a
+            straggler. Defaults to None.
+
+    Returns:
+        Tuple[Dict[str, Any], Optional[RawPage]]: The book data and its detail
+        page, or None when there is no usable page to parse.
+    """
+    detail_url = book_data.get("detail_url")
+    if not detail_url:
+        logger.warning(f"No detail URL for book: {book_data.get('title')}")
+        return book_data, None
+
+    try:
+        logger.debug(f"Fetching details for: {book_data.get('title')}")
+        raw_page = fetch_raw_page(detail_url, "detail", limiter, hedger)
+        return book_data, usable_detail_page(book_data, raw_page)
+
+    except Exception as e:
+        logger.error(
+            f"Error processing detail page for {book_data.get('title')}: {str(e)}"
+        )
+        return book_data, None
+
+
+async def async_fetch_book_details_raw(
+    book_data: Dict[str, Any],
+    semaphore: asyncio.Semaphore,
+    limiter: Optional[AdaptiveLimiter] = None,
+    hedger: Optional[Hedger] = None,
+) -> Tuple[Dict[str, Any], Optional[RawPage]]:
+    """Asynchronously download a book's detail page for the parse pool.
+
+    Args:
+        book_data (Dict[str, Any]): The basic book data from the listing.
+        semaphore (asyncio.Semaphore): Limits the number of concurrent requests.
+        limiter (AdaptiveLimiter, optional): Adaptive concurrency limit the
+            request waits for and reports its status to. Defaults to None.
+        hedger (Hedger, optional): Hedges the request if it becomes a
+            straggler. Defaults to None.
+
+    Returns:
+        Tuple[Dict[str, Any], Optional[RawPage]]: The book data and its detail
+        page, or None when there is no usable page to parse.
+    """
+    detail_url = book_data.get("detail_url")
+    if not detail_url:
+        logger.warning(f"No detail URL for book: {book_data.get('title')}")
+        return book_data, None
+
+    try:
+        logger.debug(f"Fetching details for: {book_data.get('title')}")
+        raw_page = await async_fetch_raw_page(
+            detail_url, "detail", semaphore, limiter, hedger
+        )
+        return book_data, usable_detail_page(book_data, raw_page)
+
+    except Exception as e:
+        logger.error(
+            f"Error processing detail page for {book_data.get('title')}: {str(e)}"
+        )
+        return book_data, None
+
+
+def usable_detail_page(
+    book_data: Dict[str, Any], raw_page: RawPage
+) -> Optional[RawPage]:
+    """Return the downloaded detail page if it is worth parsing.
+
+    Args:
+        book_data (Dict[str, Any]): The basic book data from the listing.
+        raw_page (RawPage): The downloaded detail page.
+
+    Returns:
+        Optional[RawPage]: The page, or None if it wasn't fetched successfully.
+    """
+    if raw_page.status != 200:
+        logger.warning(
+            f"Failed to fetch detail page for {book_data.get('title')}. Status: {raw_page.status}"
+        )
+        return None
+    return raw_page
+
+
+def parse_detail_batch(
+    items: List[Tuple[Dict[str, Any], RawPage]],
+) -> List[Dict[str, Any]]:
+    """Parse a batch of downloaded detail pages. Runs in a parse worker process.
+
+    Args:
+        items (List[Tuple[Dict[str, Any], RawPage]]): Book data and the
+            detail page downloaded for it.
+
+    Returns:
+        List[Dict[str, Any]]: The enhanced book data, in the order given.
+    """
+    books = []
+    for book_data, raw_page in items:
+        try:
+            detail_page = Adaptor(
+                body=raw_page.body, url=raw_page.url, encoding=raw_page.encoding
+            )
+            book_data.update(extract_book_details(detail_page))
+        except Exception as e:
+            logger.error(
+                f"Error parsing detail page for {book_data.get('title')}: {str(e)}"
+            )
+        books.append(book_data)
+    return books
+
+
 def get_total_pages(page: Adaptor, base_url: str) -> int:
     """Extract the total number of pages from the pagination.
 
@@ -237,181 +770,1741 @@ def get_page_url(base_url: str, page_num: int) -> str:
     return urljoin(base_url, f"catalogue/page-{page_num}.html")
 
 
-def main(max_workers: int = 10, max_pages: int = 1) -> int:
-    """Main function to scrape books from the website.
+def get_category_page_url(category_url: str, page_num: int) -> str:
+    """Generate the URL for a specific page of a category listing.
 
     Args:
-        max_workers (int, optional): Maximum number of worker threads. Defaults to 10.
-        max_pages (int, optional): Maximum number of pages to scrape. Defaults to 1.
+        category_url (str): The URL of the category's first page.
+        page_num (int): The page number.
 
     Returns:
-        int: Exit code (0 for success, non-zero for failure)
+        str: The URL for the specified page of the category.
     """
-    # Set up graceful shutdown handling
-    setup_graceful_shutdown()
+    if page_num == 1:
+        return category_url
 
-    # Track active futures for cleanup
-    active_futures: List[concurrent.futures.Future[Any]] = []
+    # Category pages are /catalogue/category/books/<name>_<id>/page-{page_num}.html
+    return urljoin(category_url, f"page-{page_num}.html")
 
-    def cleanup_futures():
-        """Cancel any active futures during shutdown."""
-        logger.info("Cancelling active futures...")
-        for future in active_futures:
-            if not future.done():
-                future.cancel()
-        active_futures.clear()
 
-    add_cleanup_callback(cleanup_futures)
+def discover_categories(page: Adaptor, base_url: str) -> List[Tuple[str, str]]:
+    """Extract the book categories from the sidebar of a listing page.
 
-    base_url = "https://books.toscrape.com/"
+    Args:
+        page (Adaptor): A listing page with the category sidebar.
+        base_url (str): The base URL of the website.
 
-    logger.info("Starting the scraping process...")
-    logger.info(f"Configuration: max_workers={max_workers}, max_pages={max_pages}")
+    Returns:
+        List[Tuple[str, str]]: The name and first page URL of each category,
+        in sidebar order.
+    """
+    categories = []
+    # The top-level "Books" entry contains every category as a nested list
+    for link in page.find_all("div.side_categories ul li ul li a"):
+        name = link.text.strip()
+        href = link.attrib.get("href", "")
+        if name and href:
+            categories.append((name, urljoin(base_url, str(href))))
+    return categories
+
+
+def select_pages(
+    total_pages: int,
+    page_range: Optional[Tuple[int, int]] = None,
+    shard_index: int = 0,
+    shard_count: int = 1,
+) -> List[int]:
+    """Choose the listing pages this process crawls.
+
+    Pages are first cut to ``page_range`` and then dealt round-robin over the
+    shards, so the assignment only depends on the arguments and a restarted
+    shard redoes exactly its own pages.
 
-    try:
-        # Check for shutdown before starting
-        if is_shutdown_requested():
-            logger.info("Shutdown requested before starting, exiting gracefully")
-            return 0
+    Args:
+        total_pages (int): The number of listing pages of the catalogue.
+        page_range (Tuple[int, int], optional): First and last page to crawl,
+            inclusive. Defaults to None, which means every page.
+        shard_index (int, optional): Which shard this process is, from 0.
+            Defaults to 0.
+        shard_count (int, optional): How many shards split the pages.
+            Defaults to 1.
 
-        # Fetch the first page to determine total pages
-        logger.info("Fetching first page...")
-        first_page = Fetcher.get(base_url, stealthy_headers=True)
+    Returns:
+        List[int]: The page numbers, in ascending order.
+    """
+    if shard_count < 1 or not 0 <= shard_index < shard_count:
+        raise ValueError(
+            f"Invalid shard {shard_index} of {shard_count}: "
+            "the index must be between 0 and the shard count minus 1"
+        )
+    start, end = page_range or (1, total_pages)
+    pages = range(max(1, start), min(end, total_pages) + 1)
+    return [page for page in pages if (page - 1) % shard_count == shard_index]
 
-        if first_page.status != 200:
-            logger.error(
-                f"Failed to fetch first page. Status code: {first_page.status}"
-            )
-            return 1  # Return error exit code
 
-        # Determine total number of pages
-        total_pages = get_total_pages(first_page, base_url)
-        logger.info(f"Found {total_pages} pages of books")
+def get_output_filename(
+    page_range: Optional[Tuple[int, int]] = None,
+    shard_index: int = 0,
+    shard_count: int = 1,
+) -> str:
+    """Return the JSON output name, unique per page range and shard.
 
-        # Limit pages if max_pages is specified
-        if max_pages and total_pages > max_pages:
-            total_pages = max_pages
-            logger.info(f"Limiting to {max_pages} pages as specified")
+    Args:
+        page_range (Tuple[int, int], optional): The crawled page range.
+            Defaults to None.
+        shard_index (int, optional): Which shard this process is. Defaults to 0.
+        shard_count (int, optional): How many shards split the pages.
+            Defaults to 1.
 
-        all_books = []
+    Returns:
+        str: "books.json" for a full crawl, e.g. "books-pages-1-10-shard-0-of-4.json"
+        otherwise.
+    """
+    name = "books"
+    if page_range is not None:
+        name += f"-pages-{page_range[0]}-{page_range[1]}"
+    if shard_count > 1:
+        name += f"-shard-{shard_index}-of-{shard_count}"
+    return f"{name}.json"
 
-        # Process each page
-        for page_num in range(1, total_pages + 1):
-            # Check for shutdown signal
-            if is_shutdown_requested():
-                logger.info(
-                    f"Shutdown requested while processing page {page_num}, stopping gracefully"
-                )
-                break
 
-            page_url = get_page_url(base_url, page_num)
-            logger.info(f"Processing page {page_num}/{total_pages}: {page_url}")
+def fetch_listing_page(
+    page_url: str, page_num: int, revalidate: bool = True
+) -> Optional[Adaptor]:
+    """Fetch a listing page, returning None when it cannot be used.
 
-            # Fetch the page
-            if page_num == 1:
-                page = first_page  # Reuse the first page we already fetched
-            else:
-                try:
-                    page = Fetcher.get(page_url, stealthy_headers=True)
-                except Exception as e:
-                    logger.error(f"Exception while fetching page {page_num}: {e}")
-                    continue
+    Args:
+        page_url (str): The URL of the listing page.
+        page_num (int): The page number, used for logging.
+        revalidate (bool, optional): Accept a 304 Not Modified; pass False
+            when the page itself is needed, e.g. for its pagination.
+            Defaults to True.
 
-                if page.status != 200:
-                    logger.error(
-                        f"Failed to fetch page {page_num}. Status code: {page.status}"
-                    )
-                    continue
+    Returns:
+        Optional[Adaptor]: The fetched page, or None if the fetch failed.
+    """
+    try:
+        page = fetch_page(page_url, "listing", revalidate=revalidate)
+    except Exception as e:
+        logger.error(f"Exception while fetching page {page_num}: {e}")
+        return None
 
-            # Extract books from the page
-            books: Adaptors = page.find_all(
-                "li", {"class": "col-xs-6 col-sm-4 col-md-3 col-lg-3"}
-            )
+    if page.status not in (200, NOT_MODIFIED):
+        logger.error(f"Failed to fetch page {page_num}. Status code: {page.status}")
+        return None
 
-            logger.info(f"Found {len(books)} books on page {page_num}")
-            if not books:
-                logger.warning(f"No books found on page {page_num}!")
-                continue
-
-            # Process book listings in parallel
-            with concurrent.futures.ThreadPoolExecutor(
-                max_workers=max_workers
-            ) as executor:
-                # Create a list of futures for processing book listings
-                listing_futures = [
-                    executor.submit(process_book_listing, book, base_url)
-                    for book in books
-                ]
-                active_futures.extend(listing_futures)
-
-                # Process results as they complete
-                page_books: list[Dict[str, Any]] = []
-                for future in tqdm(
-                    concurrent.futures.as_completed(listing_futures),
-                    desc=f"Extracting listings from page {page_num}",
-                    total=len(books),
-                ):
-                    if is_shutdown_requested():
-                        logger.info("Shutdown requested during listing processing")
-                        break
-                    try:
-                        result = future.result()
-                        if result:
-                            page_books.append(result)
-                    except Exception as e:
-                        logger.error(f"Error processing book listing: {e}")
+    return page
 
-                # Remove completed futures from active list
-                active_futures = [f for f in active_futures if not f.done()]
 
-            # Check for shutdown before detail processing
-            if is_shutdown_requested():
-                logger.info("Shutdown requested before detail processing")
-                break
+async def async_fetch_listing_page(
+    page_url: str, page_num: int, semaphore: asyncio.Semaphore
+) -> Optional[Adaptor]:
+    """Asynchronously fetch a listing page, returning None when it cannot be used.
 
-            # Process book details in parallel
-            with concurrent.futures.ThreadPoolExecutor(
-                max_workers=max_workers
-            ) as executor:
-                # Create a list of futures for processing book details
-                detail_futures = [
-                    executor.submit(process_book_details, book_data)
-                    for book_data in page_books
-                ]
-                active_futures.extend(detail_futures)
-
-                # Process results as they complete
-                processed_books = []
-                for future in tqdm(
-                    concurrent.futures.as_completed(detail_futures),
-                    desc=f"Fetching details for page {page_num} books",
-                    total=len(page_books),
-                ):
-                    if is_shutdown_requested():
-                        logger.info("Shutdown requested during detail processing")
-                        break
+    Args:
+        page_url (str): The URL of the listing page.
+        page_num (int): The page number, used for logging.
+        semaphore (asyncio.Semaphore): Limits the number of concurrent requests.
+
+    Returns:
+        Optional[Adaptor]: The fetched page, or None if the fetch failed.
+    """
+    try:
+        page = await async_fetch_page(page_url, "listing", semaphore)
+    except Exception as e:
+        logger.error(f"Exception while fetching page {page_num}: {e}")
+        return None
+
+    if page.status not in (200, NOT_MODIFIED):
+        logger.error(f"Failed to fetch page {page_num}. Status code: {page.status}")
+        return None
+
+    return page
+
+
+def parse_page_books(
+    page: Adaptor, page_num: int, base_url: str
+) -> List[Dict[str, Any]]:
+    """Parse the listing data of every book on a listing page.
+
+    Args:
+        page (Adaptor): The listing page.
+        page_num (int): The page number, used for logging.
+        base_url (str): The base URL of the website.
+
+    Returns:
+        List[Dict[str, Any]]: The listing data of the books on the page.
+    """
+    books: Adaptors = page.find_all(
+        "li", {"class": "col-xs-6 col-sm-4 col-md-3 col-lg-3"}
+    )
+
+    logger.info(f"Found {len(books)} books on page {page_num}")
+    if not books:
+        logger.warning(f"No books found on page {page_num}!")
+        return []
+
+    # Listing extraction only parses the page we already hold
+    page_books: List[Dict[str, Any]] = []
+    for book in books:
+        try:
+            result = process_book_listing(book, base_url)
+            if result:
+                page_books.append(result)
+        except Exception as e:
+            logger.error(f"Error processing book listing: {e}")
+    return page_books
+
+
+def extract_page_books(
+    page: Adaptor, page_num: int, base_url: str
+) -> List[Dict[str, Any]]:
+    """Extract the listing data of every book on a listing page.
+
+    Books whose detail URL is already in the URL frontier are dropped, so each
+    book is fetched and stored once. A page answered 304 Not Modified gets the
+    books stored by the run that last fetched it.
+
+    Args:
+        page (Adaptor): The listing page.
+        page_num (int): The page number, used for logging.
+        base_url (str): The base URL of the website.
+
+    Returns:
+        List[Dict[str, Any]]: The listing data of the books on the page.
+    """
+    if page.status == NOT_MODIFIED:
+        page_books = conditional_requests.reuse(str(page.url)) or []
+        logger.info(
+            f"Page {page_num} not modified, reusing its {len(page_books)} books"
+        )
+    else:
+        page_books = parse_page_books(page, page_num, base_url)
+        if not page_books:
+            return []
+        if conditional_requests.enabled:
+            conditional_requests.remember(str(page.url), page.headers, page_books)
+
+    unique_books = [
+        book_data
+        for book_data in page_books
+        if not frontier.seen_before(book_data.get("detail_url"))
+    ]
+    if len(unique_books) < len(page_books):
+        logger.info(
+            f"Skipped {len(page_books) - len(unique_books)} already seen books "
+            f"on page {page_num}"
+        )
+
+    return unique_books
+
+
+def unfinished_books(
+    journal: CheckpointJournal,
+    page_num: int,
+    page_books: List[Tuple[int, Dict[str, Any]]],
+) -> List[Tuple[int, Dict[str, Any]]]:
+    """Drop the books of a page whose details are already in the journal.
+
+    A page left with nothing to fetch is journaled as completed.
+
+    Args:
+        journal (CheckpointJournal): The checkpoint journal of the crawl.
+        page_num (int): The listing page the books are on.
+        page_books (List[Tuple[int, Dict[str, Any]]]): Position and listing
+            data of each book on the page.
+
+    Returns:
+        List[Tuple[int, Dict[str, Any]]]: The books that still need fetching.
+    """
+    remaining = [
+        (position, book_data)
+        for position, book_data in page_books
+        if not journal.has_book(book_data.get("detail_url"))
+    ]
+    if len(remaining) < len(page_books):
+        logger.info(
+            f"Skipped {len(page_books) - len(remaining)} books on page {page_num} "
+            "already in the checkpoint"
+        )
+    if not remaining:
+        journal.record_page(page_num)
+    return remaining
+
+
+def split_detail_fetches(
+    page_books: List[Tuple[int, Dict[str, Any]]],
+    journal: Optional[CheckpointJournal] = None,
+    page_num: int = 0,
+) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[Tuple[int, Dict[str, Any]]]]:
+    """Split a page's books by whether the details mode fetches them.
+
+    Books that are final without a detail request are journaled right away,
+    and so is their page when none of its books are left to fetch.
+
+    Args:
+        page_books (List[Tuple[int, Dict[str, Any]]]): Position and listing
+            data of each book on the page.
+        journal (CheckpointJournal, optional): The checkpoint journal of the
+            crawl. Defaults to None.
+        page_num (int, optional): The listing page the books are on, used for
+            the journal. Defaults to 0.
+
+    Returns:
+        Tuple[List[Tuple[int, Dict[str, Any]]], List[Tuple[int, Dict[str, Any]]]]:
+        The books to fetch, and the final records of the others.
+    """
+    to_fetch, finished = detail_policy.split(page_books)
+    if journal is not None and finished:
+        for position, record in finished:
+            journal.record_book((page_num, position), record)
+        if not to_fetch:
+            journal.record_page(page_num)
+    return to_fetch, finished
+
+
+def submit_detail(
+    pool: CrawlPool, task: Callable[..., Any], book_data: Dict[str, Any], **kwargs: Any
+) -> Optional[concurrent.futures.Future[Any]]:
+    """Submit a detail job once the detail stage has room for it.
+
+    Blocks the caller while the detail high-water mark of books is queued or
+    in flight; the job gives its slot back when it finishes.
+
+    Args:
+        pool (CrawlPool): The crawl's pool.
+        task (Callable[..., Any]): The detail job, called with ``book_data``.
+        book_data (Dict[str, Any]): The listing data of the book.
+        **kwargs: Passed on to ``task``.
+
+    Returns:
+        Optional[concurrent.futures.Future[Any]]: The job, or None if a
+        shutdown was requested while waiting.
+    """
+    release = backpressure.detail_slot(is_shutdown_requested)
+    if release is None:
+        return None
+    try:
+        future = pool.submit("detail", task, book_data, **kwargs)
+    except BaseException:
+        release()
+        raise
+    future.add_done_callback(lambda _: release())
+    return future
+
+
+def crawl_with_pool(
+    first_page: Adaptor,
+    base_url: str,
+    total_pages: int,
+    max_workers: int,
+    listing_window: int = 1,
+    limiter: Optional[AdaptiveLimiter] = None,
+    hedger: Optional[Hedger] = None,
+    parse_pool: Optional[ParsePool] = None,
+    pages: Optional[List[int]] = None,
+    journal: Optional[CheckpointJournal] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Crawl every listing page and its detail pages on one shared thread pool.
+
+    Listing pages and detail pages are pipelined: up to ``listing_window``
+    listing pages are downloaded ahead while earlier details are still being
+    fetched, and each listing page is extracted as soon as it arrives, so
+    there is no barrier between pages.
+
+    Args:
+        first_page (Adaptor): The already fetched first listing page.
+        base_url (str): The base URL of the website.
+        total_pages (int): The number of listing pages to crawl.
+        max_workers (int): Number of worker threads in the pool.
+        listing_window (int, optional): Listing pages fetched concurrently,
+            0 fetches all of them at once. Defaults to 1.
+        limiter (AdaptiveLimiter, optional): Adaptive limit on in-flight
+            detail requests. Defaults to None.
+        hedger (Hedger, optional): Hedges straggling detail requests.
+            Defaults to None.
+        parse_pool (ParsePool, optional): Worker processes that parse the
+            detail pages, so the threads only download them. Defaults to None,
+            which parses in the threads.
+        pages (List[int], optional): The listing pages to crawl, e.g. one
+            shard's share. Defaults to None, which crawls 1 to ``total_pages``.
+        journal (CheckpointJournal, optional): Checkpoint journal that
+            finished books and pages are recorded in; work it already holds
+            is skipped. Not used with ``parse_pool``. Defaults to None.
+
+    Yields:
+        Dict[str, Any]: Each finished book, in listing order, as soon as its
+        page and every page before it are done.
+    """
+    # One pool serves the whole run; shutting it down cancels queued work
+    pool = CrawlPool(max_workers)
+    add_cleanup_callback(pool.shutdown)
+
+    # Pages arrive and finish out of order; the books are put back in listing
+    # order and released a page at a time
+    order = PageOrder()
+    detail_keys: Dict[concurrent.futures.Future[Any], Tuple[int, int]] = {}
+    pending_per_page: Dict[int, int] = {}
+    listing_futures: Dict[concurrent.futures.Future[Any], int] = {}
+    if pages is None:
+        pages = list(range(1, total_pages + 1))
+    for page_num in pages:
+        order.open(page_num)
+    if journal is not None:
+        # Work finished by an interrupted run isn't fetched again
+        restore_journal(journal, order)
+        pages = [page for page in pages if page not in journal.completed_pages]
+    # The first page was already fetched to count the pages
+    later_pages = collections.deque(page for page in pages if page != 1)
+    detail_kwargs: Dict[str, Any] = {}
+    if limiter is not None:
+        detail_kwargs["limiter"] = limiter
+    if hedger is not None:
+        detail_kwargs["hedger"] = hedger
+
+    progress = tqdm(total=0, desc="Fetching book details")
+
+    def fill_listing_window() -> None:
+        """Keep up to ``listing_window`` listing pages in flight.
+
+        No page is started while the detail or output stage is backed up.
+        """
+        while (
+            later_pages
+            and (listing_window <= 0 or len(listing_futures) < listing_window)
+            and backpressure.admit(
+                len(listing_futures), len(detail_keys), order.buffered
+            )
+        ):
+            page_num = later_pages.popleft()
+            future = pool.submit(
+                "listing",
+                fetch_listing_page,
+                get_page_url(base_url, page_num),
+                page_num,
+            )
+            listing_futures[future] = page_num
+
+    def queue_page(page_num: int, page: Adaptor) -> None:
+        """Extract a listing page and queue the details of its books."""
+        page_url = get_page_url(base_url, page_num)
+        logger.info(f"Processing page {page_num}/{total_pages}: {page_url}")
+
+        page_books = list(enumerate(extract_page_books(page, page_num, base_url)))
+        if journal is not None:
+            page_books = unfinished_books(journal, page_num, page_books)
+        page_books, finished = split_detail_fetches(page_books, journal, page_num)
+        for position, record in finished:
+            order.add(page_num, position, record)
+        order.expect(page_num, len(page_books))
+        order.listed(page_num)
+        if not page_books:
+            return
+
+        # Queue the details without waiting for the previous pages
+        pending_per_page[page_num] = len(page_books)
+        progress.total += len(page_books)
+        progress.refresh()
+        detail_task = fetch_book_details_raw if parse_pool else process_book_details
+        for position, book_data in page_books:
+            future = submit_detail(pool, detail_task, book_data, **detail_kwargs)
+            if future is None:
+                break
+            detail_keys[future] = (page_num, position)
+
+        logger.debug(f"Crawl pool in flight: {pool.in_flight()}")
+
+    def store_details(future: concurrent.futures.Future[Any]) -> None:
+        """Store a finished detail result under its page and position."""
+        key = detail_keys.pop(future)
+        page_num, position = key
+        finished = True
+        try:
+            if parse_pool is None:
+                book_data = future.result()
+                order.add(page_num, position, book_data)
+                if journal is not None:
+                    journal.record_book(key, book_data)
+            else:
+                # Keep the listing data until the parse workers are done
+                book_data, raw_page = future.result()
+                order.add(page_num, position, book_data)
+                if raw_page is not None:
+                    parse_pool.add(key, (book_data, raw_page))
+                    finished = False
+        except Exception as e:
+            logger.error(f"Error processing book details: {e}")
+        progress.update(1)
+        if finished:
+            order.done(page_num)
+
+        pending_per_page[page_num] -= 1
+        if pending_per_page[page_num] == 0:
+            logger.success(f"Completed processing page {page_num}")
+            if journal is not None:
+                journal.record_page(page_num)
+
+    def store_parsed(block: bool) -> None:
+        """Store the books the parse workers are done with."""
+        if parse_pool is None:
+            return
+        for (page_num, position), book_data in parse_pool.finished(block).items():
+            if book_data is not None:
+                order.add(page_num, position, book_data)
+            order.done(page_num)
+
+    try:
+        # Later listing pages are queued ahead of the first page's details
+        fill_listing_window()
+        if 1 in pages:
+            queue_page(1, first_page)
+
+        while listing_futures or later_pages:
+            # Check for shutdown signal
+            if is_shutdown_requested():
+                logger.info(
+                    "Shutdown requested while fetching pages, stopping gracefully"
+                )
+                break
+
+            # Finished details make room for the listing pages held back
+            fill_listing_window()
+            done, _ = concurrent.futures.wait(
+                [*listing_futures, *detail_keys],
+                return_when=concurrent.futures.FIRST_COMPLETED,
+            )
+            for future in done:
+                if future in listing_futures:
+                    page_num = listing_futures.pop(future)
+                    fill_listing_window()
+                    page = future.result()
+                    if page is not None:
+                        queue_page(page_num, page)
+                    else:
+                        order.listed(page_num)
+                else:
+                    store_details(future)
+
+            store_parsed(block=False)
+            yield from order.release()
+
+        # Drain the details that are still in flight
+        for future in concurrent.futures.as_completed(list(detail_keys)):
+            if is_shutdown_requested():
+                logger.info("Shutdown requested during detail processing")
+                break
+            store_details(future)
+            yield from order.release()
+
+        if not is_shutdown_requested():
+            store_parsed(block=True)
+    finally:
+        progress.close()
+        pool.shutdown(wait=not is_shutdown_requested())
+        remove_cleanup_callback(pool.shutdown)
+
+    # Everything left, including unfinished pages after a shutdown
+    yield from order.flush()
+
+
+def restore_journal(journal: CheckpointJournal, order: PageOrder) -> None:
+    """Hand the books and pages an interrupted run journaled to the page order.
+
+    Args:
+        journal (CheckpointJournal): The loaded checkpoint journal.
+        order (PageOrder): The page order of the resumed crawl.
+    """
+    for (page_num, position), book_data in journal.restored_books().items():
+        order.open(page_num)
+        order.add(page_num, position, book_data)
+    for page_num in journal.completed_pages:
+        order.listed(page_num)
+
+
+async def crawl_async(
+    first_page: Adaptor,
+    base_url: str,
+    total_pages: int,
+    max_concurrency: int,
+    listing_window: int = 1,
+    limiter: Optional[AdaptiveLimiter] = None,
+    hedger: Optional[Hedger] = None,
+    parse_pool: Optional[ParsePool] = None,
+    pages: Optional[List[int]] = None,
+    journal: Optional[CheckpointJournal] = None,
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Crawl every listing page and its detail pages on an asyncio event loop.
+
+    Mirrors ``crawl_with_pool`` but each in-flight request is a coroutine
+    instead of a thread, bounded by a semaphore of ``max_concurrency``.
+
+    Args:
+        first_page (Adaptor): The already fetched first listing page.
+        base_url (str): The base URL of the website.
+        total_pages (int): The number of listing pages to crawl.
+        max_concurrency (int): Maximum number of concurrent requests.
+        listing_window (int, optional): Listing pages fetched concurrently,
+            0 fetches all of them at once. Defaults to 1.
+        limiter (AdaptiveLimiter, optional): Adaptive limit on in-flight
+            detail requests. Defaults to None.
+        hedger (Hedger, optional): Hedges straggling detail requests.
+            Defaults to None.
+        parse_pool (ParsePool, optional): Worker processes that parse the
+            detail pages, so the event loop only downloads them. Defaults to
+            None, which parses on the event loop.
+        pages (List[int], optional): The listing pages to crawl, e.g. one
+            shard's share. Defaults to None, which crawls 1 to ``total_pages``.
+        journal (CheckpointJournal, optional): Checkpoint journal that
+            finished books and pages are recorded in; work it already holds
+            is skipped. Not used with ``parse_pool``. Defaults to None.
+
+    Yields:
+        List[Dict[str, Any]]: The books that can go to the output, in listing
+        order, each time a page and every page before it are done.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    # Books waiting for or holding a request, bounded like the thread pool's
+    detail_slots = (
+        asyncio.Semaphore(backpressure.detail_high_water)
+        if backpressure.detail_high_water
+        else None
+    )
+    order = PageOrder()
+    detail_tasks: Dict[asyncio.Task[Any], Tuple[int, int]] = {}
+    listing_tasks: Dict[asyncio.Task[Optional[Adaptor]], int] = {}
+    if pages is None:
+        pages = list(range(1, total_pages + 1))
+    pending_per_page: Dict[int, int] = {}
+    for page_num in pages:
+        order.open(page_num)
+    if journal is not None:
+        restore_journal(journal, order)
+        pages = [page for page in pages if page not in journal.completed_pages]
+    later_pages = collections.deque(page for page in pages if page != 1)
+
+    progress = tqdm(total=0, desc="Fetching book details")
+
+    def fill_listing_window() -> None:
+        """Keep up to ``listing_window`` listing pages in flight.
+
+        No page is started while the detail or output stage is backed up.
+        """
+        while (
+            later_pages
+            and (listing_window <= 0 or len(listing_tasks) < listing_window)
+            and backpressure.admit(
+                len(listing_tasks), len(detail_tasks), order.buffered
+            )
+        ):
+            page_num = later_pages.popleft()
+            task = asyncio.create_task(
+                async_fetch_listing_page(
+                    get_page_url(base_url, page_num), page_num, semaphore
+                )
+            )
+            listing_tasks[task] = page_num
+
+    async def queue_page(page_num: int, page: Adaptor) -> None:
+        """Extract a listing page and schedule the details of its books.
+
+        Waits for room in the detail stage before each book is scheduled.
+        """
+        page_url = get_page_url(base_url, page_num)
+        logger.info(f"Processing page {page_num}/{total_pages}: {page_url}")
+
+        page_books = list(enumerate(extract_page_books(page, page_num, base_url)))
+        if journal is not None:
+            page_books = unfinished_books(journal, page_num, page_books)
+        page_books, finished = split_detail_fetches(page_books, journal, page_num)
+        for position, record in finished:
+            order.add(page_num, position, record)
+        order.expect(page_num, len(page_books))
+        order.listed(page_num)
+        pending_per_page[page_num] = len(page_books)
+        progress.total += len(page_books)
+        progress.refresh()
+        for position, book_data in page_books:
+            if detail_slots is not None:
+                if detail_slots.locked():
+                    backpressure.record_stall("detail")
+                await detail_slots.acquire()
+            task: asyncio.Task[Any]
+            if parse_pool is None:
+                task = asyncio.create_task(
+                    async_process_book_details(book_data, semaphore, limiter, hedger)
+                )
+            else:
+                task = asyncio.create_task(
+                    async_fetch_book_details_raw(book_data, semaphore, limiter, hedger)
+                )
+            task.add_done_callback(lambda _: progress.update(1))
+            if detail_slots is not None:
+                task.add_done_callback(lambda _: detail_slots.release())
+            detail_tasks[task] = (page_num, position)
+
+    def store_details(task: asyncio.Task[Any]) -> None:
+        """Store a finished detail task under its page and position."""
+        key = detail_tasks.pop(task)
+        page_num, position = key
+        finished = True
+        if task.exception() is not None:
+            logger.error(f"Error processing book details: {task.exception()}")
+        elif parse_pool is None:
+            order.add(page_num, position, task.result())
+            if journal is not None:
+                journal.record_book(key, task.result())
+        else:
+            # Keep the listing data until the parse workers are done
+            book_data, raw_page = task.result()
+            order.add(page_num, position, book_data)
+            if raw_page is not None:
+                parse_pool.add(key, (book_data, raw_page))
+                finished = False
+        if finished:
+            order.done(page_num)
+        pending_per_page[page_num] -= 1
+        if pending_per_page[page_num] == 0 and journal is not None:
+            journal.record_page(page_num)
+
+    def store_parsed(block: bool) -> None:
+        """Store the books the parse workers are done with."""
+        if parse_pool is None:
+            return
+        for (page_num, position), book_data in parse_pool.finished(block).items():
+            if book_data is not None:
+                order.add(page_num, position, book_data)
+            order.done(page_num)
+
+    def store_finished() -> None:
+        """Store every detail task that finished since the last check."""
+        for task in [t for t in detail_tasks if t.done()]:
+            store_details(task)
+        store_parsed(block=False)
+
+    try:
+        # Listing pages are scheduled before the first page's details so they
+        # get the semaphore first
+        fill_listing_window()
+        if 1 in pages:
+            await queue_page(1, first_page)
+
+        while listing_tasks or later_pages:
+            if is_shutdown_requested():
+                logger.info(
+                    "Shutdown requested while fetching pages, stopping gracefully"
+                )
+                break
+
+            # Finished details make room for the listing pages held back
+            fill_listing_window()
+            done, _ = await asyncio.wait(
+                [*listing_tasks, *detail_tasks], return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task not in listing_tasks:
+                    continue
+                page_num = listing_tasks.pop(task)
+                fill_listing_window()
+                page = task.result()
+                if page is not None:
+                    await queue_page(page_num, page)
+                else:
+                    order.listed(page_num)
+            store_finished()
+            yield order.release()
+
+        # Drain the details that are still in flight
+        while detail_tasks and not is_shutdown_requested():
+            await asyncio.wait(list(detail_tasks), return_when=asyncio.FIRST_COMPLETED)
+            store_finished()
+            yield order.release()
+
+        if not is_shutdown_requested():
+            store_parsed(block=True)
+    finally:
+        progress.close()
+        for pending in [*detail_tasks, *listing_tasks]:
+            if not pending.done():
+                pending.cancel()
+        # The async client is bound to this event loop
+        await AsyncFetcher.aclose()
+
+    # Everything left, including unfinished pages after a shutdown
+    yield order.flush()
+
+
+def iterate_async(agen: AsyncIterator[List[T]]) -> Iterator[T]:
+    """Drive an async generator of batches from synchronous code.
+
+    The generator runs on its own event loop, which is closed once the
+    generator is exhausted or the caller stops iterating.
+
+    Args:
+        agen (AsyncIterator[List[T]]): The async generator to run.
+
+    Yields:
+        T: Each item of each batch, in order.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                batch = loop.run_until_complete(agen.__anext__())
+            except StopAsyncIteration:
+                break
+            yield from batch
+    finally:
+        aclose = getattr(agen, "aclose", None)
+        if aclose is not None:
+            loop.run_until_complete(aclose())
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+
+
+def crawl_by_category(
+    categories: List[Tuple[str, str]],
+    max_workers: int,
+    max_pages: int = 0,
+    limiter: Optional[AdaptiveLimiter] = None,
+    hedger: Optional[Hedger] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Crawl each category's listing pages and their detail pages concurrently.
+
+    Every category is an independent pagination chain: the first page of all
+    of them is fetched at once, and a category's later pages are queued as
+    soon as its first page tells how many there are, earlier categories
+    first, and started while the detail and output stages have room. The
+    category of each book is taken from the chain it was found in.
+
+    Args:
+        categories (List[Tuple[str, str]]): Name and first page URL of each
+            category to crawl.
+        max_workers (int): Number of worker threads in the pool.
+        max_pages (int, optional): Maximum pages per category, 0 crawls all of
+            them. Defaults to 0.
+        limiter (AdaptiveLimiter, optional): Adaptive limit on in-flight
+            detail requests. Defaults to None.
+        hedger (Hedger, optional): Hedges straggling detail requests.
+            Defaults to None.
+
+    Yields:
+        Dict[str, Any]: Each finished book, by category in sidebar order and
+        then in listing order.
+    """
+    pool = CrawlPool(max_workers)
+    add_cleanup_callback(pool.shutdown)
+
+    # Pages are keyed by (category, page) to keep a stable output order
+    order = PageOrder()
+    detail_keys: Dict[concurrent.futures.Future[Any], Tuple[int, int, int]] = {}
+    listing_futures: Dict[concurrent.futures.Future[Any], Tuple[int, int]] = {}
+    # Later pages whose category is known, held back by backpressure
+    later_pages: List[Tuple[int, int]] = []
+    detail_kwargs: Dict[str, Any] = {}
+    if limiter is not None:
+        detail_kwargs["limiter"] = limiter
+    if hedger is not None:
+        detail_kwargs["hedger"] = hedger
+
+    progress = tqdm(total=0, desc="Fetching book details")
+
+    def submit_listing(index: int, page_num: int) -> None:
+        """Queue one listing page of a category."""
+        page_url = get_category_page_url(categories[index][1], page_num)
+        # The first page of a category is needed for its pagination
+        future = pool.submit(
+            "listing", fetch_listing_page, page_url, page_num, page_num != 1
+        )
+        listing_futures[future] = (index, page_num)
+
+    def fill_listing() -> None:
+        """Start the later pages while the detail and output stages have room."""
+        while later_pages and backpressure.admit(
+            len(listing_futures), len(detail_keys), order.buffered
+        ):
+            submit_listing(*heapq.heappop(later_pages))
+
+    def queue_page(index: int, page_num: int, page: Adaptor) -> None:
+        """Extract a category page and queue the details of its books."""
+        name, category_url = categories[index]
+        page_url = get_category_page_url(category_url, page_num)
+        logger.info(f"Processing {name} page {page_num}: {page_url}")
+
+        if page_num == 1:
+            total_pages = get_total_pages(page, category_url)
+            if max_pages and total_pages > max_pages:
+                total_pages = max_pages
+            for later_page in range(2, total_pages + 1):
+                order.open((index, later_page))
+                heapq.heappush(later_pages, (index, later_page))
+
+        # Book links on category pages are relative to the page itself
+        page_books = list(enumerate(extract_page_books(page, page_num, page_url)))
+        for _, book_data in page_books:
+            book_data["category"] = name
+        page_books, finished = split_detail_fetches(page_books)
+        for position, record in finished:
+            order.add((index, page_num), position, record)
+        order.expect((index, page_num), len(page_books))
+        order.listed((index, page_num))
+        progress.total += len(page_books)
+        progress.refresh()
+        for position, book_data in page_books:
+            future = submit_detail(
+                pool, process_book_details, book_data, **detail_kwargs
+            )
+            if future is None:
+                break
+            detail_keys[future] = (index, page_num, position)
+
+    def store_details(future: concurrent.futures.Future[Any]) -> None:
+        """Store a finished detail result under its category."""
+        index, page_num, position = detail_keys.pop(future)
+        try:
+            book_data = future.result()
+            # The crawl context already knows the category
+            book_data["category"] = categories[index][0]
+            order.add((index, page_num), position, book_data)
+        except Exception as e:
+            logger.error(f"Error processing book details: {e}")
+        order.done((index, page_num))
+        progress.update(1)
+
+    try:
+        logger.info(f"Crawling {len(categories)} categories")
+        for index in range(len(categories)):
+            order.open((index, 1))
+            submit_listing(index, 1)
+
+        while listing_futures or detail_keys or later_pages:
+            if is_shutdown_requested():
+                logger.info("Shutdown requested during category crawl")
+                break
+
+            fill_listing()
+            done, _ = concurrent.futures.wait(
+                [*listing_futures, *detail_keys],
+                return_when=concurrent.futures.FIRST_COMPLETED,
+            )
+            for future in done:
+                if future in listing_futures:
+                    index, page_num = listing_futures.pop(future)
+                    page = future.result()
+                    if page is not None:
+                        queue_page(index, page_num, page)
+                    else:
+                        order.listed((index, page_num))
+                else:
+                    store_details(future)
+            yield from order.release()
+    finally:
+        progress.close()
+        pool.shutdown(wait=not is_shutdown_requested())
+        remove_cleanup_callback(pool.shutdown)
+
+    # Everything left, including unfinished pages after a shutdown
+    yield from order.flush()
+
+
+def plan_pages(
+    base_url: str,
+    max_pages: int = 1,
+    page_range: Optional[Tuple[int, int]] = None,
+    shard_index: int = 0,
+    shard_count: int = 1,
+) -> Tuple[Adaptor, int, List[int]]:
+    """Fetch the first listing page and decide which pages to crawl.
+
+    Args:
+        base_url (str): The base URL of the website.
+        max_pages (int, optional): Maximum number of pages, 0 crawls all of
+            them. Ignored with a page range. Defaults to 1.
+        page_range (Tuple[int, int], optional): First and last page to crawl,
+            inclusive. Defaults to None.
+        shard_index (int, optional): Which of ``shard_count`` static shards
+            this process is, from 0. Defaults to 0.
+        shard_count (int, optional): Number of static shards. Defaults to 1.
+
+    Returns:
+        Tuple[Adaptor, int, List[int]]: The first page, the number of pages
+        and the pages this process crawls.
+
+    Raises:
+        FetchError: If the first page couldn't be fetched.
+    """
+    # Fetch the first page to determine total pages
+    logger.info("Fetching first page...")
+    first_page = fetch_page(base_url, "listing", revalidate=False)
+
+    if first_page.status != 200:
+        message = f"Failed to fetch first page. Status code: {first_page.status}"
+        logger.error(message)
+        raise FetchError(message)
+
+    # Determine total number of pages
+    total_pages = get_total_pages(first_page, base_url)
+    logger.info(f"Found {total_pages} pages of books")
+
+    # Limit pages if max_pages is specified; a page range sets its own
+    if max_pages and total_pages > max_pages and page_range is None:
+        total_pages = max_pages
+        logger.info(f"Limiting to {max_pages} pages as specified")
+
+    pages = select_pages(total_pages, page_range, shard_index, shard_count)
+    if len(pages) < total_pages:
+        logger.info(
+            f"Crawling {len(pages)} of {total_pages} pages "
+            f"(page range {page_range}, shard {shard_index} of {shard_count})"
+        )
+    return first_page, total_pages, pages
+
+
+def iter_books(
+    max_workers: int = 10,
+    max_pages: int = 1,
+    engine: str = "thread",
+    listing_window: int = 1,
+    base_url: str = BASE_URL,
+    page_range: Optional[Tuple[int, int]] = None,
+    shard_index: int = 0,
+    shard_count: int = 1,
+    by_category: bool = False,
+    limiter: Optional[AdaptiveLimiter] = None,
+    hedger: Optional[Hedger] = None,
+    parse_pool: Optional[ParsePool] = None,
+    journal: Optional[CheckpointJournal] = None,
+) -> Generator[Dict[str, Any], None, None]:
+    """Crawl the site and yield each book as soon as it is finished.
+
+    Books come out in listing order, a page at a time, while later pages are
+    still being fetched; only the pages in flight are held in memory, so the
+    crawl can be consumed as a stream whatever its size::
+
+        for book in iter_books(max_pages=0):
+            print(book["title"])
+
+    Stopping the iteration early shuts the crawl down.
+
+    Args:
+        max_workers (int, optional): Number of worker threads, or of
+            concurrent requests with the async engine. Defaults to 10.
+        max_pages (int, optional): Maximum number of pages, 0 crawls all of
+            them; with ``by_category`` the maximum per category. Defaults to 1.
+        engine (str, optional): Fetch engine, "thread" or "async".
+            Defaults to "thread".
+        listing_window (int, optional): Listing pages fetched concurrently,
+            0 fetches all of them at once. Defaults to 1.
+        base_url (str, optional): The base URL of the website.
+            Defaults to ``BASE_URL``.
+        page_range (Tuple[int, int], optional): First and last page to crawl,
+            inclusive; replaces ``max_pages``. Defaults to None.
+        shard_index (int, optional): Which of ``shard_count`` static shards
+            this process is, from 0. Defaults to 0.
+        shard_count (int, optional): Number of static shards. Defaults to 1.
+        by_category (bool, optional): Crawl every category as its own
+            pagination chain. Defaults to False.
+        limiter (AdaptiveLimiter, optional): Adaptive limit on in-flight
+            detail requests. Defaults to None.
+        hedger (Hedger, optional): Hedges straggling detail requests.
+            Defaults to None.
+        parse_pool (ParsePool, optional): Worker processes that parse the
+            detail pages. Defaults to None.
+        journal (CheckpointJournal, optional): Checkpoint journal of a
+            resumable crawl. Defaults to None.
+
+    Yields:
+        Dict[str, Any]: Each finished book.
+
+    Raises:
+        FetchError: If the first page couldn't be fetched.
+    """
+    first_page, total_pages, pages = plan_pages(
+        base_url, max_pages, page_range, shard_index, shard_count
+    )
+    if by_category:
+        categories = discover_categories(first_page, base_url)
+        logger.info(f"Found {len(categories)} categories")
+        # Shards split the categories instead of the pages
+        selected = select_pages(len(categories), None, shard_index, shard_count)
+        yield from crawl_by_category(
+            [categories[i - 1] for i in selected],
+            max_workers,
+            max_pages,
+            limiter,
+            hedger,
+        )
+    elif engine == "async":
+        yield from iterate_async(
+            crawl_async(
+                first_page,
+                base_url,
+                total_pages,
+                max_workers,
+                listing_window,
+                limiter,
+                hedger,
+                parse_pool,
+                pages,
+                journal,
+            )
+        )
+    else:
+        yield from crawl_with_pool(
+            first_page,
+            base_url,
+            total_pages,
+            max_workers,
+            listing_window,
+            limiter,
+            hedger,
+            parse_pool,
+            pages,
+            journal,
+        )
+
+
+def default_worker_id() -> str:
+    """Return a worker ID that is unique on this machine: host name and PID."""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def get_shard_path(queue_file: str, run_id: str, worker_id: str) -> str:
+    """Return the result shard of a worker, next to the work queue file.
+
+    Args:
+        queue_file (str): Path of the shared work queue.
+        run_id (str): ID of the crawl, set when the coordinator seeded the queue.
+        worker_id (str): ID of the worker writing the shard.
+
+    Returns:
+        str: The path of the worker's JSON Lines shard.
+    """
+    safe_id = re.sub(r"[^A-Za-z0-9_.-]", "_", worker_id)
+    directory = os.path.dirname(os.path.abspath(queue_file))
+    return os.path.join(directory, f"books-{run_id}-{safe_id}.jsonl")
+
+
+def seed_work_queue(work_queue: WorkQueue, base_url: str, pages: List[int]) -> str:
+    """Queue every listing page of the crawl. Seeding again is a no-op.
+
+    Args:
+        work_queue (WorkQueue): The shared work queue.
+        base_url (str): The base URL of the website.
+        pages (List[int]): The listing pages to crawl.
+
+    Returns:
+        str: The run ID that names the result shards of this crawl.
+    """
+    run_id = work_queue.set_meta("run_id", uuid.uuid4().hex[:8], overwrite=False)
+    added = work_queue.enqueue(
+        "listing",
+        (
+            (
+                get_page_url(base_url, page_num),
+                {"page_num": page_num, "url": get_page_url(base_url, page_num)},
+            )
+            for page_num in pages
+        ),
+    )
+    work_queue.set_meta("seeded", str(len(pages)))
+    logger.info(f"Seeded work queue for run {run_id} with {added} listing pages")
+    return run_id
+
+
+def fetch_listing_books(
+    page_url: str, page_num: int, base_url: str
+) -> Optional[List[Dict[str, Any]]]:
+    """Fetch a listing page and extract its books.
+
+    Args:
+        page_url (str): The URL of the listing page.
+        page_num (int): The page number, used for logging.
+        base_url (str): The base URL of the website.
+
+    Returns:
+        Optional[List[Dict[str, Any]]]: The listing data of the books, or None
+        if the page couldn't be fetched.
+    """
+    page = fetch_listing_page(page_url, page_num)
+    if page is None:
+        return None
+    return extract_page_books(page, page_num, base_url)
+
+
+def crawl_from_queue(
+    work_queue: WorkQueue,
+    worker_id: str,
+    base_url: str,
+    max_workers: int,
+    limiter: Optional[AdaptiveLimiter] = None,
+    hedger: Optional[Hedger] = None,
+) -> int:
+    """Work through leased listing and detail tasks until the crawl is done.
+
+    A listing task queues a detail task per book; detail URLs already queued
+    by any worker are skipped. Each finished book is appended to this
+    worker's shard together with its listing position.
+
+    Args:
+        work_queue (WorkQueue): The shared work queue.
+        worker_id (str): ID of this worker, used for leases and the shard name.
+            The shard is written next to the work queue file.
+        base_url (str): The base URL of the website.
+        max_workers (int): Number of worker threads, and of tasks leased at once.
+        limiter (AdaptiveLimiter, optional): Adaptive limit on in-flight
+            detail requests. Defaults to None.
+        hedger (Hedger, optional): Hedges straggling detail requests.
+            Defaults to None.
+
+    Returns:
+        int: The number of books written to the shard.
+    """
+    run_id = work_queue.get_meta("run_id")
+    if run_id is None:
+        logger.info("Waiting for the coordinator to seed the work queue...")
+    while run_id is None:
+        if is_shutdown_requested():
+            return 0
+        time.sleep(QUEUE_POLL_INTERVAL)
+        run_id = work_queue.get_meta("run_id")
+
+    shard_path = get_shard_path(work_queue.path, run_id, worker_id)
+    logger.info(f"Worker {worker_id} writing results to {shard_path}")
+
+    pool = CrawlPool(max_workers)
+    add_cleanup_callback(pool.shutdown)
+    running: Dict[concurrent.futures.Future[Any], Task] = {}
+    detail_kwargs: Dict[str, Any] = {}
+    if limiter is not None:
+        detail_kwargs["limiter"] = limiter
+    if hedger is not None:
+        detail_kwargs["hedger"] = hedger
+    written = 0
+
+    def write_book(page_num: int, position: int, book_data: Dict[str, Any]) -> None:
+        """Append a finished book to this worker's shard."""
+        nonlocal written
+        record = {"page_num": page_num, "position": position, "book": book_data}
+        shard.write(json.dumps(record, ensure_ascii=False) + "\n")
+        shard.flush()
+        written += 1
+
+    def finish(task: Task, result: Any) -> None:
+        """Record the result of a task and mark it done."""
+        if task.kind == "listing":
+            if result is None:
+                work_queue.release(task, worker_id)
+                return
+            page_num = task.payload["page_num"]
+            to_fetch, finished = split_detail_fetches(list(enumerate(result)))
+            work_queue.enqueue(
+                "detail",
+                (
+                    (
+                        canonicalize_url(book_data["detail_url"])
+                        if book_data.get("detail_url")
+                        else f"{page_num}:{position}",
+                        {"page_num": page_num, "position": position, "book": book_data},
+                    )
+                    for position, book_data in to_fetch
+                ),
+            )
+            for position, book_data in finished:
+                write_book(page_num, position, book_data)
+        else:
+            write_book(task.payload["page_num"], task.payload["position"], result)
+        if not work_queue.complete(task, worker_id):
+            logger.warning(f"Lease on {task.kind} task {task.id} was lost meanwhile")
+
+    with open(shard_path, "a", encoding="utf-8") as shard:
+        try:
+            while not is_shutdown_requested():
+                for task in work_queue.lease(worker_id, max_workers - len(running)):
+                    if task.kind == "listing":
+                        future = pool.submit(
+                            "listing",
+                            fetch_listing_books,
+                            task.payload["url"],
+                            task.payload["page_num"],
+                            base_url,
+                        )
+                    else:
+                        future = pool.submit(
+                            "detail",
+                            process_book_details,
+                            task.payload["book"],
+                            **detail_kwargs,
+                        )
+                    running[future] = task
+
+                if not running:
+                    if work_queue.is_finished():
+                        break
+                    # Other workers still hold leases that may expire
+                    time.sleep(QUEUE_POLL_INTERVAL)
+                    continue
+
+                done, _ = concurrent.futures.wait(
+                    list(running),
+                    timeout=QUEUE_POLL_INTERVAL,
+                    return_when=concurrent.futures.FIRST_COMPLETED,
+                )
+                for future in done:
+                    task = running.pop(future)
                     try:
-                        processed_books.append(future.result())
+                        finish(task, future.result())
                     except Exception as e:
-                        logger.error(f"Error processing book details: {e}")
+                        logger.error(
+                            f"Error processing {task.kind} task {task.id}: {e}"
+                        )
+                        work_queue.release(task, worker_id)
+        finally:
+            pool.shutdown(wait=not is_shutdown_requested())
+            remove_cleanup_callback(pool.shutdown)
+
+    logger.info(f"Worker {worker_id} wrote {written} books")
+    return written
+
+
+def wait_for_queue(work_queue: WorkQueue) -> None:
+    """Block until every task of the crawl is done or failed, logging progress."""
+    last_counts = None
+    while not work_queue.is_finished():
+        if is_shutdown_requested():
+            logger.info("Shutdown requested while waiting for the workers")
+            return
+        counts = work_queue.counts()
+        if counts != last_counts:
+            logger.info(
+                f"Waiting for workers: {counts['done']} tasks done, "
+                f"{counts['pending']} pending, {counts['leased']} leased"
+            )
+            last_counts = counts
+        time.sleep(QUEUE_POLL_INTERVAL)
 
-                # Remove completed futures from active list
-                active_futures = [f for f in active_futures if not f.done()]
 
-            # Add books from this page to the overall collection
-            all_books.extend(processed_books)
+def merge_shards(queue_file: str, run_id: str) -> List[Dict[str, Any]]:
+    """Combine the result shards of every worker into one list of books.
 
-            logger.success(f"Completed processing page {page_num}")
+    A book written twice (its lease expired while it was still being
+    processed) is kept once.
+
+    Args:
+        queue_file (str): Path of the work queue, the shards are next to it.
+        run_id (str): ID of the crawl whose shards are merged.
+
+    Returns:
+        List[Dict[str, Any]]: The books in listing order.
+    """
+    books: Dict[Tuple[int, int], Dict[str, Any]] = {}
+    directory = os.path.dirname(os.path.abspath(queue_file))
+    shard_paths = sorted(glob.glob(os.path.join(directory, f"books-{run_id}-*.jsonl")))
+    for shard_path in shard_paths:
+        with open(shard_path, encoding="utf-8") as shard:
+            for line in shard:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A worker killed mid-write leaves a partial last line
+                    logger.warning(f"Skipping truncated record in {shard_path}")
+                    continue
+                books[(record["page_num"], record["position"])] = record["book"]
+
+    logger.info(f"Merged {len(books)} books from {len(shard_paths)} worker shards")
+    return [books[key] for key in sorted(books)]
+
+
+def log_connection_stats() -> None:
+    """Log how many requests reused a pooled connection, and how long they took."""
+    stats = connection_stats.snapshot()
+    latencies = connection_stats.latency_percentiles()
+    logger.info(
+        f"Connection pool: {stats['requests']} requests, "
+        f"{stats['new_connections']} new connections, "
+        f"{stats['tls_handshakes']} TLS handshakes, "
+        f"reuse ratio {stats['reuse_ratio']:.1%}"
+        + "".join(
+            f", {name} {seconds * 1000:.0f} ms" for name, seconds in latencies.items()
+        )
+    )
+
+
+def main(
+    max_workers: int = 10,
+    max_pages: int = 1,
+    engine: str = "thread",
+    listing_window: int = 1,
+    adaptive: bool = False,
+    rate_limit: float = 0.0,
+    burst: Optional[int] = None,
+    retries: int = 3,
+    hedge_percentile: float = 0.0,
+    hedge_budget: float = 0.05,
+    frontier_kind: str = "memory",
+    frontier_file: Optional[str] = None,
+    parse_workers: int = 0,
+    parse_batch_size: int = 20,
+    role: str = "standalone",
+    queue_file: Optional[str] = None,
+    worker_id: Optional[str] = None,
+    lease_seconds: float = 60.0,
+    page_range: Optional[Tuple[int, int]] = None,
+    shard_index: int = 0,
+    shard_count: int = 1,
+    by_category: bool = False,
+    resume: bool = False,
+    revalidate: bool = False,
+    validators_file: Optional[str] = None,
+    details: str = "all",
+    detail_high_water: Optional[int] = None,
+    output_high_water: int = DEFAULT_OUTPUT_HIGH_WATER,
+    download_images: bool = False,
+    image_concurrency: int = DEFAULT_IMAGE_CONCURRENCY,
+    cache: bool = False,
+    cache_file: Optional[str] = None,
+    cache_ttl: float = DEFAULT_CACHE_TTL,
+    cache_max_mb: float = DEFAULT_CACHE_MAX_BYTES / 2**20,
+    offline: bool = False,
+    record: Optional[str] = None,
+    replay: Optional[str] = None,
+    replay_latency: Union[float, str, None] = None,
+    base_url: str = BASE_URL,
+) -> int:
+    """Main function to scrape books from the website.
+
+    Args:
+        max_workers (int, optional): Maximum number of worker threads, or of
+            concurrent requests with the async engine. Defaults to 10.
+        max_pages (int, optional): Maximum number of pages to scrape. Defaults to 1.
+        engine (str, optional): Fetch engine, "thread" or "async". Defaults to "thread".
+        listing_window (int, optional): Listing pages fetched concurrently once
+            the page count is known, 0 fetches all of them at once. Defaults to 1.
+        adaptive (bool, optional): Adapt the number of in-flight detail requests
+            to the server's responses, with ``max_workers`` as the ceiling.
+            Defaults to False.
+        rate_limit (float, optional): Requests per second per host, 0 disables
+            pacing. Defaults to 0.0.
+        burst (int, optional): Requests per host allowed back to back before
+            pacing starts. Defaults to one second's worth of requests.
+        retries (int, optional): Maximum retries of a failed fetch, drawn from a
+            run-wide retry budget. 0 disables retries. Defaults to 3.
+        hedge_percentile (float, optional): Latency percentile after which a
+            detail request gets a backup request, 0 disables hedging.
+            Defaults to 0.0.
+        hedge_budget (float, optional): Maximum share of detail requests that
+            may be hedged. Defaults to 0.05.
+        frontier_kind (str, optional): Detail URL deduplication: "memory",
+            "bloom" or "sqlite", or "none" to disable it. Defaults to "memory".
+        frontier_file (str, optional): File that keeps the books written by
+            earlier runs, which are then skipped, for "bloom" and "sqlite".
+            Defaults to None (only deduplicate within the run).
+        parse_workers (int, optional): Worker processes that parse the detail
+            pages while the threads or coroutines only download them, 0 parses
+            in the download workers. Defaults to 0.
+        parse_batch_size (int, optional): Detail pages sent to a parse worker
+            at a time. Defaults to 20.
+        role (str, optional): "standalone" crawls on its own; "coordinator"
+            seeds a shared work queue, waits for the workers and merges their
+            shards into the JSON output; "worker" crawls tasks leased from
+            the queue. Defaults to "standalone".
+        queue_file (str, optional): SQLite file of the shared work queue.
+            Defaults to queue.sqlite3 in the output directory.
+        worker_id (str, optional): Name of a worker, used for its leases and
+            result shard. Defaults to the host name and process ID.
+        lease_seconds (float, optional): How long a leased task may take before
+            it is handed to another worker. Defaults to 60.0.
+        page_range (Tuple[int, int], optional): First and last listing page to
+            crawl, inclusive; replaces ``max_pages``. Defaults to None.
+        shard_index (int, optional): Which of ``shard_count`` static shards
+            this process is, from 0. Defaults to 0.
+        shard_count (int, optional): Number of processes splitting the pages
+            round-robin, each writing its own output file. Defaults to 1.
+        by_category (bool, optional): Crawl every category from the sidebar as
+            its own pagination chain, concurrently; ``max_pages`` then limits
+            the pages per category and shards split the categories.
+            Defaults to False.
+        resume (bool, optional): Journal finished pages and books to a
+            checkpoint file next to the output, and skip the work an
+            interrupted run already journaled. Defaults to False.
+        revalidate (bool, optional): Keep each page's ETag and Last-Modified
+            with the record extracted from it, and send them on the next run
+            so unchanged pages answer 304 and their records are reused.
+            Defaults to False.
+        validators_file (str, optional): SQLite file of the stored validators
+            and records. Defaults to validators.sqlite3 in the output
+            directory.
+        details (str, optional): Which books get their detail page fetched:
+            "all", "none" for a listing-only crawl, or "missing" for only the
+            books the existing output has no details for. Defaults to "all".
+        detail_high_water (int, optional): Books queued or in flight for their
+            detail page; further books wait for a slot and no further listing
+            page is started, 0 is unbounded. Defaults to four per worker, at
+            least 40.
+        output_high_water (int, optional): Finished books waiting for an
+            earlier, slower page before no further listing page is started,
+            0 is unbounded. Defaults to 1000.
+        download_images (bool, optional): Download each book's cover into
+            images/ in the output directory, stored by the SHA-256 of its
+            content, and add its local path to the record as ``image_path``.
+            Defaults to False.
+        image_concurrency (int, optional): Concurrent cover downloads, on
+            threads of their own. Defaults to 4.
+        cache (bool, optional): Keep successful responses in a disk cache and
+            serve repeated requests from it. Defaults to False.
+        cache_file (str, optional): SQLite file of the response cache.
+            Defaults to cache.sqlite3 in the output directory.
+        cache_ttl (float, optional): Seconds a cached response stays fresh.
+            Defaults to one day.
+        cache_max_mb (float, optional): Compressed size of the cached bodies
+            before the least recently used are evicted, 0 is unbounded.
+            Defaults to 512.
+        offline (bool, optional): Serve every request from the response
+            cache and never touch the network; implies ``cache``.
+            Defaults to False.
+        record (str, optional): Archive file to write every request and
+            response of the run into. Defaults to None.
+        replay (str, optional): Archive file recorded by an earlier run to
+            serve every request from, without touching the network or the
+            cache. Defaults to None.
+        replay_latency (Union[float, str], optional): Delay before each
+            replayed response, in seconds, or "recorded" for the time it took
+            when it was recorded. Defaults to None, which replays at memory
+            speed.
+        base_url (str, optional): Root URL of the site to crawl, e.g. a local
+            stand-in of books.toscrape.com. Defaults to ``BASE_URL``.
+
+    Returns:
+        int: Exit code (0 for success, non-zero for failure)
+    """
+    # Set up graceful shutdown handling
+    setup_graceful_shutdown()
+
+    # Pages and books are resolved relative to the root
+    if not base_url.endswith("/"):
+        base_url += "/"
+
+    logger.info("Starting the scraping process...")
+    logger.info(
+        f"Configuration: max_workers={max_workers}, max_pages={max_pages}, "
+        f"engine={engine}, listing_window={listing_window}, adaptive={adaptive}, "
+        f"rate_limit={rate_limit}, burst={burst}, retries={retries}, "
+        f"hedge_percentile={hedge_percentile}, frontier={frontier_kind}, "
+        f"parse_workers={parse_workers}, role={role}, page_range={page_range}, "
+        f"shard={shard_index}/{shard_count}, by_category={by_category}, "
+        f"resume={resume}, revalidate={revalidate}, details={details}, "
+        f"detail_high_water={detail_high_water}, "
+        f"output_high_water={output_high_water}, "
+        f"download_images={download_images}, cache={cache}, offline={offline}, "
+        f"record={record}, replay={replay}, replay_latency={replay_latency}, "
+        f"base_url={base_url}"
+    )
 
-        logger.info(f"Total books collected: {len(all_books)}")
+    connection_stats.reset()
+    configure_rate_limit(rate_limit, burst)
+    if replay and record:
+        logger.warning("--record is ignored while replaying an archive")
+        record = None
+    if replay and (cache or offline):
+        # Replayed responses are already local, and must be the recorded ones
+        logger.warning("--cache and --offline are ignored while replaying an archive")
+        cache = offline = False
+    try:
+        configure_archive(record, replay, replay_latency)
+    except (OSError, ValueError) as e:
+        logger.error(f"Failed to open the archive: {e}")
+        return 1
+    if offline:
+        # A page that isn't cached won't be there on a retry either
+        cache = True
+        retries = 0
+    if cache and not cache_file:
+        cache_file = get_output_path("cache.sqlite3")
+    configure_response_cache(
+        cache_file if cache else None,
+        cache_ttl,
+        int(cache_max_mb * 2**20),
+        offline,
+    )
+    configure_retries(retries)
+    if frontier_file and frontier_kind == "memory":
+        logger.warning("--frontier-file needs --frontier bloom or sqlite, ignoring it")
+        frontier_file = None
+    if role != "standalone" and not queue_file:
+        queue_file = get_output_path("queue.sqlite3")
+    if role == "worker":
+        # The shared work queue deduplicates detail URLs across all workers
+        frontier_kind = "none"
+    configure_frontier(
+        None if frontier_kind == "none" else frontier_kind, frontier_file
+    )
+    if (
+        by_category
+        and role == "standalone"
+        and (engine != "thread" or parse_workers > 0 or listing_window != 1)
+    ):
+        # Each category chain runs its listing and detail fetches on the pool
+        logger.warning(
+            "--engine async, --parse-workers and --listing-window don't apply "
+            "with --by-category, ignoring them"
+        )
+        engine, parse_workers, listing_window = "thread", 0, 1
+    if revalidate and parse_workers > 0 and role == "standalone":
+        # The parse workers can't hand the extracted records back to the store
+        logger.warning("--revalidate doesn't apply with --parse-workers, ignoring it")
+        revalidate = False
+    if revalidate and not validators_file:
+        validators_file = get_output_path("validators.sqlite3")
+    configure_conditional_requests(validators_file if revalidate else None)
+    output_filename = get_output_filename(page_range, shard_index, shard_count)
+    if detail_high_water is None:
+        detail_high_water = default_detail_high_water(max_workers)
+    configure_backpressure(detail_high_water, output_high_water)
+    work_queue = None
+    hedger: Optional[Hedger] = None
+    parse_pool: Optional[ParsePool] = None
+    images: Optional[ImageDownloader] = None
+    journal: Optional[CheckpointJournal] = None
+    # The frontier only keeps this run's books if they reached the output
+    output_saved = False
+
+    try:
+        # Check for shutdown before starting
+        if is_shutdown_requested():
+            logger.info("Shutdown requested before starting, exiting gracefully")
+            return 0
+
+        # "missing" completes the output this run is about to replace
+        try:
+            configure_details(details, get_output_path(output_filename))
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to read the earlier output for --details: {e}")
+            return 1
+
+        limiter = AdaptiveLimiter(max_workers) if adaptive else None
+        if hedge_percentile > 0:
+            hedger = Hedger(hedge_percentile, hedge_budget, max_workers=max_workers)
+            add_cleanup_callback(hedger.shutdown)
+        if parse_workers > 0 and role == "standalone":
+            parse_pool = ParsePool(parse_detail_batch, parse_workers, parse_batch_size)
+            add_cleanup_callback(parse_pool.shutdown)
+        if role != "standalone" and queue_file:
+            work_queue = WorkQueue(queue_file, lease_seconds)
+        if download_images and role == "worker":
+            logger.warning(
+                "--download-images applies to the coordinator's merged output, "
+                "ignoring it"
+            )
+        elif download_images:
+            images = ImageDownloader(
+                fetch_image, ImageStore(get_output_path("images")), image_concurrency
+            )
+            add_cleanup_callback(images.shutdown)
+        # One keep-alive connection per worker, plus one per hedge in flight so
+        # a backup doesn't wait for the very straggler it should beat, plus
+        # one per cover download so images never take a detail connection
+        Fetcher.configure_pool(
+            max_workers
+            + (hedger.max_hedges if hedger else 0)
+            + (images.max_concurrency if images else 0)
+        )
+        if resume and (role != "standalone" or by_category or parse_pool):
+            logger.warning(
+                "--resume only applies to standalone page crawls without "
+                "--parse-workers, ignoring it"
+            )
+        elif resume:
+            journal = CheckpointJournal(
+                get_output_path(output_filename.replace(".json", ".checkpoint.jsonl"))
+            )
+            journal.load()
+            # Runs before the signal handler exits, so no finished book is lost
+            add_cleanup_callback(journal.flush)
+
+        # Books go to the output as they finish; only the count is kept
+        sink = JsonArraySink(get_output_path(output_filename))
+        # A signal stops the crawl at its next check instead of exiting, so
+        # the books it has are still saved
+        with deferred_exit():
+            try:
+                if work_queue is not None and role == "worker":
+                    crawl_from_queue(
+                        work_queue,
+                        worker_id or default_worker_id(),
+                        base_url,
+                        max_workers,
+                        limiter,
+                        hedger,
+                    )
+                elif work_queue is not None:
+                    # The workers do the crawling; the coordinator merges
+                    _, _, pages = plan_pages(
+                        base_url, max_pages, page_range, shard_index, shard_count
+                    )
+                    run_id = seed_work_queue(work_queue, base_url, pages)
+                    wait_for_queue(work_queue)
+                    merged = iter(merge_shards(work_queue.path, run_id))
+                    for book in images.attach(merged) if images else merged:
+                        sink.write(book)
+                else:
+                    books = iter_books(
+                        max_workers,
+                        max_pages,
+                        engine,
+                        listing_window,
+                        base_url,
+                        page_range,
+                        shard_index,
+                        shard_count,
+                        by_category,
+                        limiter,
+                        hedger,
+                        parse_pool,
+                        journal,
+                    )
+                    with contextlib.closing(books):
+                        for book in images.attach(books) if images else books:
+                            sink.write(book)
+                            if has_details(book):
+                                # A failed detail fetch is retried by the next run
+                                frontier.mark_written(book.get("detail_url"))
+                sink.close()
+                output_saved = True
+            finally:
+                # Only reached with the sink still open if the crawl failed
+                sink.discard()
+
+        logger.info(f"Total books collected: {sink.count}")
+        log_connection_stats()
+        if limiter is not None:
+            limiter.log_summary()
+        if hedger is not None:
+            hedger.log_summary()
+        if parse_pool is not None:
+            parse_pool.log_summary()
+        if images is not None:
+            images.log_summary()
+        rate_limiter.log_summary()
+        retry_engine.log_summary()
+        frontier.log_summary()
+        conditional_requests.log_summary()
+        response_cache.log_summary()
+        crawl_archive.log_summary()
+        detail_policy.log_summary()
+        if role != "worker":
+            backpressure.log_summary()
+        if work_queue is not None:
+            work_queue.log_summary()
 
         # Save all books to JSON if we have any data
-        if all_books:
-            logger.info("Saving to JSON...")
-            save_to_json(all_books)
+        if role == "worker":
+            logger.info("Books are in this worker's shard, the coordinator merges them")
+        elif sink.count:
             logger.success("Data saved successfully!")
         else:
             logger.warning("No books collected, skipping JSON save")
+        if journal is not None and not is_shutdown_requested():
+            # The output is complete, a later --resume starts over
+            journal.remove()
 
         if is_shutdown_requested():
             logger.info("Scraping stopped due to shutdown request")
@@ -420,12 +2513,82 @@ def main(max_workers: int = 10, max_pages: int = 1) -> int:
             logger.success("Scraping completed successfully!")
             return 0
 
+    except FetchError:
+        return 1  # Return error exit code
     except KeyboardInterrupt:
         logger.info("Received keyboard interrupt, shutting down gracefully")
         return 0
     except Exception as e:
         logger.error(f"Unexpected error during scraping: {e}")
         return 1
+    finally:
+        # The signal handler must not keep this run's resources alive or
+        # release them again during a later run
+        if images is not None:
+            images.shutdown()
+            remove_cleanup_callback(images.shutdown)
+        if hedger is not None:
+            hedger.shutdown()
+            remove_cleanup_callback(hedger.shutdown)
+        if parse_pool is not None:
+            parse_pool.shutdown()
+            remove_cleanup_callback(parse_pool.shutdown)
+        if journal is not None:
+            journal.close()
+            remove_cleanup_callback(journal.flush)
+        Fetcher.close()
+        frontier.close(persist=output_saved)
+        conditional_requests.close()
+        response_cache.close()
+        crawl_archive.close()
+        if work_queue is not None:
+            work_queue.close()
+
+
+def parse_page_range(value: str) -> Tuple[int, int]:
+    """Parse a ``START-END`` page range given on the command line.
+
+    Args:
+        value (str): The range, e.g. "11-20".
+
+    Returns:
+        Tuple[int, int]: The first and last page, inclusive.
+    """
+    import argparse
+
+    match = re.fullmatch(r"\s*(\d+)\s*-\s*(\d+)\s*", value)
+    if not match:
+        raise argparse.ArgumentTypeError(f"expected START-END, got {value!r}")
+    start, end = int(match.group(1)), int(match.group(2))
+    if start < 1 or end < start:
+        raise argparse.ArgumentTypeError(
+            f"the range must satisfy 1 <= START <= END, got {value!r}"
+        )
+    return start, end
+
+
+def parse_replay_latency(value: str) -> Union[float, str]:
+    """Parse the ``--replay-latency`` value: seconds, or "recorded".
+
+    Args:
+        value (str): The latency, e.g. "0.05" or "recorded".
+
+    Returns:
+        Union[float, str]: The latency in seconds, or "recorded".
+    """
+    import argparse
+
+    if value.strip().lower() == RECORDED_LATENCY:
+        return RECORDED_LATENCY
+    try:
+        seconds = float(value)
+    except ValueError:
+        seconds = -1.0
+    if seconds < 0:
+        raise argparse.ArgumentTypeError(
+            f"expected seconds or {RECORDED_LATENCY!r}, got {value!r}"
+        )
+    return seconds
 
 
 if __name__ == "__main__":
@@ -443,14 +2606,293 @@ if __name__ == "__main__":
         default=1,
         help="Maximum number of pages to scrape (default: 1)",
     )
+    parser.add_argument(
+        "--engine",
+        choices=["thread", "async"],
+        default="thread",
+        help="Fetch engine: a thread pool or an asyncio event loop (default: thread)",
+    )
+    parser.add_argument(
+        "--listing-window",
+        type=int,
+        default=1,
+        help="Listing pages fetched concurrently after page-count discovery, "
+        "0 fetches all of them at once (default: 1)",
+    )
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="Adapt in-flight detail requests to latency and 429/5xx responses, "
+        "using --threads as the ceiling",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=0.0,
+        help="Maximum requests per second per host, 0 disables pacing (default: 0)",
+    )
+    parser.add_argument(
+        "--burst",
+        type=int,
+        default=None,
+        help="Requests per host allowed back to back before pacing starts "
+        "(default: one second's worth of --rate-limit)",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=3,
+        help="Maximum retries of a failed fetch with exponential backoff, "
+        "0 disables retries (default: 3)",
+    )
+    parser.add_argument(
+        "--hedge-percentile",
+        type=float,
+        default=0.0,
+        help="Send a backup detail request once a request is slower than this "
+        "latency percentile, e.g. 95; 0 disables hedging (default: 0)",
+    )
+    parser.add_argument(
+        "--hedge-budget",
+        type=float,
+        default=0.05,
+        help="Maximum fraction of detail requests that may be hedged (default: 0.05)",
+    )
+    parser.add_argument(
+        "--frontier",
+        choices=["memory", "bloom", "sqlite", "none"],
+        default="memory",
+        help="How detail URLs are deduplicated: an in-memory set, a bloom filter "
+        "or a SQLite file (default: memory)",
+    )
+    parser.add_argument(
+        "--frontier-file",
+        default=None,
+        help="File that keeps the books written by earlier runs so they are "
+        "skipped, for bloom and sqlite (default: only deduplicate within the run)",
+    )
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        default=0,
+        help="Worker processes that parse detail pages while the threads only "
+        "download them, 0 parses in the download threads (default: 0)",
+    )
+    parser.add_argument(
+        "--parse-batch-size",
+        type=int,
+        default=20,
+        help="Detail pages sent to a parse worker at a time (default: 20)",
+    )
+    parser.add_argument(
+        "--role",
+        choices=["standalone", "coordinator", "worker"],
+        default="standalone",
+        help="Crawl alone, or share a work queue: the coordinator seeds it and "
+        "merges the results, workers crawl leased tasks (default: standalone)",
+    )
+    parser.add_argument(
+        "--queue-file",
+        default=None,
+        help="SQLite work queue shared by the coordinator and workers "
+        "(default: queue.sqlite3 in the output directory)",
+    )
+    parser.add_argument(
+        "--worker-id",
+        default=None,
+        help="Name of this worker for leases and its result shard "
+        "(default: host name and process ID)",
+    )
+    parser.add_argument(
+        "--lease-seconds",
+        type=float,
+        default=60.0,
+        help="Seconds a worker may hold a task before it is re-issued (default: 60)",
+    )
+    parser.add_argument(
+        "--page-range",
+        type=parse_page_range,
+        default=None,
+        metavar="START-END",
+        help="Only crawl listing pages START to END, inclusive; overrides --pages",
+    )
+    parser.add_argument(
+        "--shard-index",
+        type=int,
+        default=0,
+        help="Which static shard this process is, from 0 (default: 0)",
+    )
+    parser.add_argument(
+        "--shard-count",
+        type=int,
+        default=1,
+        help="Number of processes splitting the pages round-robin, each writing "
+        "its own output file (default: 1)",
+    )
+    parser.add_argument(
+        "--by-category",
+        action="store_true",
+        help="Crawl each category from the sidebar concurrently on the thread "
+        "pool; --pages then limits pages per category",
+    )
+    parser.add_argument(
+        "--revalidate",
+        action="store_true",
+        help="Send stored ETag/Last-Modified validators and reuse the stored "
+        "record of pages answered 304 Not Modified",
+    )
+    parser.add_argument(
+        "--validators-file",
+        help="SQLite file of the validators and records kept by --revalidate "
+        "(default: validators.sqlite3 in the output directory)",
+    )
+    parser.add_argument(
+        "--details",
+        choices=DETAIL_MODES,
+        default="all",
+        help="Which books get their detail page fetched: all, none (listing "
+        "fields only) or missing (only books the existing output lacks "
+        "details for) (default: all)",
+    )
+    parser.add_argument(
+        "--detail-high-water",
+        type=int,
+        default=None,
+        help="Books queued or in flight for their detail page; more books wait "
+        "and listing pages are held back, 0 for no limit (default: 4 per thread, "
+        "at least 40)",
+    )
+    parser.add_argument(
+        "--output-high-water",
+        type=int,
+        default=DEFAULT_OUTPUT_HIGH_WATER,
+        help="Finished books waiting for an earlier page before listing pages "
+        "are held back, 0 for no limit (default: 1000)",
+    )
+    parser.add_argument(
+        "--download-images",
+        action="store_true",
+        help="Download each book's cover into images/ in the output directory, "
+        "stored by content hash, and add its local path to the record",
+    )
+    parser.add_argument(
+        "--image-concurrency",
+        type=int,
+        default=DEFAULT_IMAGE_CONCURRENCY,
+        help="Concurrent cover downloads, separate from --threads (default: 4)",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Keep successful responses in a disk cache and serve repeated "
+        "requests from it",
+    )
+    parser.add_argument(
+        "--cache-file",
+        help="SQLite file of the response cache "
+        "(default: cache.sqlite3 in the output directory)",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=DEFAULT_CACHE_TTL,
+        help="Seconds a cached response stays fresh (default: 86400)",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=float,
+        default=DEFAULT_CACHE_MAX_BYTES / 2**20,
+        help="Size of the cache before the least recently used responses are "
+        "evicted, 0 for no limit (default: 512)",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Serve every request from the response cache, never the network",
+    )
+    parser.add_argument(
+        "--base-url",
+        default=BASE_URL,
+        metavar="URL",
+        help="Root URL of the site to crawl, e.g. a local stand-in started "
+        f"with scripts/mock_site.py (default: {BASE_URL})",
+    )
+    parser.add_argument(
+        "--record",
+        metavar="ARCHIVE",
+        help="Write every request and response of the run into a compressed "
+        "WARC-style archive",
+    )
+    parser.add_argument(
+        "--replay",
+        metavar="ARCHIVE",
+        help="Serve every request from an archive written by --record, "
+        "never the network",
+    )
+    parser.add_argument(
+        "--replay-latency",
+        type=parse_replay_latency,
+        default=None,
+        metavar="SECONDS|recorded",
+        help="Delay each replayed response by SECONDS, or by the time it took "
+        "when recorded (default: no delay)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Checkpoint finished pages and books next to the output and "
+        "continue an interrupted crawl from its checkpoint",
+    )
 
     args = parser.parse_args()
+    if args.shard_count < 1 or not 0 <= args.shard_index < args.shard_count:
+        parser.error("--shard-index must be between 0 and --shard-count minus 1")
 
     # Set container environment variable for logging
     os.environ.setdefault("CONTAINER_ENV", "true")
 
     try:
-        exit_code = main(max_workers=args.threads, max_pages=args.pages)
+        exit_code = main(
+            max_workers=args.threads,
+            max_pages=args.pages,
+            engine=args.engine,
+            listing_window=args.listing_window,
+            adaptive=args.adaptive,
+            rate_limit=args.rate_limit,
+            burst=args.burst,
+            retries=args.retries,
+            hedge_percentile=args.hedge_percentile,
+            hedge_budget=args.hedge_budget,
+            frontier_kind=args.frontier,
+            frontier_file=args.frontier_file,
+            parse_workers=args.parse_workers,
+            parse_batch_size=args.parse_batch_size,
+            role=args.role,
+            queue_file=args.queue_file,
+            worker_id=args.worker_id,
+            lease_seconds=args.lease_seconds,
+            page_range=args.page_range,
+            shard_index=args.shard_index,
+            shard_count=args.shard_count,
+            by_category=args.by_category,
+            resume=args.resume,
+            revalidate=args.revalidate,
+            validators_file=args.validators_file,
+            details=args.details,
+            detail_high_water=args.detail_high_water,
+            output_high_water=args.output_high_water,
+            download_images=args.download_images,
+            image_concurrency=args.image_concurrency,
+            cache=args.cache,
+            cache_file=args.cache_file,
+            cache_ttl=args.cache_ttl,
+            cache_max_mb=args.cache_max_mb,
+            offline=args.offline,
+            record=args.record,
+            replay=args.replay,
+            replay_latency=args.replay_latency,
+            base_url=args.base_url,
+        )
         sys.exit(exit_code)
     except Exception as e:
         logger.error(f"Fatal error: {e}")
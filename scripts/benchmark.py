@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+End-to-end throughput benchmark.
+
+Runs the full scraper (main()) against the local books.toscrape.com stand-in
+over a sweep of thread counts, page counts, latency profiles and engines.
+Each run happens in a fresh process, so its peak RSS and CPU time are its
+own, while the stand-in server runs in this one. Results are written as JSON
+and compared against a stored baseline.
+
+Usage:
+    python -m scripts.benchmark [--threads 5,20] [--pages 5,20]
+        [--latency SPEC ...] [--engine thread,async] [--repeat N]
+        [--output FILE] [--baseline FILE] [--save-baseline]
+        [--tolerance PCT] [--fail-on-regression]
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from scripts.mock_site import Catalogue, LatencyModel, MockSite
+
+DEFAULT_BASELINE = Path("benchmarks") / "e2e-baseline.json"
+DEFAULT_OUTPUT = Path("benchmarks") / "e2e-results.json"
+
+# Metrics where more is better; a drop beyond the tolerance is a regression
+HIGHER_IS_BETTER = ("books_per_second", "requests_per_second")
+
+# Metrics where less is better; a rise beyond the tolerance is a regression
+LOWER_IS_BETTER = ("p95_ms", "peak_rss_mb", "cpu_seconds")
+
+COLUMNS = [
+    ("books_per_second", "books/s", "{:.1f}"),
+    ("requests_per_second", "req/s", "{:.1f}"),
+    ("p50_ms", "p50 ms", "{:.1f}"),
+    ("p95_ms", "p95 ms", "{:.1f}"),
+    ("p99_ms", "p99 ms", "{:.1f}"),
+    ("peak_rss_mb", "RSS MB", "{:.0f}"),
+    ("cpu_seconds", "CPU s", "{:.2f}"),
+]
+
+
+def case_name(params: Dict[str, Any]) -> str:
+    """Return the name a case is matched by across result files."""
+    return (
+        f"threads={params['threads']} pages={params['pages']} "
+        f"latency={params['latency']} engine={params['engine']}"
+    )
+
+
+def peak_rss_mb(maxrss: int) -> float:
+    """Convert ``ru_maxrss`` to MiB; Linux reports KiB, macOS bytes."""
+    return maxrss / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+def crawl(params: Dict[str, Any], base_url: str, output_dir: str) -> Dict[str, Any]:
+    """Run one crawl in this process and measure it. Runs in the child process.
+
+    Args:
+        params (Dict[str, Any]): The case parameters.
+        base_url (str): Root URL of the stand-in server.
+        output_dir (str): Where the crawl writes its output.
+
+    Returns:
+        Dict[str, Any]: The raw measurements of the run.
+    """
+    os.environ["OUTPUT_DIR"] = output_dir
+    os.environ["TQDM_DISABLE"] = "1"
+    import main
+    from utils.http_client import connection_stats
+    from utils.logger import logger
+
+    # The crawl logs every request, which would dominate what is measured
+    logger.remove()
+    logging.getLogger("scrapling").setLevel(logging.WARNING)
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+    exit_code = main.main(
+        max_workers=params["threads"],
+        max_pages=params["pages"],
+        engine=params["engine"],
+        base_url=base_url,
+    )
+    wall = time.perf_counter() - start
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    with open(main.get_output_path("books.json"), encoding="utf-8") as f:
+        books = len(json.load(f))
+    return {
+        "exit_code": exit_code,
+        "wall_seconds": wall,
+        "books": books,
+        "requests": connection_stats.snapshot()["requests"],
+        "latency": connection_stats.latency_percentiles(),
+        "cpu_seconds": (usage.ru_utime - usage_before.ru_utime)
+        + (usage.ru_stime - usage_before.ru_stime),
+        "peak_rss_mb": peak_rss_mb(usage.ru_maxrss),
+    }
+
+
+def _child(params: Dict[str, Any], base_url: str, output_dir: str, conn: Any) -> None:
+    """Entry point of the measuring process: send back the measurements."""
+    try:
+        conn.send(crawl(params, base_url, output_dir))
+    except BaseException as e:
+        conn.send({"error": f"{type(e).__name__}: {e}"})
+    finally:
+        conn.close()
+
+
+def run_case(
+    params: Dict[str, Any], books_per_page: int = 20, error_rate: float = 0.0
+) -> Dict[str, Any]:
+    """Serve a catalogue sized for the case and crawl it in a fresh process.
+
+    Args:
+        params (Dict[str, Any]): threads, pages, latency (a latency spec) and
+            engine.
+        books_per_page (int, optional): Books per listing page. Defaults to 20.
+        error_rate (float, optional): Fraction of requests the server fails.
+            Defaults to 0.0.
+
+    Returns:
+        Dict[str, Any]: The metrics of the run.
+
+    Raises:
+        RuntimeError: If the crawl failed.
+    """
+    catalogue = Catalogue(
+        books=params["pages"] * books_per_page, per_page=books_per_page
+    )
+    latency = LatencyModel.parse(params["latency"])
+    # Spawned rather than forked: the child must not inherit the server's threads
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    with MockSite(catalogue, latency=latency, error_rate=error_rate) as site:
+        with tempfile.TemporaryDirectory(prefix="benchmark-") as output_dir:
+            process = context.Process(
+                target=_child, args=(params, site.url, output_dir, sender)
+            )
+            process.start()
+            sender.close()
+            result = receiver.recv()
+            process.join()
+        server = site.stats()
+    if "error" in result or result["exit_code"] != 0:
+        raise RuntimeError(f"{case_name(params)} failed: {result}")
+    wall = result["wall_seconds"]
+    latencies = result["latency"]
+    return {
+        "books": result["books"],
+        "requests": result["requests"],
+        "wall_seconds": wall,
+        "books_per_second": result["books"] / wall,
+        "requests_per_second": result["requests"] / wall,
+        "p50_ms": latencies.get("p50", 0.0) * 1000,
+        "p95_ms": latencies.get("p95", 0.0) * 1000,
+        "p99_ms": latencies.get("p99", 0.0) * 1000,
+        "peak_rss_mb": result["peak_rss_mb"],
+        "cpu_seconds": result["cpu_seconds"],
+        "server_statuses": server["statuses"],
+    }
+
+
+def median_metrics(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Return the median of every numeric metric over repeated runs."""
+    merged: Dict[str, Any] = {}
+    for key, value in runs[0].items():
+        if isinstance(value, (int, float)):
+            merged[key] = statistics.median(run[key] for run in runs)
+        else:
+            merged[key] = value
+    return merged
+
+
+def run_sweep(
+    threads: List[int],
+    pages: List[int],
+    latencies: List[str],
+    engines: List[str],
+    repeat: int = 1,
+    books_per_page: int = 20,
+    error_rate: float = 0.0,
+) -> Dict[str, Any]:
+    """Run every combination of the sweep and return the result document."""
+    cases = []
+    for engine in engines:
+        for latency in latencies:
+            for page_count in pages:
+                for thread_count in threads:
+                    params = {
+                        "threads": thread_count,
+                        "pages": page_count,
+                        "latency": latency,
+                        "engine": engine,
+                    }
+                    runs = [
+                        run_case(params, books_per_page, error_rate)
+                        for _ in range(max(1, repeat))
+                    ]
+                    metrics = median_metrics(runs)
+                    print(
+                        f"{case_name(params)}: {metrics['books_per_second']:.1f} "
+                        f"books/s, {metrics['requests_per_second']:.1f} req/s, "
+                        f"p95 {metrics['p95_ms']:.1f} ms",
+                        flush=True,
+                    )
+                    cases.append(
+                        {
+                            "name": case_name(params),
+                            "params": params,
+                            "metrics": metrics,
+                        }
+                    )
+    return {
+        "version": 1,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "settings": {
+            "repeat": repeat,
+            "books_per_page": books_per_page,
+            "error_rate": error_rate,
+        },
+        "cases": cases,
+    }
+
+
+def compare(
+    results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 10.0
+) -> Tuple[str, List[str]]:
+    """Render results against a baseline and find the regressions.
+
+    Args:
+        results (Dict[str, Any]): The result document of this run.
+        baseline (Dict[str, Any]): A stored result document.
+        tolerance (float, optional): Change in percent allowed before a
+            metric counts as regressed. Defaults to 10.0.
+
+    Returns:
+        Tuple[str, List[str]]: The Markdown comparison table, and a
+        description of each regression.
+    """
+    stored = {case["name"]: case["metrics"] for case in baseline.get("cases", [])}
+    header = ["case"] + [label for _, label, _ in COLUMNS]
+    rows = [header, ["---"] * len(header)]
+    regressions = []
+    for case in results["cases"]:
+        before = stored.get(case["name"])
+        row = [case["name"]]
+        for key, label, fmt in COLUMNS:
+            now = case["metrics"][key]
+            cell = fmt.format(now)
+            if before is not None and before.get(key):
+                change = (now - before[key]) / before[key] * 100
+                cell += f" ({change:+.0f}%)"
+                if (key in HIGHER_IS_BETTER and change < -tolerance) or (
+                    key in LOWER_IS_BETTER and change > tolerance
+                ):
+                    cell += " !"
+                    regressions.append(
+                        f"{case['name']}: {label} {fmt.format(before[key])} -> "
+                        f"{fmt.format(now)} ({change:+.0f}%)"
+                    )
+            elif before is None:
+                cell += " (new)"
+            row.append(cell)
+        rows.append(row)
+    table = "\n".join("| " + " | ".join(row) + " |" for row in rows)
+    return table, regressions
+
+
+def parse_list(value: str, kind: type = int) -> List[Any]:
+    """Parse a comma-separated list given on the command line."""
+    return [kind(item) for item in value.split(",") if item.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the scraper end to end against a local stand-in site"
+    )
+    parser.add_argument(
+        "--threads",
+        type=parse_list,
+        default=[5, 20],
+        help="Thread counts (default: 5,20)",
+    )
+    parser.add_argument(
+        "--pages", type=parse_list, default=[5, 20], help="Page counts (default: 5,20)"
+    )
+    parser.add_argument(
+        "--latency",
+        action="append",
+        type=lambda spec: str(LatencyModel.parse(spec)),
+        metavar="SPEC",
+        help="Server latency profile, repeatable; see scripts/mock_site.py "
+        "(default: 0 and lognormal:0.02,0.5)",
+    )
+    parser.add_argument(
+        "--engine",
+        type=lambda value: parse_list(value, str),
+        default=["thread"],
+        help="Engines, thread and/or async (default: thread)",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=1, help="Runs per case, the median is kept"
+    )
+    parser.add_argument(
+        "--books-per-page", type=int, default=20, help="Books per listing page"
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of requests the server fails (default: 0)",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=DEFAULT_OUTPUT,
+        help=f"Where to write the JSON results (default: {DEFAULT_OUTPUT})",
+    )
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        default=DEFAULT_BASELINE,
+        help=f"Stored results to compare against (default: {DEFAULT_BASELINE})",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Store these results as the new baseline",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=10.0,
+        help="Percent change allowed before a metric is a regression (default: 10)",
+    )
+    parser.add_argument(
+        "--fail-on-regression",
+        action="store_true",
+        help="Exit with status 1 if any metric regressed beyond the tolerance",
+    )
+    args = parser.parse_args(argv)
+
+    results = run_sweep(
+        args.threads,
+        args.pages,
+        args.latency or ["fixed:0", "lognormal:0.02,0.5"],
+        args.engine,
+        args.repeat,
+        args.books_per_page,
+        args.error_rate,
+    )
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+    print(f"Results written to {args.output}")
+
+    baseline = {}
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    table, regressions = compare(results, baseline, args.tolerance)
+    print()
+    print(table)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:g}%:")
+        for regression in regressions:
+            print(f"  {regression}")
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+        print(f"Baseline saved to {args.baseline}")
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
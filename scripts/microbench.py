@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks of the extraction hot paths.
+
+Times the functions that run once per book or per page (star rating,
+listing extraction, pagination, detail parsing) on the test fixture HTML and
+on large pages generated by the local stand-in site, and measures the memory
+each call allocates. Results are compared against a committed baseline and
+the run fails when a case got slower, or allocates more, than the threshold
+allows.
+
+Usage:
+    python -m scripts.microbench [--filter TEXT] [--min-time SECONDS]
+        [--threshold PCT] [--baseline FILE] [--save-baseline] [--output FILE]
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from scrapling.parser import Adaptor
+
+import main as scraper
+from scripts.mock_site import Catalogue
+from tests.fixtures.mock_responses import (
+    MOCK_COMPLETE_DETAIL_PAGE,
+    MOCK_PAGINATION_PAGE_2_OF_10,
+)
+from utils.http_client import RawPage
+from utils.logger import logger
+
+DEFAULT_BASELINE = Path("benchmarks") / "micro-baseline.json"
+
+BASE_URL = "http://127.0.0.1:8000/"
+
+# Books on the generated listing page, fifty times the real site's
+LARGE_PAGE_BOOKS = 1000
+
+BOOK_SELECTOR = ("li", {"class": "col-xs-6 col-sm-4 col-md-3 col-lg-3"})
+
+# Metrics compared against the baseline; both grow when a change regresses
+COMPARED = (("ns_per_call", "time"), ("peak_bytes", "peak memory"))
+
+
+def parse(html: str, url: str = BASE_URL) -> Adaptor:
+    """Parse an HTML page the way the fetchers do."""
+    return Adaptor(html, url=url)
+
+
+def render(catalogue: Catalogue, path: str) -> bytes:
+    """Return the body the stand-in site serves for a path."""
+    resolved = catalogue.resolve(path)
+    if resolved is None:
+        raise LookupError(f"The stand-in site has no page at {path}")
+    return resolved[1]
+
+
+def build_cases() -> Dict[str, Callable[[], Any]]:
+    """Parse the input pages once and return the call timed for each case."""
+    catalogue = Catalogue(books=LARGE_PAGE_BOOKS, per_page=LARGE_PAGE_BOOKS)
+    large_html = render(catalogue, "/").decode("utf-8")
+    large_page = parse(large_html)
+    detail_path = f"/catalogue/{catalogue.books[0].slug}/index.html"
+    detail_body = render(catalogue, detail_path)
+    fixture_page = parse(MOCK_PAGINATION_PAGE_2_OF_10)
+    fixture_book = fixture_page.find_all(*BOOK_SELECTOR)[0]
+    generated_book = large_page.find_all(*BOOK_SELECTOR)[0]
+    fixture_detail = parse(MOCK_COMPLETE_DETAIL_PAGE)
+    generated_detail = parse(detail_body.decode("utf-8"))
+    fixture_raw = RawPage(BASE_URL, 200, MOCK_COMPLETE_DETAIL_PAGE.encode("utf-8"))
+    generated_raw = RawPage(BASE_URL, 200, detail_body)
+
+    return {
+        "extract_star_rating[fixture]": lambda: scraper.extract_star_rating(
+            fixture_book
+        ),
+        "extract_star_rating[generated]": lambda: scraper.extract_star_rating(
+            generated_book
+        ),
+        "process_book_listing[fixture]": lambda: scraper.process_book_listing(
+            fixture_book, BASE_URL
+        ),
+        "process_book_listing[generated]": lambda: scraper.process_book_listing(
+            generated_book, BASE_URL
+        ),
+        "get_total_pages[fixture]": lambda: scraper.get_total_pages(
+            fixture_page, BASE_URL
+        ),
+        f"get_total_pages[{LARGE_PAGE_BOOKS} books]": lambda: scraper.get_total_pages(
+            large_page, BASE_URL
+        ),
+        f"parse_page_books[{LARGE_PAGE_BOOKS} books]": lambda: scraper.parse_page_books(
+            large_page, 1, BASE_URL
+        ),
+        "extract_book_details[fixture]": lambda: scraper.extract_book_details(
+            fixture_detail
+        ),
+        "extract_book_details[generated]": lambda: scraper.extract_book_details(
+            generated_detail
+        ),
+        "parse_detail_batch[fixture]": lambda: scraper.parse_detail_batch(
+            [({"title": "fixture"}, fixture_raw)]
+        ),
+        "parse_detail_batch[generated]": lambda: scraper.parse_detail_batch(
+            [({"title": "generated"}, generated_raw)]
+        ),
+    }
+
+
+def measure(
+    call: Callable[[], Any], min_time: float = 0.2, repeat: int = 5
+) -> Dict[str, float]:
+    """Time a call and measure what it allocates.
+
+    The time per call is the best of ``repeat`` rounds of enough calls to
+    take ``min_time`` seconds each. Allocations are traced separately, since
+    tracing slows every allocation down: ``peak_bytes`` is the most memory a
+    call had allocated at once, ``retained_bytes`` what was still allocated
+    after it returned, both averaged over the traced calls.
+
+    Args:
+        call (Callable[[], Any]): The call to measure.
+        min_time (float, optional): Seconds per timing round. Defaults to 0.2.
+        repeat (int, optional): Timing rounds. Defaults to 5.
+
+    Returns:
+        Dict[str, float]: ``ns_per_call``, ``calls``, ``peak_bytes`` and
+        ``retained_bytes``.
+    """
+    call()  # Warm up caches and lazy imports
+    timer = timeit.Timer(call)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time / 10 or number >= 10**7:
+            break
+        number *= 10
+    number = max(1, int(number * (min_time / max(elapsed, 1e-9))))
+    best = min(timer.repeat(repeat, number)) / number
+
+    traced_calls = min(number, 20)
+    peaks = retained = 0
+    tracemalloc.start()
+    try:
+        for _ in range(traced_calls):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            call()  # The result is dropped, only what leaks is retained
+            current, peak = tracemalloc.get_traced_memory()
+            peaks += peak - before
+            retained += current - before
+    finally:
+        tracemalloc.stop()
+    return {
+        "ns_per_call": best * 1e9,
+        "calls": number * repeat,
+        "peak_bytes": peaks / traced_calls,
+        "retained_bytes": retained / traced_calls,
+    }
+
+
+def run(
+    filter_text: str = "", min_time: float = 0.2, repeat: int = 5
+) -> Dict[str, Any]:
+    """Measure every case whose name contains ``filter_text``.
+
+    Returns:
+        Dict[str, Any]: The result document.
+    """
+    # The functions log per call; the sinks would be measured too
+    logger.disable("")
+    try:
+        cases = {
+            name: measure(call, min_time, repeat)
+            for name, call in build_cases().items()
+            if filter_text in name
+        }
+    finally:
+        logger.enable("")
+    return {
+        "version": 1,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "cases": cases,
+    }
+
+
+def compare(
+    results: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 25.0
+) -> Tuple[str, List[str]]:
+    """Render results against a baseline and find the regressions.
+
+    Args:
+        results (Dict[str, Any]): The result document of this run.
+        baseline (Dict[str, Any]): A stored result document.
+        threshold (float, optional): Growth in percent of the time or the
+            peak memory per call allowed before a case counts as regressed.
+            Defaults to 25.0.
+
+    Returns:
+        Tuple[str, List[str]]: The Markdown comparison table, and a
+        description of each regression.
+    """
+    stored = baseline.get("cases", {})
+    rows = [
+        ["case", "µs/call", "change", "peak KiB/call", "change", "retained B/call"],
+        ["---"] * 6,
+    ]
+    regressions = []
+    for name, metrics in results["cases"].items():
+        before = stored.get(name)
+        row = [name]
+        for key, label in COMPARED:
+            now = metrics[key]
+            row.append(
+                f"{now / 1000:.2f}" if key == "ns_per_call" else f"{now / 1024:.1f}"
+            )
+            if before is None or not before.get(key):
+                row.append("new")
+                continue
+            change = (now - before[key]) / before[key] * 100
+            row.append(f"{change:+.0f}%")
+            if change > threshold:
+                row[-1] += " !"
+                regressions.append(f"{name}: {label} {change:+.0f}%")
+        row.append(f"{metrics['retained_bytes']:.0f}")
+        rows.append(row)
+    table = "\n".join("| " + " | ".join(row) + " |" for row in rows)
+    return table, regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Micro-benchmark the extraction hot paths against a baseline"
+    )
+    parser.add_argument(
+        "--filter", default="", help="Only run cases whose name contains this text"
+    )
+    parser.add_argument(
+        "--min-time",
+        type=float,
+        default=0.2,
+        help="Seconds per timing round (default: 0.2)",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Timing rounds, the best is kept"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=25.0,
+        help="Percent a case may get slower or allocate more before the run "
+        "fails (default: 25)",
+    )
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        default=DEFAULT_BASELINE,
+        help=f"Stored results to compare against (default: {DEFAULT_BASELINE})",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Store these results as the new baseline instead of failing",
+    )
+    parser.add_argument("--output", type=Path, help="Also write the JSON results here")
+    args = parser.parse_args(argv)
+
+    results = run(args.filter, args.min_time, args.repeat)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+
+    baseline = {}
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    table, regressions = compare(results, baseline, args.threshold)
+    print(table)
+    if args.save_baseline:
+        # Cases left out by --filter keep their stored numbers
+        merged = {**baseline, **results}
+        merged["cases"] = {**baseline.get("cases", {}), **results["cases"]}
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(merged, indent=2) + "\n", encoding="utf-8")
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:g}%:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
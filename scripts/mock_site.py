@@ -0,0 +1,843 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for books.toscrape.com.
+
+Generates a deterministic catalogue of any size in the site's markup (home
+and paginated listings, category listings, detail pages and cover images)
+and serves it over keep-alive HTTP/1.1, with configurable latency, server
+errors, 429 throttling and connection resets, so the scraper's throughput
+can be measured without touching the real site.
+
+Usage:
+    python -m scripts.mock_site [--port PORT] [--books N] [--per-page N]
+        [--categories N] [--latency SPEC] [--error-rate P]
+        [--throttle-rate P] [--throttle-rps RPS] [--reset-rate P] [--seed N]
+
+    uv run main.py --base-url http://127.0.0.1:8000/ --pages 50
+"""
+
+import argparse
+import hashlib
+import html
+import math
+import random
+import re
+import socket
+import struct
+import threading
+import time
+import unicodedata
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+# The real site's categories, in sidebar order
+CATEGORY_NAMES = [
+    "Travel", "Mystery", "Historical Fiction", "Sequential Art", "Classics",
+    "Philosophy", "Romance", "Womens Fiction", "Fiction", "Childrens",
+    "Religion", "Nonfiction", "Music", "Default", "Science Fiction",
+    "Sports and Games", "Add a comment", "Fantasy", "New Adult", "Young Adult",
+    "Science", "Poetry", "Paranormal", "Art", "Psychology", "Autobiography",
+    "Parenting", "Adult Fiction", "Humor", "Horror", "History",
+    "Food and Drink", "Christian Fiction", "Business", "Biography", "Thriller",
+    "Contemporary", "Spirituality", "Academic", "Self Help", "Historical",
+    "Christian", "Suspense", "Short Stories", "Novels", "Health", "Politics",
+    "Cultural", "Erotica", "Crime",
+]  # fmt: skip
+
+WORDS = [
+    "light", "attic", "velvet", "soumission", "sharp", "objects", "sapiens",
+    "requiem", "red", "dirty", "little", "secrets", "coming", "woman", "boys",
+    "boat", "marie", "antoinette", "starving", "hearts", "shakespeare",
+    "sonnets", "set", "me", "free", "rip", "it", "up", "start", "again",
+    "our", "band", "could", "be", "your", "life", "olio", "mesaerion", "best",
+    "science", "fiction", "stories", "libertarianism", "for", "beginners",
+    "it's", "only", "the", "himalayas", "café", "naïve", "orchard", "winter",
+    "garden", "river", "shadow", "glass", "paper", "stone", "house", "night",
+]  # fmt: skip
+
+RATINGS = ["One", "Two", "Three", "Four", "Five"]
+
+# Statuses a server error is drawn from
+ERROR_STATUSES = (500, 502, 503)
+
+REASONS = {
+    200: "OK",
+    304: "Not Modified",
+    404: "NOT FOUND",
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+    502: "Bad Gateway",
+    503: "Service Unavailable",
+}
+
+LATENCY_KINDS = ("fixed", "uniform", "normal", "lognormal", "exponential")
+
+
+def slugify(text: str) -> str:
+    """Return the URL slug the site derives from a title or category name."""
+    ascii_text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore")
+    return re.sub(r"[^a-z0-9]+", "-", ascii_text.decode("ascii").lower()).strip("-")
+
+
+class Book:
+    """One generated book."""
+
+    def __init__(self, rng: random.Random, book_id: int, category: int):
+        words = rng.choices(WORDS, k=rng.randint(2, 6))
+        self.title = " ".join(word.capitalize() for word in words)
+        if rng.random() < 0.1:
+            # Some titles carry the characters the real ones do
+            self.title += rng.choice([": A Novel", " & Other Stories", " (Vol. 2)"])
+        self.id = book_id
+        self.slug = f"{slugify(self.title)}_{book_id}"
+        self.category = category
+        self.price = f"£{rng.uniform(10, 60):.2f}"
+        self.rating = rng.choice(RATINGS)
+        self.stock = rng.randint(1, 22)
+        self.upc = f"{rng.getrandbits(64):016x}"
+        self.image = f"{rng.getrandbits(128):032x}"
+        sentences = []
+        for _ in range(rng.randint(4, 10)):
+            sentence = " ".join(rng.choices(WORDS, k=rng.randint(8, 20)))
+            sentences.append(sentence.capitalize() + ".")
+        self.description = " ".join(sentences) + " ...more"
+
+    @property
+    def availability(self) -> str:
+        return f"In stock ({self.stock} available)"
+
+    @property
+    def image_path(self) -> str:
+        """Site-relative path of the cover."""
+        return f"media/cache/{self.image[:2]}/{self.image[2:4]}/{self.image}.jpg"
+
+
+class Catalogue:
+    """A deterministic generated catalogue and its pages in the site's markup.
+
+    Books are listed newest id first, like the real site, and assigned to
+    categories round-robin by a seeded shuffle.
+    """
+
+    def __init__(
+        self, books: int = 1000, per_page: int = 20, categories: int = 50, seed: int = 0
+    ):
+        rng = random.Random(seed)
+        self.per_page = max(1, per_page)
+        self.categories: List[Tuple[str, str]] = []
+        for index in range(max(1, categories)):
+            name = (
+                CATEGORY_NAMES[index]
+                if index < len(CATEGORY_NAMES)
+                else f"Category {index + 1}"
+            )
+            # books_1 is the "Books" entry holding all of them
+            self.categories.append((name, f"{slugify(name)}_{index + 2}"))
+        assignment = [i % len(self.categories) for i in range(books)]
+        rng.shuffle(assignment)
+        self.books = [
+            Book(rng, books - index, assignment[index]) for index in range(books)
+        ]
+        self.by_slug = {book.slug: book for book in self.books}
+        self.by_image = {book.image: book for book in self.books}
+        self.by_category: List[List[Book]] = [[] for _ in self.categories]
+        for book in self.books:
+            self.by_category[book.category].append(book)
+        self.category_index = {
+            slug: index for index, (_, slug) in enumerate(self.categories)
+        }
+
+    def page_count(self, books: List[Book]) -> int:
+        """Return the number of listing pages of a list of books."""
+        return max(1, math.ceil(len(books) / self.per_page))
+
+    @property
+    def pages(self) -> int:
+        """Number of pages of the main listing."""
+        return self.page_count(self.books)
+
+    def render_listing(
+        self,
+        books: List[Book],
+        page: int,
+        to_root: str,
+        to_book: str,
+        heading: str,
+        next_href: str,
+        breadcrumb: str = "",
+    ) -> Optional[str]:
+        """Render one page of a listing, or None past its last page.
+
+        Args:
+            books (List[Book]): Every book of the listing.
+            page (int): The page number.
+            to_root (str): Relative path from the page to the site root.
+            to_book (str): Relative path from the page to the book directories.
+            heading (str): The page heading.
+            next_href (str): Pattern of the pager links, with ``{page}``.
+            breadcrumb (str, optional): Extra breadcrumb items.
+
+        Returns:
+            Optional[str]: The HTML page.
+        """
+        pages = self.page_count(books)
+        if not 1 <= page <= pages:
+            return None
+        first = (page - 1) * self.per_page
+        shown = books[first : first + self.per_page]
+        sidebar = "".join(
+            f"\n                                <li>\n"
+            f'                                    <a href="{to_root}catalogue/category/books/{slug}/index.html">\n'
+            f"                                        {html.escape(name)}\n"
+            f"                                    </a>\n"
+            f"                                </li>"
+            for name, slug in self.categories
+        )
+        items = "".join(self._render_pod(book, to_root, to_book) for book in shown)
+        pager = ""
+        if pages > 1:
+            previous = (
+                f'\n                <li class="previous"><a href="{next_href.format(page=page - 1)}">previous</a></li>'
+                if page > 1
+                else ""
+            )
+            following = (
+                f'\n                <li class="next"><a href="{next_href.format(page=page + 1)}">next</a></li>'
+                if page < pages
+                else ""
+            )
+            pager = f"""
+            <div>
+                <ul class="pager">{previous}
+                <li class="current">
+                    Page {page} of {pages}
+                </li>{following}
+                </ul>
+            </div>"""
+        showing = (
+            f"<strong>{len(books)}</strong> results - showing "
+            f"<strong>{first + 1}</strong> to <strong>{first + len(shown)}</strong>."
+            if len(books) > self.per_page
+            else f"<strong>{len(books)}</strong> results."
+        )
+        return f"""<!DOCTYPE html>
+<!--[if lt IE 7]>      <html lang="en-us" class="no-js lt-ie9 lt-ie8 lt-ie7"> <![endif]-->
+<!--[if gt IE 8]><!--> <html lang="en-us" class="no-js"> <!--<![endif]-->
+    <head>
+        <title>
+    {html.escape(heading)} | Books to Scrape - Sandbox
+</title>
+        <meta http-equiv="content-type" content="text/html; charset=UTF-8" />
+        <meta name="viewport" content="width=device-width" />
+        <link rel="stylesheet" type="text/css" href="{to_root}static/oscar/css/styles.css" />
+    </head>
+    <body id="default" class="default">
+        <header class="header container-fluid">
+            <div class="page_inner">
+                <div class="row">
+                    <div class="col-sm-8 h1"><a href="{to_root}index.html">Books to Scrape</a><small> We love being scraped!</small>
+</div>
+                </div>
+            </div>
+        </header>
+<div class="container-fluid page">
+    <div class="page_inner">
+        <ul class="breadcrumb">
+            <li>
+                <a href="{to_root}index.html">Home</a>
+            </li>{breadcrumb}
+        </ul>
+        <div class="row">
+            <aside class="sidebar col-sm-4 col-md-3">
+                <div id="promotions_left">
+                </div>
+                <div class="side_categories">
+                    <ul class="nav nav-list">
+                        <li>
+                            <a href="{to_root}catalogue/category/books_1/index.html">
+                                Books
+                            </a>
+                            <ul>{sidebar}
+                            </ul>
+                        </li>
+                    </ul>
+                </div>
+            </aside>
+            <div class="col-sm-8 col-md-9">
+                <div class="page-header action">
+                    <h1>{html.escape(heading)}</h1>
+                </div>
+                <div id="messages">
+                </div>
+                <div id="promotions">
+                </div>
+                <form method="get" class="form-horizontal">
+                    <div style="display:none">
+                    </div>
+                    {showing}
+                </form>
+                <section>
+                    <div class="alert alert-warning" role="alert"><strong>Warning!</strong> This is a demo website for web scraping purposes. Prices and ratings here were randomly assigned and have no real meaning.</div>
+                    <div>
+                        <ol class="row">{items}
+                        </ol>{pager}
+                    </div>
+                </section>
+            </div>
+        </div><!-- /row -->
+    </div><!-- /page_inner -->
+</div><!-- /container-fluid -->
+    </body>
+</html>
+"""
+
+    def _render_pod(self, book: Book, to_root: str, to_book: str) -> str:
+        """Render a book's entry on a listing page."""
+        title = html.escape(book.title)
+        short = html.escape(
+            book.title if len(book.title) <= 30 else book.title[:27] + "..."
+        )
+        return f"""
+                            <li class="col-xs-6 col-sm-4 col-md-3 col-lg-3">
+    <article class="product_pod">
+            <div class="image_container">
+                    <a href="{to_book}{book.slug}/index.html"><img src="{to_root}{book.image_path}" alt="{title}" class="thumbnail"></a>
+            </div>
+                <p class="star-rating {book.rating}">
+                    <i class="icon-star"></i>
+                    <i class="icon-star"></i>
+                    <i class="icon-star"></i>
+                    <i class="icon-star"></i>
+                    <i class="icon-star"></i>
+                </p>
+            <h3><a href="{to_book}{book.slug}/index.html" title="{title}">{short}</a></h3>
+            <div class="product_price">
+        <p class="price_color">{book.price}</p>
+<p class="instock availability">
+    <i class="icon-ok"></i>
+        In stock
+</p>
+    <form>
+        <button type="submit" class="btn btn-primary btn-block" data-loading-text="Adding...">Add to basket</button>
+    </form>
+            </div>
+    </article>
+</li>"""
+
+    def render_detail(self, book: Book) -> str:
+        """Render a book's detail page."""
+        title = html.escape(book.title)
+        name, slug = self.categories[book.category]
+        return f"""<!DOCTYPE html>
+<!--[if gt IE 8]><!--> <html lang="en-us" class="no-js"> <!--<![endif]-->
+    <head>
+        <title>
+    {title} | Books to Scrape - Sandbox
+</title>
+        <meta http-equiv="content-type" content="text/html; charset=UTF-8" />
+        <meta name="description" content="
+    {html.escape(book.description[:160])}
+" />
+    </head>
+    <body id="default" class="default">
+        <header class="header container-fluid">
+            <div class="page_inner">
+                <div class="row">
+                    <div class="col-sm-8 h1"><a href="../../index.html">Books to Scrape</a><small> We love being scraped!</small>
+</div>
+                </div>
+            </div>
+        </header>
+<div class="container-fluid page">
+    <div class="page_inner">
+<ul class="breadcrumb">
+    <li>
+        <a href="../../index.html">Home</a>
+    </li>
+    <li>
+        <a href="../category/books_1/index.html">Books</a>
+    </li>
+    <li>
+        <a href="../category/books/{slug}/index.html">{html.escape(name)}</a>
+    </li>
+    <li class="active">{title}</li>
+</ul>
+<div id="messages">
+</div>
+<div class="content">
+    <div id="promotions">
+    </div>
+    <div id="content_inner">
+<article class="product_page"><!-- Start of product page -->
+    <div class="row">
+        <div class="col-sm-6">
+<div id="product_gallery" class="carousel">
+    <div class="thumbnail">
+        <div class="carousel-inner">
+            <div class="item active">
+                <img src="../../{book.image_path}" alt="{title}" />
+            </div>
+        </div>
+    </div>
+</div>
+        </div>
+        <div class="col-sm-6 product_main">
+            <h1>{title}</h1>
+<p class="price_color">{book.price}</p>
+<p class="instock availability">
+    <i class="icon-ok"></i>
+        {book.availability}
+</p>
+    <p class="star-rating {book.rating}">
+        <i class="icon-star"></i>
+        <i class="icon-star"></i>
+        <i class="icon-star"></i>
+        <i class="icon-star"></i>
+        <i class="icon-star"></i>
+    </p>
+            <hr/>
+        </div><!-- /col-sm-6 -->
+    </div><!-- /row -->
+    <div id="product_description" class="sub-header">
+        <h2>Product Description</h2>
+    </div>
+    <p>{html.escape(book.description)}</p>
+    <div class="sub-header">
+        <h2>Product Information</h2>
+    </div>
+    <table class="table table-striped">
+        <tr>
+            <th>UPC</th><td>{book.upc}</td>
+        </tr>
+        <tr>
+            <th>Product Type</th><td>Books</td>
+        </tr>
+            <tr>
+                <th>Price (excl. tax)</th><td>{book.price}</td>
+            </tr>
+            <tr>
+                <th>Price (incl. tax)</th><td>{book.price}</td>
+            </tr>
+            <tr>
+                <th>Tax</th><td>£0.00</td>
+            </tr>
+        <tr>
+            <th>Availability</th>
+            <td>{book.availability}</td>
+        </tr>
+            <tr>
+                <th>Number of reviews</th>
+                <td>0</td>
+            </tr>
+    </table>
+</article><!-- End of product page -->
+    </div>
+</div><!-- /content -->
+    </div><!-- /page_inner -->
+</div><!-- /container-fluid -->
+    </body>
+</html>
+"""
+
+    def render_image(self, book: Book) -> bytes:
+        """Return the cover bytes of a book: a JPEG marker around its hash."""
+        return b"\xff\xd8\xff\xe0" + bytes.fromhex(book.image) + b"\xff\xd9"
+
+    def resolve(self, path: str) -> Optional[Tuple[str, bytes]]:
+        """Return the content type and body of a site path, or None if it's missing.
+
+        Args:
+            path (str): The request path, without the query string.
+
+        Returns:
+            Optional[Tuple[str, bytes]]: The content type and body.
+        """
+        page: Optional[str] = None
+        if path in ("/", "/index.html"):
+            page = self.render_listing(
+                self.books,
+                1,
+                "",
+                "catalogue/",
+                "All products",
+                "catalogue/page-{page}.html",
+            )
+        elif match := re.fullmatch(r"/catalogue/page-(\d+)\.html", path):
+            page = self.render_listing(
+                self.books,
+                int(match.group(1)),
+                "../",
+                "",
+                "All products",
+                "page-{page}.html",
+            )
+        elif match := re.fullmatch(
+            r"/catalogue/category/books_1/(?:index|page-(\d+))\.html", path
+        ):
+            page = self.render_listing(
+                self.books,
+                int(match.group(1) or 1),
+                "../../../",
+                "../../",
+                "Books",
+                "page-{page}.html",
+            )
+        elif match := re.fullmatch(
+            r"/catalogue/category/books/([\w-]+)/(?:index|page-(\d+))\.html", path
+        ):
+            index = self.category_index.get(match.group(1))
+            if index is not None:
+                name = self.categories[index][0]
+                page = self.render_listing(
+                    self.by_category[index],
+                    int(match.group(2) or 1),
+                    "../../../../",
+                    "../../../",
+                    name,
+                    "page-{page}.html",
+                    "\n            <li>\n"
+                    '                <a href="../books_1/index.html">Books</a>\n'
+                    "            </li>\n"
+                    f'            <li class="active">{html.escape(name)}</li>',
+                )
+        elif match := re.fullmatch(r"/catalogue/([^/]+)/index\.html", path):
+            book = self.by_slug.get(match.group(1))
+            if book is not None:
+                page = self.render_detail(book)
+        elif match := re.fullmatch(r"/media/cache/\w\w/\w\w/(\w+)\.jpg", path):
+            book = self.by_image.get(match.group(1))
+            if book is not None:
+                return "image/jpeg", self.render_image(book)
+        if page is None:
+            return None
+        return "text/html", page.encode("utf-8")
+
+
+class LatencyModel:
+    """A distribution of response latencies, in seconds.
+
+    Specs are ``fixed:S`` (or just ``S``), ``uniform:LOW,HIGH``,
+    ``normal:MEAN,STDDEV``, ``lognormal:MEDIAN,SIGMA`` and
+    ``exponential:MEAN``; ``0`` means no added latency.
+    """
+
+    def __init__(self, kind: str = "fixed", params: Tuple[float, ...] = (0.0,)):
+        if kind not in LATENCY_KINDS:
+            raise ValueError(f"unknown latency distribution {kind!r}")
+        expected = {"fixed": 1, "exponential": 1}.get(kind, 2)
+        if len(params) != expected or any(p < 0 for p in params):
+            raise ValueError(
+                f"{kind} latency takes {expected} non-negative parameter(s)"
+            )
+        self.kind = kind
+        self.params = params
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyModel":
+        """Build a model from its spec, e.g. "lognormal:0.05,0.5"."""
+        kind, _, values = spec.strip().partition(":")
+        if not values:
+            kind, values = "fixed", kind
+        try:
+            params = tuple(float(value) for value in values.split(","))
+        except ValueError:
+            raise ValueError(f"invalid latency spec {spec!r}") from None
+        return cls(kind.lower(), params)
+
+    def sample(self, rng: random.Random) -> float:
+        """Draw one latency."""
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return rng.uniform(*self.params)
+        if self.kind == "normal":
+            return max(0.0, rng.gauss(*self.params))
+        if self.kind == "lognormal":
+            median, sigma = self.params
+            return median * math.exp(rng.gauss(0.0, sigma)) if median else 0.0
+        mean = self.params[0]
+        return rng.expovariate(1.0 / mean) if mean else 0.0
+
+    def __str__(self) -> str:
+        return f"{self.kind}:{','.join(f'{p:g}' for p in self.params)}"
+
+
+class MockSiteHandler(BaseHTTPRequestHandler):
+    """Serves the catalogue of the ``MockSite`` it belongs to."""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; with Nagle on, every
+    # response would wait for the client's delayed ACK
+    disable_nagle_algorithm = True
+    server_version = "nginx/1.24.0"
+    sys_version = ""
+    server: "MockSite"
+
+    def do_GET(self) -> None:
+        site = self.server
+        delay, fault = site.plan_response()
+        if delay:
+            time.sleep(delay)
+        if fault == "reset":
+            self._reset()
+            return
+        if fault == 429:
+            self._send(429, "text/plain", b"Too Many Requests", {"Retry-After": "1"})
+            return
+        if fault:
+            self._send(fault, "text/plain", REASONS[fault].encode("ascii"))
+            return
+        resolved = site.catalogue_response(self.path.split("?", 1)[0])
+        if resolved is None:
+            self._send(404, "text/html", b"<h1>Not Found</h1>")
+            return
+        content_type, body, etag = resolved
+        if self.headers.get("If-None-Match") == etag:
+            self._send(304, content_type, b"", {"ETag": etag})
+            return
+        self._send(200, content_type, body, {"ETag": etag})
+
+    def _send(
+        self,
+        status: int,
+        content_type: str,
+        body: bytes,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        self.send_response(status, REASONS.get(status))
+        if content_type.startswith("text/"):
+            content_type += "; charset=utf-8"
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.count(status, len(body))
+
+    def _reset(self) -> None:
+        """Abort the connection with a TCP reset instead of answering."""
+        self.connection.setsockopt(
+            socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0)
+        )
+        self.connection.close()
+        self.close_connection = True
+        self.server.count("reset", 0)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class MockSite(ThreadingHTTPServer):
+    """Threaded HTTP server for a generated catalogue, with injected faults.
+
+    Faults are drawn per request, in this order: a connection reset
+    (``reset_rate``), a 429 (``throttle_rate``, or over ``throttle_rps``
+    requests per second), then a 500/502/503 (``error_rate``). Every response,
+    faults included, is delayed by a draw from ``latency``.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(
+        self,
+        catalogue: Optional[Catalogue] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: Optional[LatencyModel] = None,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        throttle_rps: float = 0.0,
+        reset_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        super().__init__((host, port), MockSiteHandler)
+        self.catalogue = catalogue or Catalogue(seed=seed)
+        self.latency = latency or LatencyModel()
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.throttle_rps = throttle_rps
+        self.reset_rate = reset_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._responses: Dict[str, Tuple[str, bytes, str]] = {}
+        self._tokens = throttle_rps
+        self._refilled = time.monotonic()
+        self._thread: Optional[threading.Thread] = None
+        self.statuses: Counter = Counter()
+        self.requests = 0
+        self.bytes_sent = 0
+
+    @property
+    def url(self) -> str:
+        """Base URL of the site, with its trailing slash."""
+        host, port = self.server_address[:2]
+        return f"http://{host!s}:{port}/"
+
+    def plan_response(self) -> Tuple[float, Any]:
+        """Draw the latency and fault of the next request.
+
+        Returns:
+            Tuple[float, Any]: The delay in seconds, and None, "reset" or the
+            status of the error to answer with.
+        """
+        with self._lock:
+            self.requests += 1
+            delay = self.latency.sample(self._rng)
+            if self._rng.random() < self.reset_rate:
+                return delay, "reset"
+            if self._rng.random() < self.throttle_rate or not self._take_token():
+                return delay, 429
+            if self._rng.random() < self.error_rate:
+                return delay, self._rng.choice(ERROR_STATUSES)
+            return delay, None
+
+    def _take_token(self) -> bool:
+        """Take a token from the throttling bucket. Caller holds the lock."""
+        if not self.throttle_rps:
+            return True
+        now = time.monotonic()
+        self._tokens = min(
+            self.throttle_rps, self._tokens + (now - self._refilled) * self.throttle_rps
+        )
+        self._refilled = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def catalogue_response(self, path: str) -> Optional[Tuple[str, bytes, str]]:
+        """Return the content type, body and ETag of a path, rendered once."""
+        with self._lock:
+            cached = self._responses.get(path)
+        if cached is not None:
+            return cached
+        resolved = self.catalogue.resolve(path)
+        if resolved is None:
+            return None
+        content_type, body = resolved
+        etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+        with self._lock:
+            self._responses[path] = (content_type, body, etag)
+        return content_type, body, etag
+
+    def count(self, status: Any, size: int) -> None:
+        """Record an answered request."""
+        with self._lock:
+            self.statuses[str(status)] += 1
+            self.bytes_sent += size
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the request count, the answers by status and the bytes sent."""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "statuses": dict(self.statuses),
+                "bytes_sent": self.bytes_sent,
+            }
+
+    def start(self) -> str:
+        """Serve on a background thread and return the base URL."""
+        self._thread = threading.Thread(
+            target=self.serve_forever, name="mock-site", daemon=True
+        )
+        self._thread.start()
+        return self.url
+
+    def stop(self) -> None:
+        """Stop serving and close the listening socket."""
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server_close()
+
+    def __enter__(self) -> "MockSite":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Serve a generated books.toscrape.com catalogue locally"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=8000, help="Port (default: 8000)")
+    parser.add_argument(
+        "--books", type=int, default=1000, help="Books in the catalogue (default: 1000)"
+    )
+    parser.add_argument(
+        "--per-page", type=int, default=20, help="Books per listing page (default: 20)"
+    )
+    parser.add_argument(
+        "--categories", type=int, default=50, help="Number of categories (default: 50)"
+    )
+    parser.add_argument(
+        "--latency",
+        type=LatencyModel.parse,
+        default=LatencyModel(),
+        metavar="SPEC",
+        help="Response latency: S, fixed:S, uniform:LOW,HIGH, normal:MEAN,STDDEV, "
+        "lognormal:MEDIAN,SIGMA or exponential:MEAN (default: 0)",
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of requests answered 500, 502 or 503 (default: 0)",
+    )
+    parser.add_argument(
+        "--throttle-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of requests answered 429 (default: 0)",
+    )
+    parser.add_argument(
+        "--throttle-rps",
+        type=float,
+        default=0.0,
+        help="Answer 429 above this many requests per second, 0 for no limit",
+    )
+    parser.add_argument(
+        "--reset-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of connections reset instead of answered (default: 0)",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="Seed of the catalogue and the faults"
+    )
+    args = parser.parse_args()
+
+    catalogue = Catalogue(args.books, args.per_page, args.categories, args.seed)
+    site = MockSite(
+        catalogue,
+        args.host,
+        args.port,
+        args.latency,
+        args.error_rate,
+        args.throttle_rate,
+        args.throttle_rps,
+        args.reset_rate,
+        args.seed,
+    )
+    print(
+        f"Serving {len(catalogue.books)} books on {catalogue.pages} pages "
+        f"at {site.url} (latency {site.latency}); Ctrl+C to stop"
+    )
+    try:
+        site.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        site.server_close()
+        print(f"Served: {site.stats()}")
+
+
+if __name__ == "__main__":
+    main()
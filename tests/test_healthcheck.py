@@ -6,6 +6,7 @@ import json
 import subprocess
 import sys
 from pathlib import Path
+from unittest.mock import MagicMock, patch
 import pytest
 
 
@@ -110,3 +111,37 @@ def test_logger_container_mode():
             os.environ.pop("CONTAINER_ENV", None)
         else:
             os.environ["CONTAINER_ENV"] = original_env
+
+
+def test_target_website_healthy_on_200():
+    """Test that the target website check passes on a 200 response."""
+    from healthcheck import check_target_website
+
+    with patch(
+        "utils.http_client.PooledFetcher.get", return_value=MagicMock(status=200)
+    ) as mock_get:
+        assert check_target_website() is True
+
+    mock_get.assert_called_once_with("https://books.toscrape.com/", timeout=10)
+
+
+@pytest.mark.parametrize("status", [301, 404, 503])
+def test_target_website_unhealthy_on_other_status(status):
+    """Test that the target website check fails on a non-200 response."""
+    from healthcheck import check_target_website
+
+    with patch(
+        "utils.http_client.PooledFetcher.get", return_value=MagicMock(status=status)
+    ):
+        assert check_target_website() is False
+
+
+def test_target_website_unhealthy_on_error():
+    """Test that the target website check fails when the request raises."""
+    from healthcheck import check_target_website
+
+    with patch(
+        "utils.http_client.PooledFetcher.get",
+        side_effect=ConnectionError("Connection refused"),
+    ):
+        assert check_target_website() is False
@@ -0,0 +1,81 @@
+"""
+Tests for the category crawl helpers: get_category_page_url, discover_categories
+and book links that are relative to a category page.
+"""
+
+from scrapling.parser import Adaptor
+
+from main import discover_categories, get_category_page_url, process_book_listing
+
+CATEGORY_URL = "https://books.toscrape.com/catalogue/category/books/travel_2/index.html"
+
+SIDEBAR_HTML = """
+<div class="side_categories">
+  <ul class="nav nav-list">
+    <li>
+      <a href="catalogue/category/books_1/index.html">Books</a>
+      <ul>
+        <li><a href="catalogue/category/books/travel_2/index.html">
+          Travel
+        </a></li>
+        <li><a href="catalogue/category/books/mystery_3/index.html">Mystery</a></li>
+      </ul>
+    </li>
+  </ul>
+</div>
+"""
+
+
+class TestGetCategoryPageUrl:
+    """Test URL generation for category pages."""
+
+    def test_first_page_is_the_category_url(self):
+        """Test page 1 returns the category URL unchanged."""
+        assert get_category_page_url(CATEGORY_URL, 1) == CATEGORY_URL
+
+    def test_later_pages_replace_index_html(self):
+        """Test later pages are siblings of the category's index page."""
+        assert get_category_page_url(CATEGORY_URL, 3) == (
+            "https://books.toscrape.com/catalogue/category/books/travel_2/page-3.html"
+        )
+
+
+class TestDiscoverCategories:
+    """Test category discovery from the sidebar."""
+
+    def test_nested_categories_are_found_in_order(self):
+        """Test every category under "Books" is returned with an absolute URL."""
+        page = Adaptor(text=SIDEBAR_HTML, url="https://books.toscrape.com/")
+
+        assert discover_categories(page, "https://books.toscrape.com/") == [
+            ("Travel", CATEGORY_URL),
+            (
+                "Mystery",
+                "https://books.toscrape.com/catalogue/category/books/mystery_3/index.html",
+            ),
+        ]
+
+    def test_page_without_sidebar(self):
+        """Test a page without the sidebar has no categories."""
+        page = Adaptor(text="<html><body></body></html>", url="https://x/")
+        assert discover_categories(page, "https://x/") == []
+
+
+class TestCategoryBookLinks:
+    """Test book links found on category pages."""
+
+    def test_link_relative_to_category_page(self):
+        """Test a "../../../" link resolves against the category page."""
+        book = Adaptor(
+            text=(
+                '<article><h3><a href="../../../its-only-the-himalayas_981/index.html" '
+                'title="It\'s Only the Himalayas">x</a></h3></article>'
+            ),
+            url=CATEGORY_URL,
+        )
+
+        result = process_book_listing(book, CATEGORY_URL)
+
+        assert result["detail_url"] == (
+            "https://books.toscrape.com/catalogue/its-only-the-himalayas_981/index.html"
+        )
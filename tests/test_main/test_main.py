@@ -1,6 +1,7 @@
 import json
 import pathlib
 from main import (
+    get_output_path,
     get_page_url,
     save_to_json,
     extract_star_rating,
@@ -203,6 +204,15 @@ def test_save_to_json_file_not_found_error(mock_open):
         pass  # Expected behavior
 
 
+# GET OUTPUT PATH
+def test_get_output_path_honors_output_dir(tmp_path, monkeypatch):
+    output_dir = tmp_path / "run"
+    monkeypatch.setenv("OUTPUT_DIR", str(output_dir))
+
+    assert get_output_path("books.json") == str(output_dir / "books.json")
+    assert output_dir.is_dir()
+
+
 # EXTRACT STAR RATING
 def test_extract_star_rating_with_one_star():
     mock_book = MagicMock()
@@ -8,10 +8,24 @@ This module contains tests for the main function including:
 - Edge cases (max_pages limiting, empty pages, boundary conditions)
 """
 
+import asyncio
+import json
+import os
+import threading
+import time
 import pytest
-from unittest.mock import MagicMock, patch, call
-from concurrent.futures import Future
-from main import main
+from unittest.mock import AsyncMock, MagicMock, patch, call
+from main import FetchError, iter_books, main, seed_work_queue
+from scrapling.engines.toolbelt import Response
+from utils.concurrency import AdaptiveLimiter
+from utils.http_client import RawPage
+from utils.backpressure import backpressure
+from utils.checkpoint import CheckpointJournal
+from utils.conditional import conditional_requests
+from utils.frontier import frontier
+from utils.signal_handler import shutdown_handler
+from utils.work_queue import WorkQueue
+from utils.worker_pool import CrawlPool
 
 
 # Test fixtures for main function testing
@@ -26,8 +40,38 @@ def mock_fetcher_get():
 
 @pytest.fixture
 def mock_save_to_json():
-    """Mock save_to_json function."""
-    with patch("main.save_to_json") as mock_save:
+    """Mock the output sink; the mock is called once with everything written.
+
+    main streams books to a ``JsonArraySink``; the recorder hands them to the
+    mock as ``(books, filename)`` when the sink is closed, like the
+    ``save_to_json`` call it replaced, and not at all when nothing was written.
+    """
+    mock_save = MagicMock()
+
+    class RecordingSink:
+        def __init__(self, path, flush_every=50):
+            self.path = path
+            self.books = []
+            self.closed = False
+
+        @property
+        def count(self):
+            return len(self.books)
+
+        def write(self, book):
+            self.books.append(book)
+
+        def close(self):
+            if self.closed:
+                return
+            self.closed = True
+            if self.books:
+                mock_save(self.books, os.path.basename(self.path))
+
+        def discard(self):
+            self.closed = True
+
+    with patch("main.JsonArraySink", RecordingSink):
         yield mock_save
 
 
@@ -42,8 +86,8 @@ def mock_logger():
 def mock_tqdm():
     """Mock tqdm progress bars."""
     with patch("main.tqdm") as mock_progress:
-        # Make tqdm return the iterable unchanged
-        mock_progress.side_effect = lambda iterable, **kwargs: iterable
+        # A single progress bar tracks detail fetches across all pages
+        mock_progress.return_value = MagicMock(total=0)
         yield mock_progress
 
 
@@ -172,27 +216,8 @@ class TestMainFunctionSuccessScenarios:
                 "product_type": "Books",
             }
 
-            # Mock ThreadPoolExecutor
-            with patch("main.concurrent.futures.ThreadPoolExecutor") as mock_executor:
-                # Create mock context manager
-                mock_context = MagicMock()
-                mock_executor.return_value.__enter__.return_value = mock_context
-
-                # Mock submit method to return futures
-                def mock_submit(func, *args):
-                    future = MagicMock(spec=Future)
-                    # Call the actual function to get realistic results
-                    future.result.return_value = func(*args)
-                    return future
-
-                mock_context.submit.side_effect = mock_submit
-
-                # Mock as_completed to return futures in order
-                with patch("main.concurrent.futures.as_completed") as mock_as_completed:
-                    mock_as_completed.side_effect = lambda futures: futures
-
-                    # Call main function
-                    main(max_workers=5, max_pages=1)
+            # Call main function
+            main(max_workers=5, max_pages=1)
 
         # Verify Fetcher.get was called for first page
         mock_fetcher_get.assert_called_once_with(
@@ -249,23 +274,8 @@ class TestMainFunctionSuccessScenarios:
                 "category": "Test Category",
             }
 
-            # Mock ThreadPoolExecutor
-            with patch("main.concurrent.futures.ThreadPoolExecutor") as mock_executor:
-                mock_context = MagicMock()
-                mock_executor.return_value.__enter__.return_value = mock_context
-
-                def mock_submit(func, *args):
-                    future = MagicMock(spec=Future)
-                    future.result.return_value = func(*args)
-                    return future
-
-                mock_context.submit.side_effect = mock_submit
-
-                with patch("main.concurrent.futures.as_completed") as mock_as_completed:
-                    mock_as_completed.side_effect = lambda futures: futures
-
-                    # Call main function with max_pages=3
-                    main(max_workers=5, max_pages=3)
+            # Call main function with max_pages=3
+            main(max_workers=5, max_pages=3)
 
         # Verify Fetcher.get was called for all pages
         expected_calls = [
@@ -317,40 +327,17 @@ class TestMainFunctionSuccessScenarios:
                 "category": "Test Category",
             }
 
-            # Mock ThreadPoolExecutor to verify threading behavior
-            with patch("main.concurrent.futures.ThreadPoolExecutor") as mock_executor:
-                mock_context = MagicMock()
-                mock_executor.return_value.__enter__.return_value = mock_context
-
-                # Track submit calls
-                submit_calls = []
-
-                def mock_submit(func, *args):
-                    future = MagicMock(spec=Future)
-                    submit_calls.append((func, args))
-                    future.result.return_value = func(*args)
-                    return future
-
-                mock_context.submit.side_effect = mock_submit
+            # Wrap CrawlPool to verify threading behavior
+            with patch("main.CrawlPool", wraps=CrawlPool) as mock_pool:
+                # Call main function with specific max_workers
+                main(max_workers=8, max_pages=1)
 
-                with patch("main.concurrent.futures.as_completed") as mock_as_completed:
-                    mock_as_completed.side_effect = lambda futures: futures
+        # Verify a single pool sized with max_workers served the whole run
+        mock_pool.assert_called_once_with(8)
 
-                    # Call main function with specific max_workers
-                    main(max_workers=8, max_pages=1)
-
-        # Verify ThreadPoolExecutor was called with correct max_workers
-        assert mock_executor.call_count == 2  # Once for listings, once for details
-        # Check that max_workers=8 was used in both calls
-        for call_args in mock_executor.call_args_list:
-            assert call_args == call(max_workers=8)
-
-        # Verify submit was called for both listing and detail processing
-        listing_calls = [call for call in submit_calls if call[0] == mock_listing]
-        detail_calls = [call for call in submit_calls if call[0] == mock_details]
-
-        assert len(listing_calls) == 3  # 3 books on the page
-        assert len(detail_calls) == 3  # 3 books for detail processing
+        # Verify both listing and detail processing ran for every book
+        assert mock_listing.call_count == 3  # 3 books on the page
+        assert mock_details.call_count == 3  # 3 books for detail processing
 
     def test_progress_tracking_and_logging(
         self,
@@ -380,33 +367,14 @@ class TestMainFunctionSuccessScenarios:
                 "category": "Test Category",
             }
 
-            with patch("main.concurrent.futures.ThreadPoolExecutor") as mock_executor:
-                mock_context = MagicMock()
-                mock_executor.return_value.__enter__.return_value = mock_context
-
-                def mock_submit(func, *args):
-                    future = MagicMock(spec=Future)
-                    future.result.return_value = func(*args)
-                    return future
-
-                mock_context.submit.side_effect = mock_submit
-
-                with patch("main.concurrent.futures.as_completed") as mock_as_completed:
-                    mock_as_completed.side_effect = lambda futures: futures
-
-                    main(max_workers=5, max_pages=1)
+            main(max_workers=5, max_pages=1)
 
-        # Verify progress bars were created
-        assert mock_tqdm.call_count == 2  # One for listings, one for details
+        # Verify a single progress bar tracks details across pages
+        assert mock_tqdm.call_count == 1
 
-        # Check tqdm was called with correct descriptions
+        # Check tqdm was called with the correct description
         tqdm_calls = mock_tqdm.call_args_list
-        assert any(
-            "Extracting listings from page 1" in str(call) for call in tqdm_calls
-        )
-        assert any(
-            "Fetching details for page 1 books" in str(call) for call in tqdm_calls
-        )
+        assert any("Fetching book details" in str(call) for call in tqdm_calls)
 
         # Verify key logging messages
         expected_log_calls = [
@@ -511,22 +479,8 @@ class TestMainFunctionErrorScenarios:
                 "category": "Test Category",
             }
 
-            with patch("main.concurrent.futures.ThreadPoolExecutor") as mock_executor:
-                mock_context = MagicMock()
-                mock_executor.return_value.__enter__.return_value = mock_context
-
-                def mock_submit(func, *args):
-                    future = MagicMock(spec=Future)
-                    future.result.return_value = func(*args)
-                    return future
-
-                mock_context.submit.side_effect = mock_submit
-
-                with patch("main.concurrent.futures.as_completed") as mock_as_completed:
-                    mock_as_completed.side_effect = lambda futures: futures
-
-                    # Should continue processing despite page 2 failure
-                    main(max_workers=5, max_pages=3)
+            # Should continue processing despite page 2 failure
+            main(max_workers=5, max_pages=3)
 
         # Verify error was logged for failed page
         mock_logger.error.assert_any_call("Failed to fetch page 2. Status code: 500")
@@ -567,23 +521,9 @@ class TestMainFunctionErrorScenarios:
                 "category": "Test Category",
             }
 
-            with patch("main.concurrent.futures.ThreadPoolExecutor") as mock_executor:
-                mock_context = MagicMock()
-                mock_executor.return_value.__enter__.return_value = mock_context
-
-                def mock_submit(func, *args):
-                    future = MagicMock(spec=Future)
-                    future.result.return_value = func(*args)
-                    return future
-
-                mock_context.submit.side_effect = mock_submit
-
-                with patch("main.concurrent.futures.as_completed") as mock_as_completed:
-                    mock_as_completed.side_effect = lambda futures: futures
-
-                    # Should propagate file saving error
-                    with pytest.raises(PermissionError):
-                        main(max_workers=5, max_pages=1)
+            # Should propagate file saving error
+            with pytest.raises(PermissionError):
+                main(max_workers=5, max_pages=1)
 
         # Verify logging occurred before the error
         mock_logger.info.assert_any_call("Saving to JSON...")
@@ -639,66 +579,7 @@ class TestMainFunctionEdgeCases:
                     },
                 ]
 
-                with patch(
-                    "main.concurrent.futures.ThreadPoolExecutor"
-                ) as mock_executor:
-                    mock_context = MagicMock()
-                    mock_executor.return_value.__enter__.return_value = mock_context
-
-                    # Mock futures for listing processing
-                    listing_future1 = MagicMock()
-                    listing_future1.result.return_value = {
-                        "title": "Valid Book 1",
-                        "price": "£10.00",
-                    }
-                    listing_future2 = MagicMock()
-                    listing_future2.result.return_value = {}  # Empty result - triggers missing branch
-                    listing_future3 = MagicMock()
-                    listing_future3.result.return_value = {
-                        "title": "Valid Book 2",
-                        "price": "£15.00",
-                    }
-
-                    # Mock futures for detail processing
-                    detail_future1 = MagicMock()
-                    detail_future1.result.return_value = {
-                        "title": "Valid Book 1",
-                        "price": "£10.00",
-                        "description": "Desc 1",
-                    }
-                    detail_future2 = MagicMock()
-                    detail_future2.result.return_value = {
-                        "title": "Valid Book 2",
-                        "price": "£15.00",
-                        "description": "Desc 2",
-                    }
-
-                    # Mock submit to return appropriate futures
-                    mock_context.submit.side_effect = [
-                        listing_future1,
-                        listing_future2,
-                        listing_future3,  # Listing futures
-                        detail_future1,
-                        detail_future2,  # Detail futures (only for valid books)
-                    ]
-
-                    with patch(
-                        "main.concurrent.futures.as_completed"
-                    ) as mock_as_completed:
-                        # First call returns listing futures, second call returns detail futures
-                        mock_as_completed.side_effect = [
-                            [
-                                listing_future1,
-                                listing_future2,
-                                listing_future3,
-                            ],  # Listing processing
-                            [
-                                detail_future1,
-                                detail_future2,
-                            ],  # Detail processing (only valid books)
-                        ]
-
-                        main(max_workers=2, max_pages=1)
+                main(max_workers=2, max_pages=1)
 
         # Verify that only valid books were saved (empty results filtered out)
         mock_save_to_json.assert_called_once()
@@ -737,22 +618,8 @@ class TestMainFunctionEdgeCases:
                 "category": "Test Category",
             }
 
-            with patch("main.concurrent.futures.ThreadPoolExecutor") as mock_executor:
-                mock_context = MagicMock()
-                mock_executor.return_value.__enter__.return_value = mock_context
-
-                def mock_submit(func, *args):
-                    future = MagicMock(spec=Future)
-                    future.result.return_value = func(*args)
-                    return future
-
-                mock_context.submit.side_effect = mock_submit
-
-                with patch("main.concurrent.futures.as_completed") as mock_as_completed:
-                    mock_as_completed.side_effect = lambda futures: futures
-
-                    # Limit to 2 pages when 3 are available
-                    main(max_workers=5, max_pages=2)
+            # Limit to 2 pages when 3 are available
+            main(max_workers=5, max_pages=2)
 
         # Verify limiting message was logged
         mock_logger.info.assert_any_call("Found 3 pages of books")
@@ -778,14 +645,7 @@ class TestMainFunctionEdgeCases:
         """Test empty pages with no books."""
         mock_fetcher_get.return_value = empty_page_response
 
-        with patch("main.concurrent.futures.ThreadPoolExecutor") as mock_executor:
-            mock_context = MagicMock()
-            mock_executor.return_value.__enter__.return_value = mock_context
-
-            with patch("main.concurrent.futures.as_completed") as mock_as_completed:
-                mock_as_completed.side_effect = lambda futures: futures
-
-                main(max_workers=5, max_pages=1)
+        main(max_workers=5, max_pages=1)
 
         # Verify warning was logged for no books found
         mock_logger.warning.assert_called_with("No books found on page 1!")
@@ -834,21 +694,7 @@ class TestMainFunctionEdgeCases:
                 "category": "Test Category",
             }
 
-            with patch("main.concurrent.futures.ThreadPoolExecutor") as mock_executor:
-                mock_context = MagicMock()
-                mock_executor.return_value.__enter__.return_value = mock_context
-
-                def mock_submit(func, *args):
-                    future = MagicMock(spec=Future)
-                    future.result.return_value = func(*args)
-                    return future
-
-                mock_context.submit.side_effect = mock_submit
-
-                with patch("main.concurrent.futures.as_completed") as mock_as_completed:
-                    mock_as_completed.side_effect = lambda futures: futures
-
-                    main(max_workers=5, max_pages=1)
+            main(max_workers=5, max_pages=1)
 
         # Verify logging for single book
         mock_logger.info.assert_any_call("Found 1 books on page 1")
@@ -887,26 +733,1261 @@ class TestMainFunctionEdgeCases:
                 "category": "Test Category",
             }
 
-            with patch("main.concurrent.futures.ThreadPoolExecutor") as mock_executor:
-                mock_context = MagicMock()
-                mock_executor.return_value.__enter__.return_value = mock_context
+            # Call with max_pages=0
+            # Note: max_pages=0 is falsy, so the limiting logic doesn't apply
+            # The function will still process the detected pages (1 page in this case)
+            main(max_workers=5, max_pages=0)
+
+        # Verify the page was still processed because max_pages=0 doesn't trigger limiting
+        mock_save_to_json.assert_called_once()
+        saved_data = mock_save_to_json.call_args[0][0]
+        assert len(saved_data) == 3  # 3 books from the single page
+
+
+class TestMainFunctionPipelining:
+    """Test that listing and detail stages overlap across pages."""
 
-                def mock_submit(func, *args):
-                    future = MagicMock(spec=Future)
-                    future.result.return_value = func(*args)
-                    return future
+    def test_next_page_fetched_while_details_in_flight(
+        self,
+        mock_fetcher_get,
+        mock_save_to_json,
+        mock_logger,
+        mock_tqdm,
+        multi_page_response,
+    ):
+        """Test page N+1 is fetched before page N details finish."""
+        page_2_requested = threading.Event()
 
-                mock_context.submit.side_effect = mock_submit
+        def mock_get_side_effect(url, **kwargs):
+            if url == "https://books.toscrape.com/":
+                return multi_page_response["first"]
+            if "page-2.html" in url:
+                page_2_requested.set()
+                return multi_page_response["page_2"]
+            return multi_page_response["page_3"]
 
-                with patch("main.concurrent.futures.as_completed") as mock_as_completed:
-                    mock_as_completed.side_effect = lambda futures: futures
+        mock_fetcher_get.side_effect = mock_get_side_effect
 
-                    # Call with max_pages=0
-                    # Note: max_pages=0 is falsy, so the limiting logic doesn't apply
-                    # The function will still process the detected pages (1 page in this case)
-                    main(max_workers=5, max_pages=0)
+        def slow_details(book_data):
+            # Page 1 details only finish once page 2 has been requested,
+            # which would never happen with a per-page barrier
+            if book_data["detail_url"].startswith("https://example.com/page1"):
+                assert page_2_requested.wait(timeout=5)
+            return {**book_data, "category": "Test Category"}
+
+        with (
+            patch("main.process_book_listing") as mock_listing,
+            patch("main.process_book_details", side_effect=slow_details),
+        ):
+            mock_listing.side_effect = lambda book, base_url: {
+                "title": f"Book {book.name}",
+                "detail_url": f"https://example.com/{book.name}",
+            }
+
+            assert main(max_workers=4, max_pages=3) == 0
 
-        # Verify the page was still processed because max_pages=0 doesn't trigger limiting
         mock_save_to_json.assert_called_once()
         saved_data = mock_save_to_json.call_args[0][0]
-        assert len(saved_data) == 3  # 3 books from the single page
+        assert len(saved_data) == 6
+        assert all(book["category"] == "Test Category" for book in saved_data)
+
+        # Output keeps the listing order even though pages overlap
+        assert [book["title"] for book in saved_data] == [
+            f"Book page{page}_book_{i}" for page in range(1, 4) for i in range(2)
+        ]
+
+
+class TestMainFunctionAsyncEngine:
+    """Test the asyncio fetch engine."""
+
+    def test_async_engine_crawls_all_pages(
+        self,
+        mock_fetcher_get,
+        mock_save_to_json,
+        mock_logger,
+        mock_tqdm,
+        multi_page_response,
+    ):
+        """Test the async engine fetches later pages and details without threads."""
+        mock_fetcher_get.return_value = multi_page_response["first"]
+        detail_page = MagicMock(status=200)
+
+        async def mock_async_get(url, **kwargs):
+            if "page-2.html" in url:
+                return multi_page_response["page_2"]
+            if "page-3.html" in url:
+                return multi_page_response["page_3"]
+            return detail_page
+
+        with (
+            patch("main.AsyncFetcher.get", side_effect=mock_async_get) as mock_get,
+            patch("main.process_book_listing") as mock_listing,
+            patch("main.extract_book_details") as mock_extract,
+            patch("main.CrawlPool") as mock_pool,
+        ):
+            mock_listing.side_effect = lambda book, base_url: {
+                "title": f"Book {book.name}",
+                "detail_url": f"https://example.com/{book.name}",
+            }
+            mock_extract.return_value = {"category": "Test Category"}
+
+            assert main(max_workers=50, max_pages=3, engine="async") == 0
+
+        # The first page is fetched once synchronously, the rest asynchronously
+        mock_fetcher_get.assert_called_once()
+        assert mock_get.call_count == 2 + 6  # 2 listing pages + 6 detail pages
+        mock_pool.assert_not_called()
+
+        saved_data = mock_save_to_json.call_args[0][0]
+        assert [book["title"] for book in saved_data] == [
+            f"Book page{page}_book_{i}" for page in range(1, 4) for i in range(2)
+        ]
+        assert all(book["category"] == "Test Category" for book in saved_data)
+
+    def test_async_engine_skips_failed_listing_page(
+        self,
+        mock_fetcher_get,
+        mock_save_to_json,
+        mock_logger,
+        mock_tqdm,
+        multi_page_response,
+    ):
+        """Test the async engine logs and skips a listing page that fails."""
+        mock_fetcher_get.return_value = multi_page_response["first"]
+
+        async def mock_async_get(url, **kwargs):
+            if "page-2.html" in url:
+                return MagicMock(status=500)
+            if "page-3.html" in url:
+                return multi_page_response["page_3"]
+            return MagicMock(status=200)
+
+        with (
+            patch("main.AsyncFetcher.get", side_effect=mock_async_get),
+            patch("main.process_book_listing") as mock_listing,
+            patch("main.extract_book_details", return_value={}),
+        ):
+            mock_listing.side_effect = lambda book, base_url: {
+                "title": f"Book {book.name}",
+                "detail_url": f"https://example.com/{book.name}",
+            }
+
+            main(max_workers=5, max_pages=3, engine="async")
+
+        mock_logger.error.assert_any_call("Failed to fetch page 2. Status code: 500")
+        saved_data = mock_save_to_json.call_args[0][0]
+        assert len(saved_data) == 4
+
+
+class TestMainFunctionListingWindow:
+    """Test concurrent prefetch of listing pages."""
+
+    def test_listing_pages_extracted_as_they_arrive(
+        self,
+        mock_fetcher_get,
+        mock_save_to_json,
+        mock_logger,
+        mock_tqdm,
+        multi_page_response,
+    ):
+        """Test a slow page 2 does not hold back page 3 when the window is open."""
+        page_3_extracted = threading.Event()
+
+        def mock_get_side_effect(url, **kwargs):
+            if url == "https://books.toscrape.com/":
+                return multi_page_response["first"]
+            if "page-2.html" in url:
+                # Page 2 only arrives after page 3 was already extracted
+                assert page_3_extracted.wait(timeout=5)
+                return multi_page_response["page_2"]
+            return multi_page_response["page_3"]
+
+        mock_fetcher_get.side_effect = mock_get_side_effect
+
+        def listing(book, base_url):
+            if book.name.startswith("page3"):
+                page_3_extracted.set()
+            return {
+                "title": f"Book {book.name}",
+                "detail_url": f"https://example.com/{book.name}",
+            }
+
+        with (
+            patch("main.process_book_listing", side_effect=listing),
+            patch(
+                "main.process_book_details",
+                side_effect=lambda book_data: {**book_data, "category": "Test"},
+            ),
+        ):
+            assert main(max_workers=4, max_pages=3, listing_window=0) == 0
+
+        # Output keeps the listing order even though page 3 arrived first
+        saved_data = mock_save_to_json.call_args[0][0]
+        assert [book["title"] for book in saved_data] == [
+            f"Book page{page}_book_{i}" for page in range(1, 4) for i in range(2)
+        ]
+
+    def test_listing_window_bounds_pages_in_flight(
+        self,
+        mock_fetcher_get,
+        mock_save_to_json,
+        mock_logger,
+        mock_tqdm,
+    ):
+        """Test no more than listing_window listing pages are fetched at once."""
+        first_page = MagicMock(status=200)
+        mock_current = MagicMock()
+        mock_current.text = "Page 1 of 8"
+        first_page.find.return_value.find.return_value = mock_current
+        first_page.find_all.return_value = []
+
+        lock = threading.Lock()
+        in_flight = 0
+        peak = 0
+
+        def mock_get_side_effect(url, **kwargs):
+            nonlocal in_flight, peak
+            if url == "https://books.toscrape.com/":
+                return first_page
+            with lock:
+                in_flight += 1
+                peak = max(peak, in_flight)
+            time.sleep(0.02)
+            with lock:
+                in_flight -= 1
+            return first_page
+
+        mock_fetcher_get.side_effect = mock_get_side_effect
+
+        main(max_workers=8, max_pages=8, listing_window=3)
+
+        assert mock_fetcher_get.call_count == 8
+        assert 1 < peak <= 3
+
+
+class TestMainFunctionAdaptiveConcurrency:
+    """Test the adaptive concurrency mode."""
+
+    def test_adaptive_mode_backs_off_on_throttling(
+        self,
+        mock_fetcher_get,
+        mock_save_to_json,
+        mock_logger,
+        mock_tqdm,
+        multi_page_response,
+    ):
+        """Test 429 detail responses lower the limit and the range is logged."""
+
+        def mock_get_side_effect(url, **kwargs):
+            if url == "https://books.toscrape.com/":
+                return multi_page_response["first"]
+            if "page-2.html" in url:
+                return multi_page_response["page_2"]
+            if "page-3.html" in url:
+                return multi_page_response["page_3"]
+            return MagicMock(status=429)
+
+        mock_fetcher_get.side_effect = mock_get_side_effect
+
+        with (
+            patch("main.process_book_listing") as mock_listing,
+            patch("main.AdaptiveLimiter", wraps=AdaptiveLimiter) as mock_limiter,
+            patch("utils.concurrency.logger") as mock_limiter_logger,
+        ):
+            mock_listing.side_effect = lambda book, base_url: {
+                "title": f"Book {book.name}",
+                "detail_url": f"https://example.com/{book.name}",
+            }
+
+            assert main(max_workers=8, max_pages=3, adaptive=True) == 0
+
+        mock_limiter.assert_called_once_with(8)
+        # Books are still saved with their listing data
+        assert len(mock_save_to_json.call_args[0][0]) == 6
+
+        # The limit starts at half of --threads and is halved on the first 429
+        info_messages = [str(c) for c in mock_limiter_logger.info.call_args_list]
+        assert any(
+            "Adaptive concurrency: 4 -> 2 (status 429)" in m for m in info_messages
+        )
+        assert any("Adaptive concurrency: final limit" in m for m in info_messages)
+
+
+class TestMainFunctionRetries:
+    """Test retries of failed fetches."""
+
+    def test_transient_listing_failure_is_retried(
+        self,
+        mock_fetcher_get,
+        mock_save_to_json,
+        mock_logger,
+        mock_tqdm,
+        multi_page_response,
+    ):
+        """Test a listing page that fails once no longer loses its books."""
+        attempts = {"page-2.html": 0}
+
+        def mock_get_side_effect(url, **kwargs):
+            if url == "https://books.toscrape.com/":
+                return multi_page_response["first"]
+            if "page-2.html" in url:
+                attempts["page-2.html"] += 1
+                if attempts["page-2.html"] == 1:
+                    return MagicMock(status=503, headers={})
+                return multi_page_response["page_2"]
+            if "page-3.html" in url:
+                return multi_page_response["page_3"]
+            return MagicMock(status=200)
+
+        mock_fetcher_get.side_effect = mock_get_side_effect
+
+        with (
+            patch("main.process_book_listing") as mock_listing,
+            patch("main.extract_book_details", return_value={}),
+            patch("utils.retry.random.uniform", return_value=0.0),
+            patch("utils.retry.logger") as mock_retry_logger,
+        ):
+            mock_listing.side_effect = lambda book, base_url: {
+                "title": f"Book {book.name}",
+                "detail_url": f"https://example.com/{book.name}",
+            }
+
+            assert main(max_workers=4, max_pages=3, retries=2) == 0
+
+        assert attempts["page-2.html"] == 2
+        assert len(mock_save_to_json.call_args[0][0]) == 6
+
+        summary = [str(c) for c in mock_retry_logger.info.call_args_list]
+        assert any(
+            "Listing fetches: 3 requests, 1 retries, 0 failed" in m for m in summary
+        )
+        assert any(
+            "Detail fetches: 6 requests, 0 retries, 0 failed" in m for m in summary
+        )
+
+
+class TestMainFunctionDeduplication:
+    """Test detail URL deduplication across listing pages."""
+
+    def test_book_on_two_pages_is_fetched_once(
+        self,
+        mock_fetcher_get,
+        mock_save_to_json,
+        mock_logger,
+        mock_tqdm,
+        multi_page_response,
+    ):
+        """Test a book listed on two pages is fetched and saved once."""
+
+        def mock_get_side_effect(url, **kwargs):
+            if url == "https://books.toscrape.com/":
+                return multi_page_response["first"]
+            if "page-2.html" in url:
+                return multi_page_response["page_2"]
+            if "page-3.html" in url:
+                return multi_page_response["page_3"]
+            return MagicMock(status=200)
+
+        mock_fetcher_get.side_effect = mock_get_side_effect
+
+        def listing(book, base_url):
+            # The catalogue shifted: page 2's first book repeats page 1's first
+            name = "page1_book_0" if book.name == "page2_book_0" else book.name
+            return {
+                "title": f"Book {name}",
+                "detail_url": f"https://books.toscrape.com/catalogue/{name}/index.html",
+            }
+
+        with (
+            patch("main.process_book_listing", side_effect=listing),
+            patch("main.extract_book_details", return_value={}),
+        ):
+            assert main(max_workers=4, max_pages=3) == 0
+
+        detail_calls = [
+            c for c in mock_fetcher_get.call_args_list if "index.html" in c.args[0]
+        ]
+        assert len(detail_calls) == 5
+        saved_titles = [book["title"] for book in mock_save_to_json.call_args[0][0]]
+        assert saved_titles.count("Book page1_book_0") == 1
+        assert len(saved_titles) == 5
+
+    def test_failed_detail_is_fetched_again_by_the_next_run(
+        self,
+        tmp_path,
+        mock_fetcher_get,
+        mock_save_to_json,
+        mock_logger,
+        mock_tqdm,
+        multi_page_response,
+    ):
+        """Test a kept frontier only skips books whose details were written."""
+        mock_fetcher_get.side_effect = lambda url, **kwargs: (
+            multi_page_response["first"]
+            if url == "https://books.toscrape.com/"
+            else MagicMock(status=200, url=url)
+        )
+
+        def listing(book, base_url):
+            return {
+                "title": f"Book {book.name}",
+                "detail_url": f"https://books.toscrape.com/{book.name}/index.html",
+            }
+
+        def details(page):
+            if "page1_book_0" in page.url:
+                raise ConnectionError("detail page failed")
+            return {"upc": page.url}
+
+        frontier_file = str(tmp_path / "frontier.sqlite3")
+        with (
+            patch("main.process_book_listing", side_effect=listing),
+            patch("main.extract_book_details", side_effect=details),
+        ):
+            assert main(max_pages=1, frontier_kind="sqlite") == 0
+            first = mock_save_to_json.call_args[0][0]
+            assert (
+                main(max_pages=1, frontier_kind="sqlite", frontier_file=frontier_file)
+                == 0
+            )
+            mock_fetcher_get.reset_mock()
+            assert (
+                main(max_pages=1, frontier_kind="sqlite", frontier_file=frontier_file)
+                == 0
+            )
+
+        # Without a frontier file nothing is kept between runs
+        assert len(first) == 2
+        detail_calls = [
+            c.args[0] for c in mock_fetcher_get.call_args_list if "index" in c.args[0]
+        ]
+        assert detail_calls == ["https://books.toscrape.com/page1_book_0/index.html"]
+
+
+class TestMainFunctionParsePool:
+    """Test parsing detail pages in worker processes."""
+
+    DETAIL_HTML = (
+        "<html><body><ul class='breadcrumb'><li><a>Home</a></li>"
+        "<li><a>Books</a></li><li><a>Poetry</a></li></ul>"
+        "<table class='table table-striped'><tr><th>UPC</th><td>{upc}</td></tr>"
+        "</table></body></html>"
+    )
+
+    @pytest.mark.parametrize("engine", ["thread", "async"])
+    def test_details_are_parsed_in_worker_processes(
+        self,
+        engine,
+        mock_fetcher_get,
+        mock_save_to_json,
+        mock_logger,
+        mock_tqdm,
+        multi_page_response,
+    ):
+        """Test the download workers fetch raw pages and the parse pool parses them."""
+
+        def listing_page(url):
+            if "page-2.html" in url:
+                return multi_page_response["page_2"]
+            if "page-3.html" in url:
+                return multi_page_response["page_3"]
+            return multi_page_response["first"]
+
+        def raw_detail(url, **kwargs):
+            upc = url.rsplit("/", 1)[-1]
+            body = self.DETAIL_HTML.format(upc=upc).encode()
+            return RawPage(url, 200 if upc != "page2_book_1" else 404, body)
+
+        async def async_get(url, **kwargs):
+            return listing_page(url)
+
+        async def async_get_raw(url, **kwargs):
+            return raw_detail(url)
+
+        mock_fetcher_get.side_effect = lambda url, **kwargs: listing_page(url)
+        with (
+            patch("main.Fetcher.get_raw", side_effect=raw_detail),
+            patch("main.AsyncFetcher.get", side_effect=async_get),
+            patch("main.AsyncFetcher.get_raw", side_effect=async_get_raw),
+            patch("main.process_book_listing") as mock_listing,
+        ):
+            mock_listing.side_effect = lambda book, base_url: {
+                "title": f"Book {book.name}",
+                "detail_url": f"https://example.com/{book.name}",
+            }
+
+            assert (
+                main(
+                    max_workers=4,
+                    max_pages=3,
+                    engine=engine,
+                    parse_workers=2,
+                    parse_batch_size=2,
+                )
+                == 0
+            )
+
+        saved_data = mock_save_to_json.call_args[0][0]
+        assert [book["title"] for book in saved_data] == [
+            f"Book page{page}_book_{i}" for page in range(1, 4) for i in range(2)
+        ]
+        for book in saved_data:
+            if book["title"] == "Book page2_book_1":
+                # A failed download keeps the listing data only
+                assert "upc" not in book
+            else:
+                assert book["upc"] == book["title"].removeprefix("Book ")
+                assert book["category"] == "Poetry"
+
+
+class TestMainFunctionDistributed:
+    """Test the coordinator and worker roles sharing a work queue."""
+
+    def test_workers_share_the_queue_and_coordinator_merges_shards(
+        self,
+        tmp_path,
+        mock_fetcher_get,
+        mock_save_to_json,
+        mock_logger,
+        mock_tqdm,
+        multi_page_response,
+    ):
+        """Test two workers split one crawl and the coordinator saves it in order."""
+        queue_file = str(tmp_path / "queue.sqlite3")
+
+        def mock_get_side_effect(url, **kwargs):
+            if url == "https://books.toscrape.com/":
+                return multi_page_response["first"]
+            if "page-2.html" in url:
+                return multi_page_response["page_2"]
+            if "page-3.html" in url:
+                return multi_page_response["page_3"]
+            return MagicMock(status=200)
+
+        mock_fetcher_get.side_effect = mock_get_side_effect
+
+        with (
+            patch("main.QUEUE_POLL_INTERVAL", 0.01),
+            patch("main.process_book_listing") as mock_listing,
+            patch("main.extract_book_details", return_value={"category": "Poetry"}),
+        ):
+            mock_listing.side_effect = lambda book, base_url: {
+                "title": f"Book {book.name}",
+                "detail_url": f"https://example.com/{book.name}",
+            }
+            work_queue = WorkQueue(queue_file, lease_seconds=0.01)
+            seed_work_queue(work_queue, "https://books.toscrape.com/", [1, 2, 3])
+
+            # The first worker dies holding a lease, the second does everything
+            (lost,) = work_queue.lease("w1")
+            run_id = work_queue.get_meta("run_id")
+            assert main(role="worker", queue_file=queue_file, worker_id="w2") == 0
+            mock_save_to_json.assert_not_called()
+
+            assert main(max_pages=3, role="coordinator", queue_file=queue_file) == 0
+
+        # The page w1 leased was re-issued to w2 once the lease expired
+        assert not work_queue.complete(lost, "w1")
+        saved_data = mock_save_to_json.call_args[0][0]
+        assert [book["title"] for book in saved_data] == [
+            f"Book page{page}_book_{i}" for page in range(1, 4) for i in range(2)
+        ]
+        assert all(book["category"] == "Poetry" for book in saved_data)
+        assert (tmp_path / f"books-{run_id}-w2.jsonl").exists()
+        work_queue.close()
+
+
+class TestMainFunctionSharding:
+    """Test static sharding by page range and shard index."""
+
+    @pytest.mark.parametrize("engine", ["thread", "async"])
+    def test_shard_crawls_only_its_pages(
+        self,
+        engine,
+        mock_fetcher_get,
+        mock_save_to_json,
+        mock_logger,
+        mock_tqdm,
+        multi_page_response,
+    ):
+        """Test shard 1 of 2 skips page 1 and 3 and names its output file."""
+
+        def listing_page(url):
+            if "page-2.html" in url:
+                return multi_page_response["page_2"]
+            if "page-3.html" in url:
+                return multi_page_response["page_3"]
+            if url == "https://books.toscrape.com/":
+                return multi_page_response["first"]
+            return MagicMock(status=200)
+
+        async def async_get(url, **kwargs):
+            return listing_page(url)
+
+        mock_fetcher_get.side_effect = lambda url, **kwargs: listing_page(url)
+        with (
+            patch("main.AsyncFetcher.get", side_effect=async_get) as mock_async_get,
+            patch("main.process_book_listing") as mock_listing,
+            patch("main.extract_book_details", return_value={}),
+        ):
+            mock_listing.side_effect = lambda book, base_url: {
+                "title": f"Book {book.name}",
+                "detail_url": f"https://example.com/{book.name}",
+            }
+
+            assert (
+                main(
+                    max_workers=2,
+                    engine=engine,
+                    page_range=(1, 3),
+                    shard_index=1,
+                    shard_count=2,
+                )
+                == 0
+            )
+
+        fetched = [c.args[0] for c in mock_fetcher_get.call_args_list]
+        fetched += [c.args[0] for c in mock_async_get.call_args_list]
+        assert not any("page-3.html" in url for url in fetched)
+        saved_data, filename = mock_save_to_json.call_args[0]
+        assert [book["title"] for book in saved_data] == [
+            "Book page2_book_0",
+            "Book page2_book_1",
+        ]
+        assert filename == "books-pages-1-3-shard-1-of-2.json"
+
+
+class TestMainFunctionByCategory:
+    """Test the category-parallel crawl mode."""
+
+    @staticmethod
+    def _page(url, body, status=200):
+        """Build a real scrapling response for a listing page."""
+        return Response(
+            url=url,
+            text=body,
+            body=body.encode(),
+            status=status,
+            reason="OK",
+            cookies={},
+            headers={},
+            request_headers={},
+        )
+
+    @staticmethod
+    def _listing_html(books, page_num=1, total_pages=1, sidebar=""):
+        """Listing markup with a pager, the given book slugs and a sidebar."""
+        items = "".join(
+            '<li class="col-xs-6 col-sm-4 col-md-3 col-lg-3"><article>'
+            f'<h3><a href="../../../{slug}/index.html" title="{slug}">x</a></h3>'
+            "</article></li>"
+            for slug in books
+        )
+        return (
+            f"<html><body>{sidebar}<ol>{items}</ol><ul class='pager'>"
+            f"<li class='current'>Page {page_num} of {total_pages}</li></ul>"
+            "</body></html>"
+        )
+
+    def test_categories_are_crawled_as_separate_chains(
+        self, mock_fetcher_get, mock_save_to_json, mock_logger, mock_tqdm
+    ):
+        """Test every category's pages are crawled and books keep their category."""
+        root = "https://books.toscrape.com/"
+        category = root + "catalogue/category/books/"
+        sidebar = (
+            "<div class='side_categories'><ul><li><a href='x'>Books</a><ul>"
+            "<li><a href='catalogue/category/books/travel_2/index.html'>Travel</a></li>"
+            "<li><a href='catalogue/category/books/poetry_23/index.html'>Poetry</a></li>"
+            "</ul></li></ul></div>"
+        )
+        pages = {
+            root: self._listing_html([], total_pages=50, sidebar=sidebar),
+            category + "travel_2/index.html": self._listing_html(["t1", "t2"], 1, 2),
+            category + "travel_2/page-2.html": self._listing_html(["t3"], 2, 2),
+            category + "poetry_23/index.html": self._listing_html(["p1"]),
+        }
+
+        def mock_get_side_effect(url, **kwargs):
+            if url in pages:
+                return self._page(url, pages[url])
+            return MagicMock(status=200)
+
+        mock_fetcher_get.side_effect = mock_get_side_effect
+
+        with patch(
+            "main.extract_book_details",
+            return_value={"category": "From breadcrumb", "upc": "u"},
+        ):
+            assert main(max_workers=4, max_pages=0, by_category=True) == 0
+
+        fetched = [c.args[0] for c in mock_fetcher_get.call_args_list]
+        assert not any("catalogue/page-2.html" in url for url in fetched)
+        saved_data = mock_save_to_json.call_args[0][0]
+        assert [(book["title"], book["category"]) for book in saved_data] == [
+            ("t1", "Travel"),
+            ("t2", "Travel"),
+            ("t3", "Travel"),
+            ("p1", "Poetry"),
+        ]
+        assert saved_data[0]["detail_url"] == (
+            "https://books.toscrape.com/catalogue/t1/index.html"
+        )
+
+    def test_page_crawl_options_are_ignored_with_a_warning(
+        self, mock_fetcher_get, mock_save_to_json, mock_logger, mock_tqdm
+    ):
+        """Test options of the page crawl are dropped and no parse pool starts."""
+        with (
+            patch("main.ParsePool") as parse_pool,
+            patch("main.iter_books", return_value=(b for b in [])) as iter_books,
+        ):
+            result = main(
+                max_pages=1,
+                by_category=True,
+                engine="async",
+                parse_workers=2,
+                listing_window=4,
+            )
+
+        assert result == 0
+        parse_pool.assert_not_called()
+        args = iter_books.call_args.args
+        assert (args[2], args[3], args[11]) == ("thread", 1, None)
+        warnings = [str(c) for c in mock_logger.warning.call_args_list]
+        assert any("don't apply with --by-category" in w for w in warnings)
+
+
+class TestMainFunctionResume:
+    """Test resuming an interrupted crawl from its checkpoint."""
+
+    @pytest.mark.parametrize("engine", ["thread", "async"])
+    def test_resume_skips_journaled_work(
+        self,
+        engine,
+        tmp_path,
+        mock_fetcher_get,
+        mock_save_to_json,
+        mock_logger,
+        mock_tqdm,
+        multi_page_response,
+    ):
+        """Test that journaled pages and books are restored, not fetched."""
+        checkpoint = tmp_path / "books.checkpoint.jsonl"
+        journal = CheckpointJournal(str(checkpoint))
+        for key, name in [((1, 0), "page1_book_0"), ((1, 1), "page1_book_1")]:
+            journal.record_book(
+                key,
+                {"title": f"Book {name}", "detail_url": f"https://example.com/{name}"},
+            )
+        journal.record_page(1)
+        journal.record_book(
+            (2, 0),
+            {
+                "title": "Book page2_book_0",
+                "detail_url": "https://example.com/page2_book_0",
+            },
+        )
+        journal.close()
+
+        def listing_page(url):
+            if "page-2.html" in url:
+                return multi_page_response["page_2"]
+            if "page-3.html" in url:
+                return multi_page_response["page_3"]
+            if url == "https://books.toscrape.com/":
+                return multi_page_response["first"]
+            return MagicMock(status=200)
+
+        async def async_get(url, **kwargs):
+            return listing_page(url)
+
+        mock_fetcher_get.side_effect = lambda url, **kwargs: listing_page(url)
+        with (
+            patch(
+                "main.get_output_path", side_effect=lambda name: str(tmp_path / name)
+            ),
+            patch("main.AsyncFetcher.get", side_effect=async_get) as mock_async_get,
+            patch("main.process_book_listing") as mock_listing,
+            patch("main.extract_book_details", return_value={}),
+        ):
+            mock_listing.side_effect = lambda book, base_url: {
+                "title": f"Book {book.name}",
+                "detail_url": f"https://example.com/{book.name}",
+            }
+
+            assert main(max_workers=2, max_pages=3, engine=engine, resume=True) == 0
+
+        fetched = [c.args[0] for c in mock_fetcher_get.call_args_list]
+        fetched += [c.args[0] for c in mock_async_get.call_args_list]
+        assert sorted(url for url in fetched if "example.com" in url) == [
+            "https://example.com/page2_book_1",
+            "https://example.com/page3_book_0",
+            "https://example.com/page3_book_1",
+        ]
+        saved_data, _ = mock_save_to_json.call_args[0]
+        assert [book["title"] for book in saved_data] == [
+            f"Book page{page}_book_{i}" for page in range(1, 4) for i in range(2)
+        ]
+        # The finished crawl leaves no checkpoint behind
+        assert not checkpoint.exists()
+
+
+class TestMainFunctionRevalidate:
+    """Test conditional GET between two runs."""
+
+    def test_unchanged_pages_reuse_the_stored_records(
+        self, tmp_path, mock_fetcher_get, mock_save_to_json, mock_logger, mock_tqdm
+    ):
+        """Test the second run sends validators and rebuilds the output from 304s."""
+        root = "https://books.toscrape.com/"
+        pages = {
+            root: TestMainFunctionByCategory._listing_html([], total_pages=2),
+            root + "catalogue/page-2.html": (
+                '<li class="col-xs-6 col-sm-4 col-md-3 col-lg-3"><article>'
+                '<h3><a href="a_1/index.html" title="A">x</a></h3></article></li>'
+            ),
+        }
+
+        def server(url, **kwargs):
+            if kwargs.get("headers", {}).get("If-None-Match") == '"v1"':
+                status, body = 304, ""
+            else:
+                status, body = 200, pages.get(url, "<html></html>")
+            return Response(
+                url=url,
+                text=body,
+                body=body.encode(),
+                status=status,
+                reason="OK",
+                cookies={},
+                headers={"etag": '"v1"'},
+                request_headers={},
+            )
+
+        mock_fetcher_get.side_effect = server
+        runs = []
+        for _ in range(2):
+            with patch(
+                "main.extract_book_details",
+                side_effect=lambda page: {"upc": page.url},
+            ) as mock_extract:
+                assert (
+                    main(
+                        max_workers=2,
+                        max_pages=2,
+                        revalidate=True,
+                        validators_file=str(tmp_path / "validators.sqlite3"),
+                    )
+                    == 0
+                )
+            runs.append((mock_save_to_json.call_args[0][0], mock_extract.call_count))
+
+        (first_books, first_parsed), (second_books, second_parsed) = runs
+        assert first_books == second_books
+        assert first_books[0]["upc"] == root + "catalogue/a_1/index.html"
+        assert (first_parsed, second_parsed) == (1, 0)
+        # Page 2 and the detail page were revalidated; the first page never is
+        assert conditional_requests.stats()["not_modified"] == 2
+        assert conditional_requests.stats()["hit_rate"] == 1.0
+
+
+class TestMainFunctionDetails:
+    """Test the listing-only and missing-details modes."""
+
+    @pytest.fixture
+    def listing_only_site(self, mock_fetcher_get, multi_page_response):
+        """Serve the three listing pages; detail pages are counted."""
+
+        def listing_page(url, **kwargs):
+            if "page-2.html" in url:
+                return multi_page_response["page_2"]
+            if "page-3.html" in url:
+                return multi_page_response["page_3"]
+            if url == "https://books.toscrape.com/":
+                return multi_page_response["first"]
+            return MagicMock(status=200)
+
+        mock_fetcher_get.side_effect = listing_page
+        with (
+            patch("main.process_book_listing") as mock_listing,
+            patch("main.extract_book_details", return_value={"upc": "fetched"}),
+        ):
+            mock_listing.side_effect = lambda book, base_url: {
+                "title": f"Book {book.name}",
+                "detail_url": f"https://example.com/{book.name}",
+            }
+            yield mock_fetcher_get
+
+    @staticmethod
+    def _detail_requests(mock_get):
+        return sorted(
+            c.args[0] for c in mock_get.call_args_list if "example.com" in c.args[0]
+        )
+
+    @pytest.mark.parametrize("engine", ["thread", "async"])
+    def test_details_none_only_fetches_listing_pages(
+        self, engine, listing_only_site, mock_save_to_json, mock_logger, mock_tqdm
+    ):
+        """Test a listing-only crawl sends no detail request."""
+        mock_async_get = AsyncMock(side_effect=listing_only_site.side_effect)
+        with patch("main.AsyncFetcher.get", new=mock_async_get):
+            assert main(max_workers=2, max_pages=3, engine=engine, details="none") == 0
+
+        assert self._detail_requests(listing_only_site) == []
+        assert self._detail_requests(mock_async_get) == []
+        saved_data = mock_save_to_json.call_args[0][0]
+        assert len(saved_data) == 6
+        assert all("upc" not in book for book in saved_data)
+
+    def test_details_missing_enriches_only_incomplete_records(
+        self, tmp_path, listing_only_site, mock_save_to_json, mock_logger, mock_tqdm
+    ):
+        """Test books enriched in the earlier output keep their details."""
+        earlier = [
+            {
+                "title": f"Book page{page}_book_{i}",
+                "detail_url": f"https://example.com/page{page}_book_{i}",
+                **({"upc": "earlier"} if page < 3 else {}),
+            }
+            for page in range(1, 4)
+            for i in range(2)
+        ]
+        (tmp_path / "books.json").write_text(json.dumps(earlier))
+
+        with patch(
+            "main.get_output_path", side_effect=lambda name: str(tmp_path / name)
+        ):
+            assert main(max_workers=2, max_pages=3, details="missing") == 0
+
+        assert self._detail_requests(listing_only_site) == [
+            "https://example.com/page3_book_0",
+            "https://example.com/page3_book_1",
+        ]
+        saved_data = mock_save_to_json.call_args[0][0]
+        assert [book["upc"] for book in saved_data] == ["earlier"] * 4 + ["fetched"] * 2
+
+    def test_details_missing_fails_on_a_truncated_output(
+        self, tmp_path, listing_only_site, mock_save_to_json, mock_logger, mock_tqdm
+    ):
+        """Test a corrupt earlier output is an error, not a traceback."""
+        (tmp_path / "books.json").write_text('[{"title": "Book page1_book_0"')
+
+        with (
+            patch(
+                "main.get_output_path", side_effect=lambda name: str(tmp_path / name)
+            ),
+            patch.object(frontier, "close", wraps=frontier.close) as mock_close,
+        ):
+            assert main(max_workers=2, max_pages=3, details="missing") == 1
+
+        listing_only_site.assert_not_called()
+        mock_save_to_json.assert_not_called()
+        mock_close.assert_called_with(persist=False)
+        assert (
+            "Failed to read the earlier output" in (mock_logger.error.call_args[0][0])
+        )
+        assert (tmp_path / "books.json").read_text() == '[{"title": "Book page1_book_0"'
+
+
+class TestIterBooks:
+    """Test the streaming library API."""
+
+    @pytest.mark.parametrize("engine", ["thread", "async"])
+    def test_books_stream_in_listing_order(
+        self, engine, mock_fetcher_get, multi_page_response, mock_logger, mock_tqdm
+    ):
+        """Test every book is yielded once, in listing order."""
+
+        def mock_get_side_effect(url, **kwargs):
+            if url == "https://books.toscrape.com/":
+                return multi_page_response["first"]
+            if "page-2.html" in url:
+                return multi_page_response["page_2"]
+            if "page-3.html" in url:
+                return multi_page_response["page_3"]
+            return MagicMock(status=200)
+
+        mock_fetcher_get.side_effect = mock_get_side_effect
+        with (
+            patch(
+                "main.AsyncFetcher.get", new=AsyncMock(side_effect=mock_get_side_effect)
+            ),
+            patch("main.process_book_listing") as mock_listing,
+            patch("main.extract_book_details", return_value={"upc": "x"}),
+        ):
+            mock_listing.side_effect = lambda book, base_url: {
+                "title": f"Book {book.name}",
+                "detail_url": f"https://example.com/{book.name}",
+            }
+            books = list(
+                iter_books(max_workers=3, max_pages=3, engine=engine, listing_window=0)
+            )
+
+        assert [book["title"] for book in books] == [
+            f"Book page{page}_book_{i}" for page in range(1, 4) for i in range(2)
+        ]
+
+    def test_stopping_early_shuts_the_crawl_down(
+        self, mock_fetcher_get, multi_page_response, mock_logger, mock_tqdm
+    ):
+        """Test a consumer can stop after the first book."""
+        mock_fetcher_get.return_value = multi_page_response["first"]
+        with (
+            patch("main.process_book_listing") as mock_listing,
+            patch("main.process_book_details", side_effect=lambda book_data: book_data),
+            patch("main.CrawlPool.shutdown") as mock_shutdown,
+        ):
+            mock_listing.side_effect = lambda book, base_url: {"title": book.name}
+            books = iter_books(max_workers=2, max_pages=1)
+            assert next(books) == {"title": "page1_book_0"}
+            books.close()
+
+        mock_shutdown.assert_called()
+
+    def test_repeated_crawls_leave_no_cleanup_callbacks(
+        self,
+        tmp_path,
+        mock_fetcher_get,
+        multi_page_response,
+        mock_save_to_json,
+        mock_logger,
+        mock_tqdm,
+    ):
+        """Test a finished or abandoned crawl unregisters its cleanup callbacks."""
+        mock_fetcher_get.return_value = multi_page_response["first"]
+        registered = list(shutdown_handler.cleanup_callbacks)
+        with (
+            patch("main.process_book_listing") as mock_listing,
+            patch("main.process_book_details", side_effect=lambda book_data: book_data),
+            patch("main.fetch_image", return_value=None),
+            patch(
+                "main.get_output_path", side_effect=lambda name: str(tmp_path / name)
+            ),
+        ):
+            mock_listing.side_effect = lambda book, base_url: {"title": book.name}
+            for by_category in (False, True):
+                assert list(iter_books(max_pages=1, by_category=by_category))
+            books = iter_books(max_pages=1)
+            next(books)
+            books.close()
+            for _ in range(2):
+                assert (
+                    main(
+                        max_pages=1,
+                        hedge_percentile=95,
+                        download_images=True,
+                        resume=True,
+                    )
+                    == 0
+                )
+
+        assert shutdown_handler.cleanup_callbacks == registered
+
+    def test_first_page_failure_raises(self, mock_fetcher_get, mock_logger):
+        """Test the crawl fails loudly when it can't count the pages."""
+        mock_fetcher_get.return_value = MagicMock(status=503)
+
+        with pytest.raises(FetchError, match="Status code: 503"):
+            next(iter_books())
+
+
+class TestMainFunctionBackpressure:
+    """Test listing pages are held back while the detail stage is full."""
+
+    @pytest.mark.parametrize("engine", ["thread", "async"])
+    def test_detail_high_water_holds_back_listing_pages(
+        self,
+        engine,
+        mock_fetcher_get,
+        multi_page_response,
+        mock_save_to_json,
+        mock_logger,
+        mock_tqdm,
+    ):
+        """Test a slow detail stage stalls the listing stage but loses nothing."""
+
+        def listing_page(url):
+            if url == "https://books.toscrape.com/":
+                return multi_page_response["first"]
+            if "page-2.html" in url:
+                return multi_page_response["page_2"]
+            if "page-3.html" in url:
+                return multi_page_response["page_3"]
+            return MagicMock(status=200)
+
+        in_flight = peak_in_flight = 0
+        lock = threading.Lock()
+
+        def track(change):
+            nonlocal in_flight, peak_in_flight
+            with lock:
+                in_flight += change
+                peak_in_flight = max(peak_in_flight, in_flight)
+
+        def slow_get(url, **kwargs):
+            if "example.com" in url:
+                track(1)
+                time.sleep(0.05)
+                track(-1)
+            return listing_page(url)
+
+        async def slow_async_get(url, **kwargs):
+            if "example.com" in url:
+                track(1)
+                await asyncio.sleep(0.05)
+                track(-1)
+            return listing_page(url)
+
+        mock_fetcher_get.side_effect = slow_get
+        with (
+            patch("main.AsyncFetcher.get", new=AsyncMock(side_effect=slow_async_get)),
+            patch("main.process_book_listing") as mock_listing,
+            patch("main.extract_book_details", return_value={"upc": "x"}),
+        ):
+            mock_listing.side_effect = lambda book, base_url: {
+                "title": f"Book {book.name}",
+                "detail_url": f"https://example.com/{book.name}",
+            }
+            assert (
+                main(max_workers=4, max_pages=3, engine=engine, detail_high_water=2)
+                == 0
+            )
+
+        stats = backpressure.stats()
+        assert stats["detail"]["stalls"] >= 1
+        # Detail jobs wait for a slot, even with four workers free
+        assert peak_in_flight <= 2
+        # At most one listing page of books past the mark
+        assert stats["detail"]["peak"] <= 4
+        saved_data = mock_save_to_json.call_args[0][0]
+        assert [book["title"] for book in saved_data] == [
+            f"Book page{page}_book_{i}" for page in range(1, 4) for i in range(2)
+        ]
+
+
+class TestMainFunctionDownloadImages:
+    """Test the cover download stage."""
+
+    def test_covers_are_stored_and_linked_from_the_records(
+        self,
+        tmp_path,
+        mock_fetcher_get,
+        multi_page_response,
+        mock_save_to_json,
+        mock_logger,
+        mock_tqdm,
+    ):
+        """Test each record gets the path of its content-addressed cover."""
+        mock_fetcher_get.return_value = multi_page_response["first"]
+
+        def get_raw(url, **kwargs):
+            # Both books share one placeholder cover
+            return RawPage(url, 200, b"placeholder cover")
+
+        with (
+            patch("main.Fetcher.get_raw", side_effect=get_raw) as mock_get_raw,
+            patch("main.process_book_listing") as mock_listing,
+            patch("main.process_book_details", side_effect=lambda book_data: book_data),
+            patch(
+                "main.get_output_path", side_effect=lambda name: str(tmp_path / name)
+            ),
+        ):
+            mock_listing.side_effect = lambda book, base_url: {
+                "title": f"Book {book.name}",
+                "image_url": f"https://books.toscrape.com/media/{book.name}.jpg",
+            }
+            assert main(max_pages=1, download_images=True, image_concurrency=2) == 0
+            assert mock_get_raw.call_count == 2
+
+            # A second run finds both URLs in the store
+            assert main(max_pages=1, download_images=True) == 0
+            assert mock_get_raw.call_count == 2
+
+        saved_data = mock_save_to_json.call_args[0][0]
+        paths = {book["image_path"] for book in saved_data}
+        assert len(paths) == 1
+        (path,) = paths
+        assert path.startswith(str(tmp_path / "images"))
+        with open(path, "rb") as f:
+            assert f.read() == b"placeholder cover"
+
+    def test_covers_and_hedges_get_connections_of_their_own(
+        self,
+        tmp_path,
+        mock_fetcher_get,
+        single_page_response,
+        mock_save_to_json,
+        mock_logger,
+        mock_tqdm,
+    ):
+        """Test the pool is sized for workers, hedges and cover downloads."""
+        mock_fetcher_get.return_value = single_page_response
+
+        with (
+            patch("main.Fetcher.configure_pool") as mock_configure_pool,
+            patch("main.process_book_details", side_effect=lambda book_data: book_data),
+            patch("main.fetch_image", return_value=None),
+            patch(
+                "main.get_output_path", side_effect=lambda name: str(tmp_path / name)
+            ),
+        ):
+            assert main(max_workers=3, max_pages=1) == 0
+            mock_configure_pool.assert_called_with(3)
+
+            assert (
+                main(
+                    max_workers=3,
+                    max_pages=1,
+                    hedge_percentile=95,
+                    download_images=True,
+                    image_concurrency=2,
+                )
+                == 0
+            )
+            # 3 primaries, up to 3 hedges and 2 cover downloads
+            mock_configure_pool.assert_called_with(8)
+
+
+class TestMainFunctionRecordReplay:
+    """Test how main sets up the record/replay archive."""
+
+    def test_missing_replay_archive_fails(
+        self, tmp_path, mock_fetcher_get, mock_logger
+    ):
+        """Test replaying an archive that doesn't exist fails before any request."""
+        assert main(max_pages=1, replay=str(tmp_path / "missing.warc.gz")) == 1
+        mock_fetcher_get.assert_not_called()
+
+    def test_replay_ignores_record_and_cache(
+        self,
+        tmp_path,
+        mock_fetcher_get,
+        single_page_response,
+        mock_save_to_json,
+        mock_logger,
+        mock_tqdm,
+    ):
+        """Test a replay neither records a new archive nor consults the cache."""
+        recorded = str(tmp_path / "run.warc.gz")
+        mock_fetcher_get.return_value = single_page_response
+        with patch(
+            "main.get_output_path", side_effect=lambda name: str(tmp_path / name)
+        ):
+            assert main(max_pages=1, record=recorded) == 0
+            assert (
+                main(
+                    max_pages=1,
+                    replay=recorded,
+                    record=str(tmp_path / "again.warc.gz"),
+                    cache=True,
+                    replay_latency="recorded",
+                )
+                == 0
+            )
+
+        assert not (tmp_path / "again.warc.gz").exists()
+        assert not (tmp_path / "cache.sqlite3").exists()
+        warnings = [str(c) for c in mock_logger.warning.call_args_list]
+        assert any("--record is ignored" in w for w in warnings)
+        assert any("--cache and --offline are ignored" in w for w in warnings)
@@ -2,10 +2,13 @@
 Comprehensive tests for the process_book_details function.
 """
 
-from unittest.mock import MagicMock, patch
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
 from requests.exceptions import ConnectionError, Timeout, HTTPError
+from scrapling.parser import Adaptor
 
-from main import process_book_details
+from main import async_process_book_details, extract_book_details, process_book_details
+from utils.hedging import Hedger
 
 
 class TestProcessBookDetailsSuccessScenarios:
@@ -1011,3 +1014,113 @@ class TestProcessBookDetailsErrorScenarios:
             ]
             mock_rows.append(mock_row)
         return mock_rows
+
+
+class TestExtractBookDetails:
+    """Test the parsing half of process_book_details on real markup."""
+
+    def test_extract_book_details_from_detail_page(self, mock_book_detail_page):
+        """Test extract_book_details reads the product table, description and category."""
+        page = Adaptor(text=mock_book_detail_page, url="https://books.toscrape.com/")
+
+        details = extract_book_details(page)
+
+        assert details["upc"] == "a897fe39b1053632"
+        assert details["product_type"] == "Books"
+        assert details["price_excl_tax"] == "£51.77"
+        assert details["availability"] == "In stock (22 available)"
+        assert details["number_of_reviews"] == "0"
+        assert details["description"].startswith("It's hard to imagine a world")
+        assert details["category"] == "Poetry"
+
+    def test_extract_book_details_empty_page(self):
+        """Test extract_book_details returns empty fields for a page without details."""
+        page = Adaptor(text="<html><body></body></html>")
+
+        details = extract_book_details(page)
+
+        assert details["upc"] == ""
+        assert details["description"] == ""
+        assert details["category"] == ""
+
+
+class TestAsyncProcessBookDetails:
+    """Test the asyncio variant of process_book_details."""
+
+    @patch("main.AsyncFetcher.get", new_callable=AsyncMock)
+    def test_async_process_book_details_success(self, mock_get, mock_book_detail_page):
+        """Test async detail processing merges the extracted details."""
+        mock_response = Adaptor(text=mock_book_detail_page)
+        mock_response.status = 200
+        mock_get.return_value = mock_response
+
+        book_data = {
+            "title": "A Light in the Attic",
+            "detail_url": "https://books.toscrape.com/catalogue/a-light-in-the-attic_1000/index.html",
+        }
+
+        result = asyncio.run(
+            async_process_book_details(book_data, asyncio.Semaphore(1))
+        )
+
+        assert result["upc"] == "a897fe39b1053632"
+        assert result["category"] == "Poetry"
+        mock_get.assert_awaited_once_with(
+            book_data["detail_url"], stealthy_headers=True
+        )
+
+    @patch("main.AsyncFetcher.get", new_callable=AsyncMock)
+    def test_async_process_book_details_failures(self, mock_get):
+        """Test async detail processing keeps the listing data on failures."""
+        book_data = {
+            "title": "Failing Book",
+            "detail_url": "https://books.toscrape.com/catalogue/failing_1/index.html",
+        }
+
+        mock_get.return_value = MagicMock(status=503)
+        result = asyncio.run(
+            async_process_book_details(dict(book_data), asyncio.Semaphore(1))
+        )
+        assert result == book_data
+
+        mock_get.side_effect = ConnectionError("Network unreachable")
+        result = asyncio.run(
+            async_process_book_details(dict(book_data), asyncio.Semaphore(1))
+        )
+        assert result == book_data
+
+    def test_async_process_book_details_without_url(self):
+        """Test async detail processing skips books without a detail URL."""
+        book_data = {"title": "No URL"}
+
+        result = asyncio.run(
+            async_process_book_details(book_data, asyncio.Semaphore(1))
+        )
+
+        assert result == book_data
+
+
+class TestProcessBookDetailsHedging:
+    """Test detail fetches routed through a hedger."""
+
+    @patch("main.Fetcher.get")
+    def test_process_book_details_uses_hedger(self, mock_get, mock_book_detail_page):
+        """Test the detail request is sent through the hedger when one is given."""
+        mock_response = Adaptor(text=mock_book_detail_page)
+        mock_response.status = 200
+        mock_get.return_value = mock_response
+
+        hedger = Hedger(min_samples=1)
+        try:
+            result = process_book_details(
+                {"title": "Hedged", "detail_url": "https://example.com/hedged"},
+                hedger=hedger,
+            )
+        finally:
+            hedger.shutdown()
+
+        assert result["upc"] == "a897fe39b1053632"
+        assert hedger.stats()["requests"] == 1
+        mock_get.assert_called_once_with(
+            "https://example.com/hedged", stealthy_headers=True
+        )
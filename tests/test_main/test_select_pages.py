@@ -0,0 +1,80 @@
+"""
+Tests for static sharding: select_pages, get_output_filename and parse_page_range.
+"""
+
+import argparse
+
+import pytest
+
+from main import get_output_filename, parse_page_range, select_pages
+
+
+class TestSelectPages:
+    """Test which listing pages a shard crawls."""
+
+    def test_defaults_select_every_page(self):
+        """Test that one shard without a range crawls the whole catalogue."""
+        assert select_pages(5) == [1, 2, 3, 4, 5]
+
+    def test_shards_split_pages_without_overlap(self):
+        """Test that the shards together cover each page exactly once."""
+        shards = [select_pages(50, shard_index=i, shard_count=4) for i in range(4)]
+
+        assert shards[0] == list(range(1, 51, 4))
+        assert sorted(page for shard in shards for page in shard) == list(range(1, 51))
+
+    def test_assignment_is_deterministic(self):
+        """Test that a restarted shard gets the same pages."""
+        assert select_pages(50, (11, 30), 2, 3) == select_pages(50, (11, 30), 2, 3)
+
+    def test_page_range_is_clamped_to_the_catalogue(self):
+        """Test that a range past the last page stops at the last page."""
+        assert select_pages(50, page_range=(48, 60)) == [48, 49, 50]
+
+    def test_range_and_shard_combined(self):
+        """Test that the range is cut first and then dealt over the shards."""
+        assert select_pages(50, (10, 20), shard_index=1, shard_count=2) == [
+            10,
+            12,
+            14,
+            16,
+            18,
+            20,
+        ]
+
+    @pytest.mark.parametrize("shard_index, shard_count", [(2, 2), (-1, 2), (0, 0)])
+    def test_invalid_shard_raises(self, shard_index, shard_count):
+        """Test that an index outside the shard count is rejected."""
+        with pytest.raises(ValueError):
+            select_pages(50, shard_index=shard_index, shard_count=shard_count)
+
+
+class TestGetOutputFilename:
+    """Test that every shard writes its own output file."""
+
+    def test_full_crawl_keeps_books_json(self):
+        """Test the default name is unchanged."""
+        assert get_output_filename() == "books.json"
+
+    def test_range_and_shard_are_in_the_name(self):
+        """Test the name identifies the range and the shard."""
+        assert get_output_filename((1, 10)) == "books-pages-1-10.json"
+        assert get_output_filename(None, 0, 4) == "books-shard-0-of-4.json"
+        assert (
+            get_output_filename((1, 10), 3, 4) == "books-pages-1-10-shard-3-of-4.json"
+        )
+
+
+class TestParsePageRange:
+    """Test the --page-range argument type."""
+
+    def test_valid_range(self):
+        """Test START-END parses into a tuple."""
+        assert parse_page_range("11-20") == (11, 20)
+        assert parse_page_range("5-5") == (5, 5)
+
+    @pytest.mark.parametrize("value", ["10", "0-5", "20-10", "a-b", "1-2-3"])
+    def test_invalid_range(self, value):
+        """Test malformed or empty ranges are rejected."""
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_page_range(value)
@@ -0,0 +1,88 @@
+"""Tests for the end-to-end benchmark harness."""
+
+import json
+
+from scripts.benchmark import compare, main, median_metrics, run_case
+
+
+def result(books_per_second, peak_rss_mb=100.0, name="threads=5 pages=5"):
+    metrics = {
+        "books_per_second": books_per_second,
+        "requests_per_second": books_per_second * 1.05,
+        "p50_ms": 10.0,
+        "p95_ms": 20.0,
+        "p99_ms": 30.0,
+        "peak_rss_mb": peak_rss_mb,
+        "cpu_seconds": 1.0,
+    }
+    return {"cases": [{"name": name, "params": {}, "metrics": metrics}]}
+
+
+def test_compare_flags_regressions_beyond_the_tolerance():
+    """Test less throughput or more memory than the baseline is a regression."""
+    baseline = result(100.0)
+
+    table, regressions = compare(result(95.0), baseline, tolerance=10)
+    assert regressions == []
+    assert "95.0 (-5%)" in table
+
+    table, regressions = compare(result(80.0, peak_rss_mb=150.0), baseline, 10)
+    assert "80.0 (-20%) !" in table
+    assert len(regressions) == 3  # books/s, req/s and RSS
+    assert any("RSS MB" in regression for regression in regressions)
+
+
+def test_compare_marks_cases_missing_from_the_baseline():
+    """Test a case the baseline doesn't have is shown as new, never a regression."""
+    table, regressions = compare(result(50.0, name="other"), result(100.0))
+
+    assert "50.0 (new)" in table
+    assert regressions == []
+
+
+def test_median_of_repeated_runs():
+    """Test numeric metrics are reduced to their median, others kept."""
+    runs = [
+        {"books_per_second": value, "server_statuses": {"200": 1}}
+        for value in (3.0, 1.0, 2.0)
+    ]
+
+    assert median_metrics(runs) == {
+        "books_per_second": 2.0,
+        "server_statuses": {"200": 1},
+    }
+
+
+def test_run_case_measures_a_crawl_of_the_stand_in():
+    """Test a real crawl in a child process reports its throughput and resources."""
+    params = {"threads": 2, "pages": 1, "latency": "fixed:0", "engine": "thread"}
+
+    metrics = run_case(params, books_per_page=5)
+
+    assert metrics["books"] == 5
+    assert metrics["requests"] == 6
+    assert metrics["books_per_second"] > 0
+    assert 0 < metrics["p50_ms"] <= metrics["p95_ms"] <= metrics["p99_ms"]
+    assert metrics["peak_rss_mb"] > 0
+    assert metrics["cpu_seconds"] > 0
+    assert metrics["server_statuses"] == {"200": 6}
+
+
+def test_cli_writes_results_and_fails_on_regression(tmp_path, capsys):
+    """Test the results file, the baseline round trip and the exit status."""
+    output = tmp_path / "results.json"
+    baseline = tmp_path / "baseline.json"
+    args = ["--threads", "2", "--pages", "1", "--latency", "0", "--books-per-page", "5"]
+    args += ["--output", str(output), "--baseline", str(baseline)]
+
+    assert main(args + ["--save-baseline"]) == 0
+    saved = json.loads(baseline.read_text())
+    assert saved == json.loads(output.read_text())
+    assert saved["cases"][0]["name"] == (
+        "threads=2 pages=1 latency=fixed:0 engine=thread"
+    )
+
+    saved["cases"][0]["metrics"]["books_per_second"] *= 1000
+    baseline.write_text(json.dumps(saved))
+    assert main(args + ["--fail-on-regression"]) == 1
+    assert "regression(s)" in capsys.readouterr().out
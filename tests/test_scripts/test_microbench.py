@@ -0,0 +1,67 @@
+"""Tests for the micro-benchmarks of the extraction hot paths."""
+
+import json
+
+from scripts.microbench import build_cases, compare, main, measure
+
+
+def test_every_case_extracts_real_data():
+    """Test the benchmarked calls work on their inputs instead of failing fast."""
+    results = {name: call() for name, call in build_cases().items()}
+
+    assert results["extract_star_rating[fixture]"] == 4
+    assert results["get_total_pages[fixture]"] == 10
+    assert results["get_total_pages[1000 books]"] == 1
+    assert len(results["parse_page_books[1000 books]"]) == 1000
+    assert results["process_book_listing[generated]"]["detail_url"]
+    assert results["extract_book_details[fixture]"]["upc"]
+    assert results["parse_detail_batch[generated]"][0]["upc"]
+
+
+def test_measure_reports_time_and_allocations():
+    """Test a call's time and the memory it allocates are both measured."""
+    metrics = measure(lambda: [0] * 100_000, min_time=0.01, repeat=2)
+
+    assert metrics["ns_per_call"] > 0
+    assert metrics["calls"] >= 2
+    # A list of 100k pointers, freed once the call returns
+    assert metrics["peak_bytes"] >= 800_000
+    assert metrics["retained_bytes"] < 800_000
+
+
+def test_compare_fails_slower_or_hungrier_cases():
+    """Test time and peak memory growth beyond the threshold are regressions."""
+    baseline = {
+        "cases": {
+            "a": {"ns_per_call": 1000, "peak_bytes": 1024, "retained_bytes": 0},
+            "b": {"ns_per_call": 1000, "peak_bytes": 1024, "retained_bytes": 0},
+        }
+    }
+    results = {
+        "cases": {
+            "a": {"ns_per_call": 1100, "peak_bytes": 2048, "retained_bytes": 0},
+            "b": {"ns_per_call": 2000, "peak_bytes": 1024, "retained_bytes": 0},
+            "c": {"ns_per_call": 5000, "peak_bytes": 1024, "retained_bytes": 0},
+        }
+    }
+
+    table, regressions = compare(results, baseline, threshold=25)
+
+    assert regressions == ["a: peak memory +100%", "b: time +100%"]
+    assert "| c | 5.00 | new |" in table
+
+
+def test_cli_exits_non_zero_on_regression(tmp_path, capsys):
+    """Test the run fails against a faster baseline and passes after saving one."""
+    baseline = tmp_path / "baseline.json"
+    args = ["--filter", "extract_star_rating[fixture]", "--min-time", "0.01"]
+    args += ["--repeat", "1", "--baseline", str(baseline)]
+
+    assert main(args + ["--save-baseline"]) == 0
+    stored = json.loads(baseline.read_text())
+    assert list(stored["cases"]) == ["extract_star_rating[fixture]"]
+
+    stored["cases"]["extract_star_rating[fixture]"]["ns_per_call"] /= 100
+    baseline.write_text(json.dumps(stored))
+    assert main(args + ["--threshold", "50"]) == 1
+    assert "1 regression(s) beyond 50%" in capsys.readouterr().out
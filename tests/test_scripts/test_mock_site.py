@@ -0,0 +1,181 @@
+"""Tests for the local books.toscrape.com stand-in."""
+
+import json
+import os
+import random
+import signal
+from unittest.mock import patch
+
+import httpx
+import pytest
+from scrapling.parser import Adaptor
+
+import main
+from scripts.mock_site import RATINGS, Catalogue, LatencyModel, MockSite
+from utils.signal_handler import shutdown_handler
+from utils.sink import JsonArraySink
+
+
+def parse(body):
+    return Adaptor(body.decode("utf-8"), url="http://127.0.0.1/")
+
+
+def test_catalogue_is_deterministic_and_paginated():
+    """Test the same seed builds the same books, split into listing pages."""
+    catalogue = Catalogue(books=45, per_page=20, categories=3, seed=7)
+
+    assert catalogue.pages == 3
+    assert [b.slug for b in catalogue.books] == [
+        b.slug for b in Catalogue(books=45, per_page=20, categories=3, seed=7).books
+    ]
+    assert catalogue.books[0].slug.endswith("_45")
+    assert catalogue.resolve("/catalogue/page-3.html") is not None
+    assert catalogue.resolve("/catalogue/page-4.html") is None
+    assert catalogue.resolve("/catalogue/unknown_1/index.html") is None
+
+
+def test_pages_parse_with_the_scraper_functions():
+    """Test listing, category and detail pages have the markup main expects."""
+    catalogue = Catalogue(books=45, per_page=20, categories=3)
+    base_url = "http://127.0.0.1/"
+    home = parse(catalogue.resolve("/")[1])
+
+    books = main.parse_page_books(home, 1, base_url)
+    assert len(books) == 20
+    assert main.get_total_pages(home, base_url) == 3
+    assert [name for name, _ in main.discover_categories(home, base_url)] == [
+        "Travel",
+        "Mystery",
+        "Historical Fiction",
+    ]
+    first = catalogue.books[0]
+    assert books[0] == {
+        "title": first.title,
+        "price": first.price,
+        "stock_available": "In stock",
+        "star_rating": RATINGS.index(first.rating) + 1,
+        "image_url": base_url + first.image_path,
+        "detail_url": f"{base_url}catalogue/{first.slug}/index.html",
+    }
+
+    page_2 = parse(catalogue.resolve("/catalogue/page-2.html")[1])
+    assert main.parse_page_books(page_2, 2, base_url)[0]["detail_url"] == (
+        f"{base_url}catalogue/{catalogue.books[20].slug}/index.html"
+    )
+
+    category_url = f"{base_url}catalogue/category/books/travel_2/index.html"
+    category = parse(
+        catalogue.resolve("/catalogue/category/books/travel_2/index.html")[1]
+    )
+    listed = main.parse_page_books(category, 1, category_url)
+    assert len(listed) == len(catalogue.by_category[0])
+
+    detail = main.extract_book_details(
+        parse(catalogue.resolve(f"/catalogue/{first.slug}/index.html")[1])
+    )
+    assert detail["upc"] == first.upc
+    assert detail["availability"] == first.availability
+    assert detail["category"] == catalogue.categories[first.category][0]
+    assert detail["description"] == first.description
+
+
+def test_latency_specs():
+    """Test latency specs parse into distributions with non-negative draws."""
+    rng = random.Random(0)
+    assert LatencyModel.parse("0.25").sample(rng) == 0.25
+    assert 0.1 <= LatencyModel.parse("uniform:0.1,0.2").sample(rng) <= 0.2
+    for spec in ("normal:0.05,1", "lognormal:0.05,0.5", "exponential:0.05"):
+        assert all(LatencyModel.parse(spec).sample(rng) >= 0 for _ in range(50))
+    assert str(LatencyModel.parse("lognormal:0.05,0.5")) == "lognormal:0.05,0.5"
+    for spec in ("pareto:1", "uniform:0.1", "fixed:-1", "fixed:abc"):
+        with pytest.raises(ValueError):
+            LatencyModel.parse(spec)
+
+
+def test_injected_faults():
+    """Test throttling, server errors and connection resets."""
+    catalogue = Catalogue(books=5)
+    with MockSite(catalogue, throttle_rate=1.0) as site:
+        throttled = httpx.get(site.url)
+    with MockSite(catalogue, error_rate=1.0) as site:
+        failed = httpx.get(site.url)
+    with MockSite(catalogue, reset_rate=1.0) as site:
+        with pytest.raises(httpx.TransportError):
+            httpx.get(site.url)
+        assert site.stats()["statuses"] == {"reset": 1}
+
+    assert throttled.status_code == 429
+    assert throttled.headers["Retry-After"] == "1"
+    assert failed.status_code in (500, 502, 503)
+
+
+def test_rate_throttling_and_etags():
+    """Test requests over the rate are answered 429 and validators get 304."""
+    with MockSite(Catalogue(books=5), throttle_rps=2) as site:
+        with httpx.Client() as client:
+            statuses = [client.get(site.url).status_code for _ in range(4)]
+
+    assert statuses[:2] == [200, 200]
+    assert 429 in statuses[2:]
+
+    with MockSite(Catalogue(books=5)) as site:
+        first = httpx.get(site.url)
+        revalidated = httpx.get(
+            site.url, headers={"If-None-Match": first.headers["ETag"]}
+        )
+    assert revalidated.status_code == 304
+
+
+def test_main_crawls_the_mock_site_through_faults(tmp_path):
+    """Test an unmocked crawl collects every book despite errors and resets."""
+    catalogue = Catalogue(books=60, per_page=20, categories=4)
+    with (
+        MockSite(catalogue, error_rate=0.05, reset_rate=0.02, seed=3) as site,
+        patch("main.get_output_path", side_effect=lambda name: str(tmp_path / name)),
+    ):
+        assert main.main(max_workers=4, max_pages=3, base_url=site.url.rstrip("/")) == 0
+        stats = site.stats()
+
+    with open(tmp_path / "books.json", encoding="utf-8") as f:
+        books = json.load(f)
+    assert [book["title"] for book in books] == [b.title for b in catalogue.books]
+    assert all(book["upc"] for book in books)
+    assert stats["requests"] >= 63
+
+
+@pytest.fixture
+def signal_state():
+    """Restore the signal handlers and the shutdown flag a run leaves behind."""
+    handlers = {sig: signal.getsignal(sig) for sig in (signal.SIGTERM, signal.SIGINT)}
+    yield shutdown_handler
+    shutdown_handler.shutdown_event.clear()
+    shutdown_handler.is_shutting_down = False
+    for sig, handler in handlers.items():
+        signal.signal(sig, handler)
+
+
+def test_sigterm_saves_the_books_streamed_so_far(tmp_path, signal_state):
+    """Test a run stopped by a real SIGTERM still writes its partial output."""
+    catalogue = Catalogue(books=60, per_page=20, categories=4)
+    write = JsonArraySink.write
+
+    def write_then_signal(sink, book):
+        write(sink, book)
+        if sink.count == 5:
+            os.kill(os.getpid(), signal.SIGTERM)
+
+    with (
+        MockSite(catalogue, seed=3) as site,
+        patch("main.get_output_path", side_effect=lambda name: str(tmp_path / name)),
+        patch.object(JsonArraySink, "write", write_then_signal),
+    ):
+        assert main.main(max_workers=2, max_pages=3, base_url=site.url.rstrip("/")) == 0
+
+    assert signal_state.is_shutdown_requested()
+    with open(tmp_path / "books.json", encoding="utf-8") as f:
+        books = json.load(f)
+    assert 5 <= len(books) < len(catalogue.books)
+    assert [book["title"] for book in books[:5]] == [
+        b.title for b in catalogue.books[:5]
+    ]
+    assert not (tmp_path / "books.json.tmp").exists()
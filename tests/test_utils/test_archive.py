@@ -0,0 +1,121 @@
+"""Tests for the record/replay crawl archive."""
+
+import gzip
+import time
+
+from utils.archive import (
+    TRAILER_SIZE,
+    ArchiveReader,
+    ArchiveWriter,
+    CrawlArchive,
+)
+
+URL = "https://books.toscrape.com/catalogue/page-2.html"
+
+
+def record(path, exchanges):
+    writer = ArchiveWriter(str(path))
+    for url, status, body in exchanges:
+        writer.write(
+            url,
+            {"User-Agent": "test"},
+            status,
+            "OK",
+            {"Content-Type": "text/html", "Content-Encoding": "gzip"},
+            body,
+            elapsed=0.25,
+        )
+    writer.close()
+
+
+def test_recorded_responses_are_replayed(tmp_path):
+    """Test a response comes back with its status, headers, body and timing."""
+    path = tmp_path / "run.warc.gz"
+    record(path, [(URL, 200, b"<html>page 2</html>"), (URL + "?x", 200, b"x")])
+
+    reader = ArchiveReader(str(path))
+    archived = reader.get(URL)
+
+    assert len(reader) == 2
+    assert (archived.status, archived.body) == (200, b"<html>page 2</html>")
+    assert archived.url == URL
+    assert archived.elapsed == 0.25
+    # The stored body is decoded, so the encoding header would be wrong
+    assert archived.headers == {"Content-Type": "text/html"}
+    assert reader.get(URL + "?missing") is None
+
+
+def test_archive_is_a_valid_gzip_stream_of_warc_records(tmp_path):
+    """Test the archive decompresses as a whole into request and response records."""
+    path = tmp_path / "run.warc.gz"
+    record(path, [(URL, 200, b"<html>page 2</html>")])
+
+    content = gzip.decompress(path.read_bytes()).decode("utf-8")
+
+    assert content.startswith("WARC/1.1\r\nWARC-Type: request\r\n")
+    assert "WARC-Type: response" in content
+    assert "GET /catalogue/page-2.html HTTP/1.1\r\nHost: books.toscrape.com" in content
+    assert "HTTP/1.1 200 OK\r\n" in content
+    assert content.count("WARC/1.1") == 4  # request, response, index, trailer
+
+
+def test_repeated_requests_replay_in_recorded_order(tmp_path):
+    """Test a retried request replays its responses in turn, then the last one."""
+    path = tmp_path / "run.warc.gz"
+    record(path, [(URL, 503, b"busy"), (URL, 200, b"page")])
+
+    reader = ArchiveReader(str(path))
+
+    assert [reader.get(URL).status for _ in range(3)] == [503, 200, 200]
+
+
+def test_archive_without_index_is_scanned(tmp_path):
+    """Test an archive cut off before its index is still replayable."""
+    path = tmp_path / "run.warc.gz"
+    record(path, [(URL, 200, b"page 2"), (URL + "?x", 200, b"x")])
+    data = path.read_bytes()
+    # Drop the trailer and the index, and leave half of a record behind
+    path.write_bytes(data[: -TRAILER_SIZE - 40])
+
+    reader = ArchiveReader(str(path))
+
+    assert reader.get(URL).body == b"page 2"
+    assert reader.get(URL + "?x").body == b"x"
+
+
+def test_replay_simulates_latency_and_answers_misses_404(tmp_path):
+    """Test fixed and recorded latencies, and a request that wasn't recorded."""
+    path = tmp_path / "run.warc.gz"
+    record(path, [(URL, 200, b"page 2")])
+    archive = CrawlArchive()
+
+    archive.reset(replay=str(path))
+    assert archive.replay(URL)[1] == 0.0
+    archive.reset(replay=str(path), latency="0.05")
+    assert archive.replay(URL)[1] == 0.05
+    archive.reset(replay=str(path), latency="recorded")
+    response, delay = archive.replay(URL)
+    missing, _ = archive.replay(URL + "?missing")
+
+    assert (response.status, delay) == (200, 0.25)
+    assert missing.status == 404
+    assert archive.stats() == {"recorded": 0, "replayed": 1, "missing": 1}
+    archive.close()
+
+
+def test_crawl_archive_records_until_closed(tmp_path):
+    """Test the recorded archive is finished on close and readable afterwards."""
+    path = tmp_path / "run.warc.gz"
+    archive = CrawlArchive()
+    archive.reset(record=str(path))
+    start = time.perf_counter()
+    archive.record(URL, {}, 200, "OK", {}, b"page 2", time.perf_counter() - start)
+
+    assert archive.recording and not archive.replaying
+    assert archive.stats()["recorded"] == 1
+    archive.close()
+    # Closing twice, or recording after close, is harmless
+    archive.close()
+    archive.record(URL, {}, 200, "OK", {}, b"late")
+
+    assert ArchiveReader(str(path)).get(URL).body == b"page 2"
@@ -0,0 +1,98 @@
+"""Tests for the backpressure between crawl stages."""
+
+import threading
+
+from utils.backpressure import Backpressure, default_detail_high_water
+
+
+def test_full_stage_holds_back_listing_pages():
+    """Test a stage at its high-water mark blocks new listing pages."""
+    backpressure = Backpressure(detail_high_water=10, output_high_water=100)
+
+    assert backpressure.admit(listing=1, detail=9, output=0)
+    assert not backpressure.admit(listing=1, detail=10, output=0)
+    assert not backpressure.admit(listing=0, detail=12, output=0)
+    assert backpressure.admit(listing=0, detail=3, output=0)
+    assert not backpressure.admit(listing=1, detail=0, output=100)
+
+    stats = backpressure.stats()
+    assert stats["detail"] == {"depth": 0, "peak": 12, "high_water": 10, "stalls": 1}
+    assert stats["output"]["stalls"] == 1
+    assert stats["listing"]["peak"] == 1
+
+
+def test_stall_counts_episodes_not_checks():
+    """Test repeated checks while blocked count as one stall."""
+    backpressure = Backpressure(detail_high_water=5)
+
+    for _ in range(3):
+        assert not backpressure.admit(listing=0, detail=5, output=0)
+    backpressure.admit(listing=0, detail=1, output=0)
+    backpressure.admit(listing=0, detail=5, output=0)
+
+    assert backpressure.stats()["detail"]["stalls"] == 2
+
+
+def test_nothing_in_flight_always_admits():
+    """Test a full output stage can't stall a crawl with nothing to drain it."""
+    backpressure = Backpressure(output_high_water=10)
+
+    assert backpressure.admit(listing=0, detail=0, output=50)
+
+
+def test_unbounded_stages_never_block():
+    """Test a high-water mark of 0 leaves the stage unbounded."""
+    backpressure = Backpressure()
+
+    assert backpressure.admit(listing=30, detail=10_000, output=10_000)
+
+
+def test_default_detail_high_water():
+    """Test the default covers the workers and at least two listing pages."""
+    assert default_detail_high_water(2) == 40
+    assert default_detail_high_water(50) == 200
+
+
+def test_detail_slots_block_the_producer_until_released():
+    """Test the detail stage is a bounded queue the producer waits on."""
+    backpressure = Backpressure(detail_high_water=2, output_high_water=0)
+    first = backpressure.detail_slot()
+    second = backpressure.detail_slot()
+    assert first is not None and second is not None
+
+    waiting = threading.Event()
+    third = []
+
+    def producer():
+        waiting.set()
+        third.append(backpressure.detail_slot())
+
+    thread = threading.Thread(target=producer)
+    thread.start()
+    waiting.wait()
+    thread.join(0.2)
+    assert thread.is_alive()
+
+    first()
+    thread.join(1)
+    assert third and third[0] is not None
+    assert backpressure.stats()["detail"]["stalls"] == 1
+    assert backpressure.stats()["detail"]["peak"] == 2
+
+
+def test_detail_slot_wait_ends_on_stop():
+    """Test a producer waiting for a slot gives up once told to stop."""
+    backpressure = Backpressure(detail_high_water=1, output_high_water=0)
+    assert backpressure.detail_slot() is not None
+
+    assert backpressure.detail_slot(stop=lambda: True, poll=0.01) is None
+
+
+def test_unbounded_detail_stage_never_waits():
+    """Test a zero high-water mark hands out slots without limit."""
+    backpressure = Backpressure(detail_high_water=0, output_high_water=0)
+
+    releases = [backpressure.detail_slot() for _ in range(100)]
+
+    assert all(release is not None for release in releases)
+    assert backpressure.stats()["detail"]["stalls"] == 0
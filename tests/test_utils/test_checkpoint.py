@@ -0,0 +1,56 @@
+"""Tests for the checkpoint journal of resumable crawls."""
+
+import os
+
+from utils.checkpoint import CheckpointJournal
+
+
+def book(name):
+    return {"title": name, "detail_url": f"https://books.toscrape.com/{name}/"}
+
+
+def test_journal_batches_writes(tmp_path):
+    """Test that entries are written a batch at a time."""
+    path = str(tmp_path / "books.checkpoint.jsonl")
+    journal = CheckpointJournal(path, flush_every=3, flush_interval=60.0)
+
+    journal.record_book((1, 0), book("a"))
+    journal.record_book((1, 1), book("b"))
+    assert not os.path.exists(path)
+
+    journal.record_page(1)
+    assert journal.writes == 1
+    journal.close()
+
+
+def test_journal_restores_pages_and_books(tmp_path):
+    """Test that a new run sees what the interrupted run journaled."""
+    path = str(tmp_path / "books.checkpoint.jsonl")
+    journal = CheckpointJournal(path)
+    journal.record_book((1, 0), book("a"))
+    journal.record_page(1)
+    journal.record_book((2, 1), book("b"))
+    journal.close()
+    # The batch that was being written when the process died
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"type": "book", "url": "https://books.to')
+
+    resumed = CheckpointJournal(path)
+    resumed.load()
+
+    assert resumed.completed_pages == {1}
+    assert resumed.has_book("https://books.toscrape.com/b/")
+    assert not resumed.has_book("https://books.toscrape.com/c/")
+    assert resumed.restored_books() == {(1, 0): book("a"), (2, 1): book("b")}
+
+
+def test_journal_remove_deletes_the_file(tmp_path):
+    """Test that a completed crawl leaves no checkpoint behind."""
+    path = str(tmp_path / "books.checkpoint.jsonl")
+    journal = CheckpointJournal(path)
+    journal.record_page(1)
+
+    journal.remove()
+
+    assert not os.path.exists(path)
+    journal.remove()
@@ -0,0 +1,144 @@
+"""Tests for the adaptive concurrency limiter."""
+
+import asyncio
+import threading
+import time
+
+from utils.concurrency import AdaptiveLimiter
+
+
+def _respond(limiter, status, count=1):
+    """Send ``count`` responses with ``status`` through the limiter."""
+    for _ in range(count):
+        with limiter.slot() as slot:
+            slot.status = status
+
+
+def test_limit_grows_while_responses_are_healthy():
+    """Test that the limit increases by one per window of healthy responses."""
+    limiter = AdaptiveLimiter(max_limit=8, initial_limit=2)
+
+    _respond(limiter, 200, count=2)
+    assert limiter.limit == 3
+
+    _respond(limiter, 200, count=3)
+    assert limiter.limit == 4
+
+
+def test_limit_never_exceeds_the_ceiling():
+    """Test that the limit stops growing at ``max_limit``."""
+    limiter = AdaptiveLimiter(max_limit=3, initial_limit=3)
+
+    _respond(limiter, 200, count=20)
+
+    assert limiter.limit == 3
+
+
+def test_limit_halves_on_throttling_and_server_errors():
+    """Test that 429 and 5xx responses back off multiplicatively."""
+    limiter = AdaptiveLimiter(max_limit=16, initial_limit=16)
+
+    _respond(limiter, 429)
+    assert limiter.limit == 8
+
+    _respond(limiter, 503)
+    assert limiter.limit == 4
+
+
+def test_exception_counts_as_failure():
+    """Test that a request that raises without a status backs off."""
+    limiter = AdaptiveLimiter(max_limit=10, initial_limit=10)
+
+    try:
+        with limiter.slot():
+            raise ConnectionError("reset")
+    except ConnectionError:
+        pass
+
+    assert limiter.limit == 5
+    assert limiter.in_flight == 0
+
+
+def test_responses_in_flight_during_backoff_are_ignored():
+    """Test that one burst of failures only lowers the limit once."""
+    limiter = AdaptiveLimiter(max_limit=8, initial_limit=8)
+    release = threading.Event()
+    statuses = []
+
+    def request():
+        with limiter.slot() as slot:
+            release.wait(5)
+            slot.status = 429
+            statuses.append(slot.status)
+
+    threads = [threading.Thread(target=request) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    while limiter.in_flight < 4:
+        time.sleep(0.01)
+
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(statuses) == 4
+    assert limiter.limit == 4
+
+
+def test_rising_latency_backs_off():
+    """Test that a p95 far above the best seen lowers the limit."""
+    limiter = AdaptiveLimiter(max_limit=10, initial_limit=2)
+    limiter._record(0.01, 200)
+    limiter._record(0.01, 200)
+    assert limiter.limit == 3
+
+    for _ in range(3):
+        limiter._record(1.0, 200)
+
+    assert limiter.limit == 1
+
+
+def test_slot_blocks_threads_above_the_limit():
+    """Test that no more than ``limit`` threads hold a slot at once."""
+    limiter = AdaptiveLimiter(max_limit=2, initial_limit=2)
+    peak = 0
+    lock = threading.Lock()
+
+    def request():
+        nonlocal peak
+        with limiter.slot() as slot:
+            with lock:
+                peak = max(peak, limiter.in_flight)
+            time.sleep(0.02)
+            slot.status = 200
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert peak <= 2
+    assert limiter.in_flight == 0
+
+
+def test_async_slot_bounds_coroutines():
+    """Test that coroutines wait for a free slot on the event loop."""
+    limiter = AdaptiveLimiter(max_limit=3, initial_limit=3)
+    peak = 0
+
+    async def request():
+        nonlocal peak
+        async with limiter.async_slot() as slot:
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(0.01)
+            slot.status = 200
+
+    async def run():
+        await asyncio.gather(*(request() for _ in range(12)))
+
+    asyncio.run(run())
+
+    assert peak <= 3
+    assert limiter.in_flight == 0
+    assert limiter.stats()["max_seen"] == 3
@@ -0,0 +1,66 @@
+"""Tests for conditional GET validators and record reuse."""
+
+from utils.conditional import ConditionalRequests, ValidatorStore
+
+URL = "https://books.toscrape.com/catalogue/a_1/index.html"
+
+
+def test_validators_are_sent_once_a_record_is_stored(tmp_path):
+    """Test that a stored page gets If-None-Match and If-Modified-Since."""
+    requests = ConditionalRequests(ValidatorStore(str(tmp_path / "v.sqlite3")))
+    assert requests.request_headers(URL) == {}
+
+    requests.remember(
+        URL,
+        {"ETag": '"abc"', "Last-Modified": "Wed, 21 Oct 2015 07:28:00 GMT"},
+        {"upc": "a1"},
+    )
+
+    assert requests.request_headers(URL) == {
+        "If-None-Match": '"abc"',
+        "If-Modified-Since": "Wed, 21 Oct 2015 07:28:00 GMT",
+    }
+    assert requests.reuse(URL) == {"upc": "a1"}
+    assert requests.stats() == {
+        "requests": 2,
+        "conditional": 1,
+        "not_modified": 1,
+        "hit_rate": 0.5,
+    }
+    requests.close()
+
+
+def test_pages_without_validators_are_not_stored(tmp_path):
+    """Test that a response without ETag or Last-Modified is not remembered."""
+    requests = ConditionalRequests(ValidatorStore(str(tmp_path / "v.sqlite3")))
+
+    requests.remember(URL, {"content-type": "text/html"}, {"upc": "a1"})
+
+    assert requests.request_headers(URL) == {}
+    assert requests.reuse(URL) is None
+    requests.close()
+
+
+def test_validators_persist_between_runs(tmp_path):
+    """Test that the next run finds the validators under any URL spelling."""
+    path = str(tmp_path / "v.sqlite3")
+    first_run = ConditionalRequests(ValidatorStore(path))
+    first_run.remember(URL, {"etag": '"abc"'}, [{"title": "A"}])
+    first_run.close()
+
+    second_run = ConditionalRequests(ValidatorStore(path))
+    spelling = "HTTPS://Books.ToScrape.com/catalogue/a_1/index.html#top"
+    assert second_run.request_headers(spelling) == {"If-None-Match": '"abc"'}
+    assert second_run.reuse(URL) == [{"title": "A"}]
+    second_run.close()
+
+
+def test_disabled_requests_send_nothing():
+    """Test that the unconfigured front end is a no-op."""
+    requests = ConditionalRequests()
+
+    requests.remember(URL, {"etag": '"abc"'}, {"upc": "a1"})
+
+    assert requests.request_headers(URL) == {}
+    assert requests.reuse(URL) is None
+    assert requests.stats()["requests"] == 0
@@ -0,0 +1,90 @@
+"""Tests for the detail enrichment policy."""
+
+import json
+
+import pytest
+
+from utils.enrichment import (
+    DetailPolicy,
+    configure_details,
+    detail_policy,
+    load_existing_books,
+)
+
+URL = "https://books.toscrape.com/catalogue/a_1/index.html"
+
+
+def existing_url(slug):
+    return f"https://books.toscrape.com/catalogue/{slug}/index.html"
+
+
+def test_all_mode_fetches_every_book():
+    """Test that the default mode queues every detail request."""
+    policy = DetailPolicy()
+
+    assert policy.finished({"title": "A", "detail_url": URL}) is None
+    assert policy.stats()["fetched"] == 1
+
+
+def test_none_mode_keeps_the_listing_fields():
+    """Test that a listing-only crawl never fetches details."""
+    policy = DetailPolicy("none")
+    books = [(0, {"title": "A", "detail_url": URL}), (1, {"title": "B"})]
+
+    to_fetch, finished = policy.split(books)
+
+    assert to_fetch == []
+    assert finished == books
+
+
+def test_missing_mode_fetches_only_books_without_details():
+    """Test that books enriched earlier reuse their details with fresh listing data."""
+    existing = {
+        URL: {"title": "A", "price": "£1.00", "detail_url": URL, "upc": "u1"},
+        existing_url("b_2"): {"title": "B", "detail_url": existing_url("b_2")},
+    }
+    policy = DetailPolicy("missing", existing)
+    books = [
+        (0, {"title": "A", "price": "£2.00", "detail_url": URL + "#x"}),
+        (1, {"title": "B", "detail_url": existing_url("b_2")}),
+        (2, {"title": "C", "detail_url": existing_url("c_3")}),
+    ]
+
+    to_fetch, finished = policy.split(books)
+
+    assert [position for position, _ in to_fetch] == [1, 2]
+    assert finished == [
+        (0, {"title": "A", "price": "£2.00", "detail_url": URL + "#x", "upc": "u1"})
+    ]
+    assert policy.stats() == {
+        "mode": "missing",
+        "fetched": 2,
+        "reused": 1,
+        "skipped": 0,
+    }
+
+
+def test_configure_details_reads_the_earlier_output(tmp_path):
+    """Test that "missing" loads the output file and rejects unknown modes."""
+    path = tmp_path / "books.json"
+    path.write_text(json.dumps([{"title": "A", "detail_url": URL, "upc": "u1"}]))
+
+    configure_details("missing", str(path))
+    assert detail_policy.finished({"title": "A", "detail_url": URL})["upc"] == "u1"
+
+    configure_details("missing", str(tmp_path / "absent.json"))
+    assert detail_policy.finished({"title": "A", "detail_url": URL}) is None
+
+    with pytest.raises(ValueError):
+        configure_details("some")
+    configure_details("all")
+
+
+@pytest.mark.parametrize("content", ['[{"title": "A"', '{"title": "A"}'])
+def test_load_existing_books_rejects_a_corrupt_output(tmp_path, content):
+    """Test a truncated or non-array output raises ValueError."""
+    path = tmp_path / "books.json"
+    path.write_text(content)
+
+    with pytest.raises(ValueError):
+        load_existing_books(str(path))
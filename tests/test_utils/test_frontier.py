@@ -0,0 +1,162 @@
+"""Tests for the deduplicating URL frontier."""
+
+import threading
+
+import pytest
+
+from utils.frontier import (
+    BloomFrontier,
+    DedupFrontier,
+    MemoryFrontier,
+    SqliteFrontier,
+    canonicalize_url,
+    create_frontier_backend,
+)
+
+
+@pytest.mark.parametrize(
+    "url, expected",
+    [
+        (
+            "HTTPS://Books.ToScrape.com:443/catalogue/a_1/index.html#top",
+            "https://books.toscrape.com/catalogue/a_1/index.html",
+        ),
+        (
+            "https://books.toscrape.com/catalogue/../catalogue/a_1/./index.html",
+            "https://books.toscrape.com/catalogue/a_1/index.html",
+        ),
+        (
+            "http://localhost:8000/page?b=2&a=1",
+            "http://localhost:8000/page?a=1&b=2",
+        ),
+        ("https://books.toscrape.com", "https://books.toscrape.com/"),
+    ],
+)
+def test_canonicalize_url(url, expected):
+    """Test that equivalent URLs share one canonical form."""
+    assert canonicalize_url(url) == expected
+
+
+def test_dedup_frontier_counts_duplicates():
+    """Test that a URL is only new the first time, in any spelling."""
+    frontier = DedupFrontier(MemoryFrontier())
+
+    assert not frontier.seen_before("https://books.toscrape.com/catalogue/a_1/")
+    assert frontier.seen_before("https://BOOKS.toscrape.com/catalogue/a_1/#x")
+    assert not frontier.seen_before(None)
+
+    assert frontier.stats() == {"unique": 1, "duplicates": 1}
+
+
+def test_disabled_frontier_never_reports_duplicates():
+    """Test that the unconfigured frontier lets every URL through."""
+    frontier = DedupFrontier()
+
+    assert not frontier.seen_before("https://books.toscrape.com/")
+    assert not frontier.seen_before("https://books.toscrape.com/")
+
+
+def test_dedup_frontier_is_thread_safe():
+    """Test that concurrent adds of the same URL produce one winner."""
+    frontier = DedupFrontier(MemoryFrontier())
+    results = []
+
+    def add():
+        results.append(frontier.seen_before("https://books.toscrape.com/x"))
+
+    threads = [threading.Thread(target=add) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(False) == 1
+
+
+def test_bloom_frontier_has_no_false_negatives():
+    """Test that every added key is reported as seen."""
+    bloom = BloomFrontier(capacity=1000, error_rate=0.01)
+    keys = [f"https://books.toscrape.com/book_{i}" for i in range(1000)]
+
+    new = [bloom.add(key) for key in keys]
+
+    assert sum(new) >= 990
+    assert not any(bloom.add(key) for key in keys)
+
+
+def test_bloom_frontier_persists_between_runs(tmp_path):
+    """Test that a saved bloom filter remembers keys in the next run."""
+    path = str(tmp_path / "frontier.bloom")
+    bloom = BloomFrontier(capacity=100, path=path)
+    bloom.add("https://books.toscrape.com/a")
+    bloom.close()
+
+    reloaded = BloomFrontier(capacity=100, path=path)
+    assert len(reloaded) == 1
+    assert "https://books.toscrape.com/a" in reloaded
+    assert not reloaded.add("https://books.toscrape.com/a")
+    assert reloaded.add("https://books.toscrape.com/b")
+    assert len(reloaded) == 2
+
+
+def test_sqlite_frontier_persists_between_runs(tmp_path):
+    """Test that the SQLite frontier is exact and survives a restart."""
+    path = str(tmp_path / "frontier.sqlite3")
+    frontier = SqliteFrontier(path, commit_every=1000)
+    assert frontier.add("https://books.toscrape.com/a")
+    assert not frontier.add("https://books.toscrape.com/a")
+    frontier.close()
+
+    reloaded = SqliteFrontier(path)
+    assert not reloaded.add("https://books.toscrape.com/a")
+    assert len(reloaded) == 1
+    reloaded.close()
+
+
+@pytest.mark.parametrize("kind", ["bloom", "sqlite"])
+def test_store_only_skips_written_books(tmp_path, kind):
+    """Test a later run skips written books but retries merely scheduled ones."""
+    path = str(tmp_path / f"frontier.{kind}")
+    run = DedupFrontier(
+        create_frontier_backend(kind), create_frontier_backend(kind, path)
+    )
+    assert not run.seen_before("https://books.toscrape.com/a")
+    assert not run.seen_before("https://books.toscrape.com/b")
+    run.mark_written("https://books.toscrape.com/a")
+    run.close()
+
+    next_run = DedupFrontier(
+        create_frontier_backend(kind), create_frontier_backend(kind, path)
+    )
+    assert next_run.seen_before("https://BOOKS.toscrape.com/a")
+    assert not next_run.seen_before("https://books.toscrape.com/b")
+    next_run.close()
+
+
+@pytest.mark.parametrize("kind", ["bloom", "sqlite"])
+def test_unsaved_run_leaves_the_store_unchanged(tmp_path, kind):
+    """Test the books of a run whose output wasn't saved aren't kept."""
+    path = str(tmp_path / f"frontier.{kind}")
+    run = DedupFrontier(
+        create_frontier_backend(kind), create_frontier_backend(kind, path)
+    )
+    run.mark_written("https://books.toscrape.com/a")
+    run.close(persist=False)
+
+    next_run = DedupFrontier(
+        create_frontier_backend(kind), create_frontier_backend(kind, path)
+    )
+    assert not next_run.seen_before("https://books.toscrape.com/a")
+    next_run.close()
+
+
+def test_create_frontier_backend_validates_arguments():
+    """Test backend selection by name."""
+    assert isinstance(create_frontier_backend("memory"), MemoryFrontier)
+    temporary = create_frontier_backend("sqlite")
+    assert isinstance(temporary, SqliteFrontier) and temporary.path == ""
+    temporary.close()
+    with pytest.raises(ValueError):
+        create_frontier_backend("memory", "frontier.txt")
+    with pytest.raises(ValueError):
+        create_frontier_backend("redis")
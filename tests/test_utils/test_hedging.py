@@ -0,0 +1,186 @@
+"""Tests for hedged requests."""
+
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+import pytest
+
+from utils.hedging import Hedger
+
+
+@pytest.fixture
+def hedger():
+    """A hedger that has already seen ten 10 ms requests."""
+    hedger = Hedger(percentile=90, max_hedge_ratio=0.5, min_samples=10)
+    for _ in range(10):
+        hedger._latencies.append(0.01)
+    yield hedger
+    hedger.shutdown()
+
+
+def test_no_hedging_before_enough_samples():
+    """Test that there is no hedge delay until enough latencies are known."""
+    hedger = Hedger(min_samples=5)
+    try:
+        for _ in range(4):
+            assert hedger.call(lambda: "ok") == "ok"
+        assert hedger.hedge_delay() is None
+
+        hedger.call(lambda: "ok")
+        assert hedger.hedge_delay() is not None
+        assert hedger.stats()["hedges"] == 0
+    finally:
+        hedger.shutdown()
+
+
+def test_straggler_is_hedged_and_backup_wins(hedger):
+    """Test that a slow first request is raced by a faster backup."""
+    calls = 0
+    lock = threading.Lock()
+
+    def fetch():
+        nonlocal calls
+        with lock:
+            calls += 1
+            attempt = calls
+        time.sleep(1.0 if attempt == 1 else 0.01)
+        return f"attempt {attempt}"
+
+    started = time.monotonic()
+    result = hedger.call(fetch)
+
+    assert result == "attempt 2"
+    assert time.monotonic() - started < 0.5
+    assert hedger.stats()["hedge_wins"] == 1
+
+
+def test_fast_request_is_not_hedged(hedger):
+    """Test that requests finishing under the percentile get no backup."""
+    assert hedger.call(lambda: "fast") == "fast"
+    assert hedger.stats()["hedges"] == 0
+
+
+def test_hedges_are_capped_by_budget():
+    """Test that hedges never exceed the configured share of requests."""
+    hedger = Hedger(percentile=50, max_hedge_ratio=0.1, min_samples=1)
+    hedger._latencies.append(0.001)
+    try:
+        for _ in range(10):
+            hedger.call(lambda: time.sleep(0.01))
+        assert hedger.stats()["hedges"] == 1
+    finally:
+        hedger.shutdown()
+
+
+def test_hedges_in_flight_are_capped():
+    """Test that no more than ``max_hedges`` backups run at once."""
+    hedger = Hedger(percentile=50, max_hedge_ratio=1.0, min_samples=1, max_hedges=1)
+    hedger._latencies.append(0.001)
+    release = threading.Event()
+    try:
+        with concurrent.futures.ThreadPoolExecutor(3) as pool:
+            calls = [pool.submit(hedger.call, release.wait) for _ in range(3)]
+            time.sleep(0.1)
+            assert hedger.stats()["hedges"] == 1
+            release.set()
+            assert all(call.result(timeout=5) for call in calls)
+        assert hedger.hedges_in_flight == 0
+    finally:
+        release.set()
+        hedger.shutdown()
+
+
+def test_failed_backup_falls_back_to_primary(hedger):
+    """Test that an error in one of the two requests doesn't lose the other."""
+    calls = 0
+    lock = threading.Lock()
+
+    def fetch():
+        nonlocal calls
+        with lock:
+            calls += 1
+            attempt = calls
+        if attempt == 2:
+            raise ConnectionError("backup failed")
+        time.sleep(0.1)
+        return "primary"
+
+    assert hedger.call(fetch) == "primary"
+
+
+class _Page:
+    def __init__(self, status, name):
+        self.status = status
+        self.name = name
+
+
+def _race(hedger, primary, backup):
+    """Make the first call slow and return ``primary``, the hedge ``backup``."""
+    calls = 0
+    lock = threading.Lock()
+
+    def fetch():
+        nonlocal calls
+        with lock:
+            calls += 1
+            attempt = calls
+        time.sleep(0.2 if attempt == 1 else 0.01)
+        return primary if attempt == 1 else backup
+
+    return hedger.call(fetch)
+
+
+def test_fast_error_status_does_not_beat_a_slower_success(hedger):
+    """Test that a quick 429 from the hedge loses to the primary's 200."""
+    result = _race(hedger, _Page(200, "primary"), _Page(429, "backup"))
+
+    assert result.name == "primary"
+    assert hedger.stats()["hedge_wins"] == 0
+
+
+def test_error_status_is_returned_when_nothing_succeeds(hedger):
+    """Test that the first error status is the fallback when both fail."""
+    result = _race(hedger, _Page(503, "primary"), _Page(429, "backup"))
+
+    assert result.name == "backup"
+
+
+def test_async_fast_error_status_does_not_beat_a_slower_success(hedger):
+    """Test that the async race also waits for a success."""
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        attempt = calls
+        await asyncio.sleep(0.2 if attempt == 1 else 0.01)
+        return _Page(200, "primary") if attempt == 1 else _Page(503, "backup")
+
+    assert asyncio.run(hedger.call_async(fetch)).name == "primary"
+
+
+def test_async_hedge_cancels_the_slower_request(hedger):
+    """Test that the losing coroutine is cancelled on the event loop."""
+    cancelled = []
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        attempt = calls
+        try:
+            await asyncio.sleep(1.0 if attempt == 1 else 0.01)
+        except asyncio.CancelledError:
+            cancelled.append(attempt)
+            raise
+        return f"attempt {attempt}"
+
+    async def run():
+        result = await hedger.call_async(fetch)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(run()) == "attempt 2"
+    assert cancelled == [1]
@@ -0,0 +1,264 @@
+"""Tests for the connection-pooled HTTP fetchers."""
+
+import asyncio
+import concurrent.futures
+import importlib
+import pickle
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+
+from utils.archive import configure_archive
+from utils.hedging import Hedger
+from utils.http_client import (
+    ConnectionStats,
+    PooledAsyncFetcher,
+    PooledFetcher,
+    connection_stats,
+)
+from utils.rate_limiter import configure_rate_limit, rate_limiter
+from utils.response_cache import configure_response_cache, response_cache
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    """Serve a tiny HTML page over HTTP/1.1 so connections stay open.
+
+    ``/stall`` only answers once ``stalled`` is set.
+    """
+
+    protocol_version = "HTTP/1.1"
+    stalled = threading.Event()
+
+    def do_GET(self):
+        if self.path == "/stall":
+            self.stalled.wait(10)
+        body = b"<html><body><h1>Hello</h1></body></html>"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    """Run a local keep-alive HTTP server for the duration of a test."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fresh_pool():
+    """Start every test with a new pool and zeroed counters."""
+    PooledFetcher.configure_pool(2)
+    connection_stats.reset()
+    yield
+    PooledFetcher.close()
+    configure_rate_limit(None)
+
+
+def test_sequential_requests_reuse_one_connection(server_url):
+    """Test that back-to-back requests share a single keep-alive connection."""
+    for _ in range(5):
+        response = PooledFetcher.get(server_url, stealthy_headers=True)
+        assert response.status == 200
+        assert response.css_first("h1").text == "Hello"
+
+    stats = connection_stats.snapshot()
+    assert stats["requests"] == 5
+    assert stats["new_connections"] == 1
+    assert stats["reused_connections"] == 4
+    assert stats["reuse_ratio"] == pytest.approx(0.8)
+
+
+def test_get_raw_returns_unparsed_picklable_page(server_url):
+    """Test that a raw fetch shares the pool and can be sent to a process."""
+    PooledFetcher.get(server_url)
+    page = PooledFetcher.get_raw(server_url)
+
+    assert page.status == 200
+    assert b"<h1>Hello</h1>" in page.body
+    copy = pickle.loads(pickle.dumps(page))
+    assert (copy.url, copy.body, copy.encoding) == (page.url, page.body, page.encoding)
+    assert connection_stats.snapshot()["new_connections"] == 1
+
+
+def test_configure_pool_resets_the_client(server_url):
+    """Test that resizing the pool drops the old client."""
+    PooledFetcher.get(server_url)
+    client = PooledFetcher._get_client()
+
+    PooledFetcher.configure_pool(4)
+
+    assert PooledFetcher.pool_size == 4
+    assert PooledFetcher._get_client() is not client
+
+
+def test_async_fetcher_reuses_connections(server_url):
+    """Test that the async fetcher keeps connections open across requests."""
+
+    async def fetch_all():
+        try:
+            responses = []
+            for _ in range(3):
+                responses.append(await PooledAsyncFetcher.get(server_url))
+            return responses
+        finally:
+            await PooledAsyncFetcher.aclose()
+
+    responses = asyncio.run(fetch_all())
+
+    assert [response.status for response in responses] == [200, 200, 200]
+    assert connection_stats.snapshot()["new_connections"] == 1
+
+
+def test_requests_are_paced_by_the_host_rate_limiter(server_url):
+    """Test that pooled fetches take a token from the global rate limiter."""
+    configure_rate_limit(5, burst=1)
+
+    # A frozen clock makes the pacing independent of how fast requests run;
+    # utils re-exports the limiter instance under the module's own name
+    module = importlib.import_module("utils.rate_limiter")
+    with patch.object(module, "time") as clock:
+        clock.monotonic.return_value = 1000.0
+        for _ in range(3):
+            PooledFetcher.get(server_url)
+
+    metrics = rate_limiter.stats()[server_url.split("/")[2]]
+    assert metrics["requests"] == 3
+    assert metrics["waited"] == 2
+    delays = [call.args[0] for call in clock.sleep.call_args_list]
+    assert delays == pytest.approx([0.2, 0.4])
+
+
+def test_connection_stats_without_requests():
+    """Test that the reuse ratio is zero before any request is made."""
+    stats = ConnectionStats().snapshot()
+    assert stats["requests"] == 0
+    assert stats["reuse_ratio"] == 0.0
+
+
+def test_cached_responses_skip_the_network(server_url, tmp_path):
+    """Test a cached page is served without a request, sync and async."""
+    configure_response_cache(str(tmp_path / "cache.sqlite3"))
+    try:
+        first = PooledFetcher.get(server_url)
+        second = PooledFetcher.get(server_url)
+        raw = PooledFetcher.get_raw(server_url)
+
+        async def fetch():
+            try:
+                return await PooledAsyncFetcher.get(server_url)
+            finally:
+                await PooledAsyncFetcher.aclose()
+
+        third = asyncio.run(fetch())
+    finally:
+        stats = response_cache.stats()
+        configure_response_cache(None)
+
+    assert connection_stats.snapshot()["requests"] == 1
+    assert stats["hits"] == 3
+    assert second.css_first("h1").text == first.css_first("h1").text == "Hello"
+    assert b"<h1>Hello</h1>" in raw.body
+    assert third.status == 200
+
+
+def test_offline_serves_only_cached_pages(server_url, tmp_path):
+    """Test offline mode answers uncached pages 504 without a request."""
+    path = str(tmp_path / "cache.sqlite3")
+    configure_response_cache(path)
+    PooledFetcher.get(server_url)
+    configure_response_cache(path, offline=True)
+    try:
+        cached = PooledFetcher.get(server_url)
+        missing = PooledFetcher.get(server_url + "missing.html")
+    finally:
+        configure_response_cache(None)
+
+    assert cached.status == 200
+    assert missing.status == 504
+    assert connection_stats.snapshot()["requests"] == 1
+
+
+def test_recorded_run_replays_without_the_network(server_url, tmp_path):
+    """Test a recorded exchange is served from the archive, sync and async."""
+    path = str(tmp_path / "run.warc.gz")
+    configure_archive(record=path)
+    try:
+        recorded = PooledFetcher.get(server_url)
+    finally:
+        configure_archive()
+    configure_archive(replay=path)
+    try:
+        replayed = PooledFetcher.get(server_url)
+        missing = PooledFetcher.get_raw(server_url + "missing.html")
+
+        async def fetch():
+            try:
+                return await PooledAsyncFetcher.get(server_url)
+            finally:
+                await PooledAsyncFetcher.aclose()
+
+        replayed_async = asyncio.run(fetch())
+    finally:
+        configure_archive()
+
+    assert connection_stats.snapshot()["requests"] == 1
+    assert replayed.css_first("h1").text == recorded.css_first("h1").text == "Hello"
+    assert replayed_async.status == 200
+    assert missing.status == 404
+
+
+def test_latency_percentiles_of_network_requests(server_url):
+    """Test every request that reached the server is timed, and reset clears them."""
+    stats = ConnectionStats()
+    assert stats.latency_percentiles() == {}
+    for seconds in range(1, 101):
+        stats.record_latency(seconds / 1000)
+    assert stats.latency_percentiles() == {"p50": 0.051, "p95": 0.096, "p99": 0.1}
+
+    for _ in range(3):
+        PooledFetcher.get(server_url)
+    assert set(connection_stats.latency_percentiles((50, 99.9))) == {"p50", "p99.9"}
+    connection_stats.reset()
+    assert connection_stats.latency_percentiles() == {}
+
+
+def test_hedges_get_a_connection_while_every_primary_stalls(server_url):
+    """Test the pool has room for the backups on top of the primaries."""
+    workers = 2
+    hedger = Hedger(percentile=50, max_hedge_ratio=1.0, min_samples=1)
+    hedger._latencies.append(0.01)
+    # Sized the way main() sizes it
+    PooledFetcher.configure_pool(workers + hedger.max_hedges)
+    attempts = [0] * workers
+
+    def fetch(index):
+        # Every primary stalls; only its backup can answer
+        attempts[index] += 1
+        url = server_url + ("stall" if attempts[index] == 1 else "")
+        return PooledFetcher.get(url, timeout=5)
+
+    _KeepAliveHandler.stalled.clear()
+    try:
+        with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+            futures = [
+                pool.submit(hedger.call, lambda i=i: fetch(i)) for i in range(workers)
+            ]
+            responses = [future.result(timeout=3) for future in futures]
+    finally:
+        _KeepAliveHandler.stalled.set()
+        hedger.shutdown()
+
+    assert [response.status for response in responses] == [200] * workers
+    assert hedger.stats()["hedge_wins"] == workers
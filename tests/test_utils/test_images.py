@@ -0,0 +1,111 @@
+"""Tests for the content-addressed cover download stage."""
+
+import hashlib
+import os
+import threading
+import time
+
+from utils.images import ImageDownloader, ImageStore, image_extension
+
+
+def cover(name):
+    return f"https://books.toscrape.com/media/cache/{name}.jpg"
+
+
+def test_store_names_files_by_content_hash(tmp_path):
+    """Test an image is stored under the SHA-256 of its bytes."""
+    store = ImageStore(str(tmp_path / "images"))
+
+    path = store.put(cover("a"), b"cover a")
+
+    digest = hashlib.sha256(b"cover a").hexdigest()
+    assert path == os.path.join(str(tmp_path / "images"), digest[:2], digest + ".jpg")
+    with open(path, "rb") as f:
+        assert f.read() == b"cover a"
+    assert store.lookup(cover("a")) == path
+
+
+def test_same_content_is_written_once(tmp_path):
+    """Test two URLs with identical covers share one file."""
+    store = ImageStore(str(tmp_path))
+
+    first = store.put(cover("a"), b"placeholder")
+    second = store.put(cover("b"), b"placeholder")
+
+    assert first == second
+    assert store.stored == 1
+    assert store.deduplicated == 1
+
+
+def test_stored_urls_survive_a_restart(tmp_path):
+    """Test a later run skips URLs an earlier run stored."""
+    store = ImageStore(str(tmp_path))
+    path = store.put(cover("a"), b"cover a")
+    store.put(cover("gone"), b"cover gone")
+    os.remove(store.lookup(cover("gone")))
+
+    reopened = ImageStore(str(tmp_path))
+
+    assert reopened.lookup(cover("a")) == path
+    assert reopened.lookup(cover("gone")) is None
+
+
+def test_attach_keeps_order_and_sets_paths(tmp_path):
+    """Test books come out in order with their cover path, or None."""
+    fetched = []
+
+    def fetch(url):
+        fetched.append(url)
+        # Later covers finish first
+        time.sleep(0.02 if url.endswith("0.jpg") else 0)
+        return None if "broken" in url else url.encode()
+
+    downloader = ImageDownloader(fetch, ImageStore(str(tmp_path)), max_concurrency=3)
+    downloader.store.put(cover("stored"), b"already here")
+    books = [{"title": str(i), "image_url": cover(str(i))} for i in range(5)]
+    books += [
+        {"title": "broken", "image_url": cover("broken")},
+        {"title": "stored", "image_url": cover("stored")},
+        {"title": "no cover", "image_url": ""},
+    ]
+
+    result = list(downloader.attach(iter(books), window=2))
+    downloader.shutdown()
+
+    assert [book["title"] for book in result] == [book["title"] for book in books]
+    assert all(book["image_path"].endswith(".jpg") for book in result[:5])
+    assert result[5]["image_path"] is None
+    assert result[6]["image_path"] == downloader.store.lookup(cover("stored"))
+    assert result[7]["image_path"] is None
+    assert cover("stored") not in fetched
+    assert downloader.stats()["skipped"] == 1
+    assert downloader.stats()["failed"] == 1
+
+
+def test_downloads_are_bounded_by_their_own_limit(tmp_path):
+    """Test no more than ``max_concurrency`` covers download at once."""
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def fetch(url):
+        with lock:
+            running.append(url)
+            peak.append(len(running))
+        time.sleep(0.01)
+        with lock:
+            running.remove(url)
+        return url.encode()
+
+    downloader = ImageDownloader(fetch, ImageStore(str(tmp_path)), max_concurrency=2)
+    books = ({"title": str(i), "image_url": cover(str(i))} for i in range(12))
+    assert len(list(downloader.attach(books))) == 12
+    downloader.shutdown()
+
+    assert max(peak) <= 2
+
+
+def test_image_extension():
+    """Test the extension comes from the URL path."""
+    assert image_extension("https://x/y/cover.PNG?size=2") == ".png"
+    assert image_extension("https://x/y/cover") == ".jpg"
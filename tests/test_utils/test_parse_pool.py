@@ -0,0 +1,61 @@
+"""Tests for the process pool parse stage."""
+
+import os
+
+from utils.parse_pool import ParsePool
+
+
+def upper_batch(items):
+    """Parse function run in the worker processes."""
+    return [(item.upper(), os.getpid()) for item in items]
+
+
+def failing_batch(items):
+    """Parse function whose batches always fail."""
+    raise ValueError("bad page")
+
+
+def test_items_are_parsed_in_worker_processes():
+    """Test that every item is parsed off the main process and keyed back."""
+    pool = ParsePool(upper_batch, max_workers=2, batch_size=3)
+    try:
+        for i in range(7):
+            pool.add(i, f"page {i}")
+
+        results = pool.results()
+    finally:
+        pool.shutdown()
+
+    assert {key: text for key, (text, _) in results.items()} == {
+        i: f"PAGE {i}" for i in range(7)
+    }
+    assert all(pid != os.getpid() for _, pid in results.values())
+    assert pool.stats()["items"] == 7
+
+
+def test_full_batches_are_submitted_before_results():
+    """Test that parsing starts as soon as a batch fills up."""
+    pool = ParsePool(upper_batch, max_workers=1, batch_size=2)
+    try:
+        pool.add("a", "x")
+        assert not pool._batches
+        pool.add("b", "y")
+        assert len(pool._batches) == 1
+        assert not pool._pending
+    finally:
+        pool.shutdown()
+
+
+def test_failed_batch_leaves_its_keys_out():
+    """Test that a failing batch is logged and counted, not raised."""
+    pool = ParsePool(failing_batch, max_workers=1, batch_size=2)
+    try:
+        pool.add("a", "x")
+        pool.add("b", "y")
+        pool.add("c", "z")
+
+        assert pool.results() == {}
+    finally:
+        pool.shutdown()
+
+    assert pool.stats()["failed"] == 3
@@ -0,0 +1,104 @@
+"""Tests for the per-host token-bucket rate limiter."""
+
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from utils.rate_limiter import HostRateLimiter, TokenBucket
+
+
+def test_bucket_allows_burst_then_paces():
+    """Test that a full bucket serves the burst before asking callers to wait."""
+    bucket = TokenBucket(rate=10, burst=3)
+
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+    # Reservations queue behind each other
+    assert bucket.reserve() == pytest.approx(0.2, abs=0.01)
+
+
+def test_bucket_refills_at_the_rate():
+    """Test that waiting lets tokens refill, up to the burst, on a fake clock."""
+    with patch("time.monotonic", return_value=100.0) as clock:
+        bucket = TokenBucket(rate=5, burst=2)
+        assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.2]
+
+        clock.return_value = 100.4  # Two tokens refilled, one already owed
+        assert bucket.reserve() == 0.0
+        assert bucket.reserve() == pytest.approx(0.2)
+
+        clock.return_value = 110.0  # A long idle spell refills only the burst
+        assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.2]
+
+
+def test_disabled_limiter_never_waits():
+    """Test that no rate means no waiting, but requests are still counted."""
+    limiter = HostRateLimiter()
+
+    for _ in range(50):
+        assert limiter.acquire("https://books.toscrape.com/") == 0.0
+
+    assert not limiter.enabled
+    assert limiter.stats()["books.toscrape.com"]["requests"] == 50
+
+
+def test_buckets_are_per_host():
+    """Test that one host's traffic doesn't delay another host."""
+    limiter = HostRateLimiter(rate=1, burst=1)
+
+    assert limiter.acquire("https://a.example.com/1") == 0.0
+    assert limiter.acquire("https://b.example.com/1") == 0.0
+
+    stats = limiter.stats()
+    assert stats["a.example.com"]["waited"] == 0
+    assert stats["b.example.com"]["waited"] == 0
+
+
+def test_threads_share_the_rate():
+    """Test that concurrent threads together stay under the configured rate."""
+    limiter = HostRateLimiter(rate=50, burst=1)
+    url = "https://books.toscrape.com/catalogue/page-1.html"
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=limiter.acquire, args=(url,)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    elapsed = time.monotonic() - started
+
+    # One token up front, then five more at 50/s
+    assert elapsed >= 0.09
+    metrics = limiter.stats()["books.toscrape.com"]
+    assert metrics["requests"] == 6
+    assert metrics["waited"] == 5
+    assert metrics["max_wait"] == pytest.approx(0.1, abs=0.02)
+
+
+def test_async_acquire_waits_on_the_event_loop():
+    """Test that coroutines are paced without blocking the loop."""
+    limiter = HostRateLimiter(rate=100, burst=2)
+    url = "https://books.toscrape.com/"
+
+    async def run():
+        return await asyncio.gather(*(limiter.acquire_async(url) for _ in range(4)))
+
+    delays = asyncio.run(run())
+
+    assert delays[:2] == [0.0, 0.0]
+    assert delays[3] > delays[2] > 0
+
+
+def test_configure_resets_buckets_and_metrics():
+    """Test that reconfiguring starts from a full bucket."""
+    limiter = HostRateLimiter(rate=1, burst=1)
+    limiter.acquire("https://books.toscrape.com/")
+
+    limiter.configure(rate=5)
+
+    assert limiter.burst == 5
+    assert limiter.stats() == {}
+    assert limiter.acquire("https://books.toscrape.com/") == 0.0
@@ -0,0 +1,108 @@
+"""Tests for the disk-backed response cache."""
+
+import time
+
+from utils.response_cache import ResponseCache, cache_key
+
+URL = "https://books.toscrape.com/catalogue/page-2.html"
+
+
+def store(cache, url, body, **kwargs):
+    cache.put(url, {}, 200, {"Content-Type": "text/html"}, body, **kwargs)
+
+
+def test_hit_returns_the_stored_response(tmp_path):
+    """Test a stored page comes back with its status, headers and body."""
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    assert cache.get(URL) is None
+
+    cache.put(
+        URL,
+        {},
+        200,
+        {"Content-Type": "text/html", "Content-Encoding": "gzip"},
+        b"<html>page 2</html>",
+        response_url=URL + "?final",
+    )
+    cached = cache.get(URL)
+
+    assert (cached.status, cached.body) == (200, b"<html>page 2</html>")
+    assert cached.url == URL + "?final"
+    # The stored body is decoded, so the encoding header would be wrong
+    assert cached.headers == {"Content-Type": "text/html"}
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    cache.close()
+
+
+def test_key_includes_only_relevant_headers():
+    """Test random stealth headers don't split the cache, validators do."""
+    assert cache_key(URL, {"User-Agent": "a", "Referer": "x"}) == cache_key(URL)
+    assert cache_key(URL, {"If-None-Match": '"v1"'}) != cache_key(URL)
+
+
+def test_entries_expire_after_their_ttl(tmp_path):
+    """Test each entry keeps its own TTL."""
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), ttl=3600)
+    store(cache, URL, b"long lived")
+    store(cache, URL + "?short", b"short lived", ttl=0.01)
+    time.sleep(0.02)
+
+    assert cache.get(URL).body == b"long lived"
+    assert cache.get(URL + "?short") is None
+    assert cache.stats()["expired"] == 1
+    cache.close()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    """Test the cache stays under its size cap by dropping the coldest entries."""
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), max_bytes=0)
+    store(cache, URL + "?a", bytes(range(256)) * 4)
+    one_entry = cache.size
+    cache.max_bytes = int(one_entry * 2.5)
+
+    store(cache, URL + "?b", bytes(range(255, -1, -1)) * 4)
+    time.sleep(0.01)
+    cache.get(URL + "?a")
+    store(cache, URL + "?c", bytes(range(0, 256, 2)) * 8)
+
+    assert cache.get(URL + "?b") is None
+    assert cache.get(URL + "?a") is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.size <= cache.max_bytes
+    cache.close()
+
+
+def test_identical_bodies_are_stored_once(tmp_path):
+    """Test bodies are content-addressed and compressed."""
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"))
+    body = b"<html>" + b"same page " * 500 + b"</html>"
+    store(cache, URL + "?a", body)
+    store(cache, URL + "?b", body)
+
+    assert cache.size < len(body) / 10
+    assert cache.get(URL + "?a").body == cache.get(URL + "?b").body == body
+    cache.close()
+
+
+def test_cache_survives_a_restart(tmp_path):
+    """Test a later run is served what an earlier run stored."""
+    path = str(tmp_path / "cache.sqlite3")
+    cache = ResponseCache(path)
+    store(cache, URL, b"from the first run")
+    size = cache.size
+    cache.close()
+
+    reopened = ResponseCache(path)
+    assert reopened.get(URL).body == b"from the first run"
+    assert reopened.size == size
+    reopened.close()
+
+
+def test_disabled_cache_stores_nothing():
+    """Test a cache without a file is a no-op."""
+    cache = ResponseCache()
+    store(cache, URL, b"page")
+
+    assert not cache.enabled
+    assert cache.get(URL) is None
@@ -0,0 +1,172 @@
+"""Tests for the retry engine."""
+
+import asyncio
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+import httpx
+import pytest
+
+from utils.retry import (
+    RetryBudget,
+    RetryEngine,
+    RetryPolicy,
+    classify_exception,
+    classify_status,
+    parse_retry_after,
+)
+
+
+def _instant_policies(max_retries=3):
+    """Policies that retry without sleeping."""
+    return {
+        name: RetryPolicy(max_retries, 0.0, 0.0, respect_retry_after=True)
+        for name in ("throttled", "server_error", "timeout", "connection")
+    }
+
+
+def _responses(*statuses):
+    """Build a fetch function returning the given statuses in order."""
+    responses = iter([MagicMock(status=status, headers={}) for status in statuses])
+    return MagicMock(side_effect=lambda: next(responses))
+
+
+@pytest.mark.parametrize(
+    "status, expected",
+    [(429, "throttled"), (500, "server_error"), (503, "server_error"), (404, None)],
+)
+def test_classify_status(status, expected):
+    """Test that only throttling and server errors are retryable statuses."""
+    assert classify_status(status) == expected
+
+
+def test_classify_exception():
+    """Test that transport errors are retryable and other errors are not."""
+    request = httpx.Request("GET", "https://books.toscrape.com/")
+    assert classify_exception(httpx.ReadTimeout("slow", request=request)) == "timeout"
+    assert classify_exception(httpx.ConnectError("down", request=request)) == (
+        "connection"
+    )
+    assert classify_exception(ValueError("parse error")) is None
+
+
+def test_parse_retry_after_seconds_and_dates():
+    """Test both Retry-After formats and invalid values."""
+    assert parse_retry_after("7") == 7.0
+    future = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert parse_retry_after(format_datetime(future, usegmt=True)) == pytest.approx(
+        30, abs=2
+    )
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_transient_status_is_retried_until_success():
+    """Test that a 503 followed by a 200 returns the 200."""
+    engine = RetryEngine(max_retries=3, policies=_instant_policies())
+    fetch = _responses(503, 503, 200)
+
+    response = engine.call("detail", fetch)
+
+    assert response.status == 200
+    assert fetch.call_count == 3
+    assert engine.stats()["detail"] == {"requests": 1, "retries": 2, "failures": 0}
+
+
+def test_non_retryable_status_returns_immediately():
+    """Test that a 404 isn't retried but is counted as a failure."""
+    engine = RetryEngine(max_retries=3, policies=_instant_policies())
+    fetch = _responses(404)
+
+    assert engine.call("listing", fetch).status == 404
+    assert fetch.call_count == 1
+    assert engine.stats()["listing"]["failures"] == 1
+
+
+def test_not_modified_is_a_success():
+    """Test that a 304 answering a conditional GET isn't counted as a failure."""
+    engine = RetryEngine(max_retries=3, policies=_instant_policies())
+    fetch = _responses(304)
+
+    assert engine.call("detail", fetch).status == 304
+    assert fetch.call_count == 1
+    assert engine.stats()["detail"]["failures"] == 0
+
+
+def test_exhausted_retries_reraise_the_last_exception():
+    """Test that a persistent connection error is raised after the retries."""
+    engine = RetryEngine(max_retries=2, policies=_instant_policies())
+    fetch = MagicMock(side_effect=ConnectionError("reset"))
+
+    with pytest.raises(ConnectionError):
+        engine.call("detail", fetch)
+
+    assert fetch.call_count == 3
+    assert engine.stats()["detail"] == {"requests": 1, "retries": 2, "failures": 1}
+
+
+def test_disabled_engine_makes_one_attempt():
+    """Test that the default engine doesn't retry until configured."""
+    engine = RetryEngine()
+    fetch = _responses(500)
+
+    assert engine.call("detail", fetch).status == 500
+    assert fetch.call_count == 1
+
+
+def test_retry_budget_caps_retries_across_the_run():
+    """Test that the run-wide budget stops retries once spent."""
+    engine = RetryEngine(
+        max_retries=5,
+        policies=_instant_policies(5),
+        budget=RetryBudget(ratio=0.0, min_retries=2),
+    )
+    fetch = MagicMock(return_value=MagicMock(status=500, headers={}))
+
+    engine.call("detail", fetch)
+    engine.call("detail", fetch)
+
+    # Two retries for the first fetch, none left for the second
+    assert fetch.call_count == 4
+    assert engine.budget.exhausted == 2
+
+
+def test_retry_after_header_sets_the_delay():
+    """Test that the server's Retry-After wins over a shorter backoff."""
+    engine = RetryEngine(
+        max_retries=1,
+        policies={"throttled": RetryPolicy(1, 0.0, 30.0, respect_retry_after=True)},
+    )
+    throttled = MagicMock(status=429, headers={"retry-after": "3"})
+    fetch = MagicMock(side_effect=[throttled, MagicMock(status=200)])
+
+    with patch("utils.retry.time.sleep") as mock_sleep:
+        engine.call("detail", fetch)
+
+    mock_sleep.assert_called_once_with(3.0)
+
+
+def test_backoff_grows_exponentially_within_bounds():
+    """Test the full-jitter delay ceiling doubles per retry up to the maximum."""
+    policy = RetryPolicy(5, 0.5, 2.0)
+    with patch("utils.retry.random.uniform", side_effect=lambda low, high: high):
+        assert [policy.backoff(n) for n in range(1, 5)] == [0.5, 1.0, 2.0, 2.0]
+
+
+def test_async_call_retries_on_the_event_loop():
+    """Test the async variant retries a timeout and returns the response."""
+    engine = RetryEngine(max_retries=3, policies=_instant_policies())
+    attempts = 0
+
+    async def fetch():
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise TimeoutError("slow")
+        return MagicMock(status=200)
+
+    response = asyncio.run(engine.call_async("listing", fetch))
+
+    assert response.status == 200
+    assert attempts == 2
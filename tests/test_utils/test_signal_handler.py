@@ -0,0 +1,60 @@
+"""Tests for the graceful shutdown handler."""
+
+import signal
+
+import pytest
+
+from utils.signal_handler import GracefulShutdownHandler
+
+
+def test_signal_runs_the_callbacks_and_exits():
+    """Test a signal outside a deferred block cleans up and exits."""
+    handler = GracefulShutdownHandler()
+    calls = []
+    handler.add_cleanup_callback(lambda: calls.append("cleanup"))
+
+    with pytest.raises(SystemExit):
+        handler.signal_handler(signal.SIGTERM, None)
+
+    assert calls == ["cleanup"]
+    assert handler.is_shutdown_requested()
+
+
+def test_deferred_exit_only_requests_the_shutdown():
+    """Test the first signal in a deferred block only sets the flag."""
+    handler = GracefulShutdownHandler()
+    calls = []
+    handler.add_cleanup_callback(lambda: calls.append("cleanup"))
+
+    with handler.deferred_exit():
+        handler.signal_handler(signal.SIGTERM, None)
+        assert handler.is_shutdown_requested()
+        assert calls == []
+
+        # A second signal doesn't wait for the block any more
+        with pytest.raises(SystemExit):
+            handler.signal_handler(signal.SIGINT, None)
+
+    assert calls == ["cleanup"]
+    assert handler.exit_deferred == 0
+
+
+def test_removed_callbacks_are_not_run():
+    """Test a removed callback is skipped and removing it twice is harmless."""
+    handler = GracefulShutdownHandler()
+    calls = []
+
+    class Resource:
+        def close(self):
+            calls.append(self)
+
+    kept, removed = Resource(), Resource()
+    handler.add_cleanup_callback(kept.close)
+    handler.add_cleanup_callback(removed.close)
+    handler.remove_cleanup_callback(removed.close)
+    handler.remove_cleanup_callback(removed.close)
+
+    with pytest.raises(SystemExit):
+        handler.signal_handler(signal.SIGTERM, None)
+
+    assert calls == [kept]
@@ -0,0 +1,116 @@
+"""Tests for the streaming output of the crawl."""
+
+import json
+import os
+
+from utils.sink import JsonArraySink, PageOrder
+
+
+def book(page, position):
+    return {"title": f"Book {page}.{position}", "price": "£10.00"}
+
+
+def test_pages_are_released_in_listing_order():
+    """Test a page that finishes early waits for the pages before it."""
+    order = PageOrder()
+    for page in (1, 2, 3):
+        order.open(page)
+
+    # Page 2 is fully done before page 1
+    order.add(2, 0, book(2, 0))
+    order.listed(2)
+    assert order.release() == []
+
+    order.expect(1, 2)
+    order.listed(1)
+    order.add(1, 1, book(1, 1))
+    order.done(1)
+    assert order.release() == []
+    order.add(1, 0, book(1, 0))
+    order.done(1)
+
+    assert order.release() == [book(1, 0), book(1, 1), book(2, 0)]
+    assert order.buffered == 0
+    assert order.peak_buffered == 3
+
+
+def test_failed_pages_resolve_empty():
+    """Test a page that couldn't be fetched doesn't hold back later pages."""
+    order = PageOrder()
+    order.open(1)
+    order.open(2)
+    order.add(2, 0, book(2, 0))
+    order.listed(2)
+    order.listed(1)
+
+    assert order.release() == [book(2, 0)]
+
+
+def test_flush_returns_unfinished_pages():
+    """Test a stopped crawl still hands over the books it has."""
+    order = PageOrder()
+    order.open((0, 1))
+    order.open((1, 1))
+    order.expect((0, 1), 2)
+    order.add((1, 1), 0, book(1, 0))
+    order.add((0, 1), 0, book(0, 0))
+
+    assert order.release() == []
+    assert order.flush() == [book(0, 0), book(1, 0)]
+    assert order.release() == []
+
+
+def test_sink_output_matches_json_dump(tmp_path):
+    """Test the streamed file is the same as dumping the whole list."""
+    books = [book(1, i) for i in range(3)] + [{"title": "Ação", "nested": {"a": [1]}}]
+    path = str(tmp_path / "out" / "books.json")
+
+    sink = JsonArraySink(path, flush_every=2)
+    for item in books:
+        sink.write(item)
+    sink.close()
+    sink.close()
+
+    with open(path, encoding="utf-8") as f:
+        streamed = f.read()
+    assert streamed == json.dumps(books, indent=4, ensure_ascii=False)
+    assert sink.count == 4
+
+
+def test_empty_sink_writes_no_file(tmp_path):
+    """Test nothing is created when no book was written."""
+    path = str(tmp_path / "books.json")
+
+    sink = JsonArraySink(path)
+    sink.close()
+
+    assert not os.path.exists(path)
+    assert sink.count == 0
+
+
+def test_output_is_only_replaced_on_close(tmp_path):
+    """Test the previous output survives until the new one is complete."""
+    path = tmp_path / "books.json"
+    path.write_text('[{"title": "previous"}]', encoding="utf-8")
+
+    sink = JsonArraySink(str(path))
+    sink.write(book(1, 0))
+    assert json.loads(path.read_text(encoding="utf-8")) == [{"title": "previous"}]
+    sink.close()
+
+    assert json.loads(path.read_text(encoding="utf-8")) == [book(1, 0)]
+    assert not os.path.exists(sink.tmp_path)
+
+
+def test_discarded_output_keeps_the_previous_one(tmp_path):
+    """Test a failed run drops its partial output."""
+    path = tmp_path / "books.json"
+    path.write_text('[{"title": "previous"}]', encoding="utf-8")
+
+    sink = JsonArraySink(str(path))
+    sink.write(book(1, 0))
+    sink.discard()
+    sink.close()
+
+    assert json.loads(path.read_text(encoding="utf-8")) == [{"title": "previous"}]
+    assert not os.path.exists(sink.tmp_path)
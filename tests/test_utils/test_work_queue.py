@@ -0,0 +1,122 @@
+"""Tests for the shared SQLite work queue."""
+
+import multiprocessing
+import time
+
+import pytest
+
+from utils.work_queue import WorkQueue
+
+
+@pytest.fixture
+def queue_path(tmp_path):
+    """Path of a fresh work queue file."""
+    return str(tmp_path / "queue.sqlite3")
+
+
+def test_enqueue_skips_known_keys(queue_path):
+    """Test that a key is only queued once per kind."""
+    queue = WorkQueue(queue_path)
+
+    assert queue.enqueue("detail", [("a", {"n": 1}), ("b", {"n": 2})]) == 2
+    assert queue.enqueue("detail", [("a", {"n": 3})]) == 0
+    assert queue.enqueue("listing", [("a", {"n": 4})]) == 1
+
+    assert queue.counts()["pending"] == 3
+    queue.close()
+
+
+def test_listing_tasks_are_leased_first(queue_path):
+    """Test that listing pages come before details and payloads round-trip."""
+    queue = WorkQueue(queue_path)
+    queue.enqueue("detail", [("d1", {"book": "x"})])
+    queue.enqueue("listing", [("p2", {"page_num": 2})])
+
+    tasks = queue.lease("w1", limit=5)
+
+    assert [(t.kind, t.payload) for t in tasks] == [
+        ("listing", {"page_num": 2}),
+        ("detail", {"book": "x"}),
+    ]
+    assert queue.lease("w2", limit=5) == []
+    queue.close()
+
+
+def test_expired_lease_is_reissued(queue_path):
+    """Test that a task held past its lease goes to another worker."""
+    queue = WorkQueue(queue_path, lease_seconds=0.05)
+    queue.enqueue("listing", [("p1", {})])
+
+    (task,) = queue.lease("crashed")
+    time.sleep(0.1)
+    (reissued,) = queue.lease("healthy")
+
+    assert reissued.id == task.id
+    assert reissued.attempts == 2
+    assert queue.reissued == 1
+    # The first worker lost the lease and can no longer complete the task
+    assert not queue.complete(task, "crashed")
+    assert queue.complete(reissued, "healthy")
+    queue.close()
+
+
+def test_released_task_fails_after_max_attempts(queue_path):
+    """Test that a task failing on every attempt doesn't loop forever."""
+    queue = WorkQueue(queue_path, max_attempts=2)
+    queue.enqueue("detail", [("d1", {})])
+    queue.set_meta("seeded", "1")
+
+    for _ in range(2):
+        (task,) = queue.lease("w1")
+        queue.release(task, "w1")
+
+    assert queue.counts()["failed"] == 1
+    assert queue.is_finished()
+    queue.close()
+
+
+def test_is_finished_waits_for_seeding(queue_path):
+    """Test that an empty queue isn't finished before the coordinator seeds it."""
+    queue = WorkQueue(queue_path)
+    assert not queue.is_finished()
+
+    queue.set_meta("seeded", "0")
+    assert queue.is_finished()
+    assert queue.set_meta("seeded", "5", overwrite=False) == "0"
+    queue.close()
+
+
+def _lease_all(path, worker_id, results):
+    """Lease and complete tasks one at a time until none are left."""
+    queue = WorkQueue(path)
+    leased = []
+    while True:
+        tasks = queue.lease(worker_id)
+        if not tasks:
+            break
+        for task in tasks:
+            queue.complete(task, worker_id)
+            leased.append(task.payload["n"])
+    queue.close()
+    results.put(leased)
+
+
+def test_processes_never_lease_the_same_task(queue_path):
+    """Test that concurrent processes split the queue without overlap."""
+    queue = WorkQueue(queue_path)
+    queue.enqueue("detail", [(str(n), {"n": n}) for n in range(200)])
+
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=_lease_all, args=(queue_path, f"w{i}", results))
+        for i in range(3)
+    ]
+    for worker in workers:
+        worker.start()
+    leased = [n for _ in workers for n in results.get(timeout=30)]
+    for worker in workers:
+        worker.join()
+
+    assert sorted(leased) == list(range(200))
+    assert queue.counts()["done"] == 200
+    queue.close()
@@ -0,0 +1,65 @@
+"""Tests for the shared crawl worker pool."""
+
+import threading
+import pytest
+
+from utils.worker_pool import CrawlPool
+
+
+def test_submit_returns_result_and_updates_accounting():
+    """Test that finished work is counted per stage."""
+    with CrawlPool(2) as pool:
+        future = pool.submit("detail", lambda x: x * 2, 21)
+        assert future.result(timeout=5) == 42
+
+        stats = pool.stats()
+        assert stats["submitted"] == 1
+        assert stats["completed"] == 1
+        assert stats["in_flight"] == 0
+        assert pool.in_flight("detail") == 0
+
+
+def test_in_flight_is_tracked_per_stage():
+    """Test that unfinished work is reported for its own stage."""
+    release = threading.Event()
+    pool = CrawlPool(2)
+    try:
+        listing = pool.submit("listing", release.wait, 5)
+        detail = pool.submit("detail", release.wait, 5)
+
+        assert pool.in_flight() == 2
+        assert pool.in_flight("listing") == 1
+        assert pool.stats()["in_flight_by_stage"] == {"listing": 1, "detail": 1}
+
+        release.set()
+        listing.result(timeout=5)
+        detail.result(timeout=5)
+        assert pool.in_flight() == 0
+    finally:
+        release.set()
+        pool.shutdown(wait=True)
+
+
+def test_shutdown_cancels_queued_work():
+    """Test that shutdown cancels work that has not started yet."""
+    release = threading.Event()
+    pool = CrawlPool(1)
+    running = pool.submit("detail", release.wait, 5)
+    queued = pool.submit("detail", lambda: "never")
+
+    pool.shutdown(wait=False)
+    release.set()
+
+    assert queued.cancelled()
+    assert running.result(timeout=5) is True
+    assert pool.in_flight() == 0
+
+
+def test_shutdown_is_idempotent_and_blocks_new_work():
+    """Test that a second shutdown is a no-op and submit is rejected."""
+    pool = CrawlPool(1)
+    pool.shutdown(wait=True)
+    pool.shutdown(wait=True)
+
+    with pytest.raises(RuntimeError):
+        pool.submit("detail", lambda: None)
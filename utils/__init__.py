@@ -6,12 +6,64 @@ from .logger import logger
 from .signal_handler import (
     setup_graceful_shutdown,
     add_cleanup_callback,
+    remove_cleanup_callback,
     is_shutdown_requested,
 )
+from .worker_pool import CrawlPool
+from .concurrency import AdaptiveLimiter
+from .rate_limiter import HostRateLimiter, rate_limiter, configure_rate_limit
+from .retry import RetryEngine, retry_engine, configure_retries
+from .hedging import Hedger
+from .frontier import canonicalize_url, frontier, configure_frontier
+from .http_client import PooledFetcher, PooledAsyncFetcher, RawPage, connection_stats
+from .parse_pool import ParsePool
+from .work_queue import WorkQueue
+from .checkpoint import CheckpointJournal
+from .conditional import conditional_requests, configure_conditional_requests
+from .enrichment import detail_policy, configure_details
+from .sink import JsonArraySink, PageOrder
+from .backpressure import backpressure, configure_backpressure
+from .images import ImageDownloader, ImageStore
+from .response_cache import response_cache, configure_response_cache
+from .archive import crawl_archive, configure_archive
 
 __all__ = [
     "logger",
     "setup_graceful_shutdown",
     "add_cleanup_callback",
+    "remove_cleanup_callback",
     "is_shutdown_requested",
+    "CrawlPool",
+    "AdaptiveLimiter",
+    "HostRateLimiter",
+    "rate_limiter",
+    "configure_rate_limit",
+    "RetryEngine",
+    "retry_engine",
+    "configure_retries",
+    "Hedger",
+    "canonicalize_url",
+    "frontier",
+    "configure_frontier",
+    "PooledFetcher",
+    "PooledAsyncFetcher",
+    "RawPage",
+    "connection_stats",
+    "ParsePool",
+    "WorkQueue",
+    "CheckpointJournal",
+    "conditional_requests",
+    "configure_conditional_requests",
+    "detail_policy",
+    "configure_details",
+    "JsonArraySink",
+    "PageOrder",
+    "backpressure",
+    "configure_backpressure",
+    "ImageDownloader",
+    "ImageStore",
+    "response_cache",
+    "configure_response_cache",
+    "crawl_archive",
+    "configure_archive",
 ]
@@ -0,0 +1,459 @@
+"""
+Record and replay crawl archives.
+Every exchange of a recorded run is written to one WARC-style file: each
+record is its own gzip member, and an index member at the end maps every
+request to its responses, so a replay serves exactly the pages the recorded
+run saw, from memory and without network access.
+"""
+
+import gzip
+import json
+import threading
+import uuid
+import zlib
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
+from urllib.parse import urlsplit
+from utils.logger import logger
+from utils.response_cache import DROPPED_HEADERS, cache_key
+
+# Status served for a request the archive has no response for; not retryable,
+# since a retry won't find it either
+REPLAY_MISS_STATUS = 404
+
+INDEX_URI = "urn:x-crawl-archive:index"
+TRAILER_URI = "urn:x-crawl-archive:trailer"
+
+# Replays each response after the time it took when it was recorded
+RECORDED_LATENCY = "recorded"
+
+
+def _warc_record(warc_headers: Dict[str, str], payload: bytes) -> bytes:
+    """Build one WARC record: version line, headers, payload."""
+    lines = ["WARC/1.1"]
+    lines += [f"{name}: {value}" for name, value in warc_headers.items()]
+    lines.append(f"Content-Length: {len(payload)}")
+    head = ("\r\n".join(lines) + "\r\n\r\n").encode("utf-8")
+    return head + payload + b"\r\n\r\n"
+
+
+def _http_headers(headers: Mapping[str, str]) -> bytes:
+    """Serialize header lines, each ending in CRLF."""
+    return "".join(f"{name}: {value}\r\n" for name, value in headers.items()).encode(
+        "utf-8"
+    )
+
+
+def _trailer(index_offset: int) -> bytes:
+    """Build the fixed-size last member that points at the index.
+
+    Stored uncompressed with fixed-width fields so it always has the same
+    length and a reader can find it from the end of the file.
+    """
+    payload = f"index-offset: {index_offset:020d}".encode("ascii")
+    record = _warc_record(
+        {"WARC-Type": "metadata", "WARC-Target-URI": TRAILER_URI}, payload
+    )
+    return gzip.compress(record, compresslevel=0, mtime=0)
+
+
+TRAILER_SIZE = len(_trailer(0))
+
+
+def _split_record(record: bytes) -> Tuple[Dict[str, str], bytes]:
+    """Return the WARC headers and payload of a decompressed record."""
+    head, _, rest = record.partition(b"\r\n\r\n")
+    headers = {}
+    for line in head.decode("utf-8").split("\r\n")[1:]:
+        name, _, value = line.partition(": ")
+        headers[name] = value
+    return headers, rest[: int(headers["Content-Length"])]
+
+
+class ArchivedResponse:
+    """A response read back from an archive."""
+
+    def __init__(
+        self,
+        url: str,
+        status: int,
+        headers: Dict[str, str],
+        body: bytes,
+        elapsed: float = 0.0,
+    ):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.elapsed = elapsed
+
+
+class ArchiveWriter:
+    """Appends request and response records to an archive file, thread-safely."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "wb")
+        self._offset = 0
+        self._index: List[Tuple[str, str, int, int]] = []
+        self.records = 0
+
+    def _append(self, record: bytes) -> Tuple[int, int]:
+        """Write a record as its own gzip member. Caller holds the lock."""
+        member = gzip.compress(record, mtime=0)
+        offset = self._offset
+        self._file.write(member)
+        self._offset += len(member)
+        return offset, len(member)
+
+    def write(
+        self,
+        url: str,
+        request_headers: Mapping[str, str],
+        status: int,
+        reason: str,
+        response_headers: Mapping[str, str],
+        body: bytes,
+        elapsed: float = 0.0,
+        response_url: Optional[str] = None,
+    ) -> None:
+        """Record one exchange: a request record and its response record.
+
+        Args:
+            url (str): The requested URL.
+            request_headers (Mapping[str, str]): The request headers.
+            status (int): The response status.
+            reason (str): The response reason phrase.
+            response_headers (Mapping[str, str]): The response headers.
+            body (bytes): The decoded response body.
+            elapsed (float, optional): Seconds the request took.
+                Defaults to 0.0.
+            response_url (str, optional): The final URL after redirects.
+                Defaults to ``url``.
+        """
+        parts = urlsplit(url)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+        request = (
+            f"GET {target} HTTP/1.1\r\nHost: {parts.netloc}\r\n".encode("utf-8")
+            + _http_headers(request_headers)
+            + b"\r\n"
+        )
+        kept_headers = {
+            name: value
+            for name, value in response_headers.items()
+            if name.lower() not in DROPPED_HEADERS
+        }
+        response = (
+            f"HTTP/1.1 {status} {reason}\r\n".encode("utf-8")
+            + _http_headers(kept_headers)
+            + b"\r\n"
+            + body
+        )
+        date = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        response_id = f"<urn:uuid:{uuid.uuid4()}>"
+        with self._lock:
+            if self._file.closed:
+                return
+            self._append(
+                _warc_record(
+                    {
+                        "WARC-Type": "request",
+                        "WARC-Target-URI": url,
+                        "WARC-Date": date,
+                        "WARC-Record-ID": f"<urn:uuid:{uuid.uuid4()}>",
+                        "WARC-Concurrent-To": response_id,
+                        "Content-Type": "application/http;msgtype=request",
+                    },
+                    request,
+                )
+            )
+            offset, length = self._append(
+                _warc_record(
+                    {
+                        "WARC-Type": "response",
+                        "WARC-Target-URI": response_url or url,
+                        "WARC-Date": date,
+                        "WARC-Record-ID": response_id,
+                        "WARC-X-Request-URI": url,
+                        "WARC-X-Elapsed": f"{elapsed:.6f}",
+                        "Content-Type": "application/http;msgtype=response",
+                    },
+                    response,
+                )
+            )
+            self._index.append((cache_key(url, request_headers), url, offset, length))
+            self.records += 1
+
+    def close(self) -> None:
+        """Write the index and the trailer, then close the file."""
+        with self._lock:
+            if self._file.closed:
+                return
+            index_offset = self._offset
+            payload = json.dumps({"version": 1, "responses": self._index}).encode(
+                "utf-8"
+            )
+            self._append(
+                _warc_record(
+                    {
+                        "WARC-Type": "metadata",
+                        "WARC-Target-URI": INDEX_URI,
+                        "Content-Type": "application/json",
+                    },
+                    payload,
+                )
+            )
+            self._file.write(_trailer(index_offset))
+            self._file.close()
+
+
+class ArchiveReader:
+    """Serves the responses of an archive, loaded into memory.
+
+    A request recorded several times (e.g. retried) is answered with its
+    recorded responses in order, and with the last one after that.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._data = f.read()
+        self._lock = threading.Lock()
+        self._responses: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self._served: Dict[str, int] = defaultdict(int)
+        try:
+            entries = self._read_index()
+        except (OSError, EOFError, ValueError, KeyError, zlib.error):
+            logger.warning(f"Archive {path} has no index, scanning its records")
+            entries = self._scan()
+        for key, _, offset, length in entries:
+            self._responses[key].append((offset, length))
+
+    def __len__(self) -> int:
+        return sum(len(responses) for responses in self._responses.values())
+
+    def _read_index(self) -> List[Tuple[str, str, int, int]]:
+        """Read the index through the trailer at the end of the file."""
+        trailer = gzip.decompress(self._data[-TRAILER_SIZE:])
+        _, payload = _split_record(trailer)
+        index_offset = int(payload.decode("ascii").split(": ")[1])
+        record = gzip.decompress(self._data[index_offset:-TRAILER_SIZE])
+        headers, payload = _split_record(record)
+        if headers.get("WARC-Target-URI") != INDEX_URI:
+            raise ValueError("Trailer doesn't point at an index")
+        return [tuple(entry) for entry in json.loads(payload)["responses"]]
+
+    def _scan(self) -> List[Tuple[str, str, int, int]]:
+        """Rebuild the index of an archive whose recording was cut off."""
+        entries: List[Tuple[str, str, int, int]] = []
+        data = memoryview(self._data)
+        offset = 0
+        request_headers: Dict[str, str] = {}
+        while offset < len(data):
+            decompressor = zlib.decompressobj(wbits=31)
+            chunks = []
+            consumed = 0
+            try:
+                while not decompressor.eof and offset + consumed < len(data):
+                    chunk = data[offset + consumed : offset + consumed + 65536]
+                    chunks.append(decompressor.decompress(chunk))
+                    consumed += len(chunk)
+            except zlib.error:
+                break
+            if not decompressor.eof:
+                # The last record was being written when the run stopped
+                break
+            length = consumed - len(decompressor.unused_data)
+            headers, payload = _split_record(b"".join(chunks))
+            if headers.get("WARC-Type") == "request":
+                lines = payload.decode("utf-8").split("\r\n")[2:]
+                request_headers = dict(
+                    line.split(": ", 1) for line in lines if ": " in line
+                )
+            elif headers.get("WARC-Type") == "response":
+                url = headers["WARC-X-Request-URI"]
+                entries.append((cache_key(url, request_headers), url, offset, length))
+            offset += length
+        return entries
+
+    def get(
+        self, url: str, headers: Optional[Mapping[str, str]] = None
+    ) -> Optional[ArchivedResponse]:
+        """Return the next recorded response to a request, if any."""
+        key = cache_key(url, headers)
+        with self._lock:
+            responses = self._responses.get(key)
+            if not responses:
+                return None
+            served = self._served[key]
+            self._served[key] = served + 1
+            offset, length = responses[min(served, len(responses) - 1)]
+        record = gzip.decompress(self._data[offset : offset + length])
+        warc_headers, payload = _split_record(record)
+        head, _, body = payload.partition(b"\r\n\r\n")
+        lines = head.decode("utf-8").split("\r\n")
+        status = int(lines[0].split(" ")[1])
+        response_headers = dict(line.split(": ", 1) for line in lines[1:] if line)
+        return ArchivedResponse(
+            warc_headers["WARC-Target-URI"],
+            status,
+            response_headers,
+            body,
+            float(warc_headers.get("WARC-X-Elapsed", 0.0)),
+        )
+
+
+class CrawlArchive:
+    """Records every exchange of a run, or replays a recorded run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._writer: Optional[ArchiveWriter] = None
+        self._reader: Optional[ArchiveReader] = None
+        self.latency: Union[float, str, None] = None
+        self.replayed = 0
+        self.missing = 0
+
+    def reset(
+        self,
+        record: Optional[str] = None,
+        replay: Optional[str] = None,
+        latency: Union[float, str, None] = None,
+    ) -> None:
+        """Close the current archive and start recording or replaying another.
+
+        Args:
+            record (str, optional): Archive file to record the run into.
+            replay (str, optional): Archive file to serve every request from.
+            latency (Union[float, str], optional): Delay before each replayed
+                response: seconds, or "recorded" for the time it originally
+                took. Defaults to None, which replays at memory speed.
+        """
+        if latency is not None and latency != RECORDED_LATENCY:
+            latency = float(latency)
+        self.close()
+        with self._lock:
+            self._writer = ArchiveWriter(record) if record else None
+            self._reader = ArchiveReader(replay) if replay else None
+            self.latency = latency
+            self.replayed = 0
+            self.missing = 0
+        if replay:
+            logger.info(f"Replaying {len(self._reader or [])} responses from {replay}")
+
+    @property
+    def recording(self) -> bool:
+        """Whether exchanges are being written to an archive."""
+        return self._writer is not None
+
+    @property
+    def replaying(self) -> bool:
+        """Whether requests are served from an archive."""
+        return self._reader is not None
+
+    def replay(
+        self, url: str, headers: Optional[Mapping[str, str]] = None
+    ) -> Tuple[ArchivedResponse, float]:
+        """Return the archived response to a request and how long to wait first.
+
+        A request that wasn't recorded is answered 404.
+
+        Args:
+            url (str): The requested URL.
+            headers (Mapping[str, str], optional): The request headers.
+
+        Returns:
+            Tuple[ArchivedResponse, float]: The response and the simulated
+            latency in seconds.
+        """
+        reader = self._reader
+        response = reader.get(url, headers) if reader is not None else None
+        with self._lock:
+            if response is None:
+                self.missing += 1
+            else:
+                self.replayed += 1
+        if response is None:
+            logger.warning(f"Replay: {url} is not in the archive")
+            return (
+                ArchivedResponse(
+                    url, REPLAY_MISS_STATUS, {"content-type": "text/plain"}, b""
+                ),
+                0.0,
+            )
+        if self.latency == RECORDED_LATENCY:
+            return response, response.elapsed
+        return response, float(self.latency or 0.0)
+
+    def record(
+        self,
+        url: str,
+        request_headers: Mapping[str, str],
+        status: int,
+        reason: str,
+        response_headers: Mapping[str, str],
+        body: bytes,
+        elapsed: float = 0.0,
+        response_url: Optional[str] = None,
+    ) -> None:
+        """Write an exchange to the archive being recorded, if any."""
+        writer = self._writer
+        if writer is not None:
+            writer.write(
+                url,
+                request_headers,
+                status,
+                reason,
+                response_headers,
+                body,
+                elapsed,
+                response_url,
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        """Return how many exchanges were recorded, replayed or missing."""
+        with self._lock:
+            return {
+                "recorded": self._writer.records if self._writer else 0,
+                "replayed": self.replayed,
+                "missing": self.missing,
+            }
+
+    def log_summary(self) -> None:
+        """Log what was recorded or replayed."""
+        stats = self.stats()
+        if self._writer is not None:
+            logger.info(
+                f"Archive: recorded {stats['recorded']} responses "
+                f"to {self._writer.path}"
+            )
+        if self._reader is not None:
+            logger.info(
+                f"Archive: replayed {stats['replayed']} responses from "
+                f"{self._reader.path}, {stats['missing']} not in the archive"
+            )
+
+    def close(self) -> None:
+        """Finish the archive being recorded and drop the one being replayed."""
+        with self._lock:
+            writer, self._writer = self._writer, None
+            self._reader = None
+        if writer is not None:
+            writer.close()
+
+
+# Consulted by every request the pooled fetchers send
+crawl_archive = CrawlArchive()
+
+
+def configure_archive(
+    record: Optional[str] = None,
+    replay: Optional[str] = None,
+    latency: Union[float, str, None] = None,
+) -> None:
+    """Record the run into an archive, replay one, or neither."""
+    crawl_archive.reset(record, replay, latency)
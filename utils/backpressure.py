@@ -0,0 +1,198 @@
+"""
+Backpressure between the stages of a crawl.
+Listing pages produce books for the detail stage, which produces records for
+the output; new listing pages are held back while a later stage is over its
+high-water mark, and a page's books wait for room in the detail stage before
+they are submitted, so memory stays bounded when one stage falls behind.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Optional
+from utils.logger import logger
+
+STAGES = ("listing", "detail", "output")
+
+# Output records buffered behind a slow page before listing pages are held back
+DEFAULT_OUTPUT_HIGH_WATER = 1000
+
+
+def default_detail_high_water(max_workers: int) -> int:
+    """Return the default detail high-water mark for a number of workers.
+
+    Enough books to keep every worker busy while the next listing page
+    downloads, and never less than two listing pages' worth.
+    """
+    return max(40, 4 * max_workers)
+
+
+class StageQueue:
+    """Depth accounting of one pipeline stage."""
+
+    def __init__(self, name: str, high_water: int = 0):
+        self.name = name
+        self.high_water = max(0, high_water)
+        self.depth = 0
+        self.peak = 0
+        self.stalls = 0
+
+    @property
+    def full(self) -> bool:
+        """Whether the stage is at or over its high-water mark."""
+        return bool(self.high_water) and self.depth >= self.high_water
+
+    def observe(self, depth: int) -> None:
+        """Record the current depth of the stage."""
+        self.depth = depth
+        self.peak = max(self.peak, depth)
+
+
+def _keep_slot() -> None:
+    """Give back the slot of an unbounded stage."""
+
+
+class Backpressure:
+    """Bounds the detail stage and decides whether another listing page may start.
+
+    Every detail job takes a slot from ``detail_slot`` before it is
+    submitted and gives it back when it finishes, so the producer blocks
+    while ``detail_high_water`` books are queued or in flight. The crawl also
+    reports the depth of every stage each time it wants to fetch a listing
+    page; the page is held back while the detail or output stage is full,
+    unless nothing is in flight that could drain it.
+    """
+
+    def __init__(self, detail_high_water: int = 0, output_high_water: int = 0):
+        self.configure(detail_high_water, output_high_water)
+
+    def configure(self, detail_high_water: int, output_high_water: int) -> None:
+        """Set the high-water marks and clear the counters; 0 is unbounded.
+
+        Args:
+            detail_high_water (int): Books queued or in flight in the detail
+                stage before listing pages are held back.
+            output_high_water (int): Finished books waiting for an earlier page
+                before listing pages are held back.
+        """
+        self._lock = threading.Lock()
+        self._detail_slots = (
+            threading.Semaphore(detail_high_water) if detail_high_water > 0 else None
+        )
+        self._detail_slots_taken = 0
+        self.stages = {
+            "listing": StageQueue("listing"),
+            "detail": StageQueue("detail", detail_high_water),
+            "output": StageQueue("output", output_high_water),
+        }
+        self._blocked_by: Optional[str] = None
+
+    def admit(self, listing: int, detail: int, output: int) -> bool:
+        """Record the stage depths and decide whether a listing page may start.
+
+        Args:
+            listing (int): Listing pages in flight.
+            detail (int): Books queued or in flight in the detail stage.
+            output (int): Finished books buffered before the output.
+
+        Returns:
+            bool: True if the page may be fetched now.
+        """
+        with self._lock:
+            for name, depth in zip(STAGES, (listing, detail, output)):
+                self.stages[name].observe(depth)
+            full = next((stage for stage in self.stages.values() if stage.full), None)
+            # Nothing in flight could drain the full stage, so let one through
+            if full is None or (listing == 0 and detail == 0):
+                self._blocked_by = None
+                return True
+            if self._blocked_by != full.name:
+                self._blocked_by = full.name
+                full.stalls += 1
+                logger.debug(
+                    f"Backpressure: {full.name} stage at {full.depth}/"
+                    f"{full.high_water}, holding back listing pages"
+                )
+            return False
+
+    @property
+    def detail_high_water(self) -> int:
+        """Books allowed in the detail stage at once, 0 if unbounded."""
+        return self.stages["detail"].high_water
+
+    def record_stall(self, name: str) -> None:
+        """Count a producer that had to wait for room in a stage."""
+        with self._lock:
+            stage = self.stages[name]
+            stage.stalls += 1
+        logger.debug(
+            f"Backpressure: {name} stage at {stage.high_water}, waiting for room"
+        )
+
+    def detail_slot(
+        self, stop: Callable[[], bool] = lambda: False, poll: float = 0.1
+    ) -> Optional[Callable[[], None]]:
+        """Wait until the detail stage has room for one more book.
+
+        Args:
+            stop (Callable[[], bool], optional): Checked every ``poll``
+                seconds while waiting; waiting ends once it returns True.
+            poll (float, optional): Seconds between checks of ``stop``.
+                Defaults to 0.1.
+
+        Returns:
+            Optional[Callable[[], None]]: Gives the slot back; call it when the
+            book's job finished. None if ``stop`` ended the wait.
+        """
+        slots = self._detail_slots
+        if slots is None:
+            return _keep_slot
+        if not slots.acquire(blocking=False):
+            self.record_stall("detail")
+            while not slots.acquire(timeout=poll):
+                if stop():
+                    return None
+        stage = self.stages["detail"]
+        with self._lock:
+            self._detail_slots_taken += 1
+            stage.peak = max(stage.peak, self._detail_slots_taken)
+
+        def release() -> None:
+            with self._lock:
+                self._detail_slots_taken -= 1
+            slots.release()
+
+        return release
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return the current depth, peak, high-water mark and stalls per stage."""
+        with self._lock:
+            return {
+                name: {
+                    "depth": stage.depth,
+                    "peak": stage.peak,
+                    "high_water": stage.high_water,
+                    "stalls": stage.stalls,
+                }
+                for name, stage in self.stages.items()
+            }
+
+    def log_summary(self) -> None:
+        """Log the peak depth of every stage and how often it held the crawl back."""
+        parts = []
+        for name, stage in self.stats().items():
+            if stage["high_water"]:
+                parts.append(
+                    f"{name} peak {stage['peak']}/{stage['high_water']} "
+                    f"({stage['stalls']} stalls)"
+                )
+            else:
+                parts.append(f"{name} peak {stage['peak']}")
+        logger.info(f"Stage queues: {', '.join(parts)}")
+
+
+# Consulted by every page crawl before it fetches a listing or detail page
+backpressure = Backpressure()
+
+
+def configure_backpressure(detail_high_water: int, output_high_water: int) -> None:
+    """Set the run's high-water marks; 0 leaves a stage unbounded."""
+    backpressure.configure(detail_high_water, output_high_water)
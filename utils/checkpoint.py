@@ -0,0 +1,116 @@
+"""
+Checkpoint journal for resumable crawls.
+Finished books and listing pages are appended to a JSON Lines file in
+batches, so a crawl that is stopped can continue where it left off instead of
+starting again from page 1.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+from utils.logger import logger
+
+
+class CheckpointJournal:
+    """Append-only journal of completed listing pages and fetched books.
+
+    Entries are buffered and written ``flush_every`` at a time, or once
+    ``flush_interval`` seconds passed since the last write, so the
+    checkpointing cost stays small next to the requests themselves.
+    """
+
+    def __init__(self, path: str, flush_every: int = 50, flush_interval: float = 2.0):
+        self.path = path
+        self.flush_every = max(1, flush_every)
+        self.flush_interval = flush_interval
+        # Reentrant: the signal handler may flush while the main thread is
+        # already recording
+        self._lock = threading.RLock()
+        self._buffer: List[str] = []
+        self._last_flush = time.monotonic()
+        self._file: Optional[Any] = None
+        self.completed_pages: Set[int] = set()
+        self.books: Dict[str, Tuple[Tuple[int, ...], Dict[str, Any]]] = {}
+        self.writes = 0
+
+    def load(self) -> None:
+        """Read the pages and books recorded by an interrupted run, if any."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # The last batch may have been cut off mid-write
+                    logger.warning(
+                        f"Skipping truncated checkpoint entry in {self.path}"
+                    )
+                    continue
+                if entry["type"] == "page":
+                    self.completed_pages.add(entry["page"])
+                elif entry["type"] == "book":
+                    self.books[entry["url"]] = (tuple(entry["key"]), entry["book"])
+        logger.info(
+            f"Resuming from {self.path}: {len(self.completed_pages)} pages and "
+            f"{len(self.books)} books already done"
+        )
+
+    def restored_books(self) -> Dict[Any, Dict[str, Any]]:
+        """Return the journaled books by their position in the listing."""
+        return {key: book for key, book in self.books.values()}
+
+    def has_book(self, url: Optional[str]) -> bool:
+        """Whether the detail page of this URL was already fetched."""
+        return url is not None and url in self.books
+
+    def record_book(self, key: Tuple[int, ...], book: Dict[str, Any]) -> None:
+        """Journal a finished book under its listing position."""
+        url = book.get("detail_url")
+        if not url:
+            return
+        self._append({"type": "book", "url": url, "key": list(key), "book": book})
+
+    def record_page(self, page_num: int) -> None:
+        """Journal a listing page whose books are all finished."""
+        self._append({"type": "page", "page": page_num})
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        """Buffer an entry and write the batch when it is due."""
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            self._buffer.append(line)
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+            if len(self._buffer) >= self.flush_every or due:
+                self.flush()
+
+    def flush(self) -> None:
+        """Write and sync the buffered entries."""
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if not self._buffer:
+                return
+            lines, self._buffer = self._buffer, []
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write("\n".join(lines) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.writes += 1
+
+    def close(self) -> None:
+        """Write pending entries and close the file. Safe to call more than once."""
+        with self._lock:
+            self.flush()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def remove(self) -> None:
+        """Delete the journal once the crawl's output was saved."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+            logger.info(f"Crawl completed, removed checkpoint {self.path}")
@@ -0,0 +1,184 @@
+"""
+Adaptive concurrency limit for the detail stage.
+An AIMD controller that raises the number of in-flight requests while responses
+stay healthy and halves it on 429/5xx responses, errors or a rising p95 latency.
+"""
+
+import asyncio
+import contextlib
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional, Tuple
+from utils.logger import logger
+
+
+class Slot:
+    """An acquired concurrency slot; set ``status`` to report the outcome."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.status: Optional[int] = None
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit shared by worker threads or coroutines.
+
+    Every ``limit`` healthy responses the limit grows by one. A 429, a 5xx,
+    an exception, or a p95 latency above ``latency_tolerance`` times the best
+    p95 seen so far multiplies it by ``backoff_factor``. After a decrease the
+    responses of requests that were already in flight are ignored, so one
+    burst of failures only counts once.
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        initial_limit: Optional[int] = None,
+        min_limit: int = 1,
+        backoff_factor: float = 0.5,
+        latency_tolerance: float = 2.0,
+        latency_window: int = 50,
+    ):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        if initial_limit is None:
+            initial_limit = self.max_limit // 2
+        self.limit = min(self.max_limit, max(self.min_limit, initial_limit))
+        self.backoff_factor = backoff_factor
+        self.latency_tolerance = latency_tolerance
+
+        self._condition = threading.Condition()
+        self._async_waiters: Deque[asyncio.Future[None]] = deque()
+        self._latencies: Deque[float] = deque(maxlen=latency_window)
+        self._baseline_p95: Optional[float] = None
+        self._responses_since_change = 0
+        self._cooldown = 0
+        self._started = time.monotonic()
+        self.in_flight = 0
+        self.history: List[Tuple[float, int]] = [(0.0, self.limit)]
+
+    @contextlib.contextmanager
+    def slot(self) -> Iterator[Slot]:
+        """Hold a slot for one blocking request."""
+        with self._condition:
+            while self.in_flight >= self.limit:
+                self._condition.wait()
+            self.in_flight += 1
+
+        slot = Slot()
+        try:
+            yield slot
+        finally:
+            self._release(slot)
+
+    @contextlib.asynccontextmanager
+    async def async_slot(self) -> AsyncIterator[Slot]:
+        """Hold a slot for one request on the event loop."""
+        while True:
+            with self._condition:
+                if self.in_flight < self.limit:
+                    self.in_flight += 1
+                    break
+                waiter = asyncio.get_running_loop().create_future()
+                self._async_waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # Pass a wake-up this coroutine can no longer use on to the next
+                with self._condition:
+                    self._wake_async_waiters()
+                raise
+
+        slot = Slot()
+        try:
+            yield slot
+        finally:
+            self._release(slot)
+
+    def _release(self, slot: Slot) -> None:
+        """Free a slot and feed its outcome to the controller."""
+        latency = time.monotonic() - slot.started
+        with self._condition:
+            self.in_flight -= 1
+            self._record(latency, slot.status)
+            self._condition.notify_all()
+            self._wake_async_waiters()
+
+    def _wake_async_waiters(self) -> None:
+        """Wake as many waiting coroutines as there are free slots."""
+        free = self.limit - self.in_flight
+        while free > 0 and self._async_waiters:
+            waiter = self._async_waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def _record(self, latency: float, status: Optional[int]) -> None:
+        """Update the limit from one response. Called with the lock held."""
+        self._responses_since_change += 1
+        if self._cooldown:
+            self._cooldown -= 1
+            return
+        if status is None or status == 429 or status >= 500:
+            reason = "request error" if status is None else f"status {status}"
+            self._decrease(reason)
+            return
+
+        self._latencies.append(latency)
+        if self._responses_since_change < self.limit:
+            return
+
+        p95 = self._p95()
+        if self._baseline_p95 is None or p95 < self._baseline_p95:
+            self._baseline_p95 = p95
+        if p95 > self._baseline_p95 * self.latency_tolerance:
+            self._decrease(f"p95 latency {p95:.2f}s")
+        elif self.limit < self.max_limit:
+            self._set_limit(self.limit + 1, f"p95 latency {p95:.2f}s")
+        else:
+            self._responses_since_change = 0
+
+    def _decrease(self, reason: str) -> None:
+        """Multiplicatively lower the limit."""
+        new_limit = max(self.min_limit, math.floor(self.limit * self.backoff_factor))
+        self._latencies.clear()
+        # Requests already in flight were sent under the old limit
+        self._cooldown = self.in_flight
+        self._set_limit(new_limit, reason)
+
+    def _set_limit(self, new_limit: int, reason: str) -> None:
+        """Apply a new limit and record it in the history."""
+        self._responses_since_change = 0
+        if new_limit == self.limit:
+            return
+        logger.info(f"Adaptive concurrency: {self.limit} -> {new_limit} ({reason})")
+        self.limit = new_limit
+        self.history.append((time.monotonic() - self._started, new_limit))
+
+    def _p95(self) -> float:
+        """Return the 95th percentile of the recent latencies."""
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return a snapshot of the limiter state."""
+        with self._condition:
+            limits = [limit for _, limit in self.history]
+            return {
+                "limit": self.limit,
+                "min_seen": min(limits),
+                "max_seen": max(limits),
+                "changes": len(self.history) - 1,
+                "in_flight": self.in_flight,
+            }
+
+    def log_summary(self) -> None:
+        """Log the range of limits chosen during the run."""
+        stats = self.stats()
+        logger.info(
+            f"Adaptive concurrency: final limit {stats['limit']}, "
+            f"range {stats['min_seen']}-{stats['max_seen']}, "
+            f"{stats['changes']} changes"
+        )
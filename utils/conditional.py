@@ -0,0 +1,197 @@
+"""
+Conditional GET support for incremental re-crawls.
+Each page's validators (ETag and Last-Modified) are kept together with the
+record extracted from it, so a page that hasn't changed since the last run is
+answered with 304 Not Modified and its record is reused without downloading or
+parsing the body again.
+"""
+
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, Mapping, Optional, Tuple
+from utils.frontier import canonicalize_url
+from utils.logger import logger
+
+NOT_MODIFIED = 304
+
+
+class ValidatorStore:
+    """Per-URL validators and extracted records in a SQLite file, kept between runs."""
+
+    def __init__(self, path: str, commit_every: int = 100):
+        self.path = path
+        self.commit_every = commit_every
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS validators ("
+            " url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, record TEXT)"
+        )
+        self._uncommitted = 0
+
+    def get(self, key: str) -> Optional[Tuple[Optional[str], Optional[str], Any]]:
+        """Return the ETag, Last-Modified and record stored for a key, if any."""
+        row = self._conn.execute(
+            "SELECT etag, last_modified, record FROM validators WHERE url = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1], json.loads(row[2])
+
+    def put(
+        self, key: str, etag: Optional[str], last_modified: Optional[str], record: Any
+    ) -> None:
+        """Store the validators and record of a key, replacing older ones."""
+        self._conn.execute(
+            "INSERT OR REPLACE INTO validators (url, etag, last_modified, record) "
+            "VALUES (?, ?, ?, ?)",
+            (key, etag, last_modified, json.dumps(record, ensure_ascii=False)),
+        )
+        self._uncommitted += 1
+        if self._uncommitted >= self.commit_every:
+            self._conn.commit()
+            self._uncommitted = 0
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM validators").fetchone()[0]
+
+    def close(self) -> None:
+        """Commit pending entries and close the database."""
+        self._conn.commit()
+        self._conn.close()
+
+
+def _header(headers: Mapping[str, str], name: str) -> Optional[str]:
+    """Look up a response header case-insensitively."""
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+class ConditionalRequests:
+    """Thread-safe front end that builds conditional headers and counts 304s."""
+
+    def __init__(self, store: Optional[ValidatorStore] = None):
+        self._store = store
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.conditional = 0
+        self.not_modified = 0
+
+    def reset(self, store: Optional[ValidatorStore]) -> None:
+        """Close the current store and start over with a new one."""
+        self.close()
+        with self._lock:
+            self._store = store
+            self.requests = 0
+            self.conditional = 0
+            self.not_modified = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Whether validators are stored and sent at all."""
+        return self._store is not None
+
+    def request_headers(self, url: str) -> Dict[str, str]:
+        """Return the If-None-Match/If-Modified-Since headers for a request.
+
+        Validators are only sent for URLs whose record is stored, so a 304
+        can always be answered from the store.
+
+        Args:
+            url (str): The URL about to be fetched.
+
+        Returns:
+            Dict[str, str]: The conditional headers, empty if there are none.
+        """
+        with self._lock:
+            if self._store is None:
+                return {}
+            self.requests += 1
+            entry = self._store.get(canonicalize_url(url))
+            if entry is None:
+                return {}
+            etag, last_modified, _ = entry
+            headers = {}
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+            if headers:
+                self.conditional += 1
+            return headers
+
+    def remember(self, url: str, headers: Mapping[str, str], record: Any) -> None:
+        """Store the validators of a fetched page with the record extracted from it.
+
+        Pages served without an ETag or Last-Modified header aren't stored.
+
+        Args:
+            url (str): The URL of the page.
+            headers (Mapping[str, str]): The response headers.
+            record (Any): JSON-serializable data extracted from the page.
+        """
+        with self._lock:
+            if self._store is None:
+                return
+            etag = _header(headers, "etag")
+            last_modified = _header(headers, "last-modified")
+            if etag or last_modified:
+                self._store.put(canonicalize_url(url), etag, last_modified, record)
+
+    def reuse(self, url: str) -> Optional[Any]:
+        """Return the stored record of a page that answered 304 Not Modified.
+
+        Args:
+            url (str): The URL of the page.
+
+        Returns:
+            Optional[Any]: The record, or None if nothing is stored for it.
+        """
+        with self._lock:
+            if self._store is None:
+                return None
+            entry = self._store.get(canonicalize_url(url))
+            if entry is None:
+                return None
+            self.not_modified += 1
+            return entry[2]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the request counters and the 304 hit rate."""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "conditional": self.conditional,
+                "not_modified": self.not_modified,
+                "hit_rate": self.not_modified / self.requests if self.requests else 0.0,
+            }
+
+    def log_summary(self) -> None:
+        """Log how many requests were answered 304 Not Modified."""
+        if not self.enabled:
+            return
+        stats = self.stats()
+        logger.info(
+            f"Conditional GET: {stats['not_modified']} of {stats['requests']} "
+            f"requests answered 304 Not Modified ({stats['hit_rate']:.1%} hit rate), "
+            f"{stats['conditional']} sent validators"
+        )
+
+    def close(self) -> None:
+        """Close the store, if any."""
+        with self._lock:
+            if self._store is not None:
+                self._store.close()
+                self._store = None
+
+
+# Shared by the listing and detail fetches of a run
+conditional_requests = ConditionalRequests()
+
+
+def configure_conditional_requests(path: Optional[str]) -> None:
+    """Store validators in the given SQLite file, or disable conditional GET."""
+    conditional_requests.reset(ValidatorStore(path) if path else None)
@@ -0,0 +1,157 @@
+"""
+Detail enrichment policy.
+Decides which books get their detail page fetched: all of them, none (a
+listing-only crawl costs one request per listing page), or only the books an
+earlier output has no details for.
+"""
+
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from utils.frontier import canonicalize_url
+from utils.logger import logger
+
+DETAIL_MODES = ("all", "none", "missing")
+
+
+def has_details(book: Dict[str, Any]) -> bool:
+    """Whether a record was enriched from its detail page.
+
+    Every detail page carries a UPC, and a book whose detail fetch failed
+    keeps only its listing fields.
+    """
+    return bool(book.get("upc"))
+
+
+def load_existing_books(path: str) -> Dict[str, Dict[str, Any]]:
+    """Read an earlier output file, keyed by canonical detail URL.
+
+    Args:
+        path (str): The JSON output of an earlier run.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: The records, empty if the file is missing.
+
+    Raises:
+        OSError: If the file can't be read.
+        ValueError: If the file isn't a JSON array, e.g. truncated by a killed
+            run.
+    """
+    if not os.path.exists(path):
+        logger.warning(f"No earlier output at {path}, fetching every detail page")
+        return {}
+    with open(path, encoding="utf-8") as f:
+        books = json.load(f)
+    if not isinstance(books, list):
+        raise ValueError(f"{path} doesn't hold a JSON array of books")
+    return {
+        canonicalize_url(book["detail_url"]): book
+        for book in books
+        if book.get("detail_url")
+    }
+
+
+class DetailPolicy:
+    """Thread-safe decision of which books need a detail request."""
+
+    def __init__(
+        self, mode: str = "all", existing: Optional[Dict[str, Dict[str, Any]]] = None
+    ):
+        self.reset(mode, existing)
+
+    def reset(
+        self, mode: str, existing: Optional[Dict[str, Dict[str, Any]]] = None
+    ) -> None:
+        """Switch to a new mode and earlier output, clearing the counters."""
+        if mode not in DETAIL_MODES:
+            raise ValueError(f"Unknown details mode {mode!r}")
+        self._lock = threading.Lock()
+        self.mode = mode
+        self._existing = existing or {}
+        self.skipped = 0
+        self.reused = 0
+        self.fetched = 0
+
+    def finished(self, book_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Return the final record of a book that needs no detail request.
+
+        Args:
+            book_data (Dict[str, Any]): The listing data of the book.
+
+        Returns:
+            Optional[Dict[str, Any]]: The book as it goes to the output, or
+            None if its detail page must be fetched.
+        """
+        with self._lock:
+            if self.mode == "none":
+                self.skipped += 1
+                return book_data
+            url = book_data.get("detail_url")
+            if self.mode == "missing" and url:
+                earlier = self._existing.get(canonicalize_url(url))
+                if earlier is not None and has_details(earlier):
+                    self.reused += 1
+                    # Fresh listing fields, earlier detail fields
+                    return {**earlier, **book_data}
+            self.fetched += 1
+            return None
+
+    def split(
+        self, page_books: List[Tuple[int, Dict[str, Any]]]
+    ) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[Tuple[int, Dict[str, Any]]]]:
+        """Split a page's books into those to fetch and those already final.
+
+        Args:
+            page_books (List[Tuple[int, Dict[str, Any]]]): Position and
+                listing data of each book on the page.
+
+        Returns:
+            Tuple[List[Tuple[int, Dict[str, Any]]], List[Tuple[int, Dict[str, Any]]]]:
+            The books whose details must be fetched, and the final records
+            of the others, both with their positions.
+        """
+        to_fetch = []
+        finished = []
+        for position, book_data in page_books:
+            record = self.finished(book_data)
+            if record is None:
+                to_fetch.append((position, book_data))
+            else:
+                finished.append((position, record))
+        return to_fetch, finished
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the mode and how many books were fetched, reused or skipped."""
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "fetched": self.fetched,
+                "reused": self.reused,
+                "skipped": self.skipped,
+            }
+
+    def log_summary(self) -> None:
+        """Log how many detail requests the mode saved."""
+        stats = self.stats()
+        if stats["mode"] == "all":
+            return
+        logger.info(
+            f"Details ({stats['mode']}): {stats['fetched']} fetched, "
+            f"{stats['reused']} reused from the earlier output, "
+            f"{stats['skipped']} listing-only"
+        )
+
+
+# Consulted by every crawl mode before it queues a detail request
+detail_policy = DetailPolicy()
+
+
+def configure_details(mode: str, existing_path: Optional[str] = None) -> None:
+    """Set the run's details mode; "missing" reads the earlier output first."""
+    existing = (
+        load_existing_books(existing_path)
+        if mode == "missing" and existing_path
+        else None
+    )
+    detail_policy.reset(mode, existing)
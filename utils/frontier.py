@@ -0,0 +1,336 @@
+"""
+Deduplicating URL frontier.
+Remembers which detail URLs were already scheduled so a book that shows up
+twice on the listing pages is only fetched once. Optionally also remembers
+the books written by earlier runs, to skip them in the next one.
+"""
+
+import hashlib
+import math
+import os
+import posixpath
+import sqlite3
+import struct
+import threading
+from typing import Any, Dict, Optional, Set
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from utils.logger import logger
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def canonicalize_url(url: str) -> str:
+    """Normalize a URL so equivalent spellings map to the same key.
+
+    Lower-cases the scheme and host, drops default ports and fragments,
+    resolves ``.``/``..`` path segments and sorts the query parameters.
+
+    Args:
+        url (str): The URL to normalize.
+
+    Returns:
+        str: The canonical form of the URL.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and DEFAULT_PORTS.get(scheme) != parts.port:
+        host = f"{host}:{parts.port}"
+
+    path = parts.path or "/"
+    normalized = posixpath.normpath(path)
+    if path.endswith("/") and not normalized.endswith("/"):
+        normalized += "/"
+
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, normalized, query, ""))
+
+
+class MemoryFrontier:
+    """Exact in-memory set of seen keys, for a single run."""
+
+    def __init__(self):
+        self._seen: Set[str] = set()
+
+    def add(self, key: str) -> bool:
+        """Add a key, returning True if it wasn't seen before."""
+        if key in self._seen:
+            return False
+        self._seen.add(key)
+        return True
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._seen
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def close(self) -> None:
+        """Nothing to persist."""
+
+    def discard(self) -> None:
+        """Nothing to drop."""
+
+
+class BloomFrontier:
+    """Bloom filter of seen keys with a fixed memory footprint.
+
+    False positives (a new URL reported as seen) happen at roughly
+    ``error_rate`` once ``capacity`` keys were added; false negatives never
+    do. If ``path`` is given the filter is loaded from and saved to it, so
+    it carries over between runs.
+    """
+
+    # Bit count, hash count and number of keys added
+    _HEADER = struct.Struct("!QIQ")
+
+    def __init__(
+        self,
+        capacity: int = 1_000_000,
+        error_rate: float = 0.001,
+        path: Optional[str] = None,
+    ):
+        self.path = path
+        self.size = max(
+            8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self._count = 0
+        if path and os.path.exists(path):
+            self._load(path)
+
+    def _load(self, path: str) -> None:
+        """Load a filter saved by a previous run."""
+        with open(path, "rb") as f:
+            header = f.read(self._HEADER.size)
+            bits = f.read()
+        if len(header) != self._HEADER.size:
+            logger.warning(f"Ignoring corrupt bloom filter at {path}")
+            return
+        size, hash_count, count = self._HEADER.unpack(header)
+        if len(bits) != (size + 7) // 8:
+            logger.warning(f"Ignoring corrupt bloom filter at {path}")
+            return
+        self.size, self.hash_count, self._bits = size, hash_count, bytearray(bits)
+        self._count = count
+
+    def _positions(self, key: str):
+        """Yield the bit positions of a key using double hashing."""
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = struct.unpack("!QQ", digest)
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def __contains__(self, key: str) -> bool:
+        return all(
+            self._bits[position // 8] & (1 << position % 8)
+            for position in self._positions(key)
+        )
+
+    def add(self, key: str) -> bool:
+        """Add a key, returning True if it (probably) wasn't seen before."""
+        is_new = False
+        for position in self._positions(key):
+            byte, bit = divmod(position, 8)
+            if not self._bits[byte] & (1 << bit):
+                self._bits[byte] |= 1 << bit
+                is_new = True
+        if is_new:
+            self._count += 1
+        return is_new
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self) -> None:
+        """Save the filter atomically if it has a path."""
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self._HEADER.pack(self.size, self.hash_count, self._count))
+            f.write(self._bits)
+        os.replace(tmp_path, self.path)
+
+    def discard(self) -> None:
+        """Leave the saved filter as it was before this run."""
+
+
+class SqliteFrontier:
+    """Exact on-disk set of seen keys backed by SQLite.
+
+    An empty ``path`` gives a temporary database that SQLite deletes on
+    close. ``commit_every`` None defers every commit to ``close``, so keys
+    are only kept if the run finished.
+    """
+
+    def __init__(self, path: str = "", commit_every: Optional[int] = 100):
+        self.path = path
+        self.commit_every = commit_every
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS seen (url TEXT PRIMARY KEY)")
+        self._uncommitted = 0
+
+    def add(self, key: str) -> bool:
+        """Add a key, returning True if it wasn't seen before."""
+        cursor = self._conn.execute(
+            "INSERT OR IGNORE INTO seen (url) VALUES (?)", (key,)
+        )
+        if cursor.rowcount:
+            self._uncommitted += 1
+            if self.commit_every and self._uncommitted >= self.commit_every:
+                self._conn.commit()
+                self._uncommitted = 0
+        return cursor.rowcount == 1
+
+    def __contains__(self, key: str) -> bool:
+        query = "SELECT 1 FROM seen WHERE url = ?"
+        return self._conn.execute(query, (key,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+
+    def close(self) -> None:
+        """Commit pending keys and close the database."""
+        self._conn.commit()
+        self._conn.close()
+
+    def discard(self) -> None:
+        """Roll back the keys not committed yet and close the database."""
+        self._conn.rollback()
+        self._conn.close()
+
+
+class DedupFrontier:
+    """Thread-safe front end that canonicalizes URLs and counts duplicates.
+
+    ``backend`` holds the URLs scheduled in this run. The optional ``store``
+    holds the URLs of books written by earlier runs; a URL only goes into it
+    once its book reached the output, so a detail fetch that failed or was
+    interrupted is tried again by the next run.
+    """
+
+    def __init__(self, backend: Optional[Any] = None, store: Optional[Any] = None):
+        self._backend = backend
+        self._store = store
+        self._lock = threading.Lock()
+        self.unique = 0
+        self.duplicates = 0
+
+    def reset(self, backend: Optional[Any], store: Optional[Any] = None) -> None:
+        """Close the current backends and start over with new ones."""
+        self.close()
+        with self._lock:
+            self._backend = backend
+            self._store = store
+            self.unique = 0
+            self.duplicates = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Whether URLs are deduplicated at all."""
+        return self._backend is not None
+
+    def seen_before(self, url: Optional[str]) -> bool:
+        """Record a URL, returning True if it was already in the frontier."""
+        if not url:
+            return False
+        key = canonicalize_url(url)
+        with self._lock:
+            if self._backend is None:
+                return False
+            written = self._store is not None and key in self._store
+            if not written and self._backend.add(key):
+                self.unique += 1
+                return False
+            self.duplicates += 1
+            return True
+
+    def mark_written(self, url: Optional[str]) -> None:
+        """Record that a URL's book is in the output, for the next run."""
+        if not url:
+            return
+        key = canonicalize_url(url)
+        with self._lock:
+            if self._store is not None:
+                self._store.add(key)
+
+    def stats(self) -> Dict[str, int]:
+        """Return new and duplicate URL counts for this run."""
+        with self._lock:
+            return {"unique": self.unique, "duplicates": self.duplicates}
+
+    def log_summary(self) -> None:
+        """Log how many URLs were new and how many were skipped."""
+        if not self.enabled:
+            return
+        stats = self.stats()
+        logger.info(
+            f"URL frontier: {stats['unique']} new detail URLs, "
+            f"{stats['duplicates']} duplicates skipped"
+        )
+
+    def close(self, persist: bool = True) -> None:
+        """Release the backends. Safe to call more than once.
+
+        Args:
+            persist (bool, optional): Save the books written by this run to
+                the store; False leaves it as the previous run left it, for
+                runs whose output wasn't saved. Defaults to True.
+        """
+        with self._lock:
+            if self._backend is not None:
+                self._backend.close()
+                self._backend = None
+            if self._store is not None:
+                if persist:
+                    self._store.close()
+                else:
+                    self._store.discard()
+                self._store = None
+
+
+def create_frontier_backend(kind: str, path: Optional[str] = None) -> Any:
+    """Build a frontier backend by name.
+
+    Args:
+        kind (str): "memory", "bloom" or "sqlite".
+        path (str, optional): File the backend is loaded from and saved to,
+            for "bloom" and "sqlite". Without one "sqlite" uses a temporary
+            database. A "memory" frontier can't be saved.
+
+    Returns:
+        Any: The backend.
+    """
+    if kind == "memory":
+        if path:
+            raise ValueError("The memory frontier can't be kept in a file")
+        return MemoryFrontier()
+    if kind == "bloom":
+        return BloomFrontier(path=path)
+    if kind == "sqlite":
+        # Keys of a kept frontier are committed when the run's output is saved
+        return SqliteFrontier(path or "", commit_every=None if path else 100)
+    raise ValueError(f"Unknown frontier kind: {kind}")
+
+
+# Global frontier; deduplication is off until configured
+frontier = DedupFrontier()
+
+
+def configure_frontier(kind: Optional[str], path: Optional[str] = None) -> None:
+    """Give the global frontier new backends, closing the previous ones.
+
+    Args:
+        kind (str, optional): Backend kind, None disables deduplication.
+        path (str, optional): File keeping the books written by earlier runs,
+            which are skipped. Defaults to None (deduplicate within the run).
+    """
+    if not kind:
+        frontier.reset(None)
+        return
+    store = create_frontier_backend(kind, path) if path else None
+    frontier.reset(create_frontier_backend(kind), store)
@@ -0,0 +1,232 @@
+"""
+Hedged requests for tail latency.
+When a request is still running after a high percentile of the latencies seen
+so far, a duplicate is sent and whichever succeeds first wins. Hedges are
+capped at a small share of all requests.
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+import time
+from collections import deque
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+from utils.logger import logger
+
+T = TypeVar("T")
+
+
+def succeeded(result: Any) -> bool:
+    """Whether a response may win the race; error statuses only as a fallback."""
+    status = getattr(result, "status", None)
+    return not isinstance(status, int) or status < 400
+
+
+class Hedger:
+    """Sends a backup request when the first one is slower than usual."""
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        max_hedge_ratio: float = 0.05,
+        min_samples: int = 20,
+        window: int = 500,
+        max_workers: int = 10,
+        max_hedges: Optional[int] = None,
+    ):
+        self.percentile = percentile
+        self.max_hedge_ratio = max_hedge_ratio
+        self.min_samples = min_samples
+        # Backups in flight at once; the connection pool needs room for them
+        # on top of the primaries, or they queue behind the stragglers
+        self.max_hedges = max_workers if max_hedges is None else max(1, max_hedges)
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+        # Primary and backup requests both need a thread of their own
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers + self.max_hedges, thread_name_prefix="hedge"
+        )
+        self.requests = 0
+        self.hedges = 0
+        self.hedges_in_flight = 0
+        self.hedge_wins = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        """Return the latency after which a request gets a backup, if known yet."""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        return ordered[index]
+
+    def _start(self) -> None:
+        """Count a new request."""
+        with self._lock:
+            self.requests += 1
+
+    def _allow_hedge(self) -> bool:
+        """Spend a hedge if they are still under the configured share of traffic.
+
+        A hedge is also refused while ``max_hedges`` backups are in flight.
+        """
+        with self._lock:
+            if (
+                self.hedges < self.max_hedge_ratio * self.requests
+                and self.hedges_in_flight < self.max_hedges
+            ):
+                self.hedges += 1
+                self.hedges_in_flight += 1
+                return True
+            return False
+
+    def _hedge_done(self, _: Any = None) -> None:
+        """Free the slot of a backup that finished or was cancelled."""
+        with self._lock:
+            self.hedges_in_flight -= 1
+
+    def _record(self, started: float, hedge_won: bool = False) -> None:
+        """Record the latency the caller observed."""
+        with self._lock:
+            self._latencies.append(time.monotonic() - started)
+            if hedge_won:
+                self.hedge_wins += 1
+
+    def call(self, fetch: Callable[[], T]) -> T:
+        """Run a blocking fetch, hedging it if it becomes a straggler.
+
+        Args:
+            fetch (Callable[[], T]): Sends one request.
+
+        Returns:
+            T: The result of whichever request succeeded first. An error
+            status or exception is only returned when neither succeeded.
+        """
+        self._start()
+        started = time.monotonic()
+        primary = self._executor.submit(fetch)
+
+        delay = self.hedge_delay()
+        try:
+            result = primary.result(timeout=delay)
+        except concurrent.futures.TimeoutError:
+            if not self._allow_hedge():
+                result = primary.result()
+            else:
+                logger.debug(f"Hedging request still running after {delay:.2f}s")
+                backup = self._executor.submit(fetch)
+                backup.add_done_callback(self._hedge_done)
+                result, winner = self._first_success([primary, backup])
+                self._record(started, hedge_won=winner is backup)
+                return result
+
+        self._record(started)
+        return result
+
+    @staticmethod
+    def _first_success(
+        futures: List[concurrent.futures.Future[T]],
+    ) -> Tuple[T, concurrent.futures.Future[T]]:
+        """Return the first successful result and drop the other.
+
+        A fast 429 or 5xx must not beat a slower 200, so error statuses are
+        kept aside like exceptions and returned only if nothing succeeds.
+        """
+        error: Optional[BaseException] = None
+        fallback: Optional[concurrent.futures.Future[T]] = None
+        for future in concurrent.futures.as_completed(futures):
+            if future.exception() is not None:
+                error = error or future.exception()
+            elif not succeeded(future.result()):
+                fallback = fallback or future
+            else:
+                for other in futures:
+                    # A request already on the wire can't be interrupted from
+                    # another thread; its result is simply discarded
+                    other.cancel()
+                return future.result(), future
+        if fallback is not None:
+            return fallback.result(), fallback
+        assert error is not None
+        raise error
+
+    async def call_async(self, fetch: Callable[[], Awaitable[T]]) -> T:
+        """Run an async fetch, hedging it if it becomes a straggler.
+
+        Args:
+            fetch (Callable[[], Awaitable[T]]): Sends one request.
+
+        Returns:
+            T: The result of whichever request succeeded first; the other
+            request is cancelled. An error status or exception is only
+            returned when neither succeeded.
+        """
+        self._start()
+        started = time.monotonic()
+        primary: asyncio.Future[T] = asyncio.ensure_future(fetch())
+        tasks = [primary]
+        try:
+            delay = self.hedge_delay()
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and self._allow_hedge():
+                logger.debug(f"Hedging request still running after {delay:.2f}s")
+                backup = asyncio.ensure_future(fetch())
+                backup.add_done_callback(self._hedge_done)
+                tasks.append(backup)
+
+            error: Optional[BaseException] = None
+            fallback: Optional[asyncio.Future[T]] = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is not None:
+                        error = error or task.exception()
+                    elif not succeeded(task.result()):
+                        fallback = fallback or task
+                    else:
+                        self._record(started, hedge_won=task is not primary)
+                        return task.result()
+            if fallback is not None:
+                self._record(started, hedge_won=fallback is not primary)
+                return fallback.result()
+            assert error is not None
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return request, hedge and hedge-win counts."""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "hedge_ratio": self.hedges / self.requests if self.requests else 0.0,
+            }
+
+    def log_summary(self) -> None:
+        """Log how many requests were hedged and how often the hedge won."""
+        stats = self.stats()
+        logger.info(
+            f"Hedged requests: {stats['hedges']} of {stats['requests']} "
+            f"({stats['hedge_ratio']:.1%}), {stats['hedge_wins']} won by the hedge"
+        )
+
+    def shutdown(self) -> None:
+        """Stop the hedging threads without waiting for discarded requests."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
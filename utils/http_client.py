@@ -0,0 +1,520 @@
+"""
+Connection-pooled HTTP fetchers.
+Drop-in replacements for scrapling's Fetcher and AsyncFetcher that send every
+request through one shared keep-alive client instead of opening a fresh
+connection (and TCP/TLS handshake) per request. Every request is answered
+from the replayed archive or the response cache when possible and paced by the
+global per-host rate limiter otherwise, and written to the recorded archive.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import httpx
+from scrapling.engines.toolbelt import (
+    Response,
+    generate_convincing_referer,
+    generate_headers,
+)
+from scrapling.fetchers import AsyncFetcher, Fetcher
+from utils.archive import ArchivedResponse, crawl_archive
+from utils.rate_limiter import rate_limiter
+from utils.response_cache import CachedResponse, offline_miss, response_cache
+
+DEFAULT_POOL_SIZE = 10
+
+
+class ConnectionStats:
+    """Thread-safe counters describing how well connections are reused.
+
+    Also keeps the latency of every request that reached the network, for
+    percentiles at the end of a run.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.tls_handshakes = 0
+        self._latencies: List[float] = []
+
+    def record_request(self) -> None:
+        """Count one request sent through the pool."""
+        with self._lock:
+            self.requests += 1
+
+    def record_event(self, event_name: str) -> None:
+        """Count connection set-up events reported by the httpx trace hook."""
+        with self._lock:
+            if event_name == "connection.connect_tcp.complete":
+                self.new_connections += 1
+            elif event_name == "connection.start_tls.complete":
+                self.tls_handshakes += 1
+
+    def record_latency(self, seconds: float) -> None:
+        """Keep the time one request took, from sending to the full body."""
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def latency_percentiles(
+        self, percentiles: Sequence[float] = (50, 95, 99)
+    ) -> Dict[str, float]:
+        """Return request latency percentiles in seconds, e.g. ``{"p50": 0.02}``.
+
+        Empty until a request reached the network.
+        """
+        with self._lock:
+            ordered = sorted(self._latencies)
+        if not ordered:
+            return {}
+        return {
+            f"p{p:g}": ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+            for p in percentiles
+        }
+
+    def reset(self) -> None:
+        """Reset all counters."""
+        with self._lock:
+            self.requests = 0
+            self.new_connections = 0
+            self.tls_handshakes = 0
+            self._latencies = []
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the counters and the connection reuse ratio."""
+        with self._lock:
+            reused = max(self.requests - self.new_connections, 0)
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "tls_handshakes": self.tls_handshakes,
+                "reused_connections": reused,
+                "reuse_ratio": reused / self.requests if self.requests else 0.0,
+            }
+
+
+# Shared by the sync and async fetchers so a run reports one set of numbers
+connection_stats = ConnectionStats()
+
+
+def _trace(event_name: str, info: Dict[str, Any]) -> None:
+    """httpx trace hook for the sync client."""
+    connection_stats.record_event(event_name)
+
+
+async def _async_trace(event_name: str, info: Dict[str, Any]) -> None:
+    """httpx trace hook for the async client."""
+    connection_stats.record_event(event_name)
+
+
+def _build_headers(
+    url: str, stealthy_headers: bool, headers: Optional[Dict[str, str]]
+) -> Dict[str, str]:
+    """Build request headers the same way scrapling's static engine does."""
+    headers = dict(headers or {})
+    headers_keys = set(map(str.lower, headers.keys()))
+
+    if stealthy_headers:
+        extra_headers = generate_headers(browser_mode=False)
+        # Don't overwrite user supplied headers
+        headers.update(
+            {
+                key: value
+                for key, value in extra_headers.items()
+                if key.lower() not in headers_keys
+            }
+        )
+        if "referer" not in headers_keys:
+            headers["referer"] = generate_convincing_referer(url)
+    elif "user-agent" not in headers_keys:
+        headers["User-Agent"] = generate_headers(browser_mode=False)["User-Agent"]
+
+    return headers
+
+
+def _from_stored(stored: Union[CachedResponse, ArchivedResponse]) -> httpx.Response:
+    """Rebuild an httpx response from a cached or archived one."""
+    return httpx.Response(
+        stored.status,
+        headers=stored.headers,
+        content=stored.body,
+        request=httpx.Request("GET", stored.url),
+    )
+
+
+def _offline_response(url: str) -> httpx.Response:
+    """The response to a request that isn't cached in offline mode."""
+    status, headers, body = offline_miss(url)
+    return httpx.Response(
+        status, headers=headers, content=body, request=httpx.Request("GET", url)
+    )
+
+
+def _cache_response(
+    url: str, headers: Dict[str, str], response: httpx.Response
+) -> httpx.Response:
+    """Store a successful response in the response cache."""
+    if response.status_code == 200 and response_cache.enabled:
+        response_cache.put(
+            url,
+            headers,
+            response.status_code,
+            response.headers,
+            response.content,
+            response_url=str(response.url),
+        )
+    return response
+
+
+def _archive_response(
+    url: str, headers: Dict[str, str], response: httpx.Response, elapsed: float
+) -> httpx.Response:
+    """Write a response to the archive being recorded, if any."""
+    if crawl_archive.recording:
+        crawl_archive.record(
+            url,
+            headers,
+            response.status_code,
+            response.reason_phrase,
+            response.headers,
+            response.content,
+            elapsed,
+            response_url=str(response.url),
+        )
+    return response
+
+
+def _archive_proxied(url: str, response: Response, elapsed: float) -> Response:
+    """Write a response fetched through a proxy to the recorded archive, if any."""
+    if crawl_archive.recording:
+        crawl_archive.record(
+            url,
+            response.request_headers,
+            response.status,
+            response.reason,
+            response.headers,
+            # scrapling keeps the parsed page, not the bytes it received
+            str(response.body).encode("utf-8"),
+            elapsed,
+            response_url=response.url,
+        )
+    return response
+
+
+def _to_response(
+    response: httpx.Response, adaptor_arguments: Dict[str, Any]
+) -> Response:
+    """Convert an httpx response into scrapling's Response."""
+    return Response(
+        url=str(response.url),
+        text=response.text,
+        body=response.content,
+        status=response.status_code,
+        reason=response.reason_phrase,
+        encoding=response.encoding or "utf-8",
+        cookies=dict(response.cookies),
+        headers=dict(response.headers),
+        request_headers=dict(response.request.headers),
+        method=response.request.method,
+        history=[_to_response(r, adaptor_arguments) for r in response.history],
+        **adaptor_arguments,
+    )
+
+
+class RawPage:
+    """An unparsed response: just what's needed to parse it somewhere else.
+
+    Unlike scrapling's ``Response`` it is cheap to build and can be pickled,
+    so the HTML can be sent to another process for parsing.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        status: int,
+        body: bytes,
+        encoding: str = "utf-8",
+        headers: Optional[Dict[str, str]] = None,
+    ):
+        self.url = url
+        self.status = status
+        self.body = body
+        self.encoding = encoding
+        self.headers = headers or {}
+
+    @classmethod
+    def from_httpx(cls, response: httpx.Response) -> "RawPage":
+        """Wrap an httpx response without decoding or parsing it."""
+        return cls(
+            url=str(response.url),
+            status=response.status_code,
+            body=response.content,
+            encoding=response.encoding or "utf-8",
+            headers=dict(response.headers),
+        )
+
+
+def _limits(pool_size: int) -> httpx.Limits:
+    """Connection limits for a pool of the given size."""
+    return httpx.Limits(
+        max_connections=pool_size,
+        max_keepalive_connections=pool_size,
+        keepalive_expiry=30.0,
+    )
+
+
+class PooledFetcher(Fetcher):
+    """Scrapling ``Fetcher`` that reuses one keep-alive ``httpx.Client``."""
+
+    pool_size: int = DEFAULT_POOL_SIZE
+    retries: int = 3
+    _client: Optional[httpx.Client] = None
+    _client_lock = threading.Lock()
+
+    @classmethod
+    def configure_pool(cls, pool_size: int, retries: int = 3) -> None:
+        """Size the shared connection pool, usually to match ``--threads``."""
+        cls.close()
+        cls.pool_size = max(1, pool_size)
+        cls.retries = retries
+
+    @classmethod
+    def _get_client(cls) -> httpx.Client:
+        """Return the shared client, creating it on first use."""
+        with cls._client_lock:
+            if cls._client is None:
+                cls._client = httpx.Client(
+                    transport=httpx.HTTPTransport(
+                        retries=cls.retries, limits=_limits(cls.pool_size)
+                    )
+                )
+            return cls._client
+
+    @classmethod
+    def close(cls) -> None:
+        """Close the shared client and its connections."""
+        with cls._client_lock:
+            if cls._client is not None:
+                cls._client.close()
+                cls._client = None
+
+    @classmethod
+    def get(
+        cls,
+        url: str,
+        follow_redirects: bool = True,
+        timeout: Optional[Union[int, float]] = 10,
+        stealthy_headers: bool = True,
+        proxy: Optional[str] = None,
+        retries: Optional[int] = 3,
+        custom_config: Optional[Dict] = None,
+        **kwargs: Any,
+    ) -> Response:
+        """Make an HTTP GET request through the shared connection pool.
+
+        Accepts the same arguments as scrapling's ``Fetcher.get``. Requests
+        through a proxy fall back to scrapling's one-off client, uncached,
+        unless an archive is being replayed.
+        """
+        if proxy and not crawl_archive.replaying:
+            rate_limiter.acquire(url)
+            start = time.perf_counter()
+            proxied = super().get(
+                url,
+                follow_redirects=follow_redirects,
+                timeout=timeout,
+                stealthy_headers=stealthy_headers,
+                proxy=proxy,
+                retries=retries,
+                custom_config=custom_config or {},
+                **kwargs,
+            )
+            return _archive_proxied(url, proxied, time.perf_counter() - start)
+
+        adaptor_arguments = {
+            **cls._generate_parser_arguments(),
+            **(custom_config or {}),
+        }
+        response = cls._send(url, follow_redirects, timeout, stealthy_headers, kwargs)
+        return _to_response(response, adaptor_arguments)
+
+    @classmethod
+    def get_raw(
+        cls,
+        url: str,
+        follow_redirects: bool = True,
+        timeout: Optional[Union[int, float]] = 10,
+        stealthy_headers: bool = True,
+        **kwargs: Any,
+    ) -> RawPage:
+        """Make an HTTP GET request and return the body without parsing it.
+
+        Same as ``get`` minus proxies and parser options, for callers that
+        parse the page later, e.g. in a process pool.
+        """
+        response = cls._send(url, follow_redirects, timeout, stealthy_headers, kwargs)
+        return RawPage.from_httpx(response)
+
+    @classmethod
+    def _send(
+        cls,
+        url: str,
+        follow_redirects: bool,
+        timeout: Optional[Union[int, float]],
+        stealthy_headers: bool,
+        kwargs: Dict[str, Any],
+    ) -> httpx.Response:
+        """Send one GET request through the archive, the cache and the shared client."""
+        headers = _build_headers(url, stealthy_headers, kwargs.pop("headers", None))
+        if crawl_archive.replaying:
+            archived, delay = crawl_archive.replay(url, headers)
+            if delay > 0:
+                time.sleep(delay)
+            return _from_stored(archived)
+        cached = response_cache.get(url, headers)
+        if cached is not None:
+            return _archive_response(url, headers, _from_stored(cached), 0.0)
+        if response_cache.offline:
+            return _archive_response(url, headers, _offline_response(url), 0.0)
+        rate_limiter.acquire(url)
+        connection_stats.record_request()
+        start = time.perf_counter()
+        response = cls._get_client().get(
+            url,
+            headers=headers,
+            follow_redirects=follow_redirects,
+            timeout=timeout,
+            extensions={"trace": _trace},
+            **kwargs,
+        )
+        elapsed = time.perf_counter() - start
+        connection_stats.record_latency(elapsed)
+        return _archive_response(
+            url, headers, _cache_response(url, headers, response), elapsed
+        )
+
+
+class PooledAsyncFetcher(AsyncFetcher):
+    """Scrapling ``AsyncFetcher`` that reuses one keep-alive ``httpx.AsyncClient``.
+
+    An async client is bound to the event loop it was created on, so call
+    ``aclose`` before that loop ends.
+    """
+
+    _client: Optional[httpx.AsyncClient] = None
+
+    @classmethod
+    def _get_client(cls) -> httpx.AsyncClient:
+        """Return the shared async client, creating it on first use."""
+        if cls._client is None:
+            cls._client = httpx.AsyncClient(
+                transport=httpx.AsyncHTTPTransport(
+                    retries=PooledFetcher.retries,
+                    limits=_limits(PooledFetcher.pool_size),
+                )
+            )
+        return cls._client
+
+    @classmethod
+    async def aclose(cls) -> None:
+        """Close the shared async client and its connections."""
+        if cls._client is not None:
+            client, cls._client = cls._client, None
+            await client.aclose()
+
+    @classmethod
+    async def get(  # type: ignore[override]
+        cls,
+        url: str,
+        follow_redirects: bool = True,
+        timeout: Optional[Union[int, float]] = 10,
+        stealthy_headers: bool = True,
+        proxy: Optional[str] = None,
+        retries: Optional[int] = 3,
+        custom_config: Optional[Dict] = None,
+        **kwargs: Any,
+    ) -> Response:
+        """Make an async HTTP GET request through the shared connection pool.
+
+        Accepts the same arguments as scrapling's ``AsyncFetcher.get``.
+        Requests through a proxy fall back to scrapling's one-off client,
+        uncached, unless an archive is being replayed.
+        """
+        if proxy and not crawl_archive.replaying:
+            await rate_limiter.acquire_async(url)
+            start = time.perf_counter()
+            proxied = await super().get(
+                url,
+                follow_redirects=follow_redirects,
+                timeout=timeout,
+                stealthy_headers=stealthy_headers,
+                proxy=proxy,
+                retries=retries,
+                custom_config=custom_config or {},
+                **kwargs,
+            )
+            return _archive_proxied(url, proxied, time.perf_counter() - start)
+
+        adaptor_arguments = {
+            **cls._generate_parser_arguments(),
+            **(custom_config or {}),
+        }
+        response = await cls._send(
+            url, follow_redirects, timeout, stealthy_headers, kwargs
+        )
+        return _to_response(response, adaptor_arguments)
+
+    @classmethod
+    async def get_raw(
+        cls,
+        url: str,
+        follow_redirects: bool = True,
+        timeout: Optional[Union[int, float]] = 10,
+        stealthy_headers: bool = True,
+        **kwargs: Any,
+    ) -> RawPage:
+        """Make an async HTTP GET request and return the body without parsing it."""
+        response = await cls._send(
+            url, follow_redirects, timeout, stealthy_headers, kwargs
+        )
+        return RawPage.from_httpx(response)
+
+    @classmethod
+    async def _send(
+        cls,
+        url: str,
+        follow_redirects: bool,
+        timeout: Optional[Union[int, float]],
+        stealthy_headers: bool,
+        kwargs: Dict[str, Any],
+    ) -> httpx.Response:
+        """Send one async GET request through the archive, the cache and the shared client."""
+        headers = _build_headers(url, stealthy_headers, kwargs.pop("headers", None))
+        if crawl_archive.replaying:
+            archived, delay = crawl_archive.replay(url, headers)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            return _from_stored(archived)
+        cached = response_cache.get(url, headers)
+        if cached is not None:
+            return _archive_response(url, headers, _from_stored(cached), 0.0)
+        if response_cache.offline:
+            return _archive_response(url, headers, _offline_response(url), 0.0)
+        await rate_limiter.acquire_async(url)
+        connection_stats.record_request()
+        start = time.perf_counter()
+        response = await cls._get_client().get(
+            url,
+            headers=headers,
+            follow_redirects=follow_redirects,
+            timeout=timeout,
+            extensions={"trace": _async_trace},
+            **kwargs,
+        )
+        elapsed = time.perf_counter() - start
+        connection_stats.record_latency(elapsed)
+        return _archive_response(
+            url, headers, _cache_response(url, headers, response), elapsed
+        )
@@ -0,0 +1,232 @@
+"""
+Cover image download stage.
+Covers are fetched on their own small thread pool, so image traffic can't take
+the workers the detail pages need, and stored under the SHA-256 of their
+content: a cover already stored, by URL or by content, is never written twice.
+"""
+
+import collections
+import concurrent.futures
+import hashlib
+import json
+import os
+import posixpath
+import threading
+from typing import Any, Callable, Dict, Iterator, Optional
+from urllib.parse import urlparse
+from utils.logger import logger
+
+DEFAULT_IMAGE_CONCURRENCY = 4
+
+# Name of the URL index kept next to the stored images
+INDEX_FILENAME = "index.jsonl"
+
+
+def image_extension(url: str) -> str:
+    """Return the file extension of an image URL, ``.jpg`` if it has none."""
+    extension = posixpath.splitext(urlparse(url).path)[1].lower()
+    return extension if 1 < len(extension) <= 5 else ".jpg"
+
+
+class ImageStore:
+    """Content-addressed image files plus an index of the URLs already stored.
+
+    An image is written to ``<directory>/<first two hex digits>/<sha256><ext>``;
+    the index (a JSON Lines file in the same directory) maps each downloaded
+    URL to its file so later runs skip the request altogether.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._urls: Dict[str, str] = {}
+        self.stored = 0
+        self.deduplicated = 0
+        self.bytes_written = 0
+        os.makedirs(directory, exist_ok=True)
+        self._index_path = os.path.join(directory, INDEX_FILENAME)
+        self._load_index()
+
+    def _load_index(self) -> None:
+        """Read the URLs stored by earlier runs whose file still exists."""
+        if not os.path.exists(self._index_path):
+            return
+        with open(self._index_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                path = os.path.join(self.directory, entry["file"])
+                if os.path.exists(path):
+                    self._urls[entry["url"]] = path
+
+    def lookup(self, url: str) -> Optional[str]:
+        """Return the local path of an image URL that was already stored."""
+        with self._lock:
+            return self._urls.get(url)
+
+    def put(self, url: str, content: bytes) -> str:
+        """Store downloaded image content and index its URL.
+
+        Args:
+            url (str): The URL the image was downloaded from.
+            content (bytes): The image bytes.
+
+        Returns:
+            str: The local path of the image.
+        """
+        digest = hashlib.sha256(content).hexdigest()
+        name = posixpath.join(digest[:2], digest + image_extension(url))
+        path = os.path.join(self.directory, name)
+        with self._lock:
+            if os.path.exists(path):
+                self.deduplicated += 1
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Written under a temporary name so a partial file is never indexed
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(content)
+                os.replace(tmp_path, path)
+                self.stored += 1
+                self.bytes_written += len(content)
+            self._urls[url] = path
+            with open(self._index_path, "a", encoding="utf-8") as index:
+                index.write(json.dumps({"url": url, "file": name}) + "\n")
+        return path
+
+
+class ImageDownloader:
+    """Downloads the cover of each book on a bounded pool of its own.
+
+    ``fetch`` takes an image URL and returns its bytes, or None if it
+    couldn't be downloaded.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Optional[bytes]],
+        store: ImageStore,
+        max_concurrency: int = DEFAULT_IMAGE_CONCURRENCY,
+    ):
+        self.fetch = fetch
+        self.store = store
+        self.max_concurrency = max(1, max_concurrency)
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_concurrency, thread_name_prefix="image"
+        )
+        self._lock = threading.Lock()
+        self.downloaded = 0
+        self.skipped = 0
+        self.failed = 0
+        self.is_shut_down = False
+
+    def download(self, url: str) -> Optional[str]:
+        """Return the local path of an image, downloading it if needed.
+
+        Args:
+            url (str): The image URL.
+
+        Returns:
+            Optional[str]: The local path, or None if the download failed.
+        """
+        path = self.store.lookup(url)
+        if path is not None:
+            with self._lock:
+                self.skipped += 1
+            return path
+        try:
+            content = self.fetch(url)
+        except Exception as e:
+            logger.warning(f"Failed to download image {url}: {e}")
+            content = None
+        if not content:
+            with self._lock:
+                self.failed += 1
+            return None
+        with self._lock:
+            self.downloaded += 1
+        return self.store.put(url, content)
+
+    def attach(
+        self, books: Iterator[Dict[str, Any]], window: int = 0
+    ) -> Iterator[Dict[str, Any]]:
+        """Add the local cover path to each book as it streams past.
+
+        Up to ``window`` books wait for their cover at a time; they come out
+        in the order they went in, with ``image_path`` set (None when the
+        book has no cover URL or the download failed).
+
+        Args:
+            books (Iterator[Dict[str, Any]]): The finished books.
+            window (int, optional): Books waiting for their cover at most.
+                Defaults to four per download thread.
+
+        Yields:
+            Dict[str, Any]: Each book with its ``image_path``.
+        """
+        window = window or 4 * self.max_concurrency
+        pending: collections.deque = collections.deque()
+        try:
+            for book in books:
+                url = book.get("image_url")
+                future = self._executor.submit(self.download, url) if url else None
+                pending.append((book, future))
+                while len(pending) >= window or (pending and _ready(pending[0][1])):
+                    yield _with_image(*pending.popleft())
+            while pending:
+                yield _with_image(*pending.popleft())
+        finally:
+            for _, future in pending:
+                if future is not None:
+                    future.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the download counters and what the store wrote."""
+        with self._lock:
+            return {
+                "downloaded": self.downloaded,
+                "skipped": self.skipped,
+                "failed": self.failed,
+                "stored": self.store.stored,
+                "deduplicated": self.store.deduplicated,
+                "bytes_written": self.store.bytes_written,
+            }
+
+    def log_summary(self) -> None:
+        """Log how many covers were downloaded, reused or failed."""
+        stats = self.stats()
+        logger.info(
+            f"Images: {stats['downloaded']} downloaded ({stats['stored']} new files, "
+            f"{stats['deduplicated']} duplicate content, "
+            f"{stats['bytes_written']} bytes), {stats['skipped']} already stored, "
+            f"{stats['failed']} failed, in {self.store.directory}"
+        )
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Stop the download threads. Safe to call more than once."""
+        with self._lock:
+            if self.is_shut_down:
+                return
+            self.is_shut_down = True
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def _ready(future: Optional[concurrent.futures.Future[Any]]) -> bool:
+    """Whether a book's cover is settled: no download, or a finished one."""
+    return future is None or future.done()
+
+
+def _with_image(
+    book: Dict[str, Any], future: Optional[concurrent.futures.Future[Any]]
+) -> Dict[str, Any]:
+    """Wait for a book's cover and set its local path."""
+    path = None
+    if future is not None:
+        try:
+            path = future.result()
+        except Exception as e:
+            logger.warning(f"Failed to store image of {book.get('title')}: {e}")
+    book["image_path"] = path
+    return book
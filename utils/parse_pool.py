@@ -0,0 +1,146 @@
+"""
+Process pool for the CPU-bound parse stage.
+Download threads or coroutines only move bytes; the HTML is parsed in worker
+processes, in batches, so parsing neither holds the GIL the I/O threads need
+nor pays a round trip to another process per page.
+"""
+
+import concurrent.futures
+import multiprocessing
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+from utils.logger import logger
+
+
+class ParsePool:
+    """Batches items and parses each batch in a worker process.
+
+    ``parse_batch`` must be a picklable module-level function that takes a
+    list of items and returns one result per item, in the same order.
+    """
+
+    def __init__(
+        self,
+        parse_batch: Callable[[List[Any]], List[Any]],
+        max_workers: int,
+        batch_size: int = 20,
+    ):
+        self.parse_batch = parse_batch
+        self.max_workers = max_workers
+        self.batch_size = max(1, batch_size)
+        # Workers start lazily while crawl threads hold locks (connection
+        # pools, log handlers); forked children would inherit them held
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[Hashable, Any]] = []
+        self._batches: List[Tuple[List[Hashable], concurrent.futures.Future[Any]]] = []
+        self.items = 0
+        self.failed = 0
+        self.wait_time = 0.0
+        self.is_shut_down = False
+
+    def add(self, key: Hashable, item: Any) -> None:
+        """Queue an item for parsing; a full batch is sent to a worker right away."""
+        with self._lock:
+            self._pending.append((key, item))
+            self.items += 1
+            if len(self._pending) >= self.batch_size:
+                self._submit_pending()
+
+    def flush(self) -> None:
+        """Send a partially filled batch to a worker."""
+        with self._lock:
+            if self._pending:
+                self._submit_pending()
+
+    def _submit_pending(self) -> None:
+        """Submit the buffered items as one batch. Caller holds the lock."""
+        keys = [key for key, _ in self._pending]
+        items = [item for _, item in self._pending]
+        self._pending = []
+        self._batches.append((keys, self._executor.submit(self.parse_batch, items)))
+
+    def finished(self, block: bool = False) -> Dict[Any, Any]:
+        """Return the parsed results of the batches that are done, by key.
+
+        Results are handed out once, so a streaming caller can poll while the
+        crawl is still running. Keys of a batch whose worker failed map to
+        None, so the caller keeps whatever it had for them before parsing.
+
+        Args:
+            block (bool, optional): Send the partial batch and wait for every
+                batch. Defaults to False.
+
+        Returns:
+            Dict[Any, Any]: The results of the finished batches.
+        """
+        if block:
+            self.flush()
+        started = time.monotonic()
+        with self._lock:
+            batches = []
+            running = []
+            for batch in self._batches:
+                if block or batch[1].done():
+                    batches.append(batch)
+                else:
+                    running.append(batch)
+            self._batches = running
+
+        parsed: Dict[Any, Any] = {}
+        for keys, future in batches:
+            try:
+                parsed.update(zip(keys, future.result()))
+            except Exception as e:
+                logger.error(f"Parse batch of {len(keys)} pages failed: {e}")
+                parsed.update(dict.fromkeys(keys))
+                with self._lock:
+                    self.failed += len(keys)
+
+        if block:
+            with self._lock:
+                self.wait_time += time.monotonic() - started
+        return parsed
+
+    def results(self) -> Dict[Any, Any]:
+        """Wait for every batch and return the parsed results by key.
+
+        Keys of a batch whose worker failed are left out, so the caller keeps
+        whatever it had for them before parsing.
+        """
+        return {
+            key: result
+            for key, result in self.finished(block=True).items()
+            if result is not None
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the parse stage counters."""
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "batch_size": self.batch_size,
+                "items": self.items,
+                "failed": self.failed,
+                "wait_time": self.wait_time,
+            }
+
+    def log_summary(self) -> None:
+        """Log how many pages went through the parse workers."""
+        stats = self.stats()
+        logger.info(
+            f"Parse pool: {stats['items']} pages on {stats['workers']} processes "
+            f"in batches of {stats['batch_size']}, {stats['failed']} failed, "
+            f"waited {stats['wait_time']:.2f}s for stragglers"
+        )
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Stop the worker processes. Safe to call more than once."""
+        with self._lock:
+            if self.is_shut_down:
+                return
+            self.is_shut_down = True
+        self._executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,155 @@
+"""
+Per-host token-bucket rate limiting.
+Every fetch takes a token from its host's bucket before it is sent, so listing,
+detail and image requests share one request budget per host.
+"""
+
+import asyncio
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+from utils.logger import logger
+
+
+class TokenBucket:
+    """A token bucket that hands out reservations instead of blocking.
+
+    ``reserve`` takes a token immediately and returns how long the caller has
+    to wait before using it. Tokens may go negative, which queues callers in
+    the order they reserved without holding a lock while they sleep.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        """Take one token and return the delay in seconds before it is valid."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+class HostRateLimiter:
+    """Thread-safe and async-safe token buckets keyed by host."""
+
+    def __init__(self, rate: Optional[float] = None, burst: Optional[int] = None):
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._metrics: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: {"requests": 0, "waited": 0, "total_wait": 0.0, "max_wait": 0.0}
+        )
+        self.rate: Optional[float] = None
+        self.burst = 1
+        self.configure(rate, burst)
+
+    @property
+    def enabled(self) -> bool:
+        """Whether requests are paced at all."""
+        return self.rate is not None
+
+    def configure(self, rate: Optional[float], burst: Optional[int] = None) -> None:
+        """Set the requests per second and burst size for every host.
+
+        Args:
+            rate (float, optional): Requests per second per host. None or 0
+                disables rate limiting.
+            burst (int, optional): Requests allowed back to back before pacing
+                starts. Defaults to one second's worth of requests.
+        """
+        with self._lock:
+            self.rate = rate if rate and rate > 0 else None
+            if self.rate is None:
+                self.burst = 1
+            elif burst is None:
+                self.burst = max(1, int(self.rate))
+            else:
+                self.burst = max(1, burst)
+            self._buckets.clear()
+            self._metrics.clear()
+
+    def _reserve(self, url: str) -> float:
+        """Reserve a token for the URL's host and record the wait."""
+        host = urlparse(url).netloc
+        with self._lock:
+            metrics = self._metrics[host]
+            metrics["requests"] += 1
+            if self.rate is None:
+                return 0.0
+
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self.rate, self.burst)
+            delay = bucket.reserve()
+
+            if delay > 0:
+                metrics["waited"] += 1
+                metrics["total_wait"] += delay
+                metrics["max_wait"] = max(metrics["max_wait"], delay)
+            return delay
+
+    def acquire(self, url: str) -> float:
+        """Block the calling thread until a request to ``url`` may be sent.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        delay = self._reserve(url)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    async def acquire_async(self, url: str) -> float:
+        """Wait on the event loop until a request to ``url`` may be sent.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        delay = self._reserve(url)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return the wait-time metrics per host."""
+        with self._lock:
+            return {
+                host: {
+                    **metrics,
+                    "average_wait": (
+                        metrics["total_wait"] / metrics["requests"]
+                        if metrics["requests"]
+                        else 0.0
+                    ),
+                }
+                for host, metrics in self._metrics.items()
+            }
+
+    def log_summary(self) -> None:
+        """Log how long requests waited for each host's bucket."""
+        if not self.enabled:
+            return
+        for host, metrics in self.stats().items():
+            logger.info(
+                f"Rate limiter ({host}): {int(metrics['requests'])} requests, "
+                f"{int(metrics['waited'])} waited, "
+                f"total wait {metrics['total_wait']:.2f}s, "
+                f"max wait {metrics['max_wait']:.2f}s"
+            )
+
+
+# Global rate limiter shared by every fetch
+rate_limiter = HostRateLimiter()
+
+
+def configure_rate_limit(rate: Optional[float], burst: Optional[int] = None) -> None:
+    """Configure the global per-host rate limit."""
+    rate_limiter.configure(rate, burst)
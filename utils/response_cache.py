@@ -0,0 +1,318 @@
+"""
+Disk-backed HTTP response cache.
+Successful responses are kept in a SQLite file, keyed by URL and the request
+headers that change the answer, with bodies stored compressed under the
+SHA-256 of their content, so re-running a crawl serves pages from disk
+instead of the site. Entries expire after their TTL and the least recently
+used are evicted once the cache outgrows its size cap.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Mapping, Optional, Tuple
+from utils.logger import logger
+
+# Request headers that change the response; the stealth headers vary per
+# request and would make every key unique
+VARY_HEADERS = ("if-none-match", "if-modified-since", "range", "authorization")
+
+# Response headers that describe the encoded body, which isn't what is stored
+DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+DEFAULT_CACHE_TTL = 24 * 3600.0
+DEFAULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Status served for a request that isn't cached in offline mode, as for an
+# "only-if-cached" request
+OFFLINE_MISS_STATUS = 504
+
+
+def cache_key(url: str, headers: Optional[Mapping[str, str]] = None) -> str:
+    """Return the cache key of a GET request.
+
+    Args:
+        url (str): The requested URL.
+        headers (Mapping[str, str], optional): The request headers; only
+            those in ``VARY_HEADERS`` are part of the key. Defaults to None.
+
+    Returns:
+        str: A hex SHA-256 digest.
+    """
+    vary = sorted(
+        (name.lower(), value)
+        for name, value in (headers or {}).items()
+        if name.lower() in VARY_HEADERS
+    )
+    material = json.dumps(["GET", url, vary], ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class CachedResponse:
+    """A response served from the cache."""
+
+    def __init__(self, url: str, status: int, headers: Dict[str, str], body: bytes):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+class ResponseCache:
+    """Thread-safe response cache in a SQLite file.
+
+    Bodies are content-addressed: identical pages under different URLs are
+    stored once, and a body is deleted when no entry refers to it anymore.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl: float = DEFAULT_CACHE_TTL,
+        max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+        offline: bool = False,
+    ):
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.reset(path, ttl, max_bytes, offline)
+
+    def reset(
+        self,
+        path: Optional[str],
+        ttl: float = DEFAULT_CACHE_TTL,
+        max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+        offline: bool = False,
+    ) -> None:
+        """Close the current file and open another one, clearing the counters.
+
+        Args:
+            path (str, optional): SQLite file of the cache, None disables it.
+            ttl (float, optional): Seconds a new entry stays fresh.
+                Defaults to one day.
+            max_bytes (int, optional): Compressed size the bodies may take
+                before the least recently used entries are evicted, 0 is
+                unbounded. Defaults to 512 MiB.
+            offline (bool, optional): Serve only from the cache; a request
+                that isn't cached is answered 504 without touching the
+                network. Defaults to False.
+        """
+        self.close()
+        with self._lock:
+            self.path = path
+            self.ttl = ttl
+            self.max_bytes = max(0, max_bytes)
+            self.offline = offline
+            self.hits = 0
+            self.misses = 0
+            self.expired = 0
+            self.stores = 0
+            self.evictions = 0
+            self.size = 0
+            if path is None:
+                return
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(
+                "CREATE TABLE IF NOT EXISTS bodies ("
+                " digest TEXT PRIMARY KEY, data BLOB, size INTEGER);"
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, url TEXT, status INTEGER, headers TEXT,"
+                " digest TEXT, expires REAL, accessed REAL);"
+                "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);"
+            )
+            self.size = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM bodies"
+            ).fetchone()[0]
+
+    @property
+    def enabled(self) -> bool:
+        """Whether responses are cached at all."""
+        return self._conn is not None
+
+    def get(
+        self, url: str, headers: Optional[Mapping[str, str]] = None
+    ) -> Optional[CachedResponse]:
+        """Return the fresh cached response of a request, if any.
+
+        Args:
+            url (str): The requested URL.
+            headers (Mapping[str, str], optional): The request headers.
+
+        Returns:
+            Optional[CachedResponse]: The response, or None on a miss.
+        """
+        key = cache_key(url, headers)
+        with self._lock:
+            if self._conn is None:
+                return None
+            row = self._conn.execute(
+                "SELECT e.url, e.status, e.headers, e.expires, b.data "
+                "FROM entries e JOIN bodies b ON b.digest = e.digest WHERE e.key = ?",
+                (key,),
+            ).fetchone()
+            now = time.time()
+            if row is None or row[3] < now:
+                self.misses += 1
+                if row is not None:
+                    self.expired += 1
+                return None
+            self.hits += 1
+            self._conn.execute(
+                "UPDATE entries SET accessed = ? WHERE key = ?", (now, key)
+            )
+            return CachedResponse(
+                row[0], row[1], json.loads(row[2]), zlib.decompress(row[4])
+            )
+
+    def put(
+        self,
+        url: str,
+        headers: Optional[Mapping[str, str]],
+        status: int,
+        response_headers: Mapping[str, str],
+        body: bytes,
+        ttl: Optional[float] = None,
+        response_url: Optional[str] = None,
+    ) -> None:
+        """Store a response under its request.
+
+        Args:
+            url (str): The requested URL.
+            headers (Mapping[str, str], optional): The request headers.
+            status (int): The response status.
+            response_headers (Mapping[str, str]): The response headers.
+            body (bytes): The decoded response body.
+            ttl (float, optional): Seconds this entry stays fresh.
+                Defaults to the cache's TTL.
+            response_url (str, optional): The final URL after redirects.
+                Defaults to ``url``.
+        """
+        key = cache_key(url, headers)
+        digest = hashlib.sha256(body).hexdigest()
+        kept_headers = {
+            name: value
+            for name, value in response_headers.items()
+            if name.lower() not in DROPPED_HEADERS
+        }
+        with self._lock:
+            if self._conn is None:
+                return
+            now = time.time()
+            if (
+                self._conn.execute(
+                    "SELECT 1 FROM bodies WHERE digest = ?", (digest,)
+                ).fetchone()
+                is None
+            ):
+                data = zlib.compress(body)
+                self._conn.execute(
+                    "INSERT INTO bodies (digest, data, size) VALUES (?, ?, ?)",
+                    (digest, data, len(data)),
+                )
+                self.size += len(data)
+            old = self._conn.execute(
+                "SELECT digest FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(key, url, status, headers, digest, expires, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    response_url or url,
+                    status,
+                    json.dumps(kept_headers, ensure_ascii=False),
+                    digest,
+                    now + (self.ttl if ttl is None else ttl),
+                    now,
+                ),
+            )
+            if old is not None and old[0] != digest:
+                self._drop_orphan(old[0])
+            self.stores += 1
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the bodies fit. Caller holds the lock."""
+        assert self._conn is not None
+        while self.max_bytes and self.size > self.max_bytes:
+            row = self._conn.execute(
+                "SELECT key, digest FROM entries ORDER BY accessed LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (row[0],))
+            self._drop_orphan(row[1])
+            self.evictions += 1
+
+    def _drop_orphan(self, digest: str) -> None:
+        """Delete a body no entry refers to anymore. Caller holds the lock."""
+        assert self._conn is not None
+        if self._conn.execute(
+            "SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)
+        ).fetchone():
+            return
+        row = self._conn.execute(
+            "SELECT size FROM bodies WHERE digest = ?", (digest,)
+        ).fetchone()
+        if row is not None:
+            self._conn.execute("DELETE FROM bodies WHERE digest = ?", (digest,))
+            self.size -= row[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the hit/miss counters, the hit rate and the stored size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "size": self.size,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def log_summary(self) -> None:
+        """Log how many requests the cache answered."""
+        if not self.enabled:
+            return
+        stats = self.stats()
+        logger.info(
+            f"Response cache: {stats['hits']} hits, {stats['misses']} misses "
+            f"({stats['expired']} expired), {stats['hit_rate']:.1%} hit rate, "
+            f"{stats['stores']} stored, {stats['evictions']} evicted, "
+            f"{stats['size']} bytes on disk" + (" (offline)" if self.offline else "")
+        )
+
+    def close(self) -> None:
+        """Close the cache file, if any."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.commit()
+                self._conn.close()
+                self._conn = None
+
+
+def offline_miss(url: str) -> Tuple[int, Dict[str, str], bytes]:
+    """Return the status, headers and body served for an uncached URL offline."""
+    logger.warning(f"Offline: {url} is not in the response cache")
+    return OFFLINE_MISS_STATUS, {"content-type": "text/plain"}, b"Not cached"
+
+
+# Consulted by every request the pooled fetchers send
+response_cache = ResponseCache()
+
+
+def configure_response_cache(
+    path: Optional[str],
+    ttl: float = DEFAULT_CACHE_TTL,
+    max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+    offline: bool = False,
+) -> None:
+    """Cache responses in the given SQLite file, or disable the cache."""
+    response_cache.reset(path, ttl, max_bytes, offline)
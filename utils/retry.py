@@ -0,0 +1,292 @@
+"""
+Retry engine for page fetches.
+Classifies each failed attempt, backs off exponentially with full jitter (or as
+long as the server's Retry-After asks), and draws every retry from a run-wide
+budget so retries cannot snowball into overload.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+import httpx
+from utils.logger import logger
+
+T = TypeVar("T")
+
+# Statuses worth another attempt, by error class
+SERVER_ERROR_STATUSES = {500, 502, 503, 504}
+THROTTLED_STATUS = 429
+# A 304 answers a conditional GET, the page is unchanged rather than missing
+SUCCESS_STATUSES = {200, 304}
+
+
+class RetryPolicy:
+    """How often and how patiently one class of error is retried."""
+
+    def __init__(
+        self,
+        max_retries: int,
+        base_delay: float,
+        max_delay: float,
+        respect_retry_after: bool = False,
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.respect_retry_after = respect_retry_after
+
+    def backoff(self, retry_number: int) -> float:
+        """Return a full-jitter exponential delay for the given retry (1-based)."""
+        ceiling = min(self.max_delay, self.base_delay * 2 ** (retry_number - 1))
+        return random.uniform(0, ceiling)
+
+
+DEFAULT_POLICIES: Dict[str, RetryPolicy] = {
+    "throttled": RetryPolicy(5, 1.0, 60.0, respect_retry_after=True),
+    "server_error": RetryPolicy(3, 0.5, 10.0, respect_retry_after=True),
+    "timeout": RetryPolicy(3, 0.5, 10.0),
+    "connection": RetryPolicy(3, 0.5, 10.0),
+}
+
+
+def classify_status(status: int) -> Optional[str]:
+    """Return the error class of an HTTP status, or None if it isn't retryable."""
+    if status == THROTTLED_STATUS:
+        return "throttled"
+    if status in SERVER_ERROR_STATUSES:
+        return "server_error"
+    return None
+
+
+def classify_exception(error: BaseException) -> Optional[str]:
+    """Return the error class of an exception, or None if it isn't retryable."""
+    if isinstance(error, (httpx.TimeoutException, TimeoutError)):
+        return "timeout"
+    if isinstance(error, (httpx.TransportError, ConnectionError)):
+        return "connection"
+    return None
+
+
+def parse_retry_after(value: Any) -> Optional[float]:
+    """Parse a Retry-After header given in seconds or as an HTTP date."""
+    if not isinstance(value, str) or not value.strip():
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryBudget:
+    """Caps retries at a fraction of all requests, plus a small allowance."""
+
+    def __init__(self, ratio: float = 0.2, min_retries: int = 10):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.requests = 0
+        self.retries = 0
+        self.exhausted = 0
+
+    def allow(self) -> bool:
+        """Spend one retry if the budget still has room for it."""
+        if self.retries < self.min_retries + self.ratio * self.requests:
+            self.retries += 1
+            return True
+        self.exhausted += 1
+        return False
+
+
+class RetryEngine:
+    """Runs fetch attempts with per-error-class retry policies.
+
+    A fetch function returns a response with a ``status`` attribute or raises.
+    Retryable statuses and exceptions are retried according to their policy;
+    anything else is returned or raised straight away. When retries run out
+    the last response is returned, or the last exception re-raised, so callers
+    keep their existing failure handling.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 0,
+        policies: Optional[Dict[str, RetryPolicy]] = None,
+        budget: Optional[RetryBudget] = None,
+    ):
+        self._lock = threading.Lock()
+        self.max_retries = max_retries
+        self.policies = dict(policies or DEFAULT_POLICIES)
+        self.budget = budget or RetryBudget()
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"requests": 0, "retries": 0, "failures": 0}
+        )
+
+    def configure(
+        self,
+        max_retries: int,
+        budget_ratio: float = 0.2,
+        min_budget: int = 10,
+    ) -> None:
+        """Set the retry cap and budget for a run and reset the counters.
+
+        Args:
+            max_retries (int): Upper bound on retries of a single fetch; each
+                error class may allow fewer. 0 disables retries.
+            budget_ratio (float, optional): Retries allowed as a fraction of
+                all requests in the run. Defaults to 0.2.
+            min_budget (int, optional): Retries always allowed on top of the
+                ratio. Defaults to 10.
+        """
+        with self._lock:
+            self.max_retries = max(0, max_retries)
+            self.budget = RetryBudget(budget_ratio, min_budget)
+            self._stats.clear()
+
+    def _next_delay(
+        self,
+        stage: str,
+        retry_number: int,
+        response: Any,
+        error: Optional[BaseException],
+    ) -> Optional[float]:
+        """Return how long to wait before retrying, or None to give up."""
+        if error is not None:
+            error_class = classify_exception(error)
+        else:
+            error_class = classify_status(response.status)
+        if error_class is None:
+            return None
+
+        policy = self.policies.get(error_class)
+        if policy is None or retry_number > min(policy.max_retries, self.max_retries):
+            return None
+
+        with self._lock:
+            if not self.budget.allow():
+                if self.budget.exhausted == 1:
+                    logger.warning("Retry budget exhausted, failing fast from now on")
+                return None
+            self._stats[stage]["retries"] += 1
+
+        delay = policy.backoff(retry_number)
+        if policy.respect_retry_after and response is not None:
+            headers = getattr(response, "headers", None) or {}
+            retry_after = parse_retry_after(
+                headers.get("retry-after") if isinstance(headers, dict) else None
+            )
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+        delay = min(delay, policy.max_delay)
+
+        reason = f"{type(error).__name__}" if error else f"status {response.status}"
+        logger.debug(
+            f"Retrying {stage} fetch in {delay:.2f}s ({reason}, retry {retry_number})"
+        )
+        return delay
+
+    def _start(self, stage: str) -> None:
+        """Count a new logical request."""
+        with self._lock:
+            self._stats[stage]["requests"] += 1
+            self.budget.requests += 1
+
+    def _finish(self, stage: str, response: Any) -> None:
+        """Count the final outcome of a fetch."""
+        if response is None or response.status not in SUCCESS_STATUSES:
+            with self._lock:
+                self._stats[stage]["failures"] += 1
+
+    def call(self, stage: str, fetch: Callable[[], T]) -> T:
+        """Run a blocking fetch with retries.
+
+        Args:
+            stage (str): Pipeline stage the fetch belongs to, for the summary.
+            fetch (Callable[[], T]): Performs one attempt.
+
+        Returns:
+            T: The last response.
+        """
+        self._start(stage)
+        retry_number = 0
+        while True:
+            retry_number += 1
+            try:
+                response = fetch()
+            except Exception as e:
+                delay = self._next_delay(stage, retry_number, None, e)
+                if delay is None:
+                    self._finish(stage, None)
+                    raise
+            else:
+                delay = self._next_delay(stage, retry_number, response, None)
+                if delay is None:
+                    self._finish(stage, response)
+                    return response
+            time.sleep(delay)
+
+    async def call_async(self, stage: str, fetch: Callable[[], Awaitable[T]]) -> T:
+        """Run an async fetch with retries, backing off on the event loop.
+
+        Args:
+            stage (str): Pipeline stage the fetch belongs to, for the summary.
+            fetch (Callable[[], Awaitable[T]]): Performs one attempt.
+
+        Returns:
+            T: The last response.
+        """
+        self._start(stage)
+        retry_number = 0
+        while True:
+            retry_number += 1
+            try:
+                response = await fetch()
+            except Exception as e:
+                delay = self._next_delay(stage, retry_number, None, e)
+                if delay is None:
+                    self._finish(stage, None)
+                    raise
+            else:
+                delay = self._next_delay(stage, retry_number, response, None)
+                if delay is None:
+                    self._finish(stage, response)
+                    return response
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Return requests, retries and failures per stage."""
+        with self._lock:
+            return {stage: dict(counts) for stage, counts in self._stats.items()}
+
+    def log_summary(self) -> None:
+        """Log retries and final failures per stage."""
+        for stage, counts in sorted(self.stats().items()):
+            logger.info(
+                f"{stage.capitalize()} fetches: {counts['requests']} requests, "
+                f"{counts['retries']} retries, {counts['failures']} failed"
+            )
+        if self.budget.exhausted:
+            logger.warning(
+                f"Retry budget exhausted: {self.budget.exhausted} retries skipped"
+            )
+
+
+# Global retry engine shared by every stage; retries are off until configured
+retry_engine = RetryEngine()
+
+
+def configure_retries(
+    max_retries: int, budget_ratio: float = 0.2, min_budget: int = 10
+) -> None:
+    """Configure the global retry engine for a run."""
+    retry_engine.configure(max_retries, budget_ratio, min_budget)
@@ -3,10 +3,11 @@ Signal handling utilities for graceful container shutdown.
 Handles SIGTERM, SIGINT, and other signals to ensure clean application exit.
 """
 
+import contextlib
 import signal
 import sys
 import threading
-from typing import Callable, Optional
+from typing import Callable, Iterator, Optional
 from utils.logger import logger
 
 
@@ -17,11 +18,18 @@ class GracefulShutdownHandler:
         self.shutdown_event = threading.Event()
         self.cleanup_callbacks = []
         self.is_shutting_down = False
+        # Nesting depth of deferred_exit(); a signal only sets the flag then
+        self.exit_deferred = 0
 
     def add_cleanup_callback(self, callback: Callable[[], None]) -> None:
         """Add a cleanup callback to be executed during shutdown."""
         self.cleanup_callbacks.append(callback)
 
+    def remove_cleanup_callback(self, callback: Callable[[], None]) -> None:
+        """Remove a cleanup callback once the resource it releases is gone."""
+        with contextlib.suppress(ValueError):
+            self.cleanup_callbacks.remove(callback)
+
     def signal_handler(self, signum: int, frame) -> None:
         """Handle shutdown signals."""
         signal_name = signal.Signals(signum).name
@@ -33,11 +41,17 @@ class GracefulShutdownHandler:
             logger.warning("Already shutting down, ignoring additional signals")
             return
 
+        if self.exit_deferred and not self.shutdown_event.is_set():
+            # The running crawl stops at its next check and saves its output
+            self.shutdown_event.set()
+            logger.info("Stopping after the work in flight, signal again to exit now")
+            return
+
         self.is_shutting_down = True
         self.shutdown_event.set()
 
         # Execute cleanup callbacks
-        for callback in self.cleanup_callbacks:
+        for callback in list(self.cleanup_callbacks):
             try:
                 logger.debug(f"Executing cleanup callback: {callback.__name__}")
                 callback()
@@ -47,6 +61,20 @@ class GracefulShutdownHandler:
         logger.info("Graceful shutdown completed")
         sys.exit(0)
 
+    @contextlib.contextmanager
+    def deferred_exit(self) -> Iterator[None]:
+        """Let the code in the block stop itself on the first signal.
+
+        The signal only requests the shutdown, so work that checks
+        ``is_shutdown_requested`` can finish and save what it has. A second
+        signal runs the cleanup callbacks and exits as usual.
+        """
+        self.exit_deferred += 1
+        try:
+            yield
+        finally:
+            self.exit_deferred -= 1
+
     def setup_signal_handlers(self) -> None:
         """Set up signal handlers for graceful shutdown."""
         # Handle SIGTERM (sent by Docker/Kubernetes for graceful shutdown)
@@ -85,6 +113,16 @@ def add_cleanup_callback(callback: Callable[[], None]) -> None:
     shutdown_handler.add_cleanup_callback(callback)
 
 
+def remove_cleanup_callback(callback: Callable[[], None]) -> None:
+    """Remove a cleanup callback (convenience function)."""
+    shutdown_handler.remove_cleanup_callback(callback)
+
+
+def deferred_exit() -> contextlib.AbstractContextManager[None]:
+    """Defer the exit on a signal for the block (convenience function)."""
+    return shutdown_handler.deferred_exit()
+
+
 def is_shutdown_requested() -> bool:
     """Check if shutdown has been requested (convenience function)."""
     return shutdown_handler.is_shutdown_requested()
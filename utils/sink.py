@@ -0,0 +1,172 @@
+"""
+Streaming output for the crawl.
+Finished books are put back in listing order a page at a time and written to
+the output file as they arrive, so memory stays flat however many pages are
+crawled. They are streamed to a temporary file that replaces the output once
+the crawl is done, so a failed run leaves the previous output intact.
+"""
+
+import heapq
+import json
+import os
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set, TextIO
+from utils.logger import logger
+
+
+class PageOrder:
+    """Releases finished books in listing order, one resolved page at a time.
+
+    Pages are registered with ``open`` before their books arrive; a page is
+    resolved once it was ``listed`` and every book it ``expect``-ed is
+    ``done``. Books of a resolved page are released as soon as no open page
+    sorts before it, so only pages still in flight are buffered.
+    """
+
+    def __init__(self):
+        self._unresolved: List[Any] = []
+        self._resolved: List[Any] = []
+        self._open: Set[Any] = set()
+        self._listed: Set[Any] = set()
+        self._pending: Dict[Any, int] = defaultdict(int)
+        self._books: Dict[Any, Dict[int, Dict[str, Any]]] = defaultdict(dict)
+        self.buffered = 0
+        self.peak_buffered = 0
+
+    def open(self, page: Any) -> None:
+        """Register a page whose books will be released in order."""
+        if page not in self._open:
+            self._open.add(page)
+            heapq.heappush(self._unresolved, page)
+
+    def add(self, page: Any, position: int, book: Dict[str, Any]) -> None:
+        """Store a final book under its page and position."""
+        if position not in self._books[page]:
+            self.buffered += 1
+            self.peak_buffered = max(self.peak_buffered, self.buffered)
+        self._books[page][position] = book
+
+    def expect(self, page: Any, count: int) -> None:
+        """Note that ``count`` books of the page are still being processed."""
+        self._pending[page] += count
+
+    def done(self, page: Any) -> None:
+        """Note that one expected book of the page finished, with or without a result."""
+        self._pending[page] -= 1
+        self._resolve_if_complete(page)
+
+    def listed(self, page: Any) -> None:
+        """Note that every book of the page was added or expected.
+
+        Also used for pages that failed to download, which resolve empty.
+        """
+        self._listed.add(page)
+        self._resolve_if_complete(page)
+
+    def _resolve_if_complete(self, page: Any) -> None:
+        if page in self._listed and self._pending[page] <= 0 and page in self._open:
+            self._open.discard(page)
+            self._listed.discard(page)
+            self._pending.pop(page, None)
+            heapq.heappush(self._resolved, page)
+
+    def release(self) -> List[Dict[str, Any]]:
+        """Return the books that can go to the output now, in listing order."""
+        while self._unresolved and self._unresolved[0] not in self._open:
+            heapq.heappop(self._unresolved)
+        books = []
+        while self._resolved and (
+            not self._unresolved or self._resolved[0] < self._unresolved[0]
+        ):
+            books.extend(self._pop(heapq.heappop(self._resolved)))
+        return books
+
+    def flush(self) -> List[Dict[str, Any]]:
+        """Return every buffered book in listing order, resolved or not.
+
+        Used when the crawl stops early, so partial pages still reach the output.
+        """
+        pages = sorted(set(self._books))
+        books = []
+        for page in pages:
+            books.extend(self._pop(page))
+        self._unresolved.clear()
+        self._resolved.clear()
+        self._open.clear()
+        return books
+
+    def _pop(self, page: Any) -> List[Dict[str, Any]]:
+        """Remove a page's books, in position order."""
+        page_books = self._books.pop(page, {})
+        self.buffered -= len(page_books)
+        return [page_books[position] for position in sorted(page_books)]
+
+
+class JsonArraySink:
+    """Writes books to a JSON array file as they arrive.
+
+    The file is formatted exactly like ``json.dump(books, indent=4)``. Books
+    go to ``path + ".tmp"``, created with the first book, and ``close``
+    terminates the array and moves it onto ``path``; ``discard`` drops it
+    instead. An empty crawl, a failed one or a killed process leave the
+    previous output as it was.
+    """
+
+    def __init__(self, path: str, flush_every: int = 50):
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        self.flush_every = max(1, flush_every)
+        self.count = 0
+        self._file: Optional[TextIO] = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def write(self, book: Dict[str, Any]) -> None:
+        """Append a book to the array."""
+        text = json.dumps(book, indent=4, ensure_ascii=False)
+        with self._lock:
+            if self._closed:
+                raise ValueError(f"Output {self.path} is already closed")
+            if self._file is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._file = open(self.tmp_path, "w", encoding="utf-8")
+                self._file.write("[")
+            separator = "\n" if self.count == 0 else ",\n"
+            self._file.write(separator + "    " + text.replace("\n", "\n    "))
+            self.count += 1
+            if self.count % self.flush_every == 0:
+                self._file.flush()
+
+    def close(self) -> None:
+        """Terminate the array and replace the output with it.
+
+        Safe to call more than once, and a no-op after ``discard``.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._file is not None:
+                self._file.write("\n]")
+                self._file.close()
+                self._file = None
+                os.replace(self.tmp_path, self.path)
+                logger.info(f"Wrote {self.count} books to {self.path}")
+
+    def discard(self) -> None:
+        """Drop the books written so far, keeping the previous output.
+
+        A no-op after ``close``.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                os.remove(self.tmp_path)
+                logger.warning(f"Discarded {self.count} unsaved books")
@@ -0,0 +1,212 @@
+"""
+Durable work queue shared by the processes of a distributed crawl.
+A SQLite file in WAL mode on the shared output volume holds every listing page
+and detail URL. Workers lease tasks for a limited time; a lease that isn't
+completed before it expires (e.g. the worker crashed) is handed out again.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from utils.logger import logger
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+
+class Task:
+    """A leased unit of work."""
+
+    def __init__(self, task_id: int, kind: str, payload: Any, attempts: int):
+        self.id = task_id
+        self.kind = kind
+        self.payload = payload
+        self.attempts = attempts
+
+    def __repr__(self) -> str:
+        return f"Task({self.id}, {self.kind!r}, attempt {self.attempts})"
+
+
+class WorkQueue:
+    """Lease-based task queue stored in a SQLite file.
+
+    Safe to use from several threads of one process and from several
+    processes on the same machine at once.
+    """
+
+    def __init__(self, path: str, lease_seconds: float = 60.0, max_attempts: int = 5):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # Autocommit mode; writes that must be atomic use BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(
+            path, timeout=30.0, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " kind TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " state TEXT NOT NULL DEFAULT 'pending',"
+            " owner TEXT,"
+            " lease_expires REAL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " UNIQUE (kind, key))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        self.reissued = 0
+
+    def enqueue(self, kind: str, items: Iterable[Tuple[str, Any]]) -> int:
+        """Add tasks, skipping keys that were queued before.
+
+        Args:
+            kind (str): Task kind, e.g. "listing" or "detail".
+            items (Iterable[Tuple[str, Any]]): Unique key and JSON-serializable
+                payload of each task.
+
+        Returns:
+            int: The number of tasks that were new.
+        """
+        rows = [(kind, key, json.dumps(payload)) for key, payload in items]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                before = self._conn.total_changes
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO tasks (kind, key, payload) VALUES (?, ?, ?)",
+                    rows,
+                )
+                added = self._conn.total_changes - before
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return added
+
+    def lease(self, worker_id: str, limit: int = 1) -> List[Task]:
+        """Lease up to ``limit`` tasks, listing pages first.
+
+        Pending tasks and tasks whose lease expired are both eligible; an
+        expired task that already used all its attempts is marked failed.
+
+        Args:
+            worker_id (str): Who holds the lease.
+            limit (int, optional): Maximum number of tasks. Defaults to 1.
+
+        Returns:
+            List[Task]: The leased tasks, possibly none.
+        """
+        if limit <= 0:
+            return []
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "UPDATE tasks SET state = ?, owner = NULL "
+                    "WHERE state = ? AND lease_expires < ? AND attempts >= ?",
+                    (FAILED, LEASED, now, self.max_attempts),
+                )
+                rows = self._conn.execute(
+                    "SELECT id, kind, payload, attempts, state FROM tasks "
+                    "WHERE state = ? OR (state = ? AND lease_expires < ?) "
+                    "ORDER BY CASE kind WHEN 'listing' THEN 0 ELSE 1 END, id "
+                    "LIMIT ?",
+                    (PENDING, LEASED, now, limit),
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE tasks SET state = ?, owner = ?, lease_expires = ?, "
+                    "attempts = attempts + 1 WHERE id = ?",
+                    [(LEASED, worker_id, now + self.lease_seconds, r[0]) for r in rows],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+            expired = [row for row in rows if row[4] == LEASED]
+            self.reissued += len(expired)
+        for row in expired:
+            logger.warning(f"Lease on {row[1]} task {row[0]} expired, re-issuing it")
+        return [Task(row[0], row[1], json.loads(row[2]), row[3] + 1) for row in rows]
+
+    def complete(self, task: Task, worker_id: str) -> bool:
+        """Mark a task done. Returns False if the lease was lost meanwhile."""
+        return self._finish(task, worker_id, DONE)
+
+    def release(self, task: Task, worker_id: str) -> bool:
+        """Give a task back after a failure so it can be leased again.
+
+        A task that used all its attempts is marked failed instead.
+        """
+        state = FAILED if task.attempts >= self.max_attempts else PENDING
+        return self._finish(task, worker_id, state)
+
+    def _finish(self, task: Task, worker_id: str, state: str) -> bool:
+        """Move a task out of the leased state if this worker still holds it."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE tasks SET state = ?, owner = NULL, lease_expires = NULL "
+                "WHERE id = ? AND owner = ? AND state = ?",
+                (state, task.id, worker_id, LEASED),
+            )
+        return cursor.rowcount == 1
+
+    def set_meta(self, key: str, value: str, overwrite: bool = True) -> str:
+        """Store a crawl-wide setting and return the stored value."""
+        verb = "REPLACE" if overwrite else "IGNORE"
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR {verb} INTO meta (key, value) VALUES (?, ?)", (key, value)
+            )
+        stored = self.get_meta(key)
+        assert stored is not None
+        return stored
+
+    def get_meta(self, key: str) -> Optional[str]:
+        """Return a crawl-wide setting, or None if it wasn't set."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM meta WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def counts(self) -> Dict[str, int]:
+        """Return the number of tasks in each state."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT state, COUNT(*) FROM tasks GROUP BY state"
+            ).fetchall()
+        counts = {state: 0 for state in (PENDING, LEASED, DONE, FAILED)}
+        counts.update(dict(rows))
+        return counts
+
+    def is_finished(self) -> bool:
+        """Whether the crawl was seeded and no task is waiting or in flight."""
+        if self.get_meta("seeded") is None:
+            return False
+        counts = self.counts()
+        return counts[PENDING] == 0 and counts[LEASED] == 0
+
+    def log_summary(self) -> None:
+        """Log the task counts."""
+        counts = self.counts()
+        logger.info(
+            f"Work queue: {counts[DONE]} done, {counts[FAILED]} failed, "
+            f"{counts[PENDING]} pending, {counts[LEASED]} leased, "
+            f"{self.reissued} expired leases re-issued here"
+        )
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,88 @@
+"""
+Shared worker pool for the whole crawl.
+One long-lived thread pool runs every stage so threads stay warm and there is
+no per-page pool start-up or join barrier.
+"""
+
+import concurrent.futures
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, Optional, Set
+from utils.logger import logger
+
+
+class CrawlPool:
+    """A single thread pool shared by every stage of a crawl run."""
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="crawl"
+        )
+        self._lock = threading.Lock()
+        self._futures: Set[concurrent.futures.Future[Any]] = set()
+        self._in_flight: Dict[str, int] = defaultdict(int)
+        self.submitted = 0
+        self.completed = 0
+        self.is_shut_down = False
+
+    def submit(
+        self, stage: str, fn: Callable[..., Any], *args: Any, **kwargs: Any
+    ) -> concurrent.futures.Future[Any]:
+        """Submit work for a stage and account for it until it finishes."""
+        with self._lock:
+            if self.is_shut_down:
+                raise RuntimeError("Cannot submit work after the pool was shut down")
+            future = self._executor.submit(fn, *args, **kwargs)
+            self._futures.add(future)
+            self._in_flight[stage] += 1
+            self.submitted += 1
+
+        future.add_done_callback(lambda f: self._on_done(stage, f))
+        return future
+
+    def _on_done(self, stage: str, future: concurrent.futures.Future[Any]) -> None:
+        """Update the in-flight accounting when a future finishes."""
+        with self._lock:
+            if future in self._futures:
+                self._futures.discard(future)
+                self._in_flight[stage] -= 1
+                self.completed += 1
+
+    def in_flight(self, stage: Optional[str] = None) -> int:
+        """Return the number of unfinished tasks, optionally for one stage."""
+        with self._lock:
+            if stage is not None:
+                return self._in_flight[stage]
+            return len(self._futures)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return a snapshot of the pool accounting."""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "in_flight": len(self._futures),
+                "in_flight_by_stage": {
+                    stage: count for stage, count in self._in_flight.items() if count
+                },
+            }
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Cancel queued work and stop the pool. Safe to call more than once."""
+        with self._lock:
+            if self.is_shut_down:
+                return
+            self.is_shut_down = True
+            pending = len(self._futures)
+
+        if pending:
+            logger.info(f"Shutting down crawl pool with {pending} tasks in flight")
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def __enter__(self) -> "CrawlPool":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.shutdown(wait=exc_type is None)